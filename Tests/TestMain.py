@@ -6,6 +6,27 @@ from Tests.epithelium_backend_tests.FurrowTester import FurrowTester
 from Tests.epithelium_backend_tests.CellTester import CellTester
 from Tests.epithelium_backend_tests.FurrowEventTester import FurrowEventTester
 from Tests.epithelium_backend_tests.CellCollisionHandlerTester import CellCollisionHandlerTester
+from Tests.epithelium_backend_tests.RenderSnapshotTester import RenderSnapshotTester
+from Tests.epithelium_backend_tests.SharedFrameRingTester import SharedFrameRingTester
+from Tests.epithelium_backend_tests.SimulationProcessTester import SimulationProcessTester
+from Tests.epithelium_backend_tests.EpitheliumSnapshotTester import EpitheliumSnapshotTester
+from Tests.epithelium_backend_tests.TickHistoryTester import TickHistoryTester
+from Tests.epithelium_backend_tests.EpitheliumBranchesTester import EpitheliumBranchesTester
+from Tests.epithelium_backend_tests.EpitheliumFileTester import EpitheliumFileTester
+from Tests.epithelium_backend_tests.MappedEpitheliumTester import MappedEpitheliumTester
+from Tests.epithelium_backend_tests.TrajectoryRecorderTester import TrajectoryRecorderTester
+from Tests.epithelium_backend_tests.TrajectoryReaderTester import TrajectoryReaderTester
+from Tests.epithelium_backend_tests.CompressedTrajectoryTester import CompressedTrajectoryTester
+from Tests.epithelium_backend_tests.EpitheliumCacheTester import EpitheliumCacheTester
+from Tests.epithelium_backend_tests.GenerationProcessTester import GenerationProcessTester
+from Tests.epithelium_backend_tests.TiledSheetGeneratorTester import TiledSheetGeneratorTester
+from Tests.epithelium_backend_tests.CellColumnsTester import CellColumnsTester
+from Tests.epithelium_backend_tests.ParallelDecompactorTester import ParallelDecompactorTester
+from Tests.epithelium_backend_tests.ShardedSimulationTester import ShardedSimulationTester
+from Tests.epithelium_backend_tests.OutOfCoreEpitheliumTester import OutOfCoreEpitheliumTester
+from Tests.epithelium_backend_tests.RelaxationSchedulerTester import RelaxationSchedulerTester
+from Tests.epithelium_backend_tests.CellOrderingTester import CellOrderingTester
+from Tests.epithelium_backend_tests.CellPoolTester import CellPoolTester
 
 if __name__ == '__main__':
     unittest.main()
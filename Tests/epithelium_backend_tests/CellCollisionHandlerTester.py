@@ -109,6 +109,19 @@ class CellCollisionHandlerTester(unittest.TestCase):
         for new_dist, old_dist in zip(new_pairwise_distances, old_pairwise_distances):
             self.assertTrue(new_dist > old_dist, "The cells moved farther apart.")
 
+    def test_decompact_residual(self):
+        """Ensures that decompact returns the largest distance a cell moved."""
+        cells = [Cell((0, 0, 0), 1),
+                 Cell((0, 1, 0), 1)]
+        handler = CellCollisionHandler(cells)
+        residual = handler.decompact()
+        self.assertAlmostEqual(residual, max(distance((0, 0, 0), (cells[0].position_x, cells[0].position_y, 0)),
+                                             distance((0, 1, 0), (cells[1].position_x, cells[1].position_y, 0))),
+                               msg="Incorrect residual returned by decompact")
+        for _ in range(20):
+            last_residual, residual = residual, handler.decompact()
+        self.assertLess(residual, last_residual, "Residual did not shrink as the cells relaxed")
+
     def test_decompact_line_3cell(self):
         cells = [Cell((0, 0, 0), 1),
                  Cell((0, 1, 0), 1),
@@ -311,3 +324,97 @@ class CellCollisionHandlerTester(unittest.TestCase):
                 self.assertGreater(new_distance, old_distance, "Overlapping cells were not moved")
 
 
+
+    @staticmethod
+    def settled_lattice(rows: int) -> list:
+        """Returns a hexagonal lattice of cells 10 in radius, spaced so that they neither push nor pull."""
+        spacing = 2 * 10 * 0.95
+        return [Cell(((col + (row % 2) / 2) * spacing, row * spacing * 3 ** .5 / 2, 0), 10)
+                for row in range(rows) for col in range(rows)]
+
+    def test_sleeping_cells(self):
+        """Ensures that settled cells sleep, and that cells around a disturbance wake and move as if awake."""
+        awake_cells = self.settled_lattice(20)
+        sleeping_cells = self.settled_lattice(20)
+        awake_handler = CellCollisionHandler(awake_cells)
+        handler = CellCollisionHandler(sleeping_cells, sleep_threshold=.01, sleep_ticks=2)
+        for _ in range(3):
+            handler.decompact()
+        handler.decompact()
+        self.assertEqual(handler.active_fraction, 0, "Settled cells did not sleep")
+        self.assertEqual(handler.decompact(), 0, "Sleeping cells moved")
+
+        awake_cells[210].position_x += 3
+        sleeping_cells[210].position_x += 3
+        fractions = []
+        for _ in range(30):
+            awake_handler.decompact()
+            handler.decompact()
+            fractions.append(handler.active_fraction)
+        self.assertGreater(max(fractions), 0, "Moved cell did not wake its neighbors")
+        self.assertLess(max(fractions), .5, "Cells far from the moved cell woke")
+        self.assertEqual(fractions[-1], 0, "Cells did not sleep again")
+        for awake_cell, cell in zip(awake_cells, sleeping_cells):
+            self.assertAlmostEqual(awake_cell.position_x, cell.position_x, 1, "Sleeping changed how cells moved")
+            self.assertAlmostEqual(awake_cell.position_y, cell.position_y, 1, "Sleeping changed how cells moved")
+
+    def test_waking_cells(self):
+        """Ensures that sleeping cells wake when a cell near them grows, divides, or dies."""
+        disturbances = {
+            "Growing": lambda handler, cells: setattr(cells[30], "radius", cells[30].radius + 1),
+            "Dying": lambda handler, cells: handler.deregister(cells[300]),
+            "New": lambda handler, cells: handler.register(Cell((cells[200].position_x + 1,
+                                                                 cells[200].position_y, 0), 5)),
+        }
+        for name, disturb in disturbances.items():
+            cells = self.settled_lattice(20)
+            handler = CellCollisionHandler(cells, sleep_threshold=.01, sleep_ticks=1)
+            for _ in range(3):
+                handler.decompact()
+            self.assertEqual(handler.active_fraction, 0, "Settled cells did not sleep")
+            disturb(handler, cells)
+            handler.decompact()
+            self.assertGreater(handler.active_fraction, 0, "%s cell did not wake its neighbors" % name)
+            self.assertLess(handler.active_fraction, .5, "%s cell woke far cells" % name)
+            self.assertLessEqual(set(handler.settled_ticks), set(handler.cells), "Dead cell still tracked")
+
+    def test_periodic_push_pull(self):
+        """Ensures that cells on opposite edges of a periodic sheet push each other apart across the seam."""
+        cells = [Cell((0, 2, 0), 5), Cell((0, 98, 0), 5), Cell((50, 50, 0), 5)]
+        handler = CellCollisionHandler(cells, period_y=100)
+        self.assertAlmostEqual(handler.distance_between(cells[0], cells[1]), 4, 7, "Distance not across the seam")
+        handler.decompact()
+        self.assertGreater(cells[0].position_y, 2, "Cell was not pushed away from the seam")
+        self.assertLess(cells[1].position_y, 98, "Cell was not pushed away from the seam")
+        self.assertAlmostEqual(cells[0].position_x, 0, 1, "Cells were pushed along the seam")
+
+        # cells that cross the seam come back in on the other side
+        cells[0].position_y = -1
+        handler.decompact()
+        self.assertTrue(all(0 <= cell.position_y < 100 for cell in cells), "Cells were not wrapped around")
+
+        with self.assertRaises(ValueError):
+            CellCollisionHandler(cells, period_x=30)
+
+    def test_periodic_lattice(self):
+        """Ensures that a lattice wrapped around in both directions has no edge."""
+        rows = 12
+        spacing = 2 * 10 * 0.95
+        cells = self.settled_lattice(rows)
+        handler = CellCollisionHandler(cells, period_x=rows * spacing, period_y=rows * spacing * 3 ** .5 / 2)
+        for cell in cells:
+            self.assertEqual(len(handler.cells_within_distance(cell, spacing * 1.01)), 6,
+                             "A cell at (%g, %g) did not have 6 neighbors" % (cell.position_x, cell.position_y))
+        self.assertLess(handler.decompact(), 1e-6, "A settled periodic lattice was not in equilibrium")
+
+        bounded_handler = CellCollisionHandler(self.settled_lattice(rows))
+        self.assertLess(min(len(bounded_handler.cells_within_distance(cell, spacing * 1.01))
+                            for cell in bounded_handler.cells), 6, "Bounded lattice had no edge")
+
+    def test_periodic_cells_between(self):
+        """Ensures that cells between two positions are found across the seam of a sheet periodic in x."""
+        cells = [Cell((x, 20, 0), 5) for x in range(5, 200, 10)]
+        handler = CellCollisionHandler(cells, period_x=200)
+        between = handler.cells_between(170, 230)
+        self.assertEqual([cell.position_x for cell in between], [25, 15, 5, 195, 185, 175],
+                         "Cells across the seam not found from posterior to anterior")
@@ -0,0 +1,92 @@
+import pickle
+import unittest
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellColumns import CellColumns
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+
+class CellColumnsTester(unittest.TestCase):
+
+    def setUp(self):
+        self.cell_factory = CellFactory()
+        self.cell_factory.seed = 3
+        self.cell_factory.cell_events = {"event"}
+
+    def test_create_cells(self):
+        """Ensures that cells created in bulk match cells created one at a time with Cell.__init__."""
+        columns = self.cell_factory.create_columns(50)
+        cells = columns.create_cells()
+        initialized = Cell((cells[7].position_x, cells[7].position_y, 0), cells[7].radius)
+        initialized.cell_id = cells[7].cell_id
+        initialized.max_radius = self.cell_factory.max_radius
+        initialized.growth_rate = self.cell_factory.growth_rate
+        initialized.cell_events = {"event"}
+        self.assertEqual(cells[7].__dict__, initialized.__dict__, "Bulk created cell differs from an initialized one")
+        self.assertIsNot(cells[7].cell_events, cells[8].cell_events, "Cells share their set of events")
+        self.assertIsNot(cells[7].related_cells, cells[8].related_cells, "Cells share their related cells")
+        self.assertEqual(len(set(cell.cell_id for cell in cells)), 50, "Cell ids are not unique")
+        self.assertGreater(Cell().cell_id, cells[-1].cell_id, "Cell ids reused")
+
+    def test_lazy_cells(self):
+        """Ensures that indexing creates cells with the same ids as creating them all at once."""
+        columns = self.cell_factory.create_columns(20)
+        last = columns[-1]
+        self.assertIs(columns[19], last, "Cell created twice")
+        cells = columns.create_cells()
+        self.assertIs(cells[19], last, "Created cell replaced")
+        self.assertEqual([cell.cell_id for cell in cells], columns.cell_ids.tolist(), "Ids depend on creation order")
+
+    def test_seeded_cells(self):
+        """Ensures that seeded factories create the same cells every time."""
+        first = self.cell_factory.create_cells(30)
+        second = self.cell_factory.create_cells(30)
+        self.assertEqual([(cell.position_x, cell.position_y, cell.radius) for cell in first],
+                         [(cell.position_x, cell.position_y, cell.radius) for cell in second],
+                         "Seeded cells differ")
+
+    def test_cell_sheet(self):
+        """Ensures that new cell sheets are created from the columns of their factory."""
+        columns = self.cell_factory.create_columns(30)
+        epithelium = Epithelium(30, cell_factory=self.cell_factory, periodic="xy")
+        self.assertIsNone(epithelium.cell_columns, "Cells not created for decompaction")
+        self.assertEqual(sorted(cell.radius for cell in epithelium.cells), sorted(columns.radius),
+                         "Cells differ from the columns of the factory")
+        self.assertEqual(epithelium.cell_collision_handler.period_x, self.cell_factory.sheet_size(30),
+                         "Period not taken from the factory")
+
+    def test_uncreated_epithelium(self):
+        """Ensures that epithelia of uncreated cells are drawn and captured as if their cells were created."""
+        columns = self.cell_factory.create_columns(40)
+        epithelium = Epithelium(0)
+        epithelium.set_cell_columns(columns)
+        render = RenderSnapshot.from_epithelium(epithelium)
+        snapshot = EpitheliumSnapshot.capture(epithelium)
+        self.assertIs(epithelium.cell_columns, columns, "Cells created by drawing or capturing")
+
+        self.assertEqual(len(epithelium.cells), 40, "Cells not created")
+        self.assertIsNone(epithelium.cell_columns, "Columns kept after creating the cells")
+        self.assertEqual(len(epithelium.cell_collision_handler.cells), 40, "Collision handler not created")
+        created_render = RenderSnapshot.from_epithelium(epithelium)
+        self.assertTrue(numpy.array_equal(render.position_x, created_render.position_x), "Drawn differently")
+        created_snapshot = EpitheliumSnapshot.capture(epithelium)
+        for name, column in created_snapshot.columns.items():
+            self.assertTrue(numpy.array_equal(snapshot.columns[name], column), "Column %s differs" % name)
+        self.assertEqual(snapshot.cell_events, created_snapshot.cell_events, "Cell events differ")
+
+        restored = EpitheliumSnapshot.capture(Epithelium.from_snapshot(snapshot))
+        self.assertTrue(numpy.array_equal(restored.columns["cell_id"], columns.cell_ids), "Restored ids differ")
+
+    def test_pickle_uncreated_epithelium(self):
+        """Ensures that epithelia of uncreated cells are pickled like any other."""
+        epithelium = Epithelium(0)
+        epithelium.set_cell_columns(CellColumns([0, 10], [0, 0], [5, 5]))
+        unpickled = pickle.loads(pickle.dumps(epithelium))
+        self.assertEqual([cell.position_x for cell in unpickled.cells], [0, 10], "Cells not pickled")
+        self.assertIsNotNone(unpickled.cell_collision_handler, "Collision handler not pickled")
+        self.assertNotIn("_cell_columns", epithelium.__getstate__(), "Pickle format changed")
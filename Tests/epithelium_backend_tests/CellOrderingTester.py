@@ -0,0 +1,99 @@
+import unittest
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.CellOrdering import CellOrdering
+from epithelium_backend.CellOrdering import curve_order
+from epithelium_backend.CellOrdering import hilbert_codes
+from epithelium_backend.CellOrdering import morton_codes
+from epithelium_backend.CellOrdering import scattered_pairs
+
+
+class CellOrderingTester(unittest.TestCase):
+
+    def setUp(self):
+        factory = CellFactory()
+        factory.seed = 3
+        epithelium = Epithelium(0)
+        factory.cell_events = epithelium.default_cell_events()
+        epithelium.set_cell_columns(factory.create_columns(2000))
+        cells = epithelium.cells
+        epithelium.furrow.position = max(cell.position_x for cell in cells)
+        cells[0].related_cells.append(cells[1999])
+        cells[1999].related_cells.append(cells[0])
+        self.epithelium = epithelium
+
+    def test_curves(self):
+        """Ensures that the curves visit every box of a grid once, and that Hilbert curves only take single steps."""
+        box_x, box_y = (column.ravel() for column in numpy.meshgrid(numpy.arange(16), numpy.arange(16)))
+        for codes in (hilbert_codes(box_x, box_y), morton_codes(box_x, box_y)):
+            self.assertEqual(sorted(codes.tolist()), list(range(256)), "Boxes not visited once")
+        order = numpy.argsort(hilbert_codes(box_x, box_y))
+        steps = numpy.abs(numpy.diff(box_x[order])) + numpy.abs(numpy.diff(box_y[order]))
+        self.assertTrue(numpy.all(steps == 1), "Hilbert curve jumped")
+        self.assertEqual(morton_codes(numpy.array([1, 0, 1, 3]), numpy.array([0, 1, 1, 3])).tolist(), [1, 2, 3, 15],
+                         "Bits not interleaved")
+        with self.assertRaises(ValueError):
+            curve_order(box_x.astype(float), box_y.astype(float), 1, "peano")
+
+    def test_curve_order(self):
+        """Ensures that cells stored along a curve are less scattered than cells stored in random order."""
+        cells = self.epithelium.cells
+        position_x = numpy.array([cell.position_x for cell in cells])
+        position_y = numpy.array([cell.position_y for cell in cells])
+        box_size = 2 * 1.05 * max(cell.radius for cell in cells)
+        scattered = scattered_pairs(position_x, position_y, box_size, 64)
+        for curve in ("hilbert", "morton"):
+            order = curve_order(position_x, position_y, box_size, curve)
+            self.assertEqual(sorted(order.tolist()), list(range(len(cells))), "Cells lost or duplicated")
+            self.assertLess(scattered_pairs(position_x[order], position_y[order], box_size, 64), scattered / 2,
+                            "Cells along a curve are scattered")
+
+    def test_reorder_cells(self):
+        """Ensures that reordered cells keep their ids, positions, and relationships."""
+        epithelium = self.epithelium
+        event = epithelium.furrow.events[0]
+        epithelium.update()
+        processed = set(cell.cell_id for cell in event.last_processed)
+        self.assertTrue(processed, "No cell processed by the furrow")
+        states = {cell.cell_id: (cell.position_x, cell.position_y, cell.radius) for cell in epithelium.cells}
+
+        order = numpy.random.RandomState(1).permutation(len(epithelium.cells))
+        cell_ids = [epithelium.cells[i].cell_id for i in order.tolist()]
+        epithelium.reorder_cells(order)
+        self.assertEqual([cell.cell_id for cell in epithelium.cells], cell_ids, "Cells not reordered")
+        self.assertEqual({cell.cell_id: (cell.position_x, cell.position_y, cell.radius) for cell in epithelium.cells},
+                         states, "Cells changed")
+        self.assertIs(epithelium.cell_collision_handler.cells[0], epithelium.cells[0], "Collision handler not rebuilt")
+        self.assertEqual(set(cell.cell_id for cell in event.last_processed), processed, "Processed cells lost")
+        self.assertLessEqual(event.last_processed, set(epithelium.cells), "Processed cells not replaced")
+        first = next(cell for cell in epithelium.cells if cell.cell_id == cell_ids[order.tolist().index(0)])
+        self.assertEqual([cell.cell_id for cell in first.related_cells], [cell_ids[order.tolist().index(1999)]],
+                         "Relationship lost")
+        epithelium.update()
+
+    def test_ordering(self):
+        """Ensures that cells are reordered when they become scattered, and only then."""
+        self.assertIsNone(Epithelium(0).cell_ordering, "Cells ordered by default")
+        epithelium = self.epithelium
+        epithelium.cell_ordering = ordering = CellOrdering(interval=2, tolerance=.2, window=64)
+        epithelium.update()
+        self.assertEqual(ordering.reorders, 1, "Scattered cells not reordered")
+        self.assertLess(ordering.scattered, .2, "Reordered cells scattered")
+        ordered_ids = [cell.cell_id for cell in epithelium.cells]
+        for _ in range(4):
+            epithelium.update()
+        self.assertEqual(ordering.reorders, 1, "Ordered cells reordered")
+        self.assertEqual(ordering.ticks, 5, "Ticks not counted")
+        self.assertEqual([cell.cell_id for cell in epithelium.cells][:100], ordered_ids[:100], "Cells reordered")
+
+        # divided cells are appended, far from their mothers in memory
+        for cell in list(epithelium.cells)[::3]:
+            epithelium.divide_cell(cell)
+        epithelium.advance(2)
+        self.assertEqual(ordering.reorders, 2, "Scattered cells not reordered")
+        metrics = ordering.metrics()
+        self.assertEqual(metrics["reorders"], 2, "Reorders not reported")
+        self.assertGreater(metrics["seconds"], 0, "Time not measured")
@@ -0,0 +1,133 @@
+import pickle
+import random
+import sys
+import unittest
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.CellPool import CellPool
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+
+
+class CellPoolTester(unittest.TestCase):
+
+    def setUp(self):
+        factory = CellFactory()
+        factory.seed = 4
+        epithelium = Epithelium(0, cell_pool=CellPool(capacity=4))
+        factory.cell_events = epithelium.default_cell_events()
+        epithelium.set_cell_columns(factory.create_columns(20))
+        epithelium.furrow.events = [epithelium.furrow.events[0].copy()]
+        self.epithelium = epithelium
+
+    def test_handles(self):
+        """Ensures that handles resolve to their cell until it dies, even when its slot is reused."""
+        pool = CellPool(capacity=2)
+        cells = [Cell() for _ in range(5)]
+        handles = [pool.handle(cell) for cell in cells]
+        self.assertEqual(pool.capacity, 8, "Generation column did not grow geometrically")
+        self.assertEqual([pool.resolve(handle) for handle in handles], cells, "Handles not resolved")
+        self.assertEqual(pool.handle(cells[2]), handles[2], "Cell given a second slot")
+
+        pool.release(cells[2])
+        self.assertIsNone(pool.resolve(handles[2]), "Stale handle resolved")
+        recycled = pool.acquire()
+        self.assertIs(recycled, cells[2], "Dead cell not recycled")
+        self.assertIsNone(pool.acquire(), "Cell recycled twice")
+        self.assertIsNone(pool.resolve(handles[2]), "Stale handle resolved to the recycled cell")
+        self.assertIs(pool.resolve(pool.handle(recycled)), recycled, "Recycled cell not resolved")
+
+        pool.retire()
+        self.assertIsNone(pool.resolve(handles[0]), "Handle resolved after the cells were replaced")
+        new_cell = Cell()
+        pool.adopt(new_cell)
+        self.assertLess(pool.slot(new_cell), 5, "Empty slot not reused")
+
+    def test_recycled_division(self):
+        """Ensures that cells recycled by a division start over, and that nothing refers to them as the dead cell."""
+        epithelium = self.epithelium
+        epithelium.update()
+        event = epithelium.furrow.events[0]
+        dead, related, mother = epithelium.cells[:3]
+        dead.related_cells.append(related)
+        related.related_cells.append(dead)
+        dead.photoreceptor_type = PhotoreceptorType.R8
+        dead.support_specializations.add("cone")
+        event.last_processed.add(dead)
+        dead_id = dead.cell_id
+        handle = epithelium.cell_pool.handle(dead)
+
+        epithelium.delete_cell(dead)
+        self.assertNotIn(dead, related.related_cells, "Dead cell still related")
+        self.assertNotIn(dead, event.last_processed, "Dead cell still processed")
+        self.assertIsNone(epithelium.cell_pool.resolve(handle), "Handle to the dead cell resolved")
+
+        child = epithelium.divide_cell(mother)
+        self.assertIs(child, dead, "Dead cell not recycled")
+        self.assertGreater(child.cell_id, dead_id, "Recycled cell kept its id")
+        self.assertEqual(child.radius, mother.radius, "Cell not divided")
+        self.assertEqual((child.photoreceptor_type, child.support_specializations, child.related_cells),
+                         (PhotoreceptorType.NOT_RECEPTOR, set(), []), "Recycled cell kept its fate")
+        self.assertEqual(child.cell_events, mother.cell_events, "Cell events not copied")
+        self.assertIsNot(child.cell_events, mother.cell_events, "Cell events shared")
+        epithelium.update()
+
+        handle = epithelium.cell_pool.handle(mother)
+        restored = pickle.loads(pickle.dumps(epithelium))
+        self.assertEqual(restored.cell_pool.metrics()["idle"], 0, "Dead cells pickled")
+        self.assertEqual(restored.cell_pool.resolve(handle).cell_id, mother.cell_id, "Handle not pickled")
+        restored.restore(restored.snapshot())
+        self.assertIsNone(restored.cell_pool.resolve(handle), "Handle resolved to a replaced cell")
+
+    def test_dying_division(self):
+        """Ensures that a cell that dies and then divides in the same tick is not recycled into its own child."""
+        epithelium = self.epithelium
+        epithelium.furrow.events = []
+        pool = epithelium.cell_pool
+        # cells apart from each other, since the cell after a dying cell is skipped by the cell updates
+        dying_cells = set(epithelium.cells[::7])
+        dead_cells = list(dying_cells)
+        children = []
+        recycled = []
+
+        def die_and_divide(cell):
+            if cell in dying_cells:
+                dying_cells.discard(cell)
+                epithelium.delete_cell(cell)
+                children.append(epithelium.divide_cell(cell))
+                recycled.append(pool.metrics()["recycled"])
+        for cell in dying_cells:
+            cell.cell_events = {die_and_divide}
+
+        epithelium.run_cell_updates()
+        metrics = pool.metrics()
+        self.assertFalse(dying_cells, "Not every cell died")
+        self.assertEqual(recycled, [0, 0, 0], "Cell recycled within the cell updates it died in")
+        self.assertNotIn(None, children, "Cell not divided")
+        self.assertEqual(len(set(map(id, children))), 3, "Cell recycled into its own child")
+        self.assertEqual((metrics["idle"], metrics["released"]), (3, 3), "Dead cells not released afterwards")
+
+        # cells that died in earlier cell updates are recycled
+        self.assertIn(epithelium.divide_cell(epithelium.cells[1]), dead_cells, "Dead cells not recycled")
+
+    def test_long_run(self):
+        """Ensures that cells dying and dividing for 10000 ticks allocate no cells and no memory once warmed up."""
+        epithelium = self.epithelium
+        epithelium.furrow.events = []
+        generator = random.Random(4)
+        blocks = []
+        for tick in range(10000):
+            epithelium.delete_cell(generator.choice(epithelium.cells))
+            mother = generator.choice(epithelium.cells)
+            child = epithelium.divide_cell(mother)
+            child.radius = mother.radius = 10
+            epithelium.update()
+            if tick in (999, 9999):
+                blocks.append(sys.getallocatedblocks())
+        metrics = epithelium.cell_pool.metrics()
+        self.assertEqual(len(epithelium.cells), 20, "Cells lost")
+        self.assertEqual(metrics["allocated"], 0, "Cells allocated")
+        self.assertEqual(metrics["recycled"], 10000, "Cells not recycled")
+        self.assertEqual(metrics["slots"], 20, "Slots leaked")
+        self.assertLess(blocks[1] - blocks[0], 1000, "Memory allocated as cells died and divided")
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.CompressedTrajectoryReader import CompressedTrajectoryReader
+from epithelium_backend.CompressedTrajectoryWriter import CompressedTrajectoryWriter
+from epithelium_backend.CompressedTrajectoryWriter import compress_trajectory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.TrajectoryReader import TrajectoryReader
+from epithelium_backend.TrajectoryRecorder import TrajectoryRecorder
+
+
+class CompressedTrajectoryTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, "trajectory.trz")
+        self.random = numpy.random.RandomState(7)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def frames(self, count: int) -> list:
+        """Returns frames of cells that drift, divide, die, change fate, and are sometimes shuffled."""
+        ids = numpy.arange(200)
+        values = self.random.uniform(0, 50, (3, 200))
+        fate = numpy.zeros(200, numpy.uint8)
+        next_id = 200
+        frames = []
+        for tick in range(0, 2 * count, 2):
+            values = values + self.random.normal(0, .05, values.shape)
+            fate[self.random.randint(len(fate), size=3)] = self.random.randint(1, 6)
+            fate[40:45] = tick % 5
+            if tick % 6 == 0:
+                keep = numpy.ones(len(ids), bool)
+                keep[self.random.randint(len(ids), size=4)] = False
+                ids, values, fate = ids[keep], values[:, keep], fate[keep]
+                ids = numpy.append(ids, [next_id, next_id + 1])
+                values = numpy.append(values, self.random.uniform(0, 50, (3, 2)), axis=1)
+                fate = numpy.append(fate, [0, 3]).astype(numpy.uint8)
+                next_id += 2
+            if tick == 10:
+                order = self.random.permutation(len(ids))
+                ids, values, fate = ids[order], values[:, order], fate[order]
+            frames.append((tick, ids.copy(), values.copy(), fate.copy()))
+        return frames
+
+    def test_round_trip(self):
+        """Ensures that every frame is decoded within the resolution, in any order and with any compressor."""
+        frames = self.frames(30)
+        for compressor in ("zlib", "lzma"):
+            writer = CompressedTrajectoryWriter(self.file_path, compressor=compressor, position_resolution=1 / 128,
+                                                radius_resolution=1 / 64, chunk_frames=8, workers=2)
+            for tick, ids, values, fate in frames:
+                writer.add_frame(tick, ids, values[0], values[1], values[2], fate)
+            statistics = writer.close()
+            self.assertEqual(statistics["frames"], 30, "Incorrect frame count")
+            self.assertEqual(statistics["output_bytes"], os.path.getsize(self.file_path), "Incorrect written size")
+            self.assertGreater(statistics["compression_ratio"], 4, "Frames were not compressed")
+
+            reader = CompressedTrajectoryReader(self.file_path)
+            self.assertEqual(reader.ticks.tolist(), [frame[0] for frame in frames], "Incorrect ticks")
+            self.assertEqual(reader.keyframe_ticks, [0, 16, 32, 48], "Incorrect keyframes")
+            for index in list(range(30)) + [29, 3, 17, 16, 0, 25, 24]:
+                tick, ids, values, fate = frames[index]
+                arrays = reader.frame_arrays(index)
+                self.assertEqual(arrays["ids"].tolist(), ids.tolist(), "Incorrect ids at tick %d" % tick)
+                numpy.testing.assert_allclose(arrays["position_x"], values[0], atol=1 / 256)
+                numpy.testing.assert_allclose(arrays["position_y"], values[1], atol=1 / 256)
+                numpy.testing.assert_allclose(arrays["radius"], values[2], atol=1 / 128)
+                self.assertEqual(arrays["fate"].tolist(), fate.tolist(), "Incorrect fates at tick %d" % tick)
+            self.assertEqual(reader.snapshot_at(23).tick, 22, "Incorrect frame drawn between ticks")
+
+    def test_compress_recording(self):
+        """Ensures that recorded trajectories are compressed frame by frame."""
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        epithelium = Epithelium(40, 1, cell_factory)
+        recording_path = os.path.join(self.directory.name, "trajectory.trj")
+        recorder = TrajectoryRecorder(recording_path)
+        recorder.attach(epithelium)
+        for _ in range(5):
+            epithelium.update()
+        recorder.close()
+
+        compress_trajectory(recording_path, self.file_path, chunk_frames=4)
+        recording = TrajectoryReader(recording_path)
+        compressed = CompressedTrajectoryReader(self.file_path)
+        self.assertEqual(compressed.ticks.tolist(), recording.ticks.tolist(), "Incorrect ticks")
+        for index in range(len(recording)):
+            numpy.testing.assert_allclose(compressed.snapshot(index).position_y,
+                                          recording.snapshot(index).position_y, atol=1 / 256)
@@ -0,0 +1,66 @@
+import unittest
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumBranches import advance_branches
+
+
+class EpitheliumBranchesTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        self.epithelium.advance(3)
+        self.epithelium.furrow.events[0].last_processed = set(self.epithelium.cells[:4])
+
+    def test_fork(self):
+        """Ensures that branches start in the state of the forked epithelium and are independent of it."""
+        epithelium = self.epithelium
+        branches = epithelium.fork(2)
+        self.assertEqual(len(branches), 2, "Incorrect number of branches")
+
+        for branch in branches:
+            self.assertEqual([(cell.cell_id, cell.position_x, cell.radius) for cell in branch.cells],
+                             [(cell.cell_id, cell.position_x, cell.radius) for cell in epithelium.cells],
+                             "Branch does not start with the cells of the forked epithelium")
+            self.assertEqual(branch.furrow.position, epithelium.furrow.position, "Furrow position not forked")
+            self.assertEqual(set(cell.cell_id for cell in branch.furrow.events[0].last_processed),
+                             set(cell.cell_id for cell in epithelium.cells[:4]),
+                             "Processed cells of furrow event not forked")
+            self.assertTrue(branch.furrow.events[0].last_processed <= set(branch.cells),
+                            "Processed cells of furrow event belong to another epithelium")
+            for cell in branch.cells:
+                for event in cell.cell_events:
+                    self.assertIs(getattr(event, "epithelium", branch), branch,
+                                  "Cell event bound to another epithelium")
+            self.assertIsNot(branch.furrow.events[0], epithelium.furrow.events[0], "Furrow events shared")
+
+        # field values and simulation are independent
+        original_value = epithelium.furrow.events[-1].field_types["death chance (0-100)"].value
+        branches[0].set_field_values({"Cell Death": {"death chance (0-100)": 5}})
+        self.assertEqual(epithelium.furrow.events[-1].field_types["death chance (0-100)"].value, original_value,
+                         "Field values shared with the forked epithelium")
+        original_positions = [cell.position_x for cell in epithelium.cells]
+        branches[0].advance(2)
+        self.assertEqual([cell.position_x for cell in epithelium.cells], original_positions,
+                         "Simulating a branch changed the forked epithelium")
+        self.assertEqual(branches[0].cell_collision_handler.cells, branches[0].cells,
+                         "Collision handler does not track the branch's cells")
+
+        with self.assertRaises(ValueError):
+            branches[1].set_field_values({"Not An Event": {}})
+
+    def test_advance_branches(self):
+        """Ensures that branches can be simulated under their own field values in worker processes."""
+        branches = self.epithelium.fork(2)
+        field_values = [{"Cell Death": {"death chance (0-100)": 0}},
+                        {"Cell Death": {"death chance (0-100)": 100}}]
+        advanced = advance_branches(branches, 2, field_values, processes=2)
+        self.assertEqual(len(advanced), 2, "Incorrect number of branches")
+        for branch, values in zip(advanced, field_values):
+            self.assertEqual(branch.furrow.events[-1].field_types["death chance (0-100)"].value,
+                             values["Cell Death"]["death chance (0-100)"], "Field value not applied to branch")
+            self.assertEqual(branch.furrow.position, self.epithelium.furrow.position - 2 * branch.furrow.velocity,
+                             "Branch not advanced")
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend import EpitheliumCache as EpitheliumCacheModule
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+
+
+class EpitheliumCacheTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = EpitheliumCache(self.directory.name, size_limit=1024 * 1024)
+        self.cell_factory = CellFactory()
+        self.cell_factory.average_radius = 1
+        self.cell_factory.radius_divergence = .1
+        self.cell_factory.seed = 5
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_generate(self):
+        """Ensures that seeded epithelia are generated once and then loaded from the cache."""
+        key = EpitheliumCache.key(30, 1, self.cell_factory)
+        self.assertIsNone(self.cache.get(key), "Epithelium cached before it was generated")
+        generated = self.cache.generate(30, 1, self.cell_factory)
+        self.assertTrue(os.path.exists(self.cache.path(key)), "Generated epithelium not cached")
+
+        cached = self.cache.generate(30, 1, self.cell_factory)
+        self.assertIsNot(cached, generated)
+        self.assertEqual([(cell.position_x, cell.position_y, cell.radius) for cell in cached.cells],
+                         [(cell.position_x, cell.position_y, cell.radius) for cell in generated.cells],
+                         "Cached epithelium does not match the generated epithelium")
+        self.assertEqual(len(cached.cell_collision_handler.cells), 30, "Collision handler not created")
+
+    def test_key(self):
+        """Ensures that epithelia are cached under every parameter that changes them."""
+        key = EpitheliumCache.key(30, 1, self.cell_factory)
+        self.assertNotEqual(key, EpitheliumCache.key(31, 1, self.cell_factory), "Cell count not in the key")
+        self.cell_factory.seed = 6
+        self.assertNotEqual(key, EpitheliumCache.key(30, 1, self.cell_factory), "Seed not in the key")
+        self.cell_factory.seed = 5
+        self.cell_factory.radius_divergence = .2
+        self.assertNotEqual(key, EpitheliumCache.key(30, 1, self.cell_factory), "Factory parameters not in the key")
+        self.cell_factory.radius_divergence = .1
+
+        code_version = EpitheliumCacheModule.generation_code_version()
+        try:
+            EpitheliumCacheModule._code_version = "changed"
+            self.assertNotEqual(key, EpitheliumCache.key(30, 1, self.cell_factory), "Code version not in the key")
+        finally:
+            EpitheliumCacheModule._code_version = code_version
+        self.assertEqual(key, EpitheliumCache.key(30, 1, self.cell_factory), "Key is not stable")
+
+        self.cell_factory.seed = None
+        self.assertIsNone(EpitheliumCache.key(30, 1, self.cell_factory), "Unseeded epithelia have a key")
+        self.cache.generate(30, 1, self.cell_factory)
+        self.assertFalse(os.listdir(self.directory.name), "Unseeded epithelium cached")
+
+    def test_evict(self):
+        """Ensures that the least recently used epithelia are removed once the cache is full."""
+        keys = []
+        for seed in range(3):
+            self.cell_factory.seed = seed
+            keys.append(EpitheliumCache.key(20, 1, self.cell_factory))
+            self.cache.generate(20, 1, self.cell_factory)
+            # modification times need to differ
+            time.sleep(.01)
+        entry_size = os.path.getsize(self.cache.path(keys[0]))
+
+        # using the oldest entry makes the second oldest the least recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.size_limit = 2 * entry_size
+        self.cache.evict()
+        self.assertEqual([os.path.exists(self.cache.path(key)) for key in keys], [True, False, True],
+                         "Least recently used epithelium not removed")
+
+        self.cache.size_limit = 0
+        self.cache.put(keys[1], self.cache.get(keys[2]))
+        self.assertEqual(os.listdir(self.directory.name), [keys[1] + EpitheliumCache.file_suffix],
+                         "Newly cached epithelium removed")
@@ -0,0 +1,114 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import convert_pickled_epithelium
+from epithelium_backend.EpitheliumFile import is_columnar_file
+from epithelium_backend.EpitheliumFile import read_columns
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.EpitheliumFile import write_snapshot
+from epithelium_backend.OperationCancelled import OperationCancelled
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+from quick_change.CellEvents import TryCellDeath
+
+
+def cell_state(cell) -> tuple:
+    """Returns the attributes of a cell that a file must preserve."""
+    return (cell.cell_id, cell.position_x, cell.position_y, cell.radius, cell.max_radius, cell.target_radius,
+            cell.dividable, cell_fate(cell), sorted(type(event).__name__ for event in cell.cell_events),
+            [related.cell_id for related in cell.related_cells])
+
+
+class EpitheliumFileTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        cells = self.epithelium.cells
+        cells[0].photoreceptor_type = PhotoreceptorType.R8
+        cells[0].related_cells.append(cells[1])
+        cells[1].related_cells.append(cells[0])
+        cells[2].cell_events.add(TryCellDeath(self.epithelium, 0.25))
+        self.epithelium.furrow.position -= 3
+        self.epithelium.furrow.events[0].last_processed = set(cells[5:8])
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, "epithelium.epth")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_loaded(self, loaded: Epithelium) -> None:
+        """Checks that an epithelium loaded from a file matches the saved epithelium."""
+        self.assertEqual([cell_state(cell) for cell in loaded.cells],
+                         [cell_state(cell) for cell in self.epithelium.cells], "Cells not loaded")
+        self.assertEqual(loaded.furrow.position, self.epithelium.furrow.position, "Furrow position not loaded")
+        self.assertEqual(loaded.furrow.last_position, self.epithelium.furrow.last_position,
+                         "Furrow last position not loaded")
+        self.assertEqual(set(cell.cell_id for cell in loaded.furrow.events[0].last_processed),
+                         set(cell.cell_id for cell in self.epithelium.cells[5:8]),
+                         "Processed cells of furrow event not loaded")
+        death_events = [event for event in loaded.cells[2].cell_events if isinstance(event, TryCellDeath)]
+        self.assertEqual(death_events[0].death_chance, 0.25, "Cell event parameters not loaded")
+        self.assertIs(death_events[0].epithelium, loaded, "Cell event not bound to the loaded epithelium")
+
+    def test_round_trip(self):
+        """Ensures that epithelia are saved and loaded with all of their state."""
+        write_epithelium(self.epithelium, self.file_path)
+        self.assertTrue(is_columnar_file(self.file_path), "File not written in the columnar format")
+        self.assert_loaded(read_epithelium(self.file_path))
+
+    def test_progress(self):
+        """Ensures that saving and loading report their progress, and that a cancelled save leaves the old file."""
+        fractions = []
+        write_snapshot(self.epithelium.snapshot(), self.file_path, progress=fractions.append)
+        self.assertEqual(fractions, sorted(fractions), "Save progress decreased")
+        self.assertEqual(fractions[-1], 1, "Save not reported as finished")
+
+        fractions = []
+        self.assert_loaded(read_epithelium(self.file_path, progress=fractions.append))
+        self.assertEqual(fractions, sorted(fractions), "Load progress decreased")
+        self.assertEqual(fractions[-1], 1, "Load not reported as finished")
+
+        def cancel(fraction):
+            if fraction > 0:
+                raise OperationCancelled()
+        with open(self.file_path, "rb") as saved_file:
+            saved = saved_file.read()
+        self.epithelium.cells[0].radius += 1
+        with self.assertRaises(OperationCancelled):
+            write_snapshot(self.epithelium.snapshot(), self.file_path, progress=cancel)
+        with open(self.file_path, "rb") as saved_file:
+            self.assertEqual(saved_file.read(), saved, "Cancelled save changed the file")
+        self.assertEqual(os.listdir(self.directory.name), ["epithelium.epth"], "Cancelled save left a partial file")
+        with self.assertRaises(OperationCancelled):
+            read_epithelium(self.file_path, progress=cancel)
+
+    def test_columns(self):
+        """Ensures that columns can be read, and memory mapped, without loading the epithelium."""
+        write_epithelium(self.epithelium, self.file_path)
+        for memory_map in (False, True):
+            header, columns = read_columns(self.file_path, memory_map)
+            self.assertEqual(header["cell_count"], len(self.epithelium.cells), "Incorrect cell count")
+            self.assertEqual(columns["radius"].tolist(), [cell.radius for cell in self.epithelium.cells],
+                             "Incorrect radius column")
+            self.assertEqual(columns["fate"].tolist(), [cell_fate(cell) for cell in self.epithelium.cells],
+                             "Incorrect fate column")
+            with self.assertRaises(ValueError):
+                columns["radius"][0] = 0
+
+    def test_convert_pickle(self):
+        """Ensures that epithelia saved with pickle are converted to the columnar format."""
+        pickle_path = os.path.join(self.directory.name, "pickled.epth")
+        with open(pickle_path, "wb") as out_file:
+            pickle.dump(self.epithelium, out_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.assertFalse(is_columnar_file(pickle_path), "Pickle detected as a columnar file")
+
+        convert_pickled_epithelium(pickle_path, self.file_path)
+        self.assert_loaded(read_epithelium(self.file_path))
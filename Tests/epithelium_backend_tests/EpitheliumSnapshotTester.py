@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+
+
+def cell_state(cell) -> tuple:
+    """Returns the attributes of a cell that a snapshot must preserve."""
+    return (cell.position_x, cell.position_y, cell.position_z, cell.radius, cell.max_radius,
+            cell.target_radius, cell.growth_rate, cell.dividable, cell_fate(cell))
+
+
+class EpitheliumSnapshotTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        self.epithelium.cells[0].photoreceptor_type = PhotoreceptorType.R8
+        self.epithelium.cells[0].related_cells.append(self.epithelium.cells[1])
+
+    def test_restore(self):
+        """Ensures that restoring a snapshot returns an epithelium to the captured state."""
+        epithelium = self.epithelium
+        furrow_event = epithelium.furrow.events[0]
+        furrow_event.last_processed = {epithelium.cells[2], epithelium.cells[5]}
+        expected_states = [cell_state(cell) for cell in epithelium.cells]
+        expected_furrow_position = epithelium.furrow.position
+        snapshot = epithelium.snapshot()
+        self.assertEqual(len(snapshot), len(epithelium.cells), "Incorrect snapshot length")
+
+        # change everything the snapshot holds
+        for _ in range(3):
+            epithelium.furrow.update(epithelium)
+            epithelium.cell_collision_handler.decompact()
+        epithelium.cells[0].position_x += 50
+        epithelium.divide_cell(epithelium.cells[3])
+        epithelium.furrow.position -= 10
+        furrow_event.last_processed = set()
+
+        epithelium.restore(snapshot)
+        self.assertEqual([cell_state(cell) for cell in epithelium.cells], expected_states,
+                         "Cells were not restored to their captured state")
+        self.assertEqual(epithelium.furrow.position, expected_furrow_position, "Furrow position not restored")
+        self.assertIs(epithelium.cells[0].related_cells[0], epithelium.cells[1], "Related cells not restored")
+        self.assertEqual(furrow_event.last_processed, {epithelium.cells[2], epithelium.cells[5]},
+                         "Processed cells of furrow event not restored")
+        self.assertEqual(len(epithelium.cell_collision_handler.cells), len(expected_states),
+                         "Collision handler not rebuilt from restored cells")
+
+        # restored cells are new objects, changing them does not change the snapshot
+        epithelium.cells[0].position_x += 50
+        epithelium.restore(snapshot)
+        self.assertEqual(cell_state(epithelium.cells[0]), expected_states[0], "Snapshot changed after restoring")
+
+    def test_collision_handler_parameters(self):
+        """Ensures that restored, forked, reordered and saved epithelia keep their collision handler parameters."""
+        epithelium = self.epithelium
+        epithelium.cell_collision_handler = CellCollisionHandler(epithelium.cells, spring_constant=0.2,
+                                                                 sleep_threshold=0.01, sleep_ticks=5)
+
+        def parameters(handler: CellCollisionHandler) -> tuple:
+            return handler.spring_constant, handler.sleep_threshold, handler.sleep_ticks
+
+        epithelium.restore(epithelium.snapshot())
+        self.assertEqual(parameters(epithelium.cell_collision_handler), (0.2, 0.01, 5), "Restore lost parameters")
+        branch = epithelium.fork()[0]
+        self.assertEqual(parameters(branch.cell_collision_handler), (0.2, 0.01, 5), "Fork lost parameters")
+        epithelium.reorder_cells(list(reversed(range(len(epithelium.cells)))))
+        self.assertEqual(parameters(epithelium.cell_collision_handler), (0.2, 0.01, 5), "Reorder lost parameters")
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "epithelium.epth")
+            write_epithelium(epithelium, file_path)
+            loaded = read_epithelium(file_path)
+        self.assertEqual(parameters(loaded.cell_collision_handler), (0.2, 0.01, 5), "Saving lost parameters")
+
+    def test_copy_on_write(self):
+        """Ensures that snapshots share the columns that did not change."""
+        epithelium = self.epithelium
+        first_snapshot = epithelium.snapshot()
+        epithelium.cells[0].position_x += 1
+        second_snapshot = epithelium.snapshot(previous=first_snapshot)
+
+        self.assertIsNot(second_snapshot.columns["position_x"], first_snapshot.columns["position_x"],
+                         "Changed column was shared")
+        for name in ("position_y", "radius", "fate", "related_indices"):
+            self.assertIs(second_snapshot.columns[name], first_snapshot.columns[name],
+                          "Unchanged column %s was copied" % name)
+        with self.assertRaises(ValueError):
+            second_snapshot.columns["radius"][0] = 0
+
+    def test_spill(self):
+        """Ensures that snapshots above their memory budget are kept on disk."""
+        epithelium = self.epithelium
+        expected_states = [cell_state(cell) for cell in epithelium.cells]
+        with tempfile.TemporaryDirectory() as spill_directory:
+            self.assertFalse(epithelium.snapshot(memory_budget=10 ** 9, spill_directory=spill_directory).spilled,
+                             "Snapshot within its budget was spilled")
+
+            snapshot = epithelium.snapshot(memory_budget=1, spill_directory=spill_directory)
+            self.assertTrue(snapshot.spilled, "Snapshot above its budget was not spilled")
+            self.assertTrue(os.path.exists(snapshot.spill_path), "Spilled snapshot not written to disk")
+
+            epithelium.cells[0].position_x += 50
+            epithelium.restore(snapshot)
+            self.assertEqual([cell_state(cell) for cell in epithelium.cells], expected_states,
+                             "Spilled snapshot was not restored")
+
+            spill_path = snapshot.spill_path
+            del snapshot
+            self.assertFalse(os.path.exists(spill_path), "Spilled snapshot not deleted with the snapshot")
+
+    def test_select(self):
+        """Ensures that selecting cells of a snapshot keeps their state and their relationships with each other."""
+        epithelium = self.epithelium
+        cells = epithelium.cells
+        cells[0].related_cells.append(cells[2])
+        cells[3].related_cells.append(cells[0])
+        epithelium.furrow.events[0].last_processed = {cells[1], cells[3]}
+        snapshot = epithelium.snapshot().select([0, 1, 3])
+        selected = snapshot.create_cells()
+        self.assertEqual([cell_state(cell) for cell in selected], [cell_state(cells[i]) for i in (0, 1, 3)],
+                         "Selected cells differ")
+        self.assertEqual(selected[0].related_cells, [selected[1]], "Relationship with an unselected cell kept")
+        self.assertEqual(selected[2].related_cells, [selected[0]], "Relationship between selected cells lost")
+        self.assertEqual(snapshot.furrow_events[0][2].tolist(), [1, 2], "Cells last processed not selected")
@@ -5,6 +5,8 @@ from epithelium_backend.Cell import Cell
 from epithelium_backend.CellCollisionHandler import distance
 from epithelium_backend.CellCollisionHandler import CellCollisionHandler
 from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.GenerationProgress import GenerationProgress
+from epithelium_backend.OperationCancelled import OperationCancelled
 
 
 class EpitheliumTester(unittest.TestCase):
@@ -100,6 +102,28 @@ class EpitheliumTester(unittest.TestCase):
             self.assertAlmostEqual(cell.radius, cell_avg_radius, delta=cell_radius_divergence * cell_avg_radius,
                                    msg="Incorrect cell radii produced by Epithelium.create_cell_sheet.")
 
+    def test_create_cell_sheet_progress(self):
+        """Ensures that cell sheet creation reports each phase, and stops once cancelled."""
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        reports = []
+        epithelium = Epithelium(20, 1, cell_factory,
+                                lambda progress: reports.append((progress.phase, progress.fraction,
+                                                                 progress.iteration, progress.residual)))
+        self.assertEqual(reports[0][0], GenerationProgress.creating_cells, "Cell creation not reported")
+        self.assertEqual([report[2] for report in reports[1:]], list(range(11)), "Relaxation iterations not reported")
+        self.assertEqual([report[1] for report in reports], sorted(report[1] for report in reports),
+                         "Progress decreased")
+        self.assertEqual(reports[-1][1], 1, "Generation not reported as finished")
+        self.assertGreater(reports[1 + 1][3], reports[-1][3], "Residual did not shrink as the cells relaxed")
+        self.assertEqual(len(epithelium.cells), 20)
+
+        def cancel(progress: GenerationProgress):
+            if progress.iteration == 3:
+                raise OperationCancelled()
+        with self.assertRaises(OperationCancelled):
+            Epithelium(20, 1, cell_factory, cancel)
+
     def test_create_cell_sheet_rerun(self):
         """Ensures that an Epithelium can correctly populate its cell with additional cells after init."""
         cell_quantity = 1
@@ -192,3 +216,22 @@ class EpitheliumTester(unittest.TestCase):
         # check furrow
         self.assertEqual(epithelium.furrow.position, initial_furrow_pos - epithelium.furrow.velocity,
                          "Furrow position not correctly changed when updating epithelium in Epithelium.update")
+
+    def test_periodic_sheet(self):
+        """Ensures that periodic epithelia wrap their cells around, and keep doing so when restored."""
+        cell_factory = CellFactory()
+        cell_factory.seed = 0
+        epithelium = Epithelium(60, 10, cell_factory, periodic="y")
+        handler = epithelium.cell_collision_handler
+        self.assertIsNone(handler.period_x, "Sheet wrapped around in x")
+        self.assertAlmostEqual(handler.period_y, cell_factory.sheet_size(60), 7, "Period was not the sheet size")
+        self.assertTrue(all(0 <= cell.position_y < handler.period_y for cell in epithelium.cells),
+                        "Cells were not wrapped around")
+
+        snapshot = epithelium.snapshot()
+        epithelium.update()
+        epithelium.restore(snapshot)
+        self.assertEqual(epithelium.cell_collision_handler.period_y, handler.period_y, "Period was not restored")
+
+        with self.assertRaises(ValueError):
+            Epithelium(10, 10, cell_factory, periodic="z")
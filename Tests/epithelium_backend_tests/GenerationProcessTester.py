@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.GenerationProcess import run_generation_process
+from epithelium_backend.GenerationProgress import GenerationProgress
+
+
+class GenerationProcessTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cell_factory = CellFactory()
+        self.cell_factory.average_radius = 1
+        self.cell_factory.seed = 3
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def receive_all(self, connection) -> list:
+        """Returns every message sent by a generation process, up to and including its last."""
+        messages = [connection.recv()]
+        while messages[-1][0] not in ('done', 'cancelled', 'error'):
+            messages.append(connection.recv())
+        return messages
+
+    def test_protocol(self):
+        """
+        Runs generation on a thread (standing in for the process) and checks that progress is relayed
+        and the epithelium is returned through a columnar file.
+        """
+        file_path = os.path.join(self.directory.name, "candidate.epth")
+        gui_connection, process_connection = multiprocessing.Pipe()
+        generation = threading.Thread(target=run_generation_process,
+                                      args=(process_connection, 4, 30, 1, self.cell_factory, file_path, None, 0))
+        generation.start()
+        messages = self.receive_all(gui_connection)
+        generation.join(timeout=10)
+
+        commands = [message[0] for message in messages]
+        self.assertEqual(commands[-1], 'done', "Generation did not finish")
+        self.assertIn('preview', commands, "No preview sent")
+        self.assertTrue(all(message[1] == 4 for message in messages), "Messages not tagged with the candidate")
+        progress = [message for message in messages if message[0] == 'progress']
+        self.assertEqual(progress[0][2], GenerationProgress.creating_cells, "Cell creation not reported")
+        self.assertEqual(progress[-1][3], 1, "Generation not reported as finished")
+
+        _, _, done_path, residual = messages[-1]
+        self.assertEqual(residual, progress[-1][4], "Final residual not returned")
+        generated = read_epithelium(done_path)
+        expected = Epithelium(30, 1, self.cell_factory)
+        self.assertEqual([(cell.position_x, cell.position_y) for cell in generated.cells],
+                         [(cell.position_x, cell.position_y) for cell in expected.cells],
+                         "Returned epithelium does not match")
+
+    def test_cancel(self):
+        """Ensures that cancelled generation stops without writing the epithelium."""
+        file_path = os.path.join(self.directory.name, "candidate.epth")
+        gui_connection, process_connection = multiprocessing.Pipe()
+        gui_connection.send(('cancel',))
+        run_generation_process(process_connection, 0, 30, 1, self.cell_factory, file_path)
+        self.assertEqual(self.receive_all(gui_connection)[-1], ('cancelled', 0), "Generation not cancelled")
+        self.assertFalse(os.path.exists(file_path), "Cancelled epithelium written")
+
+    def test_processes(self):
+        """Ensures that candidates are generated in separate processes at once."""
+        context = multiprocessing.get_context("spawn")
+        connections = []
+        processes = []
+        for candidate in range(2):
+            self.cell_factory.seed = candidate
+            connection, process_connection = context.Pipe()
+            process = context.Process(target=run_generation_process,
+                                      args=(process_connection, candidate, 20, 1, self.cell_factory,
+                                            os.path.join(self.directory.name, "%d.epth" % candidate)))
+            process.start()
+            process_connection.close()
+            connections.append(connection)
+            processes.append(process)
+
+        for candidate, (connection, process) in enumerate(zip(connections, processes)):
+            message = self.receive_all(connection)[-1]
+            process.join(timeout=10)
+            self.assertEqual(message[0], 'done', "Candidate %d not generated" % candidate)
+            self.assertEqual(len(read_epithelium(message[2]).cells), 20, "Incorrect candidate cell count")
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.MappedEpithelium import MappedEpithelium
+
+
+class MappedEpitheliumTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, "epithelium.epth")
+        write_epithelium(self.epithelium, self.file_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_render_snapshot(self):
+        """Ensures that mapped files are drawn from views of the file."""
+        mapped_epithelium = MappedEpithelium(self.file_path)
+        self.assertEqual(len(mapped_epithelium), len(self.epithelium.cells), "Incorrect cell count")
+        self.assertEqual(mapped_epithelium.furrow_position, self.epithelium.furrow.position,
+                         "Incorrect furrow position")
+
+        snapshot = mapped_epithelium.render_snapshot()
+        self.assertIsInstance(snapshot.position_x, numpy.memmap, "Columns were not memory mapped")
+        self.assertEqual(snapshot.position_x.tolist(), [cell.position_x for cell in self.epithelium.cells],
+                         "Incorrect x positions")
+        self.assertEqual(snapshot.radius.tolist(), [cell.radius for cell in self.epithelium.cells],
+                         "Incorrect radii")
+        self.assertEqual(snapshot.fate.tolist(), [cell_fate(cell) for cell in self.epithelium.cells],
+                         "Incorrect fates")
+
+        average_radius, radius_divergence = mapped_epithelium.radius_statistics()
+        self.assertAlmostEqual(average_radius, numpy.mean([cell.radius for cell in self.epithelium.cells]))
+
+    def test_materialize(self):
+        """Ensures that mapped files create the saved epithelium."""
+        epithelium = MappedEpithelium(self.file_path).materialize()
+        self.assertEqual([(cell.cell_id, cell.position_x, cell.radius) for cell in epithelium.cells],
+                         [(cell.cell_id, cell.position_x, cell.radius) for cell in self.epithelium.cells],
+                         "Materialized cells do not match the saved cells")
+        self.assertEqual(len(epithelium.cell_collision_handler.cells), len(epithelium.cells),
+                         "Collision handler not created")
+
+    def test_overwrite(self):
+        """Ensures that saving over a mapped file does not change what the mapped epithelium reads."""
+        mapped_epithelium = MappedEpithelium(self.file_path)
+        original_positions = [cell.position_x for cell in self.epithelium.cells]
+        for cell in self.epithelium.cells:
+            cell.position_x += 10
+        write_epithelium(self.epithelium, self.file_path)
+
+        self.assertEqual(mapped_epithelium.render_snapshot().position_x.tolist(), original_positions,
+                         "Mapped columns changed when the file was saved over")
+        self.assertEqual(MappedEpithelium(self.file_path).render_snapshot().position_x.tolist(),
+                         [cell.position_x for cell in self.epithelium.cells], "New file not written")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.OutOfCoreEpithelium import OutOfCoreEpithelium
+from epithelium_backend.OutOfCoreEpithelium import passive_growth
+from quick_change.CellEvents import PassiveGrowth
+
+
+class DivisionRecorder(object):
+    """Stands in for the epithelium of PassiveGrowth, recording the cells it would divide."""
+
+    def __init__(self):
+        self.divided = set()
+
+    def divide_cell(self, cell):
+        if cell.dividable:
+            self.divided.add(cell)
+
+
+class OutOfCoreEpitheliumTester(unittest.TestCase):
+
+    def setUp(self):
+        factory = CellFactory()
+        factory.seed = 7
+        epithelium = Epithelium(0)
+        factory.cell_events = epithelium.default_cell_events()
+        epithelium.set_cell_columns(factory.create_columns(600))
+        cells = epithelium.cells
+        epithelium.furrow.position = max(cell.position_x for cell in cells)
+        # only R8 selection, so that the band of resident tiles is narrow
+        epithelium.furrow.events = [epithelium.furrow.events[0].copy()]
+        self.lowest = min(cells, key=lambda cell: cell.position_x)
+        self.highest = max(cells, key=lambda cell: cell.position_x)
+        self.lowest.related_cells.append(self.highest)
+        self.highest.related_cells.append(self.lowest)
+        self.epithelium = epithelium
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_passive_growth(self):
+        """Ensures that growing cells at once matches growing them with PassiveGrowth tick by tick."""
+        generator = numpy.random.RandomState(2)
+        cells = []
+        for radius in generator.uniform(5, 30, 200).tolist():
+            cell = Cell(radius=radius)
+            cell.max_radius = 20
+            cell.target_radius = float(generator.choice([10, 25]))
+            cell.growth_rate = float(generator.uniform(.05, .5))
+            cell.dividable = bool(generator.randint(2))
+            cells.append(cell)
+        columns = [numpy.array([getattr(cell, name) for cell in cells])
+                   for name in ("radius", "max_radius", "target_radius", "growth_rate", "dividable")]
+
+        recorder = DivisionRecorder()
+        growth = PassiveGrowth(recorder)
+        for ticks in range(1, 120):
+            for cell in cells:
+                if cell not in recorder.divided:
+                    growth(cell)
+            grown = passive_growth(*columns, ticks)
+            for cell, radius in zip(cells, grown.tolist()):
+                self.assertAlmostEqual(cell.radius, radius, 6, "Cell grew differently after %d ticks" % ticks)
+        self.assertTrue(recorder.divided, "No cell reached division")
+
+    def test_paging(self):
+        """Ensures that only the band around the furrow is kept in memory and no cell is lost."""
+        cell_ids = sorted(cell.cell_id for cell in self.epithelium.cells)
+        radii = {cell.cell_id: cell.radius for cell in self.epithelium.cells}
+        out_of_core = OutOfCoreEpithelium.from_epithelium(self.epithelium, self.directory.name, 40, 20)
+        self.assertEqual(out_of_core.cell_count, 600, "Cells lost when stored")
+        self.assertLess(len(out_of_core.epithelium.cells), 300, "Too many cells in memory")
+        self.assertEqual(len(os.listdir(self.directory.name)), len(out_of_core.tiles), "Tiles not stored")
+
+        ticks = 60
+        out_of_core.advance(ticks)
+        resident = out_of_core.resident_tiles()
+        for cell in out_of_core.epithelium.cells:
+            self.assertIn(out_of_core.tile_index(cell.position_x), resident, "Cell outside the band kept")
+        self.assertEqual(out_of_core.epithelium.furrow.position, self.epithelium.furrow.position - ticks,
+                         "Furrow not advanced")
+
+        gathered = out_of_core.gather()
+        self.assertEqual(sorted(cell.cell_id for cell in gathered.cells), cell_ids, "Cells lost or duplicated")
+        cells_by_id = {cell.cell_id: cell for cell in gathered.cells}
+        lowest = cells_by_id[self.lowest.cell_id]
+        self.assertEqual([cell.cell_id for cell in lowest.related_cells], [self.highest.cell_id],
+                         "Relationship across tiles lost")
+        # the anterior cells were stored the whole time, and grew anyway
+        self.assertAlmostEqual(lowest.radius, radii[lowest.cell_id] + ticks * lowest.growth_rate, 9,
+                               "Stored cells did not grow")
+        self.assertEqual(out_of_core.gather().cells[-1].radius, gathered.cells[-1].radius, "Gathering grew cells twice")
+
+    def test_from_file(self):
+        """Ensures that saved epithelia are stored as tiles without loading them."""
+        file_path = os.path.join(self.directory.name, "epithelium.epth")
+        write_epithelium(self.epithelium, file_path)
+        out_of_core = OutOfCoreEpithelium.from_file(file_path, os.path.join(self.directory.name, "tiles"), 40, 20)
+        gathered = out_of_core.gather()
+        self.assertEqual(sorted((cell.cell_id, cell.position_x, cell.radius) for cell in gathered.cells),
+                         sorted((cell.cell_id, cell.position_x, cell.radius) for cell in self.epithelium.cells),
+                         "Stored cells differ from the saved cells")
+        self.assertEqual(gathered.furrow.position, self.epithelium.furrow.position, "Furrow not stored")
@@ -0,0 +1,110 @@
+import unittest
+
+import numpy
+
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.ParallelDecompactor import ParallelDecompactor
+from epithelium_backend.ParallelDecompactor import shared_decompactor
+
+
+class ParallelDecompactorTester(unittest.TestCase):
+
+    def setUp(self):
+        factory = CellFactory()
+        factory.seed = 5
+        self.factory = factory
+        self.sheet = factory.create_columns(2000)
+
+    def create_cells(self) -> list:
+        """Returns new cells at the positions of the test sheet."""
+        return self.factory.create_columns_at(self.sheet.position_x, self.sheet.position_y,
+                                              self.sheet.radius).create_cells()
+
+    @staticmethod
+    def positions(cells: list) -> numpy.ndarray:
+        return numpy.array([(cell.position_x, cell.position_y) for cell in cells])
+
+    def test_strip_bounds(self):
+        """Ensures that strips cover every cell once, with equally many cells in each."""
+        decompactor = ParallelDecompactor(3, strips_per_process=2)
+        for cell_count in (1, 5, 1000, 1003):
+            bounds = decompactor.strip_bounds(cell_count)
+            self.assertEqual(bounds[0][0], 0, "First cell not in a strip")
+            self.assertEqual(bounds[-1][1], cell_count, "Last cell not in a strip")
+            for (_, end), (start, _) in zip(bounds[:-1], bounds[1:]):
+                self.assertEqual(end, start, "Strips overlap or leave a gap")
+            sizes = [end - start for start, end in bounds]
+            self.assertLessEqual(max(sizes) - min(sizes), 1, "Strips unbalanced")
+
+    def test_decompact(self):
+        """Ensures that strips with halos push and pull cells like CellCollisionHandler.push_pull."""
+        serial = self.create_cells()[:600]
+        handler = CellCollisionHandler(serial)
+        parallel = self.create_cells()[:600]
+        parallel[3].position_delta_x = 2
+        serial[3].position_delta_x = 2
+        residual = ParallelDecompactor(1, strips_per_process=4).decompact(parallel)
+
+        # every pair, ordered along the sheet like the strips order them
+        ordered = sorted(serial, key=lambda cell: cell.position_x)
+        for index, cell1 in enumerate(ordered):
+            for cell2 in ordered[index + 1:]:
+                handler.push_pull(cell1, cell2)
+        moved = numpy.array([(cell.position_delta_x, cell.position_delta_y) for cell in serial])
+        expected = self.positions(serial) + moved
+        numpy.testing.assert_allclose(self.positions(parallel), expected, atol=1e-9,
+                                      err_msg="Strips moved cells differently")
+        self.assertAlmostEqual(residual, numpy.hypot(moved[:, 0], moved[:, 1]).max(), 9, "Incorrect residual")
+        self.assertEqual((parallel[3].position_delta_x, parallel[3].position_delta_y), (0, 0), "Delta not applied")
+
+    def test_processes(self):
+        """Ensures that worker processes move cells exactly like a single process does."""
+        single = self.create_cells()
+        ParallelDecompactor(1, strips_per_process=2).decompact(single)
+        pooled = self.create_cells()
+        decompactor = ParallelDecompactor(2)
+        try:
+            decompactor.decompact(pooled)
+            # more cells than the shared memory holds
+            pooled_again = self.factory.create_columns(4000).create_cells()
+            decompactor.decompact(pooled_again)
+        finally:
+            decompactor.close()
+        numpy.testing.assert_array_equal(self.positions(pooled), self.positions(single),
+                                         "Worker processes moved cells differently")
+
+    def test_iterations(self):
+        """Ensures that iterations of one call move cells like as many calls do, with and without worker processes."""
+        stepped = self.create_cells()
+        stepped[3].position_delta_x = 2
+        for _ in range(3):
+            residual = ParallelDecompactor(1, strips_per_process=2).decompact(stepped)
+        single = self.create_cells()
+        single[3].position_delta_x = 2
+        self.assertEqual(ParallelDecompactor(1, strips_per_process=2).decompact(single, iterations=3), residual,
+                         "Incorrect residual")
+        pooled = self.create_cells()
+        pooled[3].position_delta_x = 2
+        decompactor = ParallelDecompactor(2)
+        try:
+            decompactor.decompact(pooled, iterations=3)
+        finally:
+            decompactor.close()
+        numpy.testing.assert_array_equal(self.positions(single), self.positions(stepped),
+                                         "Iterations moved cells differently")
+        numpy.testing.assert_array_equal(self.positions(pooled), self.positions(stepped),
+                                         "Worker processes moved cells differently")
+
+    def test_collision_handler(self):
+        """Ensures that collision handlers decompact large sheets on their decompaction processes."""
+        self.assertIsNone(shared_decompactor(None), "Decompactor shared without decompaction processes")
+        self.assertIs(shared_decompactor(1), shared_decompactor(1), "Decompactor not shared")
+
+        sheet = self.factory.create_columns(ParallelDecompactor.minimum_cells)
+        single = sheet.create_cells()
+        ParallelDecompactor(1).decompact(single, iterations=2)
+        handled = self.factory.create_columns_at(sheet.position_x, sheet.position_y, sheet.radius).create_cells()
+        CellCollisionHandler(handled, decompaction_processes=1).decompact(2)
+        numpy.testing.assert_array_equal(self.positions(handled), self.positions(single),
+                                         "Collision handler did not decompact on its decompaction processes")
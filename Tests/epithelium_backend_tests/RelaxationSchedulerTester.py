@@ -0,0 +1,98 @@
+import pickle
+import unittest
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.RelaxationScheduler import RelaxationScheduler
+
+
+def settled_lattice(rows: int) -> list:
+    """Returns a hexagonal lattice of cells 10 in radius, spaced so that they neither push nor pull."""
+    spacing = 2 * 10 * 0.95
+    return [Cell(((col + (row % 2) / 2) * spacing, row * spacing * 3 ** .5 / 2, 0), 10)
+            for row in range(rows) for col in range(rows)]
+
+
+class RelaxationSchedulerTester(unittest.TestCase):
+
+    def test_quiet_ticks(self):
+        """Ensures that relaxed sheets are left alone until they are disturbed."""
+        cells = settled_lattice(20)
+        handler = CellCollisionHandler(cells)
+        scheduler = RelaxationScheduler(max_iterations=6, tolerance=.1)
+        self.assertEqual(scheduler.relax(handler).iterations, 1, "New cells not decompacted")
+        decision = scheduler.relax(handler)
+        self.assertEqual((decision.iterations, decision.reason), (0, "quiet"), "Relaxed sheet decompacted")
+
+        cells[210].position_x += 4
+        decision = scheduler.relax(handler)
+        self.assertAlmostEqual(decision.disturbance, 4, 9, "Disturbance not measured")
+        self.assertGreater(decision.iterations, 1, "Disturbed sheet decompacted only once")
+        self.assertEqual(decision.region_fraction, 1, "Sheet decompacted by region")
+        for _ in range(10):
+            decision = scheduler.relax(handler)
+        self.assertEqual(decision.reason, "quiet", "Relaxed sheet decompacted")
+        self.assertLess(scheduler.residual, .1, "Sheet did not relax")
+
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["ticks"], len(scheduler.decisions), "Ticks not counted")
+        self.assertEqual(metrics["iterations"], sum(decision.iterations for decision in scheduler.decisions),
+                         "Decompactions not counted")
+        self.assertEqual(metrics["quiet_ticks"], metrics["reasons"]["quiet"], "Quiet ticks not counted")
+        self.assertIs(metrics["last_decision"], decision, "Last decision not reported")
+
+    def test_regional(self):
+        """Ensures that regional schedulers only decompact around the disturbance, and relax it as well."""
+        regional_cells = settled_lattice(20)
+        cells = settled_lattice(20)
+        regional_handler = CellCollisionHandler(regional_cells)
+        handler = CellCollisionHandler(cells)
+        regional_scheduler = RelaxationScheduler(max_iterations=6, tolerance=.1, regional=True)
+        scheduler = RelaxationScheduler(max_iterations=6, tolerance=.1)
+        regional_scheduler.relax(regional_handler)
+        scheduler.relax(handler)
+
+        regional_cells[210].position_x += 4
+        cells[210].position_x += 4
+        decision = regional_scheduler.relax(regional_handler)
+        self.assertLess(decision.region_fraction, .1, "Decompactions not restricted to the disturbance")
+        for _ in range(5):
+            regional_scheduler.relax(regional_handler)
+            scheduler.relax(handler)
+        self.assertLess(regional_scheduler.residual, .1, "Sheet did not relax")
+        self.assertLess(regional_scheduler.iterations, scheduler.iterations + 6, "Regional scheduler wasted work")
+        for regional_cell, cell in zip(regional_cells, cells):
+            self.assertAlmostEqual(regional_cell.position_x, cell.position_x, 0, "Disturbance relaxed differently")
+            self.assertAlmostEqual(regional_cell.position_y, cell.position_y, 0, "Disturbance relaxed differently")
+
+    def test_dead_cells(self):
+        """Ensures that cells dying or being born disturb the sheet."""
+        cells = settled_lattice(20)
+        handler = CellCollisionHandler(cells)
+        scheduler = RelaxationScheduler(tolerance=.1, regional=True)
+        scheduler.relax(handler)
+        handler.deregister(cells[100])
+        self.assertEqual(scheduler.relax(handler).disturbance, 10, "Dead cell did not disturb the sheet")
+        handler.register(Cell((cells[200].position_x + 1, cells[200].position_y, 0), 5))
+        decision = scheduler.relax(handler)
+        self.assertEqual(decision.disturbance, 5, "New cell did not disturb the sheet")
+        self.assertGreater(decision.iterations, 0, "New cell not decompacted")
+
+    def test_epithelium(self):
+        """Ensures that epithelia with a scheduler are relaxed by it, and keep it when pickled."""
+        factory = CellFactory()
+        factory.seed = 5
+        self.assertIsNone(Epithelium(0).relaxation_scheduler, "Scheduler set by default")
+        epithelium = Epithelium(200, cell_factory=factory, relaxation_scheduler=RelaxationScheduler(max_iterations=3))
+        epithelium.advance(5)
+        self.assertEqual(epithelium.relaxation_scheduler.ticks, 5, "Scheduler not run every tick")
+        for decision in epithelium.relaxation_scheduler.decisions:
+            self.assertLessEqual(decision.iterations, 3, "Decompacted more than allowed")
+
+        restored = pickle.loads(pickle.dumps(epithelium))
+        self.assertEqual(restored.relaxation_scheduler.ticks, 5, "Scheduler not pickled")
+        self.assertIsNone(restored.relaxation_scheduler.residual, "Cell states pickled")
+        self.assertGreater(restored.relaxation_scheduler.relax(restored.cell_collision_handler).iterations, 0,
+                           "Restored epithelium not decompacted")
@@ -0,0 +1,59 @@
+import unittest
+
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFate import decode_fate
+from epithelium_backend.CellFate import encode_fate
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+from epithelium_backend.SupportCellType import SupportCellType
+
+
+class RenderSnapshotTester(unittest.TestCase):
+
+    def test_fate_round_trip(self):
+        """Ensures that every combination of specializations survives encoding."""
+        for photoreceptor_type in PhotoreceptorType:
+            for support_specializations in [set(), {SupportCellType.BORDER_CELL},
+                                            {SupportCellType.BORDER_CELL, SupportCellType.PIGMENT_CELL}]:
+                code = encode_fate(photoreceptor_type, support_specializations)
+                self.assertLess(code, 256, "Fate code does not fit in a uint8")
+                self.assertEqual(decode_fate(code), (photoreceptor_type, support_specializations),
+                                 "Fate code did not decode to the encoded specializations")
+
+    def test_from_cells(self):
+        """Ensures that snapshots copy the render columns of cells."""
+        cells = [Cell(position=(i, 2 * i, 0), radius=i + 1) for i in range(5)]
+        cells[3].photoreceptor_type = PhotoreceptorType.R8
+        snapshot = RenderSnapshot.from_cells(cells, tick=7)
+
+        self.assertEqual(len(snapshot), len(cells), "Incorrect snapshot length")
+        self.assertEqual(snapshot.tick, 7, "Incorrect snapshot tick")
+        for i, cell in enumerate(cells):
+            self.assertEqual(snapshot.position_x[i], cell.position_x, "Incorrect x position in snapshot")
+            self.assertEqual(snapshot.position_y[i], cell.position_y, "Incorrect y position in snapshot")
+            self.assertEqual(snapshot.radius[i], cell.radius, "Incorrect radius in snapshot")
+            self.assertEqual(snapshot.fate[i], cell_fate(cell), "Incorrect fate in snapshot")
+
+        # snapshots do not follow later changes and cannot be changed
+        cells[0].position_x = 100
+        self.assertEqual(snapshot.position_x[0], 0, "Snapshot changed along with its cells")
+        with self.assertRaises(ValueError):
+            snapshot.radius[0] = 10
+
+    def test_double_buffer(self):
+        """Ensures that the double buffer always exposes the latest published snapshot."""
+        render_buffer = SnapshotDoubleBuffer()
+        self.assertIsNone(render_buffer.front, "Empty buffer has a front snapshot")
+
+        first = RenderSnapshot.from_cells([Cell()], tick=1)
+        second = RenderSnapshot.from_cells([Cell()], tick=2)
+        render_buffer.publish(first)
+        self.assertIs(render_buffer.front, first, "Published snapshot is not at the front")
+        render_buffer.publish(second)
+        self.assertIs(render_buffer.front, second, "Published snapshot is not at the front")
+        self.assertEqual(render_buffer.version, 2, "Buffer version not incremented by publish")
+
+        render_buffer.clear()
+        self.assertIsNone(render_buffer.front, "Cleared buffer has a front snapshot")
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.ShardedSimulation import ShardedSimulation
+
+
+class ShardedSimulationTester(unittest.TestCase):
+
+    def setUp(self):
+        factory = CellFactory()
+        factory.seed = 11
+        factory.max_radius = 100  # no cell grows large enough to divide
+        epithelium = Epithelium(0)
+        factory.cell_events = epithelium.default_cell_events()
+        epithelium.set_cell_columns(factory.create_columns(600))
+        epithelium.furrow.position = max(cell.position_x for cell in epithelium.cells)
+        self.epithelium = epithelium
+
+    @staticmethod
+    def positions(epithelium: Epithelium) -> dict:
+        return {cell.cell_id: (cell.position_x, cell.position_y, cell.radius) for cell in epithelium.cells}
+
+    def test_shards_match_single_process(self):
+        """Ensures that slabs simulated by several shards move their cells like a single shard does."""
+        self.epithelium.furrow.events = []
+        with ShardedSimulation(self.epithelium, shards=1, family="AF_UNIX") as simulation:
+            single = simulation.advance(5).gather()
+        with ShardedSimulation(self.epithelium, shards=3, family="AF_UNIX") as simulation:
+            sharded = simulation.advance(5).gather()
+            self.assertGreater(simulation.migrated, 0, "No cell crossed between slabs")
+
+        single_positions = self.positions(single)
+        sharded_positions = self.positions(sharded)
+        self.assertEqual(sorted(single_positions), sorted(sharded_positions), "Cells lost or duplicated")
+        cell_ids = sorted(single_positions)
+        numpy.testing.assert_allclose([sharded_positions[cell_id] for cell_id in cell_ids],
+                                      [single_positions[cell_id] for cell_id in cell_ids], atol=1e-6,
+                                      err_msg="Shards moved cells differently")
+        moved = self.positions(self.epithelium)
+        self.assertNotEqual(single_positions, moved, "Cells did not move")
+
+    def test_furrow_events(self):
+        """Ensures that shards connected over TCP run the furrow events and keep every cell."""
+        with ShardedSimulation(self.epithelium, shards=2, family="AF_INET") as simulation:
+            simulation.advance(3)
+            gathered = simulation.gather()
+            simulation.advance(1)
+            advanced = simulation.gather()
+        self.assertEqual(gathered.furrow.position, self.epithelium.furrow.position - 3, "Furrow not advanced")
+        self.assertEqual(advanced.furrow.position, self.epithelium.furrow.position - 4, "Furrow not advanced")
+        self.assertEqual(len(gathered.cells), len(self.epithelium.cells), "Cells lost or duplicated")
+        self.assertEqual(len(set(cell.cell_id for cell in advanced.cells)), len(advanced.cells), "Cell ids reused")
+        self.assertEqual([event.name for event in gathered.furrow.events],
+                         [event.name for event in self.epithelium.furrow.events], "Furrow events not gathered")
+        self.assertIsNotNone(gathered.cell_collision_handler, "Collision handler not created")
+        for cell in advanced.cells:
+            for event in cell.cell_events:
+                self.assertIs(getattr(event, "epithelium", advanced), advanced, "Cell event bound elsewhere")
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy
+
+from epithelium_backend.Cell import Cell
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.SharedFrameRing import SharedFrameRing
+
+
+class SharedFrameRingTester(unittest.TestCase):
+
+    def test_write_read(self):
+        """Ensures that frames written to a ring can be read back through another attachment."""
+        cells = [Cell(position=(i, -i, 0), radius=i + 1) for i in range(10)]
+        cells[2].photoreceptor_type = PhotoreceptorType.R8
+        snapshot = RenderSnapshot.from_cells(cells, tick=4)
+
+        ring = SharedFrameRing.create(capacity=16, slot_count=3)
+        reader = SharedFrameRing.attach(ring.name)
+        try:
+            self.assertEqual(reader.capacity, 16, "Attached ring has incorrect capacity")
+            self.assertEqual(reader.slot_count, 3, "Attached ring has incorrect slot count")
+            self.assertEqual(reader.latest_slot, -1, "New ring has a latest slot")
+
+            ring.write(1, snapshot)
+            self.assertEqual(reader.latest_slot, 1, "Written slot is not the latest slot")
+            frame = reader.read(1)
+            self.assertEqual(frame.tick, 4, "Incorrect tick read from ring")
+            for name in ("position_x", "position_y", "radius", "fate"):
+                numpy.testing.assert_array_equal(getattr(frame, name), getattr(snapshot, name),
+                                                 "Incorrect %s read from ring" % name)
+            del frame
+        finally:
+            self.assertTrue(reader.close(), "Reader could not be closed")
+            self.assertTrue(ring.close(), "Ring could not be closed")
+
+    def test_capacity(self):
+        """Ensures that frames larger than the ring are rejected."""
+        ring = SharedFrameRing.create(capacity=2)
+        try:
+            with self.assertRaises(ValueError):
+                ring.write(0, RenderSnapshot.from_cells([Cell() for _ in range(3)]))
+        finally:
+            ring.close()
+
+    def test_close_while_read(self):
+        """Ensures that a ring is not unmapped while snapshots read from it are alive."""
+        ring = SharedFrameRing.create(capacity=4)
+        ring.write(0, RenderSnapshot.from_cells([Cell()]))
+        frame = ring.read(0)
+        self.assertFalse(ring.close(), "Ring closed while a frame read from it was in use")
+        del frame
+        self.assertTrue(ring.close(), "Ring could not be closed after its frames were released")
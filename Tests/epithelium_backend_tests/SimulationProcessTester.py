@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+import unittest
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.SharedFrameRing import SharedFrameRing
+from epithelium_backend.SimulationProcess import run_simulation_process
+
+
+class SimulationProcessTester(unittest.TestCase):
+
+    def test_protocol(self):
+        """
+        Runs a simulation loop on a thread (standing in for the process) and checks
+        that frames arrive through shared memory and control messages are obeyed.
+        """
+        epithelium = Epithelium(20)
+        gui_connection, process_connection = multiprocessing.Pipe()
+        simulation = threading.Thread(target=run_simulation_process, args=(process_connection, epithelium))
+        simulation.start()
+        ring = None
+        try:
+            gui_connection.send(('set_parameters', {'max_throughput': True, 'frame_delay': 0}))
+            gui_connection.send(('resume',))
+
+            # the first frame creates the ring
+            message = gui_connection.recv()
+            self.assertEqual(message[0], 'ring', "No ring announced before the first frame")
+            ring = SharedFrameRing.attach(message[1])
+
+            ticks = []
+            for _ in range(3):
+                command, slot, tick, _ = gui_connection.recv()
+                self.assertEqual(command, 'frame', "Expected a frame message")
+                frame = ring.read(slot)
+                self.assertEqual(len(frame), len(epithelium.cells), "Frame has incorrect cell count")
+                self.assertEqual(frame.tick, tick, "Frame tick does not match message")
+                del frame
+                ticks.append(tick)
+                gui_connection.send(('hold', slot))
+            self.assertEqual(ticks, sorted(set(ticks)), "Frames did not advance")
+
+            gui_connection.send(('pause',))
+            gui_connection.send(('fetch',))
+            message = gui_connection.recv()
+            while message[0] != 'epithelium':
+                message = gui_connection.recv()
+            self.assertIsInstance(message[1], Epithelium, "Fetch did not return an epithelium")
+            self.assertLess(message[1].furrow.position, epithelium.furrow.position + 1,
+                            "Fetched epithelium was not simulated")
+        finally:
+            gui_connection.send(('stop',))
+            simulation.join(timeout=10)
+            if ring is not None:
+                ring.close()
+        self.assertFalse(simulation.is_alive(), "Simulation did not stop")
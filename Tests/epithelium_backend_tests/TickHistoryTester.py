@@ -0,0 +1,108 @@
+import unittest
+
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+
+
+def render_state(epithelium) -> tuple:
+    """Returns the render columns of an epithelium with cells ordered by id."""
+    cells = sorted(epithelium.cells, key=lambda cell: cell.cell_id)
+    return (numpy.array([cell.position_x for cell in cells]),
+            numpy.array([cell.position_y for cell in cells]),
+            numpy.array([cell.radius for cell in cells]),
+            numpy.array([cell_fate(cell) for cell in cells]))
+
+
+class TickHistoryTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+
+    def simulate(self, ticks: int, expected_states: dict = None) -> None:
+        """Simulates the epithelium with births, deaths, and fate changes between ticks."""
+        epithelium = self.epithelium
+        for _ in range(ticks):
+            tick = epithelium.history.next_tick
+            if tick % 5 == 0:
+                epithelium.divide_cell(epithelium.cells[tick % len(epithelium.cells)])
+            if tick % 7 == 3:
+                epithelium.delete_cell(epithelium.cells[0])
+            if tick % 4 == 1:
+                epithelium.cells[tick % len(epithelium.cells)].photoreceptor_type = PhotoreceptorType.R8
+            epithelium.update()
+            if expected_states is not None:
+                expected_states[tick] = render_state(epithelium)
+
+    def test_render_snapshot(self):
+        """Ensures that every recorded tick can be rebuilt within the position resolution."""
+        history = self.epithelium.keep_history(keyframe_interval=7)
+        expected_states = {0: render_state(self.epithelium)}
+        self.simulate(30, expected_states)
+        self.assertEqual((history.first_tick, history.last_tick), (0, 30), "Incorrect recorded ticks")
+        self.assertEqual(history.keyframe_ticks, [0, 7, 14, 21, 28], "Incorrect keyframe ticks")
+
+        for tick, (position_x, position_y, radius, fate) in expected_states.items():
+            snapshot = history.render_snapshot(tick)
+            self.assertEqual(snapshot.tick, tick, "Incorrect snapshot tick")
+            self.assertEqual(len(snapshot), len(radius), "Incorrect number of cells at tick %d" % tick)
+            tolerance = history.position_resolution
+            numpy.testing.assert_allclose(snapshot.position_x, position_x, atol=tolerance)
+            numpy.testing.assert_allclose(snapshot.position_y, position_y, atol=tolerance)
+            numpy.testing.assert_allclose(snapshot.radius, radius, atol=tolerance)
+            numpy.testing.assert_array_equal(snapshot.fate, fate)
+
+        with self.assertRaises(KeyError):
+            history.render_snapshot(31)
+
+    def test_memory_cap(self):
+        """Ensures that the oldest keyframes are dropped when the history outgrows its memory cap."""
+        history = self.epithelium.keep_history(keyframe_interval=5)
+        self.simulate(10)
+        history.memory_cap = history.nbytes
+        self.simulate(20)
+
+        self.assertEqual(history.last_tick, 30, "Most recent tick was dropped")
+        self.assertGreater(history.first_tick, 0, "Oldest ticks were not dropped")
+        self.assertIn(history.first_tick, history.keyframe_ticks, "History does not begin with a keyframe")
+        self.assertLessEqual(history.nbytes, history.memory_cap, "History exceeds its memory cap")
+
+    def test_shared_keyframes(self):
+        """Ensures that the columns keyframes share with each other are only counted once."""
+        history = self.epithelium.keep_history(keyframe_interval=1)
+        keyframe_bytes = history.nbytes
+        # nothing changes between the keyframes, so they share every column
+        for _ in range(3):
+            history.record(self.epithelium)
+        self.assertEqual(history.keyframe_ticks, [0, 1, 2, 3], "Incorrect keyframe ticks")
+        self.assertLess(history.nbytes, 2 * keyframe_bytes, "Shared columns counted for every keyframe")
+        self.assertEqual(history.nbytes, sum(array.nbytes for array in
+                                             {id(array): array for tick in range(4)
+                                              for array in history._records[tick].arrays()}.values()),
+                         "History bytes are not the bytes of its arrays")
+
+        history.memory_cap = history.nbytes - 1
+        history.record(self.epithelium)
+        self.assertLessEqual(history.nbytes, history.memory_cap, "History exceeds its memory cap")
+        self.assertGreater(history.nbytes, keyframe_bytes, "Shared columns released with a dropped keyframe")
+
+    def test_restore(self):
+        """Ensures that an epithelium can be restored to a keyframe and recording continues from there."""
+        history = self.epithelium.keep_history(keyframe_interval=10)
+        expected_states = {0: render_state(self.epithelium)}
+        self.simulate(25, expected_states)
+
+        restored_tick = history.restore(self.epithelium, 17)
+        self.assertEqual(restored_tick, 10, "Not restored to the last keyframe before the tick")
+        self.assertEqual(history.last_tick, 10, "Later ticks were not forgotten")
+        for expected, restored in zip(expected_states[10], render_state(self.epithelium)):
+            numpy.testing.assert_array_equal(restored, expected)
+
+        self.epithelium.update()
+        self.assertEqual(history.last_tick, 11, "Recording did not continue from the restored tick")
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.TiledSheetGenerator import TiledSheetGenerator
+from epithelium_backend.TiledSheetGenerator import generate_epithelium
+from epithelium_backend.TiledSheetGenerator import neighbor_pairs
+from epithelium_backend.TiledSheetGenerator import spring_deltas
+
+
+class TiledSheetGeneratorTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cell_factory = CellFactory()
+        self.cell_factory.average_radius = 1
+        self.cell_factory.radius_divergence = .1
+        self.cell_factory.seed = 2
+        self.random = numpy.random.RandomState(4)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_neighbor_pairs(self):
+        """Ensures that every pair of cells closer than the box size is found once, in open and periodic space."""
+        position_x = self.random.uniform(0, 20, 300)
+        position_y = self.random.uniform(0, 20, 300)
+        for period in (None, 20):
+            first, second = neighbor_pairs(position_x, position_y, 2, period)
+            found = set(zip(first.tolist(), second.tolist()))
+            self.assertEqual(len(found), len(first), "Pair found more than once")
+            found = set(tuple(sorted(pair)) for pair in found)
+            self.assertEqual(len(found), len(first), "Pair found in both orders")
+
+            delta_x = position_x[:, None] - position_x[None, :]
+            delta_y = position_y[:, None] - position_y[None, :]
+            if period is not None:
+                delta_x -= period * numpy.round(delta_x / period)
+                delta_y -= period * numpy.round(delta_y / period)
+            close = numpy.hypot(delta_x, delta_y) < 2
+            expected = set((i, j) for i, j in zip(*numpy.nonzero(close)) if i < j)
+            self.assertLessEqual(expected, found, "Close pair not found")
+
+    def test_spring_deltas(self):
+        """Ensures that cells are pushed and pulled as CellCollisionHandler does."""
+        cells = [Cell((x, y, 0), radius) for x, y, radius in zip(self.random.uniform(0, 6, 30),
+                                                                  self.random.uniform(0, 6, 30),
+                                                                  self.random.uniform(.9, 1.1, 30))]
+        position_x = numpy.array([cell.position_x for cell in cells])
+        position_y = numpy.array([cell.position_y for cell in cells])
+        radius = numpy.array([cell.radius for cell in cells])
+        first, second = neighbor_pairs(position_x, position_y, 2 * 1.05 * radius.max())
+        delta_x, delta_y = spring_deltas(position_x, position_y, radius, first, second)
+
+        handler = CellCollisionHandler(cells)
+        for i, j in zip(first.tolist(), second.tolist()):
+            handler.push_pull(cells[i], cells[j])
+        numpy.testing.assert_allclose(delta_x, [cell.position_delta_x for cell in cells], atol=1e-12)
+        numpy.testing.assert_allclose(delta_y, [cell.position_delta_y for cell in cells], atol=1e-12)
+
+    def test_generate(self):
+        """Ensures that tiled sheets have the requested cells, relaxed seams, and reuse cached patches."""
+        cache = EpitheliumCache(self.directory.name)
+        generator = TiledSheetGenerator(patch_cells=128, patch_count=2, cache=cache)
+        epithelium = generator.generate(1000, 1, self.cell_factory)
+        self.assertEqual(len(epithelium.cells), 1000, "Incorrect cell count")
+        self.assertEqual(len(epithelium.cell_collision_handler.cells), 1000, "Collision handler not created")
+        self.assertEqual(len(os.listdir(self.directory.name)), 1, "Patches not cached")
+
+        position_x = numpy.array([cell.position_x for cell in epithelium.cells])
+        position_y = numpy.array([cell.position_y for cell in epithelium.cells])
+        radius = numpy.array([cell.radius for cell in epithelium.cells])
+        first, second = neighbor_pairs(position_x, position_y, 2.2 * radius.max())
+        spacing = numpy.hypot(position_x[first] - position_x[second],
+                              position_y[first] - position_y[second]) / (radius[first] + radius[second])
+        self.assertGreater(spacing.min(), .7, "Cells overlap along the seams")
+
+        # cached patches are loaded, and seeded sheets are the same every time
+        generator.relax_patch = None
+        generated_again = generator.generate(1000, 1, self.cell_factory)
+        self.assertEqual([(cell.position_x, cell.position_y) for cell in generated_again.cells],
+                         [(cell.position_x, cell.position_y) for cell in epithelium.cells],
+                         "Seeded sheet not reproduced")
+
+    def test_tiled_threshold(self):
+        """Ensures that epithelia are only generated from tiles from the tiled threshold on."""
+        cache = EpitheliumCache(self.directory.name)
+
+        def patches_cached():
+            return any(name.startswith(TiledSheetGenerator.cache_prefix) for name in os.listdir(cache.directory))
+
+        epithelium = generate_epithelium(200, 1, self.cell_factory, cache, tiled_threshold=201)
+        self.assertEqual(len(epithelium.cells), 200, "Incorrect cell count")
+        self.assertFalse(patches_cached(), "Epithelium below the threshold generated from tiles")
+
+        epithelium = generate_epithelium(200, 1, self.cell_factory, cache, tiled_threshold=200)
+        self.assertEqual(len(epithelium.cells), 200, "Incorrect cell count")
+        self.assertTrue(patches_cached(), "Epithelium at the threshold not generated from tiles")
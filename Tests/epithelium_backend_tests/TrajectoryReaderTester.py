@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.TrajectoryReader import TrajectoryReader
+from epithelium_backend.TrajectoryRecorder import TrajectoryRecorder
+
+
+class TrajectoryReaderTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, "trajectory.trj")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, recorder: TrajectoryRecorder, ticks: int) -> dict:
+        """Simulates the epithelium with a cell division every other tick, returning the x positions of every tick."""
+        positions = {}
+        for _ in range(ticks):
+            tick = recorder.tick
+            if tick % 2:
+                self.epithelium.divide_cell(self.epithelium.cells[tick % len(self.epithelium.cells)])
+            self.epithelium.update()
+            positions[tick] = [cell.position_x for cell in self.epithelium.cells]
+        return positions
+
+    def test_seek(self):
+        """Ensures that every recorded tick can be drawn in any order from views of the file."""
+        recorder = TrajectoryRecorder(self.file_path, tick_interval=3)
+        recorder.attach(self.epithelium, record=False)
+        positions = self.record(recorder, 12)
+        recorder.close()
+
+        reader = TrajectoryReader(self.file_path, check_crc=True)
+        self.assertEqual(reader.ticks.tolist(), [0, 3, 6, 9], "Incorrect recorded ticks")
+        for tick in (9, 0, 6, 3):
+            snapshot = reader.snapshot_at(tick)
+            self.assertEqual(snapshot.tick, tick, "Incorrect tick drawn")
+            self.assertIs(snapshot.source, reader._mapped_file, "Frame was not memory mapped")
+            self.assertFalse(snapshot.position_x.flags.owndata, "Frame was copied")
+            numpy.testing.assert_array_equal(snapshot.position_x, numpy.float32(positions[tick]))
+
+        self.assertEqual(reader.snapshot_at(8).tick, 6, "Ticks between frames not drawn from the previous frame")
+        self.assertEqual(reader.snapshot_at(-1).tick, 0, "Ticks before the recording not drawn from the first frame")
+        self.assertEqual(reader.snapshot_at(100).tick, 9, "Ticks after the recording not drawn from the last frame")
+
+    def test_quantized(self):
+        """Ensures that quantized frames are drawn within their resolution."""
+        recorder = TrajectoryRecorder(self.file_path, quantized=True, position_resolution=1 / 64)
+        recorder.attach(self.epithelium, record=False)
+        positions = self.record(recorder, 4)
+        recorder.close()
+
+        snapshot = TrajectoryReader(self.file_path).snapshot(3)
+        self.assertEqual(snapshot.position_x.dtype, numpy.float32, "Quantized positions not converted")
+        numpy.testing.assert_allclose(snapshot.position_x, positions[3], atol=1 / 64)
+
+    def test_refresh(self):
+        """Ensures that frames recorded after the file was mapped are found."""
+        recorder = TrajectoryRecorder(self.file_path)
+        recorder.attach(self.epithelium, record=False)
+        self.record(recorder, 3)
+        recorder.close()
+        reader = TrajectoryReader(self.file_path)
+        self.assertEqual(len(reader), 3, "Incorrect frame count")
+
+        # frames written by a recording that is still running
+        with open(self.file_path, "ab") as out_file:
+            recorder._out_file = out_file
+            for tick in (3, 4):
+                recorder._write_frame(tick, numpy.arange(2), numpy.full((2, 3), tick, numpy.float64),
+                                      numpy.zeros(2, numpy.uint8))
+
+        self.assertEqual(reader.refresh(), 2, "Appended frames not found")
+        self.assertEqual(reader.ticks.tolist(), list(range(5)), "Incorrect ticks after refreshing")
+        self.assertEqual(reader.snapshot(4).radius.tolist(), [4, 4], "Appended frame not read")
+        self.assertEqual(reader.refresh(), 0, "Frames found twice")
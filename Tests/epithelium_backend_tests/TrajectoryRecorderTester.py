@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+from epithelium_backend import TrajectoryFile
+from epithelium_backend.TrajectoryRecorder import TrajectoryRecorder
+
+
+def read_frames(file_path: str) -> list:
+    """Returns the tick and payload arrays of every frame in a trajectory file."""
+    with open(file_path, "rb") as in_file:
+        header, frames_start = TrajectoryFile.read_header(in_file)
+        frames, _ = TrajectoryFile.scan_frames(in_file, frames_start)
+        in_file.seek(0)
+        contents = in_file.read()
+    return [(frame[0], TrajectoryFile.frame_arrays(header, contents, frame)) for frame in frames]
+
+
+class TrajectoryRecorderTester(unittest.TestCase):
+
+    def setUp(self):
+        cell_factory = CellFactory()
+        cell_factory.average_radius = 1
+        cell_factory.radius_divergence = .1
+        self.epithelium = Epithelium(40, 1, cell_factory)
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.directory.name, "trajectory.trj")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def simulate(self, recorder: TrajectoryRecorder, ticks: int, expected_states: dict = None) -> None:
+        """Simulates the epithelium with births, deaths, and fate changes between ticks."""
+        epithelium = recorder.epithelium
+        for _ in range(ticks):
+            tick = recorder.tick
+            if tick % 3 == 0:
+                epithelium.divide_cell(epithelium.cells[tick % len(epithelium.cells)])
+            if tick % 4 == 1:
+                epithelium.delete_cell(epithelium.cells[0])
+            epithelium.cells[tick % len(epithelium.cells)].photoreceptor_type = PhotoreceptorType.R8
+            epithelium.update()
+            if expected_states is not None:
+                expected_states[tick] = self.state(epithelium)
+
+    @staticmethod
+    def state(epithelium) -> tuple:
+        """Returns the recorded columns of an epithelium."""
+        return ([cell.cell_id for cell in epithelium.cells],
+                numpy.array([(cell.position_x, cell.position_y, cell.radius) for cell in epithelium.cells]),
+                [cell_fate(cell) for cell in epithelium.cells])
+
+    def test_record(self):
+        """Ensures that every tick_interval-th tick is recorded with its births and deaths."""
+        recorder = TrajectoryRecorder(self.file_path, tick_interval=2)
+        expected_states = {0: self.state(self.epithelium)}
+        recorder.attach(self.epithelium)
+        self.simulate(recorder, 12, expected_states)
+        recorder.close()
+        self.assertIsNone(self.epithelium.trajectory_recorder, "Recorder not detached when closed")
+
+        frames = read_frames(self.file_path)
+        self.assertEqual([tick for tick, _ in frames], list(range(0, 13, 2)), "Incorrect recorded ticks")
+        previous_ids = set()
+        for tick, arrays in frames:
+            ids, values, fates = expected_states[tick]
+            self.assertEqual(arrays["ids"].tolist(), ids, "Incorrect ids at tick %d" % tick)
+            numpy.testing.assert_array_equal(arrays["position_x"], values[:, 0].astype(numpy.float32))
+            numpy.testing.assert_array_equal(arrays["radius"], values[:, 2].astype(numpy.float32))
+            self.assertEqual(arrays["fate"].tolist(), fates, "Incorrect fates at tick %d" % tick)
+            self.assertEqual(set(arrays["born_ids"].tolist()), set(ids) - previous_ids,
+                             "Incorrect births at tick %d" % tick)
+            self.assertEqual(set(arrays["died_ids"].tolist()), previous_ids - set(ids),
+                             "Incorrect deaths at tick %d" % tick)
+            previous_ids = set(ids)
+
+    def test_quantized(self):
+        """Ensures that quantized positions are recorded within their resolution."""
+        recorder = TrajectoryRecorder(self.file_path, quantized=True, position_resolution=1 / 64)
+        recorder.attach(self.epithelium)
+        expected_states = {}
+        self.simulate(recorder, 3, expected_states)
+        recorder.close()
+
+        for tick, arrays in read_frames(self.file_path)[1:]:
+            self.assertEqual(arrays["position_y"].dtype, numpy.int32, "Positions not quantized")
+            numpy.testing.assert_allclose(arrays["position_y"] / 64, expected_states[tick][1][:, 1], atol=1 / 64)
+
+    def test_resume(self):
+        """Ensures that a recording is continued from its latest checkpoint after being interrupted."""
+        recorder = TrajectoryRecorder(self.file_path, checkpoint_interval=4)
+        recorder.attach(self.epithelium)
+        expected_states = {}
+        self.simulate(recorder, 10, expected_states)
+        recorder.close()
+        # a frame that was being written when the program crashed
+        with open(self.file_path, "ab") as out_file:
+            out_file.write(TrajectoryFile.frame_magic + bytes(100))
+
+        resumed = TrajectoryRecorder.resume(self.file_path, checkpoint_interval=4)
+        self.assertEqual(resumed.tick, 9, "Not resumed after the latest checkpoint")
+        ids, values, _ = self.state(resumed.epithelium)
+        self.assertEqual(ids, expected_states[8][0], "Epithelium not restored from the checkpoint")
+        numpy.testing.assert_array_equal(values, expected_states[8][1])
+
+        self.simulate(resumed, 2)
+        resumed.close()
+        self.assertEqual([tick for tick, _ in read_frames(self.file_path)], list(range(11)),
+                         "Recording not continued after the checkpoint")
@@ -7,7 +7,7 @@ import moderngl
 from pyrr import matrix44
 import numpy
 
-from display_2d.EpitheliumGlTranslator import format_epithelium_for_gl
+from display_2d.EpitheliumGlTranslator import format_snapshot_for_gl
 from display_2d.EpitheliumGlTranslator import gl_bytes_per_cell
 from display_2d.Simple2dGlProgram import Simple2dGlProgram
 from display_2d.GlHelpers import world_coord_from_window_coord
@@ -190,7 +190,7 @@ class ModernDisplayCanvas(glcanvas.GLCanvas):
         :return:
         """
         # update cell positions
-        cell_data = format_epithelium_for_gl(self.epithelium)  # type: numpy.ndarray
+        cell_data = format_snapshot_for_gl(self.render_snapshot)  # type: list
         self.empty_circle_gl_program.update_vertex_objects(cell_data[0])
         self.filled_circle_gl_program.update_vertex_objects(cell_data[1])
 
@@ -237,6 +237,11 @@ class ModernDisplayCanvas(glcanvas.GLCanvas):
     def epithelium(self):
         return self.GetParent().epithelium
 
+    @property
+    def render_snapshot(self):
+        """Returns the render snapshot of the epithelium displayed by this widgets parent."""
+        return self.GetParent().render_snapshot
+
     @property
     def model_view_projection_matrix(self) -> numpy.ndarray:
         """Returns the model view projection matrix of the current scene."""
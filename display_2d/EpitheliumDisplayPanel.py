@@ -3,6 +3,8 @@ from wx import glcanvas
 
 
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
 from display_2d.EpitheliumDisplayCanvas import EpitheliumDisplayCanvas
 
 
@@ -19,6 +21,9 @@ class EpitheliumDisplayPanel(wx.Panel):
         # create default epithelium
         self._epithelium = Epithelium(0)  # type: Epithelium
 
+        # snapshots published by a simulation running in the background
+        self.render_buffer = None  # type: SnapshotDoubleBuffer
+
         # create gl canvas
         self.gl_canvas = EpitheliumDisplayCanvas(self)  # type: glcanvas
 
@@ -37,6 +42,16 @@ class EpitheliumDisplayPanel(wx.Panel):
         self._epithelium = value
         self.draw()
 
+    @property
+    def render_snapshot(self) -> RenderSnapshot:
+        """
+        Returns the snapshot that should be drawn. This is the front of the render buffer
+        when one has been published, otherwise a fresh snapshot of the stored epithelium.
+        """
+        if self.render_buffer is not None and self.render_buffer.front is not None:
+            return self.render_buffer.front
+        return RenderSnapshot.from_epithelium(self._epithelium)
+
     def on_size(self, e: wx.SizeEvent):
         """Event handler for resizing Does not consume the size event.
         Also invokes resize callback for child EpitheliumDisplayCanvas."""
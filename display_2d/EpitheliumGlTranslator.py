@@ -1,4 +1,8 @@
+from epithelium_backend.Cell import Cell
+from epithelium_backend.CellFate import decode_fate
+from epithelium_backend.CellFate import fate_code_count
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RenderSnapshot import RenderSnapshot
 from quick_change.CellDisplayRules import determine_cell_color
 from quick_change.CellDisplayRules import determine_cell_fill
 import numpy
@@ -16,33 +20,52 @@ gl_bytes_per_cell = 6 * 4
     radius
 """
 
+_fate_colors = None  # type: numpy.ndarray
+_fate_fills = None  # type: numpy.ndarray
+
+
+def fate_display_tables() -> tuple:
+    """
+    Returns lookup tables, indexed by fate code, of the color and fill of a cell
+    as determined by the rules in CellDisplayRules.
+    :return: (colors, fills) where colors is an (n, 3) float32 array and fills is a boolean array.
+    """
+    global _fate_colors, _fate_fills
+    if _fate_colors is None:
+        colors = numpy.zeros((fate_code_count, 3), dtype=numpy.float32)
+        fills = numpy.zeros(fate_code_count, dtype=bool)
+        for code in range(fate_code_count):
+            try:
+                photoreceptor_type, support_specializations = decode_fate(code)
+            except ValueError:
+                continue  # no photoreceptor type uses these bits
+            prototype = Cell(support_specializations=support_specializations)
+            prototype.photoreceptor_type = photoreceptor_type
+            colors[code] = determine_cell_color(prototype)
+            fills[code] = determine_cell_fill(prototype)
+        _fate_colors, _fate_fills = colors, fills
+    return _fate_colors, _fate_fills
+
+
+def format_snapshot_for_gl(snapshot: RenderSnapshot) -> list:
+    """Returns numpy arrays containing the center position, color and radius of each cell
+    :param snapshot: The render snapshot to format for OpenGL
+    :return: [empty circle data, filled circle data]
+    """
+    colors, fills = fate_display_tables()
+    cell_data = numpy.empty((len(snapshot), 6), dtype=numpy.float32)
+    cell_data[:, 0] = snapshot.position_x
+    cell_data[:, 1] = snapshot.position_y
+    cell_data[:, 2:5] = colors[snapshot.fate]
+    cell_data[:, 5] = snapshot.radius
+
+    filled = fills[snapshot.fate]
+    return [cell_data[~filled].ravel(), cell_data[filled].ravel()]
+
 
 def format_epithelium_for_gl(epithelium: Epithelium) -> list:
-    """Returns a numpy array containing the center position of each cell
+    """Returns numpy arrays containing the center position, color and radius of each cell
     :param epithelium: The epithelium to format for OpenGL
+    :return: [empty circle data, filled circle data]
     """
-    # gather the data for each cell
-    empty_circle_buffer_data = []
-    filled_circle_buffer_data = []
-    for cell in epithelium.cells:
-        if determine_cell_fill(cell):
-            selected_buffer = filled_circle_buffer_data
-        else:
-            selected_buffer = empty_circle_buffer_data
-
-        # gather position data
-        selected_buffer.append(cell.position_x)
-        selected_buffer.append(cell.position_y)
-
-        # gather color data
-        color_data = determine_cell_color(cell)
-        selected_buffer.append(color_data[0])
-        selected_buffer.append(color_data[1])
-        selected_buffer.append(color_data[2])
-
-        # gather radius
-        selected_buffer.append(cell.radius)
-
-    # convert to numpy array and return
-    return [numpy.array(empty_circle_buffer_data, dtype=numpy.float16),
-            numpy.array(filled_circle_buffer_data, dtype=numpy.float16)]
+    return format_snapshot_for_gl(RenderSnapshot.from_epithelium(epithelium))
@@ -1,9 +1,60 @@
 
+import itertools
 import random
 from math import sin, cos, sqrt
 
 from epithelium_backend.PhotoreceptorType import PhotoreceptorType
 
+# source of the ids that identify cells for as long as they live
+_cell_ids = itertools.count()
+# processes that create cells of the same epithelium each give out every stride-th id, see partition_cell_ids
+_cell_id_offset = 0
+_cell_id_stride = 1
+
+
+def _partitioned_cell_id(cell_id: int) -> int:
+    """Returns the first id at or after cell_id that belongs to this process."""
+    return cell_id + (_cell_id_offset - cell_id) % _cell_id_stride
+
+
+def reserve_cell_ids(cell_id: int) -> None:
+    """
+    Ensures that no new cell is given an id lower than or equal to cell_id.
+    Called when cells created elsewhere (by another process, or before being saved) are loaded.
+    :param cell_id: The highest id in use.
+    """
+    global _cell_ids
+    next_id = next(_cell_ids)
+    _cell_ids = itertools.count(_partitioned_cell_id(max(next_id, cell_id + 1)), _cell_id_stride)
+
+
+def partition_cell_ids(offset: int, stride: int) -> None:
+    """
+    Makes this process only give out ids equal to offset modulo stride, so that several processes
+    can create cells for the same epithelium without giving two cells the same id (see ShardedSimulation).
+    :param offset: The index of this process, from 0 to stride - 1.
+    :param stride: The number of processes.
+    """
+    global _cell_ids, _cell_id_offset, _cell_id_stride
+    next_id = next(_cell_ids)
+    _cell_id_offset = offset
+    _cell_id_stride = stride
+    _cell_ids = itertools.count(_partitioned_cell_id(next_id), stride)
+
+
+def allocate_cell_ids(count: int) -> int:
+    """
+    Reserves a block of consecutive ids for cells that are created later (see CellColumns).
+    :param count: The number of ids to reserve.
+    :return: The first id of the block.
+    """
+    global _cell_ids
+    if _cell_id_stride != 1 and count > 0:
+        raise RuntimeError("Blocks of cell ids cannot be reserved while ids are partitioned between processes")
+    first_id = next(_cell_ids)
+    _cell_ids = itertools.count(first_id + count, _cell_id_stride)
+    return first_id
+
 
 class Cell(object):
     """A single cell"""
@@ -21,6 +72,7 @@ class Cell(object):
         :param support_specializations: Set of the cells non-photoreceptor specializations
         :param cell_events: Default list of cell events
         """
+        self.cell_id = next(_cell_ids)  # type: int
         self.position_x = position[0]  # type: float
         self.position_y = position[1]  # type: float
         self.position_z = position[2]  # type: float
@@ -47,11 +99,43 @@ class Cell(object):
         # cells recruited by this cell, or that recruited this cell
         self.related_cells = list()  # type: list
 
-    def divide(self):
+    def __setstate__(self, state: dict) -> None:
+        """Restores a pickled cell, giving cells saved before cells had ids a new id."""
+        self.__dict__.update(state)
+        if "cell_id" in state:
+            reserve_cell_ids(self.cell_id)
+        else:
+            self.cell_id = next(_cell_ids)
+
+    def recycle(self, position: tuple, radius: float, cell_events: set) -> None:
+        """
+        Turns a dead cell into a new cell with a new id, like __init__ does, reusing its sets and list
+        rather than allocating new ones (see CellPool).
+        :param position: The cartesian coordinates of the cell (x,y,z)
+        :param radius: A multiplier of the average cell radius
+        :param cell_events: The cell events of the new cell, copied into its own set
+        """
+        self.cell_id = next(_cell_ids)
+        self.position_x, self.position_y, self.position_z = position
+        self.position_delta_x = 0
+        self.position_delta_y = 0
+        self.radius = radius
+        self.max_radius = 25
+        self.target_radius = 25
+        self.dividable = True
+        self.growth_rate = .01
+        self.photoreceptor_type = PhotoreceptorType.NOT_RECEPTOR
+        self.support_specializations.clear()
+        self.cell_events.clear()
+        self.cell_events.update(cell_events)
+        self.related_cells.clear()
+
+    def divide(self, child_cell=None):
         """
         Divides this cell into a new cell with half of this cell's radius.
         Then divides this parent cell's radius in half.
-        :return:
+        :param child_cell: A dead cell to recycle into the new cell (see recycle), None to create a new one.
+        :return: The new cell
         """
         # Choose some radian for direction of placement of new cell
         rand_rad = random.uniform(0, 6.283)
@@ -59,7 +143,10 @@ class Cell(object):
         delta_x = self.radius/2 * cos(rand_rad)
         delta_y = self.radius/2 * sin(rand_rad)
         rand_pos = (self.position_x + delta_x, self.position_y + delta_y, 0)
-        child_cell = Cell(position=rand_pos, radius=self.radius / 2.0, cell_events=set(self.cell_events))
+        if child_cell is None:
+            child_cell = Cell(position=rand_pos, radius=self.radius / 2.0, cell_events=set(self.cell_events))
+        else:
+            child_cell.recycle(rand_pos, self.radius / 2.0, self.cell_events)
         child_cell.growth_rate = self.growth_rate
         child_cell.max_radius = self.max_radius
         # Divide the original cell size in half
@@ -4,6 +4,7 @@
 from math import sqrt, ceil, floor
 from epithelium_backend.Cell import Cell
 from quick_change.CellEvents import UpdateCellPosition
+from epithelium_backend.ParallelDecompactor import shared_decompactor
 import numpy as np
 
 
@@ -139,13 +140,29 @@ class CellCollisionHandler(object):
     :param by_max_radius: If True, grid square sizes will be determined by the
         biggest cell. If False, grid square sizes will be determined by the
         average cell size.
+    :param sleep_threshold: If set, cells that settle are put to sleep and skipped
+        when decompacting (see decompact). A cell settles when it moves less than
+        this distance for sleep_ticks decompactions in a row. None keeps every cell awake.
+    :param sleep_ticks: How many decompactions a cell must settle for before it sleeps.
+    :param decompaction_processes: If set, large bounded sheets are decompacted on this many processes
+        (see ParallelDecompactor) instead of by this handler.
+    :param period_x: If set, the sheet wraps around in the x direction, as if it were
+        repeated every period_x. Cells are kept between 0 and period_x, and cells near
+        opposite edges push and pull each other across the seam, so the sheet has no
+        edge in that direction. Must be at least 3 boxes wide.
+    :param period_y: Like period_x, in the y direction.
     """
     def __init__(self,
                  cells: list,
                  force_escape: float = 1.05,
                  allow_overlap: float = 0.95,
                  spring_constant: float = 0.32,
-                 by_max_radius: bool = True):
+                 by_max_radius: bool = True,
+                 sleep_threshold: float = None,
+                 sleep_ticks: int = 3,
+                 period_x: float = None,
+                 period_y: float = None,
+                 decompaction_processes: int = None):
 
         # Constants
         self.max_delta_x = 0
@@ -167,12 +184,62 @@ class CellCollisionHandler(object):
         self.non_empty = set()
 
         self.by_max_radius = by_max_radius
+        self.decompaction_processes = decompaction_processes
+
+        # Periodic boundaries
+        self.period_x = period_x
+        self.period_y = period_y
+        # the number of boxes across each period, and their width
+        self.columns = 0
+        self.rows = 0
+        self.column_width = 0
+        self.row_height = 0
+
+        # Quiescence tracking
+        self.sleep_threshold = sleep_threshold
+        self.sleep_ticks = sleep_ticks
+        # the fraction of cells that were awake in the last decompaction
+        self.active_fraction = 1.0
+        self.asleep = set()
+        # how many decompactions in a row each awake cell has settled for
+        self.settled_ticks = {}
+        # the position and radius of every cell after the last decompaction, by cell
+        self.last_states = {}
+
         self.fill_grid()
 
+    def __setstate__(self, state: dict) -> None:
+        """Restores a pickled collision handler, including those pickled before cells could sleep."""
+        self.__dict__.update(state)
+        if "sleep_threshold" not in state:
+            self.sleep_threshold = None
+            self.sleep_ticks = 3
+            self.active_fraction = 1.0
+            self.asleep = set()
+            self.settled_ticks = {}
+            self.last_states = {}
+        self.__dict__.setdefault("decompaction_processes", None)
+        if "period_x" not in state:
+            self.period_x = None
+            self.period_y = None
+            self.columns = 0
+            self.rows = 0
+            self.column_width = 0
+            self.row_height = 0
+
+    @property
+    def periodic(self) -> bool:
+        """Returns True if the sheet wraps around in either direction."""
+        return self.period_x is not None or self.period_y is not None
+
     def compute_row(self, y):
+        if self.period_y is not None:
+            return min(int((y % self.period_y)/self.row_height), self.rows-1)
         return int(self.dimension/2 + (y-self.center_y)/self.box_size)
 
     def compute_col(self, x):
+        if self.period_x is not None:
+            return min(int((x % self.period_x)/self.column_width), self.columns-1)
         return int(self.dimension/2 + (x-self.center_x)/self.box_size)
 
     def bin(self, cell: Cell):
@@ -221,6 +288,14 @@ class CellCollisionHandler(object):
         # the space.
         self.cell_quantity = len(self.cells)
 
+        # Cells that crossed a periodic edge come back in on the other side.
+        if self.period_x is not None:
+            for cell in self.cells:
+                cell.position_x %= self.period_x
+        if self.period_y is not None:
+            for cell in self.cells:
+                cell.position_y %= self.period_y
+
         self.avg_radius = sum(map(lambda x: x.radius, self.cells))/self.cell_quantity
         self.max_cell_radius = max(map(lambda x: x.radius, self.cells))
         self.center_x = sum(map(lambda x: x.position_x, self.cells))/self.cell_quantity
@@ -243,6 +318,16 @@ class CellCollisionHandler(object):
         # Use the largest delta * 2 as the side-length/dimension of our grid
         # pad with the radius for kicks
         self.dimension = ceil(( self.max_cell_radius * 2 + max(self.max_delta_x, self.max_delta_y) * 2) / self.box_size)
+        # Periodic directions are split into boxes at least box_size wide that exactly cover the period,
+        # and the grid is made large enough for both directions.
+        if self.period_x is not None:
+            self.columns = self.periodic_boxes(self.period_x)
+            self.column_width = self.period_x / self.columns
+            self.dimension = max(self.dimension, self.columns)
+        if self.period_y is not None:
+            self.rows = self.periodic_boxes(self.period_y)
+            self.row_height = self.period_y / self.rows
+            self.dimension = max(self.dimension, self.rows)
         # The one dimensional list representing our grid.
         self.grids = [[] for x in range(0,self.dimension**2)]
         # The set of non-empty boxes -- the only ones we need
@@ -254,6 +339,47 @@ class CellCollisionHandler(object):
         for cell in cells:
             self.register(cell)
 
+    def periodic_boxes(self, period: float) -> int:
+        """Returns the number of boxes across a period, raising ValueError if it is too narrow to wrap around."""
+        boxes = int(period // self.box_size)
+        if boxes < 3:
+            raise ValueError("A period of %g is narrower than 3 boxes of %g" % (period, self.box_size))
+        return boxes
+
+    def separation(self, cell1: Cell, cell2: Cell) -> tuple:
+        """
+        Returns the x and y distances from cell2 to cell1. Across a periodic direction, the distance
+        to the nearest copy of cell2 is returned.
+        """
+        dx = cell1.position_x - cell2.position_x
+        dy = cell1.position_y - cell2.position_y
+        if self.period_x is not None:
+            dx -= self.period_x * round(dx / self.period_x)
+        if self.period_y is not None:
+            dy -= self.period_y * round(dy / self.period_y)
+        return dx, dy
+
+    def distance_between(self, cell1: Cell, cell2: Cell) -> float:
+        """Returns the distance between two cells, across periodic edges if that is shorter."""
+        dx, dy = self.separation(cell1, cell2)
+        dz = cell1.position_z - cell2.position_z
+        return sqrt(dx*dx + dy*dy + dz*dz)
+
+    def periodic_push_pull(self, cell1: Cell, cell2: Cell):
+        """Like push_pull, between cell1 and the nearest copy of cell2 on a periodic sheet."""
+        position_x = cell2.position_x
+        position_y = cell2.position_y
+        dx, dy = self.separation(cell1, cell2)
+        if dx == cell1.position_x - position_x and dy == cell1.position_y - position_y:
+            # most pairs are not across a seam
+            self.push_pull(cell1, cell2)
+            return
+        cell2.position_x = cell1.position_x - dx
+        cell2.position_y = cell1.position_y - dy
+        self.push_pull(cell1, cell2)
+        cell2.position_x = position_x
+        cell2.position_y = position_y
+
     def push_pull(self, cell1: Cell, cell2: Cell):
         """Compute the force of cell1 on cell2 and vice versa."""
         # I've broken with the physics of real springs here by
@@ -296,44 +422,243 @@ class CellCollisionHandler(object):
             cell2.position_delta_x += scxnx
             cell2.position_delta_y += scyny
 
-    def decompact(self):
+    def decompact(self, iterations: int = 1) -> float:
         """
         Push overlapping cells apart, with a tendency to keep them barely overlapping.
-
+        :param iterations: The number of times to push the cells apart.
+        :return: The largest distance a cell was moved in the last iteration, which shrinks as the cells relax.
         """
 
+        # large sheets are decompacted on several cores, if decompaction_processes is set
+        decompactor = shared_decompactor(self.decompaction_processes)
+        if decompactor is not None and len(self.cells) >= decompactor.minimum_cells and not self.periodic:
+            residual = decompactor.decompact(self.cells, self.force_escape, self.allow_overlap, self.spring_constant,
+                                             iterations=iterations)
+            self.fill_grid()
+            return residual
+        for _ in range(iterations - 1):
+            self.decompact()
+
         self.fill_grid()
+        if self.sleep_threshold is not None:
+            return self.decompact_awake()
 
         # This actually results in a non-trivial speed up because
         # resolving local variables is faster than resolving
         # member variables.
         grids = self.grids
-        len_grids = len(grids)
-        dimension = self.dimension
+        push_pull = self.periodic_push_pull if self.periodic else self.push_pull
         for i in self.non_empty:
             box = grids[i]
-            right = i+1
-            down_left = i+dimension-1
-            down = i+dimension
-            down_right = i+dimension+1
             for m in range(0, len(box)):
                 cell1 = box[m]
                 for n in range(m+1, len(box)):
                     cell2 = box[n]
-                    self.push_pull(cell1, cell2)
+                    push_pull(cell1, cell2)
 
+            neighbors = self.forward_boxes(i)
             for cell1 in box:
-                for j in [right, down_left, down, down_right]:
-                    if 0 < j < len_grids:
-                        for cell2 in grids[j]:
-                            self.push_pull(cell1, cell2)
+                for j in neighbors:
+                    for cell2 in grids[j]:
+                        push_pull(cell1, cell2)
 
         # Now that we have the deltas for each cell update their positions
         position_updater = UpdateCellPosition()  # type: UpdateCellPosition
+        residual = 0
         for cell in self.cells:
+            moved = cell.position_delta_x * cell.position_delta_x + cell.position_delta_y * cell.position_delta_y
+            if moved > residual:
+                residual = moved
             position_updater(cell)
 
         self.fill_grid()
+        return sqrt(residual)
+
+    def wrap_box(self, row: int, col: int) -> int:
+        """
+        Returns the grid index of a row and column, wrapped around the periodic directions,
+        or -1 if it is off the grid.
+        """
+        if self.period_y is not None:
+            row %= self.rows
+        if self.period_x is not None:
+            col %= self.columns
+        if 0 <= row < self.dimension and 0 <= col < self.dimension:
+            return self.dimension*row + col
+        return -1
+
+    def forward_boxes(self, box: int) -> list:
+        """
+        Returns the grid indices of the boxes to the right of and below a box, whose cells the cells of the
+        box push and pull when decompacting. Every pair of neighboring boxes is returned for only one of them.
+        """
+        dimension = self.dimension
+        if not self.periodic:
+            return [j for j in (box+1, box+dimension-1, box+dimension, box+dimension+1) if 0 < j < len(self.grids)]
+        row, col = divmod(box, dimension)
+        boxes = (self.wrap_box(row, col+1), self.wrap_box(row+1, col-1),
+                 self.wrap_box(row+1, col), self.wrap_box(row+1, col+1))
+        return [j for j in boxes if j >= 0]
+
+    def surrounding_boxes(self, box: int) -> list:
+        """Returns the grid index of a box and of the boxes around it."""
+        dimension = self.dimension
+        if self.periodic:
+            row, col = divmod(box, dimension)
+            boxes = set(self.wrap_box(row+i, col+j) for i in (-1, 0, 1) for j in (-1, 0, 1))
+            boxes.discard(-1)
+            return list(boxes)
+        len_grids = len(self.grids)
+        return [box + row * dimension + col for row in (-1, 0, 1) for col in (-1, 0, 1)
+                if 0 <= box + row * dimension + col < len_grids]
+
+    def wake_around(self, box: int) -> None:
+        """Wakes the cells in a box and in the boxes around it."""
+        asleep = self.asleep
+        settled_ticks = self.settled_ticks
+        for surrounding_box in self.surrounding_boxes(box):
+            for cell in self.grids[surrounding_box]:
+                asleep.discard(cell)
+                settled_ticks[cell] = 0
+
+    def decompact_awake(self) -> float:
+        """
+        Decompacts like decompact, but skips the forces between sleeping cells. Cells sleep once they and
+        every cell around them have settled (see sleep_threshold), and wake when a cell around them moves,
+        grows or shrinks by more than the threshold, divides, or dies, whether in a decompaction or elsewhere.
+        Sleeping cells are still pushed and pulled by awake cells. Updates active_fraction.
+        :return: The largest distance a cell was moved.
+        """
+        threshold = self.sleep_threshold
+        asleep = self.asleep
+        settled_ticks = self.settled_ticks
+
+        # wake the cells around cells that changed since the last decompaction, new cells, and dead cells
+        last_states = self.last_states
+        bins = {}
+        for cell in self.cells:
+            bins[cell] = cell_bin = self.bin(cell)
+            state = last_states.pop(cell, None)
+            if state is None or abs(cell.radius - state[2]) > threshold or \
+                    abs(cell.position_x - state[0]) > threshold or abs(cell.position_y - state[1]) > threshold:
+                self.wake_around(cell_bin)
+        for cell, (position_x, position_y, _) in last_states.items():
+            asleep.discard(cell)
+            settled_ticks.pop(cell, None)
+            dead_box = self.wrap_box(self.compute_row(position_y), self.compute_col(position_x))
+            if dead_box >= 0:
+                self.wake_around(dead_box)
+
+        # only boxes with awake cells, or next to them, exert forces
+        awake_boxes = set(bins[cell] for cell in self.cells if cell not in asleep)
+        boxes = set(surrounding_box for box in awake_boxes for surrounding_box in self.surrounding_boxes(box))
+        grids = self.grids
+        push_pull = self.periodic_push_pull if self.periodic else self.push_pull
+        for i in boxes:
+            box = grids[i]
+            if not box:
+                continue
+            neighbors = self.forward_boxes(i)
+            for m in range(0, len(box)):
+                cell1 = box[m]
+                for n in range(m+1, len(box)):
+                    cell2 = box[n]
+                    if cell1 not in asleep or cell2 not in asleep:
+                        push_pull(cell1, cell2)
+
+            for cell1 in box:
+                sleeping = cell1 in asleep
+                for j in neighbors:
+                    for cell2 in grids[j]:
+                        if not sleeping or cell2 not in asleep:
+                            push_pull(cell1, cell2)
+
+        # move the cells, counting how long each awake cell has settled for
+        position_updater = UpdateCellPosition()  # type: UpdateCellPosition
+        threshold_squared = threshold * threshold
+        residual = 0
+        awake_count = 0
+        restless_boxes = set()
+        for cell in self.cells:
+            moved = cell.position_delta_x * cell.position_delta_x + cell.position_delta_y * cell.position_delta_y
+            if moved > residual:
+                residual = moved
+            position_updater(cell)
+            if cell in asleep:
+                if moved > threshold_squared:
+                    asleep.discard(cell)
+                    settled_ticks[cell] = 0
+                    restless_boxes.add(bins[cell])
+                continue
+            awake_count += 1
+            if moved > threshold_squared:
+                settled_ticks[cell] = 0
+            else:
+                settled_ticks[cell] = settled_ticks.get(cell, 0) + 1
+            if settled_ticks[cell] < self.sleep_ticks:
+                restless_boxes.add(bins[cell])
+        self.active_fraction = awake_count / len(self.cells) if self.cells else 0.0
+
+        # cells that have settled sleep once every cell around them has, cells around restless ones wake
+        for cell in self.cells:
+            if cell not in asleep and settled_ticks[cell] >= self.sleep_ticks and \
+                    not any(box in restless_boxes for box in self.surrounding_boxes(bins[cell])):
+                asleep.add(cell)
+        for box in restless_boxes:
+            for surrounding_box in self.surrounding_boxes(box):
+                for cell in grids[surrounding_box]:
+                    asleep.discard(cell)
+
+        self.last_states = {cell: (cell.position_x, cell.position_y, cell.radius) for cell in self.cells}
+        self.fill_grid()
+        return sqrt(residual)
+
+    def decompact_region(self, region: set, threshold: float = 0) -> tuple:
+        """
+        Decompacts like decompact, but only exerts the forces that involve a cell in one of the given boxes,
+        so only the cells in and next to them move.
+        :param region: The grid indices of the boxes to decompact.
+        :param threshold: Boxes where a cell moved more than this distance are returned.
+        :return: The largest distance a cell was moved, and the set of boxes where cells moved more than threshold.
+        """
+        self.fill_grid()
+        grids = self.grids
+        len_grids = len(grids)
+        push_pull = self.periodic_push_pull if self.periodic else self.push_pull
+        boxes = set(surrounding_box for box in region if 0 <= box < len_grids
+                    for surrounding_box in self.surrounding_boxes(box))
+        for i in boxes:
+            box = grids[i]
+            if not box:
+                continue
+            inside = i in region
+            if inside:
+                for m in range(0, len(box)):
+                    cell1 = box[m]
+                    for n in range(m+1, len(box)):
+                        push_pull(cell1, box[n])
+
+            for j in self.forward_boxes(i):
+                if inside or j in region:
+                    for cell1 in box:
+                        for cell2 in grids[j]:
+                            push_pull(cell1, cell2)
+
+        position_updater = UpdateCellPosition()  # type: UpdateCellPosition
+        threshold_squared = threshold * threshold
+        residual = 0
+        moved_cells = []
+        for i in boxes:
+            for cell in grids[i]:
+                moved = cell.position_delta_x * cell.position_delta_x + cell.position_delta_y * cell.position_delta_y
+                if moved > residual:
+                    residual = moved
+                if moved > threshold_squared:
+                    moved_cells.append(cell)
+                position_updater(cell)
+
+        self.fill_grid()
+        return sqrt(residual), set(self.bin(cell) for cell in moved_cells)
 
     def cells_within_distance(self, cell, r):
         box_number = ceil(r/self.box_size)
@@ -345,6 +670,13 @@ class CellCollisionHandler(object):
                     for row in range(-box_number, box_number+1)
                     for col in range(-box_number, box_number+1)]
         # Map the (row,col) pairs to grid indices and remove duplicates.
+        if self.periodic:
+            # Boxes past a periodic edge are those on the other side.
+            grids = set(self.wrap_box(row, col) for row, col in row_cols)
+            grids.discard(-1)
+            for grid in grids:
+                cells.extend(self.grids[grid])
+            return [n for n in cells if 0 < self.distance_between(cell, n) <= r]
         grids = set(map(lambda rc: self.dimension*rc[0]+rc[1], row_cols))
         for grid in grids:
             if 0 < grid < len(self.grids):
@@ -365,8 +697,24 @@ class CellCollisionHandler(object):
     def cells_between(self, min_x, max_x):
         """
         Return the list of cells between min_x and max_x, sorted from
-        posterior to anterior order.
+        posterior to anterior order. If the sheet wraps around in the x direction,
+        the range may cross the periodic edge, and cells are sorted by their
+        distance past min_x.
         """
+        if self.period_x is not None:
+            period = self.period_x
+            width = max_x - min_x
+            min_col = self.compute_col(min_x)
+            if width >= period - self.column_width:
+                cols = range(0, self.columns)
+            else:
+                span = (self.compute_col(max_x) - min_col) % self.columns
+                cols = [(min_col + col) % self.columns for col in range(0, span+1)]
+            result = [cell for col in cols for row in range(0, self.dimension)
+                      for cell in self.grids[self.dimension*row+col]
+                      if 0 < (cell.position_x - min_x) % period < width]
+            result.sort(key=lambda c: -((c.position_x - min_x) % period))
+            return result
         max_col = min(self.dimension-1, self.compute_col(max_x))
         min_col = max(0, self.compute_col(min_x))
         result = []
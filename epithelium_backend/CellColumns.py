@@ -0,0 +1,139 @@
+import gc
+
+import numpy
+
+from epithelium_backend.Cell import Cell
+from epithelium_backend.Cell import allocate_cell_ids
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+# attributes of a newly initialized cell, copied into cells created in bulk
+_cell_defaults = None
+
+
+def cell_defaults() -> dict:
+    """Returns the attributes Cell.__init__ gives a cell, other than its id, position, and radius."""
+    global _cell_defaults
+    if _cell_defaults is None:
+        cell = Cell.__new__(Cell)
+        Cell.__init__(cell)
+        _cell_defaults = dict(cell.__dict__)
+        for name in ("cell_id", "position_x", "position_y", "radius"):
+            del _cell_defaults[name]
+    return _cell_defaults
+
+
+class CellColumns(object):
+    """
+    Newly created cells stored as columns (one array per attribute that differs between them) rather than
+    as Cell objects. Indexing creates the Cell at that index the first time it is asked for, and
+    create_cells creates every cell at once, much faster than creating them one by one with Cell.__init__.
+    The ids of the cells are reserved when the columns are created, so cells have the same ids no matter
+    the order they are created in.
+
+    Every cell gets the same max_radius, growth_rate, and cell events, like the cells of a CellFactory.
+    """
+
+    def __init__(self,
+                 position_x: numpy.ndarray,
+                 position_y: numpy.ndarray,
+                 radius: numpy.ndarray,
+                 max_radius: float = 25,
+                 growth_rate: float = .01,
+                 cell_events: set = None) -> None:
+        """
+        :param position_x: The x position of every cell.
+        :param position_y: The y position of every cell.
+        :param radius: The radius of every cell.
+        :param max_radius: The max_radius of every cell.
+        :param growth_rate: The growth_rate of every cell.
+        :param cell_events: The events every cell starts out with, each cell gets its own set of them.
+        """
+        self.position_x = numpy.asarray(position_x, numpy.float64)  # type: numpy.ndarray
+        self.position_y = numpy.asarray(position_y, numpy.float64)  # type: numpy.ndarray
+        self.radius = numpy.asarray(radius, numpy.float64)  # type: numpy.ndarray
+        self.max_radius = max_radius  # type: float
+        self.growth_rate = growth_rate  # type: float
+        self.cell_events = frozenset(cell_events or ())  # type: frozenset
+        self.first_id = allocate_cell_ids(len(self.radius))  # type: int
+        self._cells = [None] * len(self.radius)  # type: list
+
+    def __len__(self) -> int:
+        return len(self.radius)
+
+    @property
+    def cell_ids(self) -> numpy.ndarray:
+        """Returns the ids of the cells."""
+        return numpy.arange(self.first_id, self.first_id + len(self), dtype=numpy.int64)
+
+    def _new_cell(self, index: int, x: float, y: float, radius: float, defaults: dict) -> Cell:
+        """Creates a cell, bypassing Cell.__init__."""
+        cell = Cell.__new__(Cell)
+        attributes = dict(defaults)
+        attributes["cell_id"] = self.first_id + index
+        attributes["position_x"] = x
+        attributes["position_y"] = y
+        attributes["radius"] = radius
+        attributes["max_radius"] = self.max_radius
+        attributes["growth_rate"] = self.growth_rate
+        attributes["support_specializations"] = set()
+        attributes["cell_events"] = set(self.cell_events)
+        attributes["related_cells"] = []
+        cell.__dict__ = attributes
+        return cell
+
+    def __getitem__(self, index: int) -> Cell:
+        """Returns the cell at an index, creating it if it was not created before."""
+        cell = self._cells[index]
+        if cell is None:
+            index = range(len(self))[index]
+            cell = self._new_cell(index, float(self.position_x[index]), float(self.position_y[index]),
+                                  float(self.radius[index]), cell_defaults())
+            self._cells[index] = cell
+        return cell
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def create_cells(self) -> list:
+        """
+        Creates every cell that was not created before.
+        :return: A list of the cells.
+        """
+        defaults = cell_defaults()
+        cells = self._cells
+        new_cell = self._new_cell
+        # none of the new objects can form a cycle, but allocating millions of them would trigger
+        # the cyclic garbage collector over and over, taking most of the time
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for index, (cell, x, y, radius) in enumerate(zip(cells, self.position_x.tolist(),
+                                                             self.position_y.tolist(), self.radius.tolist())):
+                if cell is None:
+                    cells[index] = new_cell(index, x, y, radius, defaults)
+        finally:
+            if collecting:
+                gc.enable()
+        return list(cells)
+
+    def attribute_column(self, name: str, dtype) -> numpy.ndarray:
+        """
+        Returns a column of any numeric cell attribute, as the cells are created.
+        :param name: The name of the attribute, such as "radius" or "target_radius".
+        :param dtype: The type of the column.
+        """
+        if name == "cell_id":
+            return self.cell_ids.astype(dtype)
+        if name in ("position_x", "position_y", "radius"):
+            return getattr(self, name).astype(dtype)
+        if name in ("max_radius", "growth_rate"):
+            return numpy.full(len(self), getattr(self, name), dtype)
+        return numpy.full(len(self), cell_defaults()[name], dtype)
+
+    def render_snapshot(self, tick: int = 0) -> RenderSnapshot:
+        """
+        Returns a RenderSnapshot of the cells without creating them.
+        Only valid while no cell has been moved or changed.
+        """
+        return RenderSnapshot(self.position_x.astype(numpy.float32), self.position_y.astype(numpy.float32),
+                              self.radius.astype(numpy.float32), numpy.zeros(len(self), numpy.uint8), tick)
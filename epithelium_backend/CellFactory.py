@@ -1,9 +1,8 @@
-from epithelium_backend.Cell import Cell
+from epithelium_backend.CellColumns import CellColumns
 
-import random
 from math import sqrt
 import math
-import copy
+import numpy
 
 
 class CellFactory(object):
@@ -16,6 +15,8 @@ class CellFactory(object):
         self.cell_events = set()
         self.radius_divergence = 0.5
         self.average_radius = 10
+        # seeds the placement and radii of created cells, None for different cells every time
+        self.seed = None  # type: int
 
     def create_cells(self, quantity: int) -> list:
         """
@@ -23,39 +24,51 @@ class CellFactory(object):
         :param quantity: The number of cells to create.
         :return: A list of newly generated cells.
         """
+        return self.create_columns(quantity).create_cells()
+
+    def create_columns(self, quantity: int) -> CellColumns:
+        """
+        Creates cells with the factories parameters, stored as columns. Cell objects are only created
+        when they are asked for (see CellColumns).
+        :param quantity: The number of cells to create.
+        :return: The columns of the newly generated cells.
+        """
         # The approach: randomly place self.cell_quantity cells on a grid,
         # then decompact them with the collision handler until they're
         # just slightly overlapping.
 
+        # Because we allow some cell overlap, and we want the cells to start
+        # in a more compact state and decompact them, we multiply by .87
+        approx_grid_size = 0.87 * self.sheet_size(quantity)
+
+        # draw every radius and position at once
+        generator = numpy.random.RandomState(self.seed)
+        # cell_radius_divergence is a percentage, like 0.05 (5%). So you want to
+        # uniformly grab radii within +/- cell_radius_divergence percent of cell_avg_radius
+        radius = generator.uniform(self.average_radius * (1 - self.radius_divergence),
+                                   self.average_radius * (1 + self.radius_divergence),
+                                   quantity)
+        position = generator.random_sample((2, quantity)) * approx_grid_size
+        return self.create_columns_at(position[0], position[1], radius)
+
+    def sheet_size(self, quantity: int) -> float:
+        """
+        Returns the side of the square a quantity of cells covers once relaxed, such as the period
+        of a periodic sheet of them.
+        :param quantity: The number of cells.
+        """
         # If we know the average radius of each cell, we know the average
         # area, and therefore the approximate grid size.
         avg_area = self.average_radius ** 2 * math.pi
-        # Because we allow some cell overlap, and we want the cells to start
-        # in a more compact state and decompact them, we multiply by .87
-        approx_grid_size = 0.87 * sqrt(avg_area * quantity)
-
-        # build cell list
-        cells = []
-        for i in range(quantity):
-            # cell_radius_divergence is a percentage, like 0.05 (5%). So you want to
-            # uniformly grab radii within +/- cell_radius_divergence percent of cell_avg_radius
-            rand_radius = random.uniform(self.average_radius * (1 - self.radius_divergence),
-                                         self.average_radius * (1 + self.radius_divergence))
-            random_pos = (random.random() * approx_grid_size,
-                          random.random() * approx_grid_size,
-                          0)
-
-            # Create events for each cell
-            cell_events = set()
-            for cell_event in self.cell_events:
-                cell_events.add(cell_event)
-
-            # create the cell
-            cell = Cell(position=random_pos,
-                        radius=rand_radius,
-                        cell_events=cell_events)
-            cell.max_radius = self.max_radius
-            cell.growth_rate = self.growth_rate
-            cells.append(cell)
-
-        return cells
+        return sqrt(avg_area * quantity)
+
+    def create_columns_at(self, position_x, position_y, radius) -> CellColumns:
+        """
+        Creates cells with the factories parameters at given positions and sizes, such as those of a
+        sheet that was relaxed elsewhere, stored as columns (see create_columns).
+        :param position_x: The x position of every cell.
+        :param position_y: The y position of every cell.
+        :param radius: The radius of every cell.
+        :return: The columns of the newly generated cells.
+        """
+        return CellColumns(position_x, position_y, radius, self.max_radius, self.growth_rate, self.cell_events)
@@ -0,0 +1,44 @@
+from epithelium_backend.PhotoreceptorType import PhotoreceptorType
+from epithelium_backend.SupportCellType import SupportCellType
+
+
+# The low four bits of a fate code hold the photoreceptor type,
+# every bit above that flags one support specialization.
+photoreceptor_bits = 4
+photoreceptor_mask = (1 << photoreceptor_bits) - 1
+fate_code_count = 1 << (photoreceptor_bits + len(SupportCellType))
+"""The number of distinct fate codes. Every fate code is smaller than this value."""
+
+
+def encode_fate(photoreceptor_type: PhotoreceptorType, support_specializations: set) -> int:
+    """
+    Packs a cell's specializations into a single small integer (fits in a uint8).
+    :param photoreceptor_type: The photoreceptor specialization of the cell.
+    :param support_specializations: The set of non-photoreceptor specializations of the cell.
+    :return: The fate code of the specializations.
+    """
+    code = photoreceptor_type.value
+    for support_type in support_specializations:
+        code |= 1 << (photoreceptor_bits + support_type.value)
+    return code
+
+
+def decode_fate(code: int) -> tuple:
+    """
+    Unpacks a fate code produced by encode_fate.
+    :param code: The fate code to unpack.
+    :return: A (PhotoreceptorType, set of SupportCellType) tuple.
+    """
+    code = int(code)
+    photoreceptor_type = PhotoreceptorType(code & photoreceptor_mask)
+    support_specializations = {support_type for support_type in SupportCellType
+                               if code >> (photoreceptor_bits + support_type.value) & 1}
+    return photoreceptor_type, support_specializations
+
+
+def cell_fate(cell) -> int:
+    """
+    Returns the fate code of a cell.
+    :param cell: The cell whose specializations will be encoded.
+    """
+    return encode_fate(cell.photoreceptor_type, cell.support_specializations)
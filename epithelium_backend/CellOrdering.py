@@ -0,0 +1,212 @@
+import argparse
+import time
+
+import numpy
+
+from epithelium_backend.SpringForces import neighbor_pairs
+
+
+# the orders cells can be stored in, see curve_order
+curves = ("hilbert", "morton")
+
+
+def morton_codes(box_x: numpy.ndarray, box_y: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the position of grid boxes along a Morton (Z order) curve, by interleaving the bits of their coordinates.
+    :param box_x: The column of every box, below 2 ** 32.
+    :param box_y: The row of every box, below 2 ** 32.
+    """
+    codes = numpy.zeros(len(box_x), numpy.uint64)
+    for shift, coordinate in ((0, box_x), (1, box_y)):
+        spread = numpy.asarray(coordinate, numpy.uint64) & numpy.uint64(0xFFFFFFFF)
+        for bits, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                           (2, 0x3333333333333333), (1, 0x5555555555555555)):
+            spread = (spread | (spread << numpy.uint64(bits))) & numpy.uint64(mask)
+        codes |= spread << numpy.uint64(shift)
+    return codes
+
+
+def hilbert_codes(box_x: numpy.ndarray, box_y: numpy.ndarray) -> numpy.ndarray:
+    """
+    Returns the position of grid boxes along a Hilbert curve. Unlike a Morton curve, consecutive boxes along
+    a Hilbert curve are always adjacent, so it never jumps across the sheet.
+    :param box_x: The column of every box, below 2 ** 31.
+    :param box_y: The row of every box, below 2 ** 31.
+    """
+    x = numpy.array(box_x, numpy.int64)
+    y = numpy.array(box_y, numpy.int64)
+    codes = numpy.zeros(len(x), numpy.int64)
+    if not len(x):
+        return codes
+    side = 1 << max(int(max(x.max(), y.max())), 1).bit_length()
+    s = side // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        codes += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant, so that the curve within it starts and ends next to its neighbors
+        flip = ~ry & rx
+        x = numpy.where(flip, side - 1 - x, x)
+        y = numpy.where(flip, side - 1 - y, y)
+        x, y = numpy.where(ry, x, y), numpy.where(ry, y, x)
+        s //= 2
+    return codes
+
+
+def curve_order(position_x: numpy.ndarray, position_y: numpy.ndarray, box_size: float,
+                curve: str = "hilbert") -> numpy.ndarray:
+    """
+    Returns the order that stores cells along a space filling curve through a grid of boxes, so cells that are
+    near each other on the sheet are near each other in memory. Cells in the same box keep their order.
+    :param position_x: The x positions of the cells.
+    :param position_y: The y positions of the cells.
+    :param box_size: The width of the boxes.
+    :param curve: The curve, "hilbert" or "morton".
+    :return: The index of the cell to store first, second, and so on.
+    """
+    if curve not in curves:
+        raise ValueError("%s is not a space filling curve, expected one of %s" % (curve, ", ".join(curves)))
+    if not len(position_x):
+        return numpy.zeros(0, numpy.int64)
+    box_x = numpy.floor((position_x - position_x.min()) / box_size).astype(numpy.int64)
+    box_y = numpy.floor((position_y - position_y.min()) / box_size).astype(numpy.int64)
+    codes = hilbert_codes(box_x, box_y) if curve == "hilbert" else morton_codes(box_x, box_y)
+    return numpy.argsort(codes, kind="stable")
+
+
+def scattered_pairs(position_x: numpy.ndarray, position_y: numpy.ndarray, box_size: float,
+                    window: int = 256) -> float:
+    """
+    Measures how scattered in memory cells that push and pull each other are.
+    :param position_x: The x positions of the cells, in the order they are stored in.
+    :param position_y: The y positions of the cells.
+    :param box_size: The furthest apart two cells can push or pull each other.
+    :param window: Cells stored this many cells apart or more count as scattered.
+    :return: The fraction of the pairs of cells in neighboring grid boxes that are scattered.
+    """
+    if len(position_x) < 2:
+        return 0.0
+    first, second = neighbor_pairs(position_x, position_y, box_size)
+    if not len(first):
+        return 0.0
+    return float(numpy.count_nonzero(numpy.abs(first - second) >= window)) / len(first)
+
+
+class CellOrdering(object):
+    """
+    Keeps the cells of an epithelium stored along a space filling curve. Cells are created in random places,
+    and divided cells are appended wherever their mothers are, so cells that push and pull each other end up
+    scattered in memory, and every decompaction and neighbor query jumps around in it.
+
+    Every interval ticks the ordering measures how scattered the cells are (see scattered_pairs), and when
+    that has grown by more than tolerance since the cells were last reordered, they are stored along the curve
+    again (see Epithelium.reorder_cells).
+    """
+
+    def __init__(self, curve: str = "hilbert", interval: int = 50, tolerance: float = 0.2,
+                 window: int = 256) -> None:
+        """
+        :param curve: The curve the cells are stored along, "hilbert" or "morton".
+        :param interval: The number of ticks between measurements.
+        :param tolerance: How much the fraction of scattered pairs may grow before the cells are reordered.
+        :param window: Cells stored this many cells apart or more count as scattered.
+        """
+        if curve not in curves:
+            raise ValueError("%s is not a space filling curve, expected one of %s" % (curve, ", ".join(curves)))
+        self.curve = curve  # type: str
+        self.interval = max(int(interval), 1)  # type: int
+        self.tolerance = tolerance  # type: float
+        self.window = window  # type: int
+        self.ticks = 0  # type: int
+        # the fraction of scattered pairs when last measured, and right after the cells were last reordered
+        self.scattered = None  # type: float
+        self.reordered_scattered = 0.0  # type: float
+        self.reorders = 0  # type: int
+        self.seconds = 0.0  # type: float
+
+    def measure(self, epithelium) -> float:
+        """Returns the fraction of scattered pairs of cells of an epithelium."""
+        cells = epithelium.cells
+        position_x = numpy.fromiter((cell.position_x for cell in cells), numpy.float64, len(cells))
+        position_y = numpy.fromiter((cell.position_y for cell in cells), numpy.float64, len(cells))
+        return scattered_pairs(position_x, position_y, epithelium.cell_collision_handler.box_size, self.window)
+
+    def reorder(self, epithelium) -> None:
+        """Stores the cells of an epithelium along the curve."""
+        start_time = time.perf_counter()
+        cells = epithelium.cells
+        position_x = numpy.fromiter((cell.position_x for cell in cells), numpy.float64, len(cells))
+        position_y = numpy.fromiter((cell.position_y for cell in cells), numpy.float64, len(cells))
+        box_size = epithelium.cell_collision_handler.box_size
+        order = curve_order(position_x, position_y, box_size, self.curve)
+        epithelium.reorder_cells(order)
+        self.reordered_scattered = self.scattered = scattered_pairs(position_x[order], position_y[order], box_size,
+                                                                    self.window)
+        self.reorders += 1
+        self.seconds += time.perf_counter() - start_time
+
+    def update(self, epithelium) -> bool:
+        """
+        Counts a tick of an epithelium, reordering its cells when they are due to be measured and too scattered.
+        Called by Epithelium.update.
+        :return: True if the cells were reordered.
+        """
+        tick = self.ticks
+        self.ticks += 1
+        if tick % self.interval or epithelium.cell_collision_handler is None or len(epithelium.cells) < 2:
+            return False
+        start_time = time.perf_counter()
+        self.scattered = self.measure(epithelium)
+        self.seconds += time.perf_counter() - start_time
+        if self.scattered <= self.reordered_scattered + self.tolerance:
+            return False
+        self.reorder(epithelium)
+        return True
+
+    def metrics(self) -> dict:
+        """
+        :return: The number of ticks counted, the number of reorders, the fraction of scattered pairs when last
+        measured and right after the last reorder, and the seconds spent measuring and reordering.
+        """
+        return {"ticks": self.ticks,
+                "reorders": self.reorders,
+                "scattered": self.scattered,
+                "reordered_scattered": self.reordered_scattered,
+                "seconds": self.seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures how the order cells are stored in affects decompaction.")
+    parser.add_argument("cells", type=int, help="the number of cells in the sheet")
+    parser.add_argument("--iterations", type=int, default=3, help="decompaction iterations per measurement")
+    arguments = parser.parse_args()
+
+    from epithelium_backend.CellFactory import CellFactory
+    from epithelium_backend.SpringForces import spring_deltas
+    factory = CellFactory()
+    factory.seed = 0
+    sheet = factory.create_columns(arguments.cells)
+    position_x, position_y, radius = sheet.position_x.copy(), sheet.position_y.copy(), sheet.radius.copy()
+    sheet_box_size = 2 * 1.05 * float(radius.max())
+    # relax the sheet a little, so that cells have about as many neighbors as in a simulation
+    for _ in range(3):
+        first_cells, second_cells = neighbor_pairs(position_x, position_y, sheet_box_size)
+        delta_x, delta_y = spring_deltas(position_x, position_y, radius, first_cells, second_cells)
+        position_x += delta_x
+        position_y += delta_y
+
+    orders = [("created", numpy.arange(arguments.cells)),
+              ("x sorted", numpy.argsort(position_x, kind="stable"))]
+    orders += [(name, curve_order(position_x, position_y, sheet_box_size, name)) for name in curves]
+    print("order     scattered pairs  seconds per iteration  speedup")
+    first_seconds = None
+    for name, sheet_order in orders:
+        ordered_x, ordered_y, ordered_radius = position_x[sheet_order], position_y[sheet_order], radius[sheet_order]
+        start_time = time.perf_counter()
+        for _ in range(arguments.iterations):
+            first_cells, second_cells = neighbor_pairs(ordered_x, ordered_y, sheet_box_size)
+            spring_deltas(ordered_x, ordered_y, ordered_radius, first_cells, second_cells)
+        seconds = (time.perf_counter() - start_time) / arguments.iterations
+        first_seconds = first_seconds or seconds
+        print("%-8s  %15.3f  %21.3f  %7.2f" % (name, scattered_pairs(ordered_x, ordered_y, sheet_box_size), seconds,
+                                              first_seconds / seconds))
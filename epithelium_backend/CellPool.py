@@ -0,0 +1,134 @@
+import numpy
+
+from epithelium_backend.Cell import Cell
+
+
+class CellPool(object):
+    """
+    Recycles the cells of an epithelium. Every cell is given a slot when it is first handled by the pool, and
+    when it dies its slot goes on a free list, keeping the dead Cell along with its sets and list. Dividing
+    cells take their new cell from the free list before allocating one (see Cell.recycle), so in a sheet where
+    about as many cells die as are born, the number of cells ever allocated stays flat.
+
+    Every slot has a generation, counted up whenever the cell in it dies. A handle (see handle) names a cell by
+    its slot and generation, so a handle kept after its cell died, whether or not the slot was reused since,
+    is recognized as stale by resolve. The generations are stored in a column whose capacity doubles as it
+    fills, so slots are rarely reallocated.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """
+        :param capacity: The number of slots to make room for up front.
+        """
+        self.generations = numpy.zeros(max(int(capacity), 1), numpy.int64)  # type: numpy.ndarray
+        # the cell in every slot, living or dead, None if it was dropped
+        self.slots = []  # type: list
+        self.living = []  # type: list
+        # slots of dead cells waiting to be recycled, and slots without a cell
+        self.free = []  # type: list
+        self.empty = []  # type: list
+        # the number of cells the pool allocated, recycled, and saw die
+        self.allocated = 0  # type: int
+        self.recycled = 0  # type: int
+        self.released = 0  # type: int
+
+    def __getstate__(self) -> dict:
+        """Dead cells are not saved, their slots are reused for newly allocated cells."""
+        state = dict(self.__dict__)
+        state["slots"] = [cell if living else None for cell, living in zip(self.slots, self.living)]
+        state["free"] = []
+        state["empty"] = self.empty + self.free
+        return state
+
+    @property
+    def capacity(self) -> int:
+        """Returns the number of slots there is room for before the generation column grows."""
+        return len(self.generations)
+
+    def _new_slot(self, cell: Cell) -> int:
+        """Gives a cell a slot of its own, growing the generation column if it is full."""
+        slot = len(self.slots)
+        if slot == len(self.generations):
+            generations = numpy.zeros(2 * len(self.generations), numpy.int64)
+            generations[:slot] = self.generations
+            self.generations = generations
+        self.slots.append(cell)
+        self.living.append(True)
+        cell.slot = slot
+        return slot
+
+    def slot(self, cell: Cell) -> int:
+        """Returns the slot of a living cell, giving it one if it has none."""
+        slot = getattr(cell, "slot", None)
+        if slot is None or slot >= len(self.slots) or self.slots[slot] is not cell:
+            slot = self._new_slot(cell)
+        return slot
+
+    def handle(self, cell: Cell) -> tuple:
+        """Returns the slot and generation of a living cell, which resolve turns back into the cell."""
+        slot = self.slot(cell)
+        return slot, int(self.generations[slot])
+
+    def resolve(self, handle: tuple) -> Cell:
+        """
+        :param handle: A handle returned by handle.
+        :return: The cell the handle names, or None if that cell has died since.
+        """
+        slot, generation = handle
+        if 0 <= slot < len(self.slots) and self.living[slot] and self.generations[slot] == generation:
+            return self.slots[slot]
+        return None
+
+    def acquire(self):
+        """
+        Takes a dead cell off the free list, to be recycled into a new cell with Cell.recycle or Cell.divide.
+        :return: The dead cell, or None if there is none.
+        """
+        if not self.free:
+            return None
+        slot = self.free.pop()
+        self.living[slot] = True
+        self.recycled += 1
+        return self.slots[slot]
+
+    def adopt(self, cell: Cell) -> None:
+        """Gives a newly allocated cell a slot, reusing a slot whose dead cell was dropped if there is one."""
+        self.allocated += 1
+        if self.empty:
+            slot = self.empty.pop()
+            self.slots[slot] = cell
+            self.living[slot] = True
+            cell.slot = slot
+        else:
+            self._new_slot(cell)
+
+    def release(self, cell: Cell) -> None:
+        """Puts a cell that died on the free list, making every handle to it stale."""
+        slot = self.slot(cell)
+        self.generations[slot] += 1
+        self.living[slot] = False
+        self.free.append(slot)
+        self.released += 1
+
+    def retire(self) -> None:
+        """
+        Makes every handle stale and drops every cell, for when the cells of the epithelium are replaced
+        by new ones (see Epithelium.restore).
+        """
+        self.generations[:len(self.slots)] += 1
+        self.free = []
+        self.empty = list(range(len(self.slots)))
+        self.slots = [None] * len(self.slots)
+        self.living = [False] * len(self.slots)
+
+    def metrics(self) -> dict:
+        """
+        :return: The number of cells allocated, recycled and released, of slots, of dead cells waiting to
+        be recycled, and the capacity of the generation column.
+        """
+        return {"allocated": self.allocated,
+                "recycled": self.recycled,
+                "released": self.released,
+                "slots": len(self.slots),
+                "idle": len(self.free),
+                "capacity": self.capacity}
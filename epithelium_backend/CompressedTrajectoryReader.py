@@ -0,0 +1,111 @@
+import threading
+
+import numpy
+
+from epithelium_backend import TrajectoryCodec
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.TrajectoryCodec import FrameDecoder
+
+
+class CompressedTrajectoryReader(object):
+    """
+    Reads the frames of a compressed trajectory (see TrajectoryCodec) in any order.
+    Opening a trajectory only reads the chunk headers. A frame is decoded from the keyframe of its chunk,
+    and the chunk being read is kept decoded, so playing frames in order only applies one frame at a time.
+    Offers the same interface as TrajectoryReader, so compressed trajectories can be replayed the same way.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Opens a compressed trajectory file.
+        :param file_path: The path of the file.
+        """
+        self.file_path = file_path  # type: str
+        self.header = None  # type: dict
+        self.chunks = []  # type: list
+        self.ticks = numpy.empty(0, numpy.int64)  # type: numpy.ndarray
+        self._chunk_starts = numpy.zeros(1, numpy.int64)  # type: numpy.ndarray
+        self._chunks_end = 0  # type: int
+        self._decoder = None  # type: FrameDecoder
+        self._decoder_chunk = -1  # type: int
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    @property
+    def keyframe_ticks(self) -> list:
+        """Returns the ticks of the keyframes, the first frame of every chunk."""
+        return [int(chunk[0][0]) for chunk in self.chunks]
+
+    def refresh(self) -> int:
+        """
+        Finds chunks appended to the file since it was opened.
+        :return: The number of new frames.
+        """
+        with open(self.file_path, "rb") as in_file:
+            if self.header is None:
+                self.header, self._chunks_end = TrajectoryCodec.read_header(in_file)
+            new_chunks, self._chunks_end = TrajectoryCodec.scan_chunks(in_file, self._chunks_end)
+        if not new_chunks:
+            return 0
+        self.chunks.extend(new_chunks)
+        self.ticks = numpy.concatenate([chunk[0] for chunk in self.chunks])
+        self._chunk_starts = numpy.cumsum([0] + [len(chunk[0]) for chunk in self.chunks])
+        return sum(len(chunk[0]) for chunk in new_chunks)
+
+    def frame_index(self, tick: int) -> int:
+        """
+        Returns the index of the frame to draw for a tick: the last frame written at or before the tick,
+        or the first frame if the tick is before every frame.
+        """
+        return max(int(numpy.searchsorted(self.ticks, tick, side="right")) - 1, 0)
+
+    def frame_arrays(self, index: int) -> dict:
+        """
+        Decodes a frame.
+        :param index: The index of the frame.
+        :return: The ids (int64), position_x, position_y, radius (float64), and fate (uint8) of every cell.
+        """
+        chunk_index = int(numpy.searchsorted(self._chunk_starts, index, side="right")) - 1
+        frame_in_chunk = index - self._chunk_starts[chunk_index]
+        with self._lock:
+            decoder = self._decoder
+            # frames are only applied forwards, earlier frames are decoded again from the keyframe
+            if chunk_index != self._decoder_chunk or (decoder.tick is not None and decoder.tick > self.ticks[index]):
+                _, payload_offset, compressed_length = self.chunks[chunk_index]
+                with open(self.file_path, "rb") as in_file:
+                    in_file.seek(payload_offset)
+                    payload = TrajectoryCodec.decode_chunk(self.header, in_file.read(compressed_length))
+                decoder = FrameDecoder(payload)
+                self._decoder = decoder
+                self._decoder_chunk = chunk_index
+            for _ in range(frame_in_chunk + 1 - self._frames_decoded(decoder, chunk_index)):
+                decoder.decode()
+            ids, values, fate = decoder.ids, decoder.values, decoder.fate
+
+        values = values * numpy.array([[self.header["position_resolution"]],
+                                       [self.header["position_resolution"]],
+                                       [self.header["radius_resolution"]]])
+        return {"ids": ids, "position_x": values[0], "position_y": values[1], "radius": values[2], "fate": fate}
+
+    def _frames_decoded(self, decoder: FrameDecoder, chunk_index: int) -> int:
+        """Returns the number of frames of a chunk that a decoder has applied."""
+        if decoder.tick is None:
+            return 0
+        chunk_ticks = self.chunks[chunk_index][0]
+        return int(numpy.searchsorted(chunk_ticks, decoder.tick)) + 1
+
+    def snapshot(self, index: int) -> RenderSnapshot:
+        """
+        Returns a RenderSnapshot of a frame.
+        :param index: The index of the frame.
+        """
+        arrays = self.frame_arrays(index)
+        return RenderSnapshot(arrays["position_x"].astype(numpy.float32), arrays["position_y"].astype(numpy.float32),
+                              arrays["radius"].astype(numpy.float32), arrays["fate"].copy(), int(self.ticks[index]))
+
+    def snapshot_at(self, tick: int) -> RenderSnapshot:
+        """Returns a RenderSnapshot of the frame drawn for a tick (see frame_index)."""
+        return self.snapshot(self.frame_index(tick))
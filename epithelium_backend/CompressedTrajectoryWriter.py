@@ -0,0 +1,186 @@
+import argparse
+import collections
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from epithelium_backend import TrajectoryCodec
+from epithelium_backend.TrajectoryCodec import FrameEncoder
+from epithelium_backend.TrajectoryReader import TrajectoryReader
+
+
+class CompressedTrajectoryWriter(object):
+    """
+    Writes a trajectory in the compressed format (see TrajectoryCodec), for runs too long to record every
+    tick at full precision.
+
+    Frames are delta encoded as they are added, and every chunk_frames frames the chunk is compressed by a
+    pool of worker threads (zlib and lzma release the GIL while compressing). At most twice as many chunks
+    as there are workers wait to be written, when the workers fall further behind add_frame waits for them.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 compressor: str = "zlib",
+                 level: int = 1,
+                 position_resolution: float = 1 / 256,
+                 radius_resolution: float = 1 / 256,
+                 chunk_frames: int = 16,
+                 workers: int = 0) -> None:
+        """
+        Creates a new compressed trajectory file, replacing any file at file_path.
+        :param file_path: The path of the file.
+        :param compressor: "zlib" or "lzma".
+        :param level: The compression level (zlib level or lzma preset).
+        :param position_resolution: The precision positions are stored with.
+        :param radius_resolution: The precision radii are stored with.
+        :param chunk_frames: The number of frames between keyframes, each chunk is compressed as a whole.
+        :param workers: The number of threads compressing chunks, 0 for one per cpu.
+        """
+        self.file_path = file_path  # type: str
+        self.header = {"compressor": compressor,
+                       "level": level,
+                       "position_resolution": position_resolution,
+                       "radius_resolution": radius_resolution}  # type: dict
+        self.chunk_frames = max(int(chunk_frames), 1)  # type: int
+
+        # measured while writing, see statistics
+        self.frame_count = 0  # type: int
+        self.input_bytes = 0  # type: int
+        self.output_bytes = 0  # type: int
+        self.start_time = None  # type: float
+        self.end_time = None  # type: float
+        self.last_tick = None  # type: int
+
+        self._out_file = open(file_path, "wb")
+        TrajectoryCodec.write_header(self._out_file, self.header)
+        self.output_bytes = self._out_file.tell()
+        self._encoder = FrameEncoder(position_resolution, radius_resolution)
+        self._chunk_ticks = []  # type: list
+        self._chunk_frames = []  # type: list
+        self._workers = max(workers, 0) or os.cpu_count() or 1  # type: int
+        self._pool = ThreadPoolExecutor(self._workers)
+        self._pending_chunks = collections.deque()
+
+    def add_frame(self,
+                  tick: int,
+                  ids: numpy.ndarray,
+                  position_x: numpy.ndarray,
+                  position_y: numpy.ndarray,
+                  radius: numpy.ndarray,
+                  fate: numpy.ndarray) -> None:
+        """
+        Adds a frame to the trajectory. Ticks must increase from frame to frame.
+        :param tick: The tick of the frame.
+        :param ids: The id of every cell.
+        :param position_x: x position of every cell.
+        :param position_y: y position of every cell.
+        :param radius: radius of every cell.
+        :param fate: fate code (see CellFate) of every cell.
+        """
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        if self.last_tick is not None and tick <= self.last_tick:
+            raise ValueError("Frame at tick %d added after tick %d" % (tick, self.last_tick))
+        self.last_tick = tick
+        if not self._chunk_ticks:
+            self._encoder.keyframe()
+
+        self._chunk_ticks.append(tick)
+        self._chunk_frames.append(self._encoder.encode(tick, ids, position_x, position_y, radius, fate))
+        self.frame_count += 1
+        # the size of the frame as float64 values, int64 ids and uint8 fates
+        self.input_bytes += 33 * len(ids)
+
+        if len(self._chunk_ticks) >= self.chunk_frames:
+            self._submit_chunk()
+
+    def add_snapshot(self, ids: numpy.ndarray, snapshot) -> None:
+        """
+        Adds a RenderSnapshot to the trajectory as a frame at its tick.
+        :param ids: The id of every cell in the snapshot.
+        :param snapshot: The snapshot.
+        """
+        self.add_frame(snapshot.tick, ids, snapshot.position_x, snapshot.position_y, snapshot.radius, snapshot.fate)
+
+    def _submit_chunk(self) -> None:
+        """Hands the frames since the last keyframe to the workers, and writes the chunks they have finished."""
+        self._pending_chunks.append(self._pool.submit(TrajectoryCodec.encode_chunk, self.header,
+                                                      self._chunk_ticks, b"".join(self._chunk_frames)))
+        self._chunk_ticks = []
+        self._chunk_frames = []
+        while self._pending_chunks and (self._pending_chunks[0].done()
+                                        or len(self._pending_chunks) > 2 * self._workers):
+            self._write_chunk(self._pending_chunks.popleft().result())
+
+    def _write_chunk(self, chunk: bytes) -> None:
+        """Appends a compressed chunk to the file."""
+        self._out_file.write(chunk)
+        self.output_bytes += len(chunk)
+
+    def close(self) -> dict:
+        """
+        Compresses the remaining frames and closes the file.
+        :return: The statistics of the written trajectory (see statistics).
+        """
+        if self._chunk_ticks:
+            self._submit_chunk()
+        while self._pending_chunks:
+            self._write_chunk(self._pending_chunks.popleft().result())
+        self._pool.shutdown()
+        self._out_file.close()
+        if self.start_time is not None:
+            self.end_time = time.perf_counter()
+        return self.statistics
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Returns the achieved compression: the number of frames, the bytes the frames take as float64
+        values, the bytes written, their ratio, and the encode throughput in frames and input megabytes per second.
+        """
+        seconds = ((self.end_time or time.perf_counter()) - self.start_time) if self.start_time is not None else 0
+        return {"frames": self.frame_count,
+                "input_bytes": self.input_bytes,
+                "output_bytes": self.output_bytes,
+                "compression_ratio": self.input_bytes / self.output_bytes if self.output_bytes else 0,
+                "frames_per_second": self.frame_count / seconds if seconds else 0,
+                "megabytes_per_second": self.input_bytes / seconds / 1024 / 1024 if seconds else 0}
+
+
+def compress_trajectory(trajectory_path: str, file_path: str, **options) -> dict:
+    """
+    Compresses a trajectory recorded by TrajectoryRecorder.
+    :param trajectory_path: The path of the recorded trajectory.
+    :param file_path: The path of the compressed trajectory to write.
+    :param options: Passed on to CompressedTrajectoryWriter.
+    :return: The statistics of the compressed trajectory (see CompressedTrajectoryWriter.statistics).
+    """
+    reader = TrajectoryReader(trajectory_path)
+    writer = CompressedTrajectoryWriter(file_path, **options)
+    for index in range(len(reader)):
+        writer.add_snapshot(reader.frame_arrays(index)["ids"], reader.snapshot(index))
+    return writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compresses recorded trajectory files.")
+    parser.add_argument("files", nargs="+", help="recorded trajectory files, written next to them with a .z suffix")
+    parser.add_argument("--compressor", choices=sorted(TrajectoryCodec.compressors), default="zlib")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--position-resolution", type=float, default=1 / 256)
+    parser.add_argument("--radius-resolution", type=float, default=1 / 256)
+    parser.add_argument("--chunk-frames", type=int, default=16)
+    arguments = parser.parse_args()
+    for path in arguments.files:
+        statistics = compress_trajectory(path, path + ".z",
+                                         compressor=arguments.compressor,
+                                         level=arguments.level,
+                                         position_resolution=arguments.position_resolution,
+                                         radius_resolution=arguments.radius_resolution,
+                                         chunk_frames=arguments.chunk_frames)
+        print("%s: %d frames, compression ratio %.1f, %.1f frames/s (%.1f MB/s)"
+              % (path, statistics["frames"], statistics["compression_ratio"],
+                 statistics["frames_per_second"], statistics["megabytes_per_second"]))
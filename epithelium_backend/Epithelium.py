@@ -1,7 +1,14 @@
 from epithelium_backend import Cell
 from epithelium_backend import CellCollisionHandler
+from epithelium_backend.CellColumns import CellColumns
 from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.CellOrdering import CellOrdering
+from epithelium_backend.CellPool import CellPool
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.GenerationProgress import GenerationProgress
+from epithelium_backend.RelaxationScheduler import RelaxationScheduler
 from epithelium_backend import Furrow
+from epithelium_backend.TickHistory import TickHistory
 from quick_change.FurrowEventList import furrow_event_list
 from quick_change import CellEvents
 
@@ -11,19 +18,51 @@ class Epithelium(object):
 
     def __init__(self, cell_quantity: int,
                  cell_avg_radius: float = 10,
-                 cell_factory: CellFactory = None) -> None:
+                 cell_factory: CellFactory = None,
+                 progress=None,
+                 periodic: str = None,
+                 relaxation_scheduler: RelaxationScheduler = None,
+                 cell_ordering: CellOrdering = None,
+                 cell_pool: CellPool = None) -> None:
         """
         Initializes the epithelium
         :param cell_quantity: number of cells to be in the sheet
         :param cell_avg_radius: average cell radius
         :param cell_factory: A factory responsible for producing the initial cells in the epithelium.
+        :param progress: Called with a GenerationProgress as the cell sheet is created and relaxed.
+        May raise OperationCancelled to abandon the epithelium.
+        :param periodic: The directions the sheet wraps around in, "y", "x" or "xy", None for a bounded sheet.
+        A periodic sheet has no edge in those directions, so a small one behaves like the middle of a larger one.
+        Its period is the size of the relaxed sheet (see CellFactory.sheet_size).
+        :param relaxation_scheduler: Decides how many times update decompacts the cells, once per tick if None.
+        :param cell_ordering: Keeps the cells stored along a space filling curve. If None, cells stay in the order
+        they were created in.
+        :param cell_pool: Recycles dead cells into the cells of divisions. If None, dead cells are left to the
+        garbage collector and every division allocates a new cell.
         """
+        if periodic not in (None, "", "x", "y", "xy"):
+            raise ValueError("%s is not a periodic direction, expected x, y or xy" % periodic)
+        # cells that have not been created yet, see set_cell_columns
+        self._cell_columns = None  # type: CellColumns
         self.cells = []
         self.cell_quantity = cell_quantity
         self.cell_avg_radius = cell_avg_radius
         self.cell_collision_handler = None
+        self.history = None  # type: TickHistory
+        # set by TrajectoryRecorder.attach
+        self.trajectory_recorder = None
+        # decides how many times update decompacts the cells, once if None
+        self.relaxation_scheduler = relaxation_scheduler  # type: RelaxationScheduler
+        # keeps the cells stored along a space filling curve, if set
+        self.cell_ordering = cell_ordering  # type: CellOrdering
+        # recycles dead cells into the cells of divisions, if set
+        self.cell_pool = cell_pool  # type: CellPool
+        # cells that died during run_cell_updates, released to the cell pool once every cell is updated
+        self._dead_cells = None  # type: list
+        # the directions the sheet wraps around in, see CellCollisionHandler
+        self.periodic = periodic or None  # type: str
 
-        self.create_cell_sheet(cell_factory)
+        self.create_cell_sheet(cell_factory, progress)
 
         # create furrow
         if len(self.cells):
@@ -35,6 +74,109 @@ class Epithelium(object):
                                     velocity=1,
                                     events=furrow_event_list)
 
+    def __getstate__(self) -> dict:
+        """
+        The tick history and trajectory recorder are not saved along with the epithelium.
+        Cells stored as columns are created first, so epithelia are pickled the same way they always were.
+        """
+        self.create_column_cells()
+        state = dict(self.__dict__)
+        state["cells"] = state.pop("_cells")
+        state["cell_collision_handler"] = state.pop("_cell_collision_handler")
+        del state["_cell_columns"]
+        state["history"] = None
+        state["trajectory_recorder"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restores a pickled epithelium, including those saved before epithelia kept a history."""
+        state = dict(state)
+        self._cells = state.pop("cells")
+        self._cell_collision_handler = state.pop("cell_collision_handler")
+        self._cell_columns = None
+        self.__dict__.update(state)
+        self.__dict__.setdefault("relaxation_scheduler", None)
+        self.__dict__.setdefault("cell_ordering", None)
+        self.__dict__.setdefault("cell_pool", None)
+        self.__dict__.setdefault("_dead_cells", None)
+        self.__dict__.setdefault("periodic", None)
+        self.history = None
+        self.trajectory_recorder = None
+
+    @property
+    def cells(self) -> list:
+        """Returns the cells of the epithelium, creating them first if they are stored as columns."""
+        if self._cell_columns is not None:
+            self.create_column_cells()
+        return self._cells
+
+    @cells.setter
+    def cells(self, value: list) -> None:
+        self._cell_columns = None
+        self._cells = value
+
+    @property
+    def cell_collision_handler(self) -> CellCollisionHandler:
+        """Returns the collision handler of the cells, creating the cells first if they are stored as columns."""
+        if self._cell_columns is not None:
+            self.create_column_cells()
+        return self._cell_collision_handler
+
+    @cell_collision_handler.setter
+    def cell_collision_handler(self, value: CellCollisionHandler) -> None:
+        if self._cell_columns is not None:
+            self.create_column_cells()
+        self._cell_collision_handler = value
+
+    @property
+    def cell_columns(self) -> CellColumns:
+        """Returns the columns of cells that have not been created yet, None once every cell is created."""
+        return self._cell_columns
+
+    def set_cell_columns(self, columns: CellColumns) -> None:
+        """
+        Populates the epithelium with cells stored as columns, such as those of a sheet relaxed elsewhere.
+        The cells and their collision handler are only created once they are asked for, so an epithelium
+        that is only drawn or saved never creates them.
+        :param columns: The cells. Their positions are taken as relaxed.
+        """
+        self._cells = []
+        self._cell_collision_handler = None
+        self._cell_columns = columns
+        self.cell_quantity = len(columns)
+
+    def create_column_cells(self, cell_factory: CellFactory = None) -> None:
+        """
+        Creates the cells stored as columns (see set_cell_columns) and their collision handler.
+        :param cell_factory: The factory that created the columns, which determines the periods of the
+        collision handler. A factory of cells of the average radius of the epithelium if None.
+        """
+        columns, self._cell_columns = self._cell_columns, None
+        if columns is None:
+            return
+        self._cells = columns.create_cells()
+        if self._cells:
+            if cell_factory is None:
+                cell_factory = CellFactory()
+                cell_factory.average_radius = self.cell_avg_radius
+            self._cell_collision_handler = CellCollisionHandler.CellCollisionHandler(self._cells,
+                                                                                     **self.periods(cell_factory))
+
+    def keep_history(self,
+                     memory_cap: int = 64 * 1024 * 1024,
+                     keyframe_interval: int = 50,
+                     position_resolution: float = 1 / 256) -> TickHistory:
+        """
+        Begins recording every tick of this epithelium in a TickHistory, starting with its current state.
+        :param memory_cap: The number of bytes the history may occupy.
+        :param keyframe_interval: The number of ticks between keyframes the epithelium can be restored to.
+        :param position_resolution: The precision positions and radii are recorded with.
+        :return: The new history, also available as self.history
+        """
+        self.history = TickHistory(memory_cap, keyframe_interval, position_resolution)
+        self.history.record(self)
+        return self.history
+
     def divide_cell(self, cell_from_list) -> Cell:
         """
         divides the given cell and adds the newly created cell to the list
@@ -43,7 +185,13 @@ class Epithelium(object):
         """
 
         if cell_from_list.dividable:
-            new_cell = cell_from_list.divide()
+            if self.cell_pool is not None:
+                recycled_cell = self.cell_pool.acquire()
+                new_cell = cell_from_list.divide(recycled_cell)
+                if recycled_cell is None:
+                    self.cell_pool.adopt(new_cell)
+            else:
+                new_cell = cell_from_list.divide()
             if new_cell is not None:
                 self.cells.append(new_cell)
                 self.cell_collision_handler.register(new_cell)
@@ -52,39 +200,198 @@ class Epithelium(object):
 
     def delete_cell(self, cell: Cell):
         """
-        Removes a cell from the epithelium, and then deregisters it from the CellCollisionHandler
+        Removes a cell from the epithelium, and then deregisters it from the CellCollisionHandler.
+        If the epithelium has a cell pool, the cell is forgotten by its related cells and the furrow events
+        and given to the pool to be recycled. Cells that die while the cells are updated are only given to the
+        pool afterwards, since their events may still be running, or they may still divide.
         :param cell: cell to delete from the epithelium
         :return:
         """
         self.cells.remove(cell)
         self.cell_collision_handler.deregister(cell)
+        if self.cell_pool is not None:
+            # the cell will come back as another cell, nothing may refer to it as the dead one
+            for related_cell in cell.related_cells:
+                if cell in related_cell.related_cells:
+                    related_cell.related_cells.remove(cell)
+            for event in self.furrow.events:
+                event.last_processed.discard(cell)
+            if self._dead_cells is not None:
+                self._dead_cells.append(cell)
+            else:
+                self.cell_pool.release(cell)
+
+    def default_cell_events(self) -> set:
+        """
+        Returns the set of events cells should start out with.
+        They are run once per tick of the simulation.
+        """
+        return {CellEvents.PassiveGrowth(self), CellEvents.UpdateCellPosition()}
+
+    # the fraction of generation taken by creating the cells, the rest is relaxation
+    creation_fraction = 0.05
 
-    def create_cell_sheet(self, cell_factory: CellFactory = None) -> None:
+    def create_cell_sheet(self, cell_factory: CellFactory = None, progress=None) -> None:
         """
         creates the sheet of cells, populating self.cells, and then decompacts them
         :param cell_factory: A factory responsible for producing the initial cells in the new cell sheet.
+        :param progress: Called with a GenerationProgress before the cells are created and after every
+        decompaction. May raise OperationCancelled to stop creating the sheet.
         """
 
         # ensure presence of valid factory
         if cell_factory is None:
             cell_factory = CellFactory()
 
-        # This is the set of events should start out with.
-        # They are run once per tick of the simulation.
-        # Each cell gets its own copy of each event
-        default_cell_events = {CellEvents.PassiveGrowth(self), CellEvents.UpdateCellPosition()}
-        cell_factory.cell_events = default_cell_events
+        cell_factory.cell_events = self.default_cell_events()
 
         # create cells for sheet
-        self.cells = cell_factory.create_cells(self.cell_quantity)
+        if progress is not None:
+            progress(GenerationProgress(GenerationProgress.creating_cells, 0, []))
+        self.set_cell_columns(cell_factory.create_columns(self.cell_quantity))
 
         # run initial decompaction of cells cells
         if self.cell_quantity > 0:
-            self.cell_collision_handler = CellCollisionHandler.CellCollisionHandler(self.cells)
+            self.create_column_cells(cell_factory)
             # Scale decompactions to epithelium size
             decompactions = len(self.cells) // 2
-            for _ in range(decompactions):
-                self.cell_collision_handler.decompact()
+            if progress is not None:
+                progress(GenerationProgress(GenerationProgress.relaxing, self.creation_fraction, self.cells,
+                                            0, decompactions))
+            # large sheets are decompacted a batch of iterations at a time, see ParallelDecompactor
+            batch = max(decompactions // 100, 1)
+            for first_iteration in range(0, decompactions, batch):
+                iteration = min(first_iteration + batch, decompactions)
+                residual = self.cell_collision_handler.decompact(iteration - first_iteration)
+                if progress is not None:
+                    fraction = self.creation_fraction + (1 - self.creation_fraction) * iteration / decompactions
+                    progress(GenerationProgress(GenerationProgress.relaxing, fraction, self.cells,
+                                                iteration, decompactions, residual))
+
+    def periods(self, cell_factory: CellFactory) -> dict:
+        """
+        Returns the periods of the collision handler in the directions the sheet wraps around in.
+        :param cell_factory: The factory of the cells, which determines the size of the sheet.
+        """
+        if not self.periodic:
+            return {}
+        period = cell_factory.sheet_size(self.cell_quantity)
+        return {"period_" + direction: period for direction in self.periodic}
+
+    def snapshot(self, previous: EpitheliumSnapshot = None,
+                 memory_budget: int = None,
+                 spill_directory: str = None) -> EpitheliumSnapshot:
+        """
+        Captures the current state of the epithelium in memory. See EpitheliumSnapshot.
+        :param previous: An earlier snapshot of this epithelium to share unchanged columns with.
+        :param memory_budget: Snapshots with columns larger than this many bytes are spilled to disk.
+        None for no limit.
+        :param spill_directory: Where to spill large snapshots. Defaults to the system's temporary directory.
+        :return: The snapshot
+        """
+        return EpitheliumSnapshot.capture(self, previous, memory_budget, spill_directory)
+
+    def restore(self, snapshot: EpitheliumSnapshot, event_fields: bool = True) -> None:
+        """
+        Returns the epithelium to the state captured by a snapshot of it.
+        The cells are replaced by new cells, and the collision handler is rebuilt.
+        The furrow must have the events that were captured, in the same order.
+        :param snapshot: A snapshot taken from this epithelium, or from the epithelium it was forked from.
+        :param event_fields: If false, the furrow events keep their current field values.
+        """
+        self.cells = snapshot.create_cells(self)
+        if self.cell_pool is not None:
+            self.cell_pool.retire()
+        self.cell_quantity = snapshot.cell_quantity
+        self.cell_avg_radius = snapshot.cell_avg_radius
+        if len(self.cells) and snapshot.collision_handler_parameters is not None:
+            self.cell_collision_handler = CellCollisionHandler.CellCollisionHandler(
+                self.cells, **snapshot.collision_handler_parameters)
+        else:
+            self.cell_collision_handler = None
+
+        self.furrow.position = snapshot.furrow_position
+        self.furrow.velocity = snapshot.furrow_velocity
+        self.furrow.last_position = snapshot.furrow_last_position
+        for event, (_, field_values, last_processed) in zip(self.furrow.events, snapshot.furrow_events):
+            if event_fields:
+                for name, value in field_values.items():
+                    event.field_types[name].value = value
+            event.last_processed = set(self.cells[i] for i in last_processed.tolist())
+
+    def reorder_cells(self, order) -> None:
+        """
+        Stores the cells in another order, such as along a space filling curve (see CellOrdering).
+        The cells are replaced by new cells created one after the other, so that they are next to each other
+        in memory as well, and the collision handler is rebuilt with the same parameters. Cell ids and
+        relationships between cells are kept.
+        :param order: The index of the cell to store first, second, and so on. Every index must appear once.
+        """
+        snapshot = self.snapshot().select(order)
+        self.cells = snapshot.create_cells(self)
+        if self.cell_pool is not None:
+            self.cell_pool.retire()
+        if snapshot.collision_handler_parameters is not None:
+            self.cell_collision_handler = CellCollisionHandler.CellCollisionHandler(
+                self.cells, **snapshot.collision_handler_parameters)
+        for event, (_, _, last_processed) in zip(self.furrow.events, snapshot.furrow_events):
+            event.last_processed = set(self.cells[i] for i in last_processed.tolist())
+        if self.relaxation_scheduler is not None:
+            self.relaxation_scheduler.reset()
+
+    @staticmethod
+    def from_snapshot(snapshot: EpitheliumSnapshot):
+        """
+        Creates a new epithelium in the state captured by a snapshot. The new epithelium has its own
+        copies of the captured furrow events, so their field values can be changed independently.
+        :param snapshot: The snapshot to create the epithelium from.
+        :return: The new Epithelium
+        """
+        epithelium = Epithelium(0, snapshot.cell_avg_radius)
+        epithelium.furrow.events = [event.copy() for event, _, _ in snapshot.furrow_events]
+        epithelium.restore(snapshot)
+        return epithelium
+
+    def fork(self, branch_count: int = 1) -> list:
+        """
+        Creates branches of this epithelium that can be simulated independently of it and of each other,
+        for instance under different furrow event field values (see set_field_values).
+        The epithelium is captured once, and every branch is created from the same snapshot.
+        :param branch_count: The number of branches to create.
+        :return: A list of new Epithelium instances
+        """
+        snapshot = self.snapshot()
+        return [Epithelium.from_snapshot(snapshot) for _ in range(branch_count)]
+
+    def set_field_values(self, field_values: dict) -> None:
+        """
+        Changes the field values of the furrow events of this epithelium.
+        :param field_values: Maps event names to dictionaries that map field names to their new values,
+        for instance {"Cell Death": {"death chance (0-100)": 10}}.
+        """
+        events = {event.name: event for event in self.furrow.events}
+        for event_name, values in field_values.items():
+            if event_name not in events:
+                raise ValueError("The furrow has no event named %s" % event_name)
+            for field_name, value in values.items():
+                field = events[event_name].field_types.get(field_name)
+                if field is None:
+                    raise ValueError("%s has no field named %s" % (event_name, field_name))
+                if not field.validate(value):
+                    raise ValueError("%s is not a valid value for %s of %s" % (value, field_name, event_name))
+
+    def advance(self, ticks: int, field_values: dict = None):
+        """
+        Simulates the epithelium for a number of ticks.
+        :param ticks: The number of ticks to simulate.
+        :param field_values: Furrow event field values to set before simulating (see set_field_values).
+        :return: This epithelium
+        """
+        if field_values:
+            self.set_field_values(field_values)
+        for _ in range(ticks):
+            self.update()
+        return self
 
     def neighboring_cells(self, cell: Cell, number_cells: int):
         """
@@ -102,12 +409,31 @@ class Epithelium(object):
         """Simulates the epithelium for one tick"""
         self.furrow.update(self)
         self.run_cell_updates()
-        self.cell_collision_handler.decompact()
+        if self.relaxation_scheduler is not None:
+            self.relaxation_scheduler.relax(self.cell_collision_handler)
+        else:
+            self.cell_collision_handler.decompact()
+        if self.cell_ordering is not None:
+            self.cell_ordering.update(self)
+        if self.history is not None:
+            self.history.record(self)
+        if self.trajectory_recorder is not None:
+            self.trajectory_recorder.record(self)
 
     def run_cell_updates(self):
         """
         Has each cell run all of their respective updating functions.
         :return:
         """
-        for cell in self.cells:
-            cell.dispatch_updates()
+        if self.cell_pool is None:
+            for cell in self.cells:
+                cell.dispatch_updates()
+            return
+        self._dead_cells = []
+        try:
+            for cell in self.cells:
+                cell.dispatch_updates()
+        finally:
+            dead_cells, self._dead_cells = self._dead_cells, None
+            for cell in dead_cells:
+                self.cell_pool.release(cell)
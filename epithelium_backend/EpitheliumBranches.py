@@ -0,0 +1,34 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _advance_branch(branch, ticks: int, field_values: dict):
+    """Entry point of a branch simulated in a worker process. Returns the simulated branch."""
+    return branch.advance(ticks, field_values)
+
+
+def advance_branches(branches: list, ticks: int, field_values: list = None, processes: int = 0) -> list:
+    """
+    Simulates branches of an epithelium (see Epithelium.fork), each under its own furrow event field values.
+    :param branches: The epithelia to simulate.
+    :param ticks: The number of ticks to simulate every branch for.
+    :param field_values: For every branch, the field values to simulate it with (see
+    Epithelium.set_field_values), or None to keep the values it has.
+    :param processes: The number of worker processes to simulate the branches in.
+    0 simulates the branches one after another in this process.
+    :return: The simulated branches. Branches simulated in this process are the passed epithelia,
+    branches simulated in worker processes are copies.
+    """
+    if field_values is None:
+        field_values = [None] * len(branches)
+    if len(field_values) != len(branches):
+        raise ValueError("Expected field values for %d branches, received %d" % (len(branches), len(field_values)))
+
+    if processes <= 0:
+        return [branch.advance(ticks, values) for branch, values in zip(branches, field_values)]
+
+    # spawn rather than fork, wx does not survive being forked
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(_advance_branch, branch, ticks, values)
+                   for branch, values in zip(branches, field_values)]
+        return [future.result() for future in futures]
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+
+import numpy
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.EpitheliumFile import write_epithelium
+
+# the modules whose code decides what a generated epithelium looks like
+_generation_modules = ("Cell.py", "CellCollisionHandler.py", "CellColumns.py", "CellFactory.py", "Epithelium.py",
+                       "ParallelDecompactor.py", "SpringForces.py", "TiledSheetGenerator.py")
+_code_version = None
+
+
+def generation_code_version() -> str:
+    """Returns a hash of the code that generates epithelia, so cached epithelia are not reused once it changes."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for module in _generation_modules:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as module_file:
+                digest.update(module_file.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+class EpitheliumCache(object):
+    """
+    An on-disk cache of generated (created and decompacted) epithelia.
+
+    Epithelia are saved in the columnar format (see EpitheliumFile) under a hash of everything that decides
+    their cells: the cell count, the average radius, the parameters and seed of the cell factory, and the
+    generation code. Only epithelia generated with a seeded cell factory are cached, since unseeded ones
+    differ every time. Once the cached files take more than size_limit bytes the least recently used
+    ones are removed.
+
+    Intermediate results of generation, such as the relaxed patches of TiledSheetGenerator, are cached
+    alongside the epithelia as numpy arrays (see get_arrays).
+    """
+
+    file_suffix = ".epth"
+    arrays_suffix = ".npz"
+    # where epithelia are cached unless another directory is given
+    default_directory = os.path.join(os.path.expanduser("~"), ".cache", "eye_development_model", "epithelia")
+
+    def __init__(self, directory: str = None, size_limit: int = 1024 * 1024 * 1024) -> None:
+        """
+        :param directory: The directory of the cached files, created when needed. Defaults to default_directory.
+        :param size_limit: The number of bytes the cached files may take.
+        """
+        self.directory = directory or self.default_directory  # type: str
+        self.size_limit = size_limit  # type: int
+
+    @staticmethod
+    def key(cell_quantity: int, cell_avg_radius: float, cell_factory: CellFactory) -> str:
+        """
+        Returns the key an epithelium generated from these parameters is cached under.
+        None if the cell factory is not seeded.
+        """
+        if cell_factory.seed is None:
+            return None
+        parameters = {"cell_quantity": cell_quantity,
+                      "cell_avg_radius": cell_avg_radius,
+                      "average_radius": cell_factory.average_radius,
+                      "radius_divergence": cell_factory.radius_divergence,
+                      "max_radius": cell_factory.max_radius,
+                      "growth_rate": cell_factory.growth_rate,
+                      "seed": cell_factory.seed,
+                      "code_version": generation_code_version()}
+        return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        """Returns the path of the file an epithelium is cached in."""
+        return os.path.join(self.directory, key + self.file_suffix)
+
+    def get(self, key: str) -> Epithelium:
+        """
+        Loads a cached epithelium.
+        :param key: The key of the epithelium (see key).
+        :return: The epithelium, or None if it is not cached.
+        """
+        if key is None:
+            return None
+        path = self.path(key)
+        try:
+            epithelium = read_epithelium(path)
+            # the modification time records when an entry was last used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return epithelium
+
+    def put(self, key: str, epithelium: Epithelium) -> None:
+        """
+        Caches an epithelium, then removes the least recently used epithelia above the size limit.
+        :param key: The key of the epithelium (see key).
+        :param epithelium: The generated epithelium.
+        """
+        if key is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        write_epithelium(epithelium, self.path(key))
+        self.evict(keep=key)
+
+    def get_arrays(self, key: str) -> dict:
+        """
+        Loads cached arrays.
+        :param key: The key the arrays were cached under.
+        :return: The arrays by name, or None if they are not cached.
+        """
+        path = os.path.join(self.directory, key + self.arrays_suffix)
+        try:
+            with numpy.load(path) as arrays_file:
+                arrays = {name: arrays_file[name] for name in arrays_file.files}
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def put_arrays(self, key: str, arrays: dict) -> None:
+        """
+        Caches arrays, then removes the least recently used entries above the size limit.
+        :param key: The key to cache the arrays under.
+        :param arrays: The arrays by name.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key + self.arrays_suffix)
+        # written under another name first, so a partly written file is never loaded
+        partial_path = path + ".partial"
+        with open(partial_path, "wb") as arrays_file:
+            numpy.savez(arrays_file, **arrays)
+        os.replace(partial_path, path)
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Removes the least recently used epithelia until the cached files fit in the size limit.
+        :param keep: The key of an epithelium that is never removed.
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith((self.file_suffix, self.arrays_suffix)):
+                status = os.stat(os.path.join(self.directory, file_name))
+                entries.append((status.st_mtime, status.st_size, file_name))
+        total_size = sum(entry[1] for entry in entries)
+        for _, size, file_name in sorted(entries):
+            if total_size <= self.size_limit:
+                break
+            if file_name in ((keep or "") + self.file_suffix, (keep or "") + self.arrays_suffix):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                continue
+            total_size -= size
+
+    def clear(self) -> None:
+        """Removes every cached epithelium."""
+        if os.path.isdir(self.directory):
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith((self.file_suffix, self.arrays_suffix)):
+                    os.remove(os.path.join(self.directory, file_name))
+
+    def generate(self, cell_quantity: int, cell_avg_radius: float, cell_factory: CellFactory,
+                 progress=None) -> Epithelium:
+        """
+        Returns the epithelium generated from these parameters, loading it from the cache when it was generated
+        before and caching it otherwise. Takes the same parameters as Epithelium.
+        """
+        key = self.key(cell_quantity, cell_avg_radius, cell_factory)
+        epithelium = self.get(key)
+        if epithelium is None:
+            epithelium = Epithelium(cell_quantity, cell_avg_radius, cell_factory, progress)
+            self.put(key, epithelium)
+        return epithelium
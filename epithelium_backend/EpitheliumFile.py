@@ -0,0 +1,300 @@
+"""
+Reads and writes epithelia in a versioned columnar file format.
+
+Layout of a file:
+    8 bytes       magic number (file_magic)
+    8 bytes       length of the header, little endian unsigned integer
+    header        utf-8 JSON describing the epithelium and the columns
+    padding       up to a multiple of column_alignment bytes
+    columns       raw little endian arrays, each starting at a multiple of column_alignment bytes
+
+Every cell attribute is stored as one column (see EpitheliumSnapshot), relationships between cells
+and the cells last processed by furrow events are stored as arrays of cell indices, and cell events
+and furrow events are stored by name with their parameters. Columns can be memory mapped.
+"""
+
+import argparse
+import json
+import os
+import pickle
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.EpitheliumSnapshot import numeric_columns
+from quick_change import CellEvents
+from quick_change.FurrowEventList import furrow_event_list
+
+file_magic = b"EPTHCOL\x00"
+format_version = 1
+column_alignment = 64
+
+# length of the magic number and the header length
+_preamble_length = 16
+
+
+def _aligned(offset: int) -> int:
+    """Returns the first multiple of column_alignment at or after offset."""
+    return -(-offset // column_alignment) * column_alignment
+
+
+def is_columnar_file(file_path: str) -> bool:
+    """Returns True if the file at file_path is in the columnar format, False otherwise."""
+    try:
+        with open(file_path, "rb") as input_file:
+            return input_file.read(len(file_magic)) == file_magic
+    except OSError:
+        return False
+
+
+def _encode_cell_event(functor) -> dict:
+    """Describes a cell event functor by its class name and parameters."""
+    parameters = {name: value for name, value in vars(functor).items() if name != "epithelium"}
+    return {"type": type(functor).__name__,
+            "parameters": parameters,
+            "bound": hasattr(functor, "epithelium")}
+
+
+def _decode_cell_event(description: dict):
+    """Recreates a cell event functor from its description. Bound functors are bound to no epithelium."""
+    functor_type = getattr(CellEvents, description["type"], None)
+    if functor_type is None:
+        raise ValueError("Unknown cell event: %s" % description["type"])
+    functor = functor_type.__new__(functor_type)
+    functor.__dict__.update(description["parameters"])
+    if description["bound"]:
+        functor.epithelium = None
+    return functor
+
+
+def _scaled_progress(progress, start: float, end: float):
+    """Returns a progress callback that reports the fractions of a step between start and end to progress."""
+    if progress is None:
+        return None
+    return lambda fraction: progress(start + (end - start) * fraction)
+
+
+def write_epithelium(epithelium: Epithelium, file_path: str, metadata: dict = None) -> None:
+    """
+    Saves an epithelium in the columnar format. The file is replaced in one step once it is fully
+    written, so memory maps of the previous file (see MappedEpithelium) stay valid.
+    :param epithelium: The epithelium to save.
+    :param file_path: The path of the file to write.
+    :param metadata: JSON serializable values stored in the header, under "metadata".
+    """
+    write_snapshot(EpitheliumSnapshot.capture(epithelium), file_path, metadata)
+
+
+def snapshot_to_columns(snapshot: EpitheliumSnapshot, metadata: dict = None) -> tuple:
+    """
+    Describes a snapshot the way the columnar format stores it, with cell events and furrow events
+    described by name instead of as objects. The result can be pickled cheaply, for instance to hand
+    cells to another process, and snapshot_from_columns turns it back into a snapshot.
+    :param snapshot: The snapshot to describe.
+    :param metadata: JSON serializable values stored in the header, under "metadata".
+    :return: The header as a dictionary, without the layout of the columns, and a dictionary of columns.
+    """
+    columns = dict(snapshot.load_columns())
+
+    # cell events are stored once per distinct set, cells store the index of their set
+    event_set_indices = {}
+    event_sets = []
+    for event_set in snapshot.cell_events:
+        if event_set not in event_set_indices:
+            event_set_indices[event_set] = len(event_sets)
+            event_sets.append(sorted((_encode_cell_event(functor) for functor in event_set),
+                                     key=lambda description: description["type"]))
+    columns["cell_event_set"] = numpy.fromiter((event_set_indices[event_set] for event_set in snapshot.cell_events),
+                                               numpy.int32, len(snapshot))
+
+    furrow_events = []
+    for i, (event, field_values, last_processed) in enumerate(snapshot.furrow_events):
+        column_name = "furrow_event_%d_last_processed" % i
+        columns[column_name] = last_processed
+        furrow_events.append({"name": event.name,
+                              "fields": field_values,
+                              "last_processed_column": column_name})
+
+    header = {"version": format_version,
+              "cell_count": len(snapshot),
+              "cell_quantity": snapshot.cell_quantity,
+              "cell_avg_radius": snapshot.cell_avg_radius,
+              "collision_handler": snapshot.collision_handler_parameters,
+              "furrow": {"position": snapshot.furrow_position,
+                         "velocity": snapshot.furrow_velocity,
+                         "last_position": snapshot.furrow_last_position,
+                         "events": furrow_events},
+              "cell_event_sets": event_sets,
+              "metadata": metadata or {}}
+    return header, columns
+
+
+def write_snapshot(snapshot: EpitheliumSnapshot, file_path: str, metadata: dict = None, progress=None) -> None:
+    """
+    Saves a snapshot of an epithelium in the columnar format (see write_epithelium).
+    :param snapshot: The snapshot to save.
+    :param file_path: The path of the file to write.
+    :param metadata: JSON serializable values stored in the header, under "metadata".
+    :param progress: Called with the fraction of the file written after every column. If it raises
+    (see OperationCancelled) the file is left as it was.
+    """
+    header, columns = snapshot_to_columns(snapshot, metadata)
+
+    # lay the columns out one after the other
+    column_descriptions = {}
+    offset = 0
+    for name, column in columns.items():
+        column = numpy.ascontiguousarray(column, dtype=column.dtype.newbyteorder("<"))
+        columns[name] = column
+        column_descriptions[name] = {"dtype": column.dtype.str, "length": len(column), "offset": offset}
+        offset = _aligned(offset + column.nbytes)
+
+    header["columns"] = column_descriptions
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(_preamble_length + len(header_bytes))
+
+    partial_path = file_path + ".partial"
+    try:
+        with open(partial_path, "wb") as out_file:
+            out_file.write(file_magic)
+            out_file.write(len(header_bytes).to_bytes(8, "little"))
+            out_file.write(header_bytes)
+            out_file.write(bytes(data_start - out_file.tell()))
+            for i, (name, column) in enumerate(columns.items()):
+                out_file.write(bytes(data_start + column_descriptions[name]["offset"] - out_file.tell()))
+                out_file.write(column.tobytes())
+                if progress is not None:
+                    progress((i + 1) / len(columns))
+    except BaseException:
+        os.remove(partial_path)
+        raise
+    os.replace(partial_path, file_path)
+
+
+def read_header(file_path: str) -> tuple:
+    """
+    Reads the header of a columnar file.
+    :param file_path: The path of the file to read.
+    :return: The header as a dictionary, and the offset in the file where the columns begin.
+    """
+    with open(file_path, "rb") as input_file:
+        if input_file.read(len(file_magic)) != file_magic:
+            raise ValueError("%s is not a columnar epithelium file" % file_path)
+        header_length = int.from_bytes(input_file.read(8), "little")
+        header = json.loads(input_file.read(header_length).decode("utf-8"))
+    if header["version"] > format_version:
+        raise ValueError("%s was saved by a newer version (format %d, this version reads up to %d)"
+                         % (file_path, header["version"], format_version))
+    return header, _aligned(_preamble_length + header_length)
+
+
+def read_columns(file_path: str, memory_map: bool = False, progress=None) -> tuple:
+    """
+    Reads the header and the columns of a columnar file.
+    :param file_path: The path of the file to read.
+    :param memory_map: If true, the columns are read only views into one memory map of the file, and
+    nothing is read until a column is used. Otherwise, the columns are read into memory.
+    :param progress: Called with the fraction of the columns read after every column.
+    :return: The header as a dictionary, and a dictionary mapping column names to arrays.
+    """
+    header, data_start = read_header(file_path)
+    columns = {}
+    mapped_file = numpy.memmap(file_path, dtype=numpy.uint8, mode="r") if memory_map else None
+    with open(file_path, "rb") as input_file:
+        for i, (name, description) in enumerate(header["columns"].items()):
+            dtype = numpy.dtype(description["dtype"])
+            offset = data_start + description["offset"]
+            if memory_map:
+                column = mapped_file[offset:offset + description["length"] * dtype.itemsize].view(dtype)
+            else:
+                input_file.seek(offset)
+                column = numpy.fromfile(input_file, dtype=dtype, count=description["length"])
+            column.setflags(write=False)
+            columns[name] = column
+            if progress is not None:
+                progress((i + 1) / len(header["columns"]))
+    return header, columns
+
+
+def snapshot_from_columns(header: dict, columns: dict) -> EpitheliumSnapshot:
+    """
+    Creates an EpitheliumSnapshot from the header and columns of a columnar file (see read_columns),
+    which Epithelium.from_snapshot turns into an epithelium.
+    Furrow events are matched to the events in FurrowEventList by name, saved events and fields that no
+    longer exist are ignored.
+    :param header: The header of the file.
+    :param columns: The columns of the file.
+    :return: The snapshot
+    """
+    snapshot = EpitheliumSnapshot()
+    snapshot.columns = {name: columns[name] for name in numeric_columns}
+    snapshot.nbytes = sum(column.nbytes for column in snapshot.columns.values())
+    event_sets = [frozenset(_decode_cell_event(description) for description in descriptions)
+                  for descriptions in header["cell_event_sets"]]
+    snapshot.cell_events = [event_sets[i] for i in columns["cell_event_set"].tolist()]
+    snapshot.cell_quantity = header["cell_quantity"]
+    snapshot.cell_avg_radius = header["cell_avg_radius"]
+    snapshot.collision_handler_parameters = header["collision_handler"]
+
+    furrow = header["furrow"]
+    snapshot.furrow_position = furrow["position"]
+    snapshot.furrow_velocity = furrow["velocity"]
+    snapshot.furrow_last_position = furrow["last_position"]
+    events_by_name = {event.name: event for event in furrow_event_list}
+    for saved_event in furrow["events"]:
+        event = events_by_name.get(saved_event["name"])
+        if event is None:
+            continue
+        field_values = {name: value for name, value in saved_event["fields"].items() if name in event.field_types}
+        snapshot.furrow_events.append((event, field_values, columns[saved_event["last_processed_column"]]))
+    return snapshot
+
+
+def read_snapshot(file_path: str, progress=None) -> EpitheliumSnapshot:
+    """
+    Reads a columnar file into an EpitheliumSnapshot (see snapshot_from_columns).
+    :param file_path: The path of the file to read.
+    :param progress: Called with the fraction of the columns read after every column.
+    :return: The snapshot
+    """
+    return snapshot_from_columns(*read_columns(file_path, progress=progress))
+
+
+def read_epithelium(file_path: str, progress=None) -> Epithelium:
+    """
+    Loads an epithelium from a columnar file.
+    :param file_path: The path of the file to read.
+    :param progress: Called with the fraction of the epithelium loaded. Reading the columns is the first half,
+    creating the cells the second.
+    :return: The loaded epithelium. Its furrow has its own copies of the saved furrow events.
+    """
+    snapshot = read_snapshot(file_path, _scaled_progress(progress, 0, .5))
+    epithelium = Epithelium.from_snapshot(snapshot)
+    if progress is not None:
+        progress(1)
+    return epithelium
+
+
+def convert_pickled_epithelium(pickle_path: str, file_path: str) -> None:
+    """
+    Converts an epithelium saved with pickle (the format used before the columnar format) to a columnar file.
+    :param pickle_path: The path of the pickled epithelium.
+    :param file_path: The path of the columnar file to write. May be the same as pickle_path.
+    """
+    with open(pickle_path, "rb") as input_file:
+        epithelium = pickle.load(input_file)
+    if not isinstance(epithelium, Epithelium):
+        raise ValueError("%s does not contain a pickled epithelium" % pickle_path)
+    write_epithelium(epithelium, file_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts pickled epithelium files to the columnar format.")
+    parser.add_argument("files", nargs="+", help="pickled .epth files, converted in place")
+    for path in parser.parse_args().files:
+        if is_columnar_file(path):
+            print("%s is already columnar" % path)
+        else:
+            convert_pickled_epithelium(path, path)
+            print("converted %s" % path)
@@ -0,0 +1,310 @@
+import copy
+import os
+import tempfile
+import weakref
+
+import numpy
+
+from epithelium_backend.Cell import Cell
+from epithelium_backend.Cell import reserve_cell_ids
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.CellFate import decode_fate
+
+
+# per cell attributes stored as numeric columns, and the types of their columns
+cell_columns = (("cell_id", numpy.int64),
+                ("position_x", numpy.float64),
+                ("position_y", numpy.float64),
+                ("position_z", numpy.float64),
+                ("position_delta_x", numpy.float64),
+                ("position_delta_y", numpy.float64),
+                ("radius", numpy.float64),
+                ("max_radius", numpy.float64),
+                ("target_radius", numpy.float64),
+                ("growth_rate", numpy.float64),
+                ("dividable", numpy.bool_))
+
+# every numeric column of a snapshot, including those that are not plain cell attributes
+numeric_columns = tuple(name for name, _ in cell_columns) + ("fate", "related_offsets", "related_indices")
+
+
+class EpitheliumSnapshot(object):
+    """
+    The complete state of an epithelium stored as columns (one array per cell attribute),
+    along with the state of its furrow and furrow events. Created by Epithelium.snapshot and
+    restored with Epithelium.restore. A snapshot can be restored any number of times.
+
+    Columns are read only, so snapshots taken from the same epithelium share every
+    column that did not change between them (copy-on-write).
+
+    Snapshots bigger than their memory budget spill their numeric columns to disk,
+    and load them back when restored.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty snapshot. Use EpitheliumSnapshot.capture instead."""
+        self.columns = {}  # type: dict
+        self.cell_events = []  # type: list
+        self.cell_quantity = 0  # type: int
+        self.cell_avg_radius = 0  # type: float
+        self.collision_handler_parameters = None  # type: dict
+        self.furrow_position = 0  # type: float
+        self.furrow_velocity = 0  # type: float
+        self.furrow_last_position = 0  # type: float
+        self.furrow_events = []  # type: list
+        self.nbytes = 0  # type: int
+        self.spill_path = None  # type: str
+        self._spill_finalizer = None
+
+    @staticmethod
+    def capture(epithelium, previous=None, memory_budget: int = None, spill_directory: str = None):
+        """
+        Captures the state of an epithelium.
+        :param epithelium: The epithelium to capture.
+        :param previous: An earlier snapshot of the same epithelium. Columns that have not
+        changed since it was taken are shared instead of copied.
+        :param memory_budget: The number of bytes the numeric columns may occupy in memory.
+        Larger snapshots are spilled to disk. None for no limit.
+        :param spill_directory: Where to spill snapshots. Defaults to the system's temporary directory.
+        :return: The new EpitheliumSnapshot
+        """
+        snapshot = EpitheliumSnapshot()
+        columns = snapshot.columns
+        # cells that have not been created yet are captured straight from their columns
+        uncreated_cells = getattr(epithelium, "cell_columns", None)
+        if uncreated_cells is not None:
+            cells = []
+            index_of = {}
+            cell_count = len(uncreated_cells)
+            for name, dtype in cell_columns:
+                columns[name] = uncreated_cells.attribute_column(name, dtype)
+            columns["fate"] = numpy.zeros(cell_count, numpy.uint8)
+            columns["related_offsets"] = numpy.zeros(cell_count + 1, numpy.int64)
+            columns["related_indices"] = numpy.zeros(0, numpy.int64)
+            snapshot.cell_events = [uncreated_cells.cell_events] * cell_count
+        else:
+            cells = list(epithelium.cells)
+            index_of = snapshot._capture_cells(cells)
+
+        # share unchanged columns with the previous snapshot
+        if previous is not None:
+            previous_columns = previous.load_columns()
+            for name in numeric_columns:
+                if numpy.array_equal(columns[name], previous_columns[name]):
+                    columns[name] = previous_columns[name]
+        for column in columns.values():
+            column.setflags(write=False)
+        snapshot.nbytes = sum(column.nbytes for column in columns.values())
+
+        # epithelium
+        snapshot.cell_quantity = epithelium.cell_quantity
+        snapshot.cell_avg_radius = epithelium.cell_avg_radius
+        if uncreated_cells is not None:
+            # the collision handler will be created with its default parameters
+            snapshot.collision_handler_parameters = {} if cell_count else None
+        elif epithelium.cell_collision_handler is not None:
+            handler = epithelium.cell_collision_handler
+            snapshot.collision_handler_parameters = {"force_escape": handler.force_escape,
+                                                     "allow_overlap": handler.allow_overlap,
+                                                     "spring_constant": handler.spring_constant,
+                                                     "by_max_radius": handler.by_max_radius,
+                                                     "sleep_threshold": handler.sleep_threshold,
+                                                     "sleep_ticks": handler.sleep_ticks,
+                                                     "decompaction_processes": handler.decompaction_processes}
+            if handler.periodic:
+                snapshot.collision_handler_parameters.update(period_x=handler.period_x, period_y=handler.period_y)
+
+        # furrow
+        furrow = epithelium.furrow
+        snapshot.furrow_position = furrow.position
+        snapshot.furrow_velocity = furrow.velocity
+        snapshot.furrow_last_position = furrow.last_position
+        for event in furrow.events:
+            field_values = {name: field.value for name, field in event.field_types.items()}
+            last_processed = numpy.array(sorted(index_of[id(cell)] for cell in event.last_processed
+                                                if id(cell) in index_of), dtype=numpy.int64)
+            snapshot.furrow_events.append((event, field_values, last_processed))
+
+        if memory_budget is not None and snapshot.nbytes > memory_budget:
+            snapshot.spill(spill_directory)
+        return snapshot
+
+    @staticmethod
+    def capture_cells(cells: list):
+        """
+        Captures cells without the epithelium they belong to, such as the cells one process hands to another.
+        The snapshot has no furrow and no collision handler. Relationships to cells that are not captured are lost.
+        :param cells: The cells to capture.
+        :return: The new EpitheliumSnapshot
+        """
+        snapshot = EpitheliumSnapshot()
+        snapshot._capture_cells(list(cells))
+        for column in snapshot.columns.values():
+            column.setflags(write=False)
+        snapshot.nbytes = sum(column.nbytes for column in snapshot.columns.values())
+        return snapshot
+
+    def select(self, indices):
+        """
+        Returns a snapshot of some of the captured cells, along with the captured epithelium and furrow,
+        such as the cells of one tile of a large epithelium (see OutOfCoreEpithelium). Only the selected
+        rows of spilled or memory mapped columns are read. Relationships to cells that are not selected are lost.
+        :param indices: The indices of the cells to select, in the order the selected cells are stored in.
+        :return: The new EpitheliumSnapshot
+        """
+        columns = self.load_columns()
+        indices = numpy.asarray(indices, numpy.int64)
+        snapshot = EpitheliumSnapshot()
+        for name in numeric_columns[:-2]:
+            snapshot.columns[name] = columns[name][indices]
+
+        # the index of every captured cell among the selected cells, -1 if it is not selected
+        new_indices = numpy.full(len(self), -1, numpy.int64)
+        new_indices[indices] = numpy.arange(len(indices))
+        related_offsets = columns["related_offsets"]
+        starts = related_offsets[indices]
+        counts = related_offsets[indices + 1] - starts
+        rows = numpy.repeat(numpy.arange(len(indices)), counts)
+        positions = numpy.arange(len(rows)) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + starts[rows]
+        related = columns["related_indices"][positions]
+        related = numpy.where(related >= 0, new_indices[numpy.maximum(related, 0)], -1)
+        kept = related >= 0
+        kept_counts = numpy.bincount(rows[kept], minlength=len(indices))
+        snapshot.columns["related_offsets"] = numpy.concatenate(([0], numpy.cumsum(kept_counts))).astype(numpy.int64)
+        snapshot.columns["related_indices"] = related[kept]
+        for column in snapshot.columns.values():
+            column.setflags(write=False)
+        snapshot.nbytes = sum(column.nbytes for column in snapshot.columns.values())
+        snapshot.cell_events = [self.cell_events[i] for i in indices.tolist()]
+
+        snapshot.cell_quantity = self.cell_quantity
+        snapshot.cell_avg_radius = self.cell_avg_radius
+        snapshot.collision_handler_parameters = self.collision_handler_parameters
+        snapshot.furrow_position = self.furrow_position
+        snapshot.furrow_velocity = self.furrow_velocity
+        snapshot.furrow_last_position = self.furrow_last_position
+        for event, field_values, last_processed in self.furrow_events:
+            last_processed = new_indices[last_processed]
+            snapshot.furrow_events.append((event, field_values, last_processed[last_processed >= 0]))
+        return snapshot
+
+    def _capture_cells(self, cells: list) -> dict:
+        """
+        Fills the cell columns and cell events of this snapshot.
+        :param cells: The cells to capture.
+        :return: The index of every cell in the columns, by the id() of the cell.
+        """
+        columns = self.columns
+        cell_count = len(cells)
+        index_of = {id(cell): i for i, cell in enumerate(cells)}
+
+        # cell columns
+        for name, dtype in cell_columns:
+            columns[name] = numpy.fromiter((getattr(cell, name) for cell in cells), dtype, cell_count)
+        columns["fate"] = numpy.fromiter((cell_fate(cell) for cell in cells), numpy.uint8, cell_count)
+
+        # relationships between cells as index arrays, cell i is related to
+        # related_indices[related_offsets[i]:related_offsets[i+1]]
+        related_counts = numpy.fromiter((len(cell.related_cells) for cell in cells), numpy.int64, cell_count)
+        columns["related_offsets"] = numpy.concatenate(([0], numpy.cumsum(related_counts))).astype(numpy.int64)
+        columns["related_indices"] = numpy.fromiter((index_of.get(id(related), -1)
+                                                     for cell in cells for related in cell.related_cells),
+                                                    numpy.int64, int(columns["related_offsets"][-1]))
+
+        # cell events are functors shared between many cells, store each distinct set once
+        distinct_event_sets = {}
+        self.cell_events = [distinct_event_sets.setdefault(event_set, event_set)
+                            for event_set in (frozenset(cell.cell_events) for cell in cells)]
+        return index_of
+
+    @property
+    def spilled(self) -> bool:
+        """Returns True if the numeric columns of this snapshot are stored on disk."""
+        return self.spill_path is not None
+
+    def __len__(self) -> int:
+        return len(self.cell_events)
+
+    def spill(self, spill_directory: str = None) -> None:
+        """
+        Moves the numeric columns of this snapshot to disk. The file is deleted along with the snapshot.
+        :param spill_directory: Where to write the columns. Defaults to the system's temporary directory.
+        """
+        if self.spilled:
+            return
+        file_descriptor, path = tempfile.mkstemp(suffix=".npz", prefix="epithelium_snapshot_", dir=spill_directory)
+        with os.fdopen(file_descriptor, "wb") as spill_file:
+            numpy.savez(spill_file, **self.columns)
+        self.spill_path = path
+        self._spill_finalizer = weakref.finalize(self, os.remove, path)
+        self.columns = {}
+
+    def load_columns(self) -> dict:
+        """Returns the numeric columns of this snapshot, reading them from disk if they were spilled."""
+        if not self.spilled:
+            return self.columns
+        with numpy.load(self.spill_path) as spilled_columns:
+            columns = {name: spilled_columns[name] for name in numeric_columns}
+        for column in columns.values():
+            column.setflags(write=False)
+        return columns
+
+    def _bind_cell_events(self, epithelium) -> list:
+        """Returns the captured cell event sets with every functor bound to epithelium."""
+        bound_functors = {}
+        bound_sets = {}
+        for event_set in self.cell_events:
+            if event_set in bound_sets:
+                continue
+            bound_set = []
+            for functor in event_set:
+                if getattr(functor, "epithelium", epithelium) is not epithelium:
+                    if functor not in bound_functors:
+                        bound_functors[functor] = copy.copy(functor)
+                        bound_functors[functor].epithelium = epithelium
+                    functor = bound_functors[functor]
+                bound_set.append(functor)
+            bound_sets[event_set] = frozenset(bound_set)
+        return [bound_sets[event_set] for event_set in self.cell_events]
+
+    def create_cells(self, epithelium=None) -> list:
+        """
+        Creates new cells from the snapshot's columns.
+        Cell events are not copied, cells share the functors that were captured.
+        :param epithelium: The epithelium the cells are created for. Cell events bound to another
+        epithelium are copied once and bound to this one instead.
+        :return: The list of new cells in the order they were captured.
+        """
+        columns = self.load_columns()
+        cell_events = self.cell_events
+        if epithelium is not None:
+            cell_events = self._bind_cell_events(epithelium)
+        names = [name for name, _ in cell_columns]
+        rows = zip(*(columns[name].tolist() for name in names))
+        fates = {}
+        cells = []
+        new_cell = Cell.__new__
+        for row, fate, events in zip(rows, columns["fate"].tolist(), cell_events):
+            if fate not in fates:
+                fates[fate] = decode_fate(fate)
+            photoreceptor_type, support_specializations = fates[fate]
+
+            # bypass Cell.__init__, every attribute is set from the snapshot
+            cell = new_cell(Cell)
+            attributes = dict(zip(names, row))
+            attributes["photoreceptor_type"] = photoreceptor_type
+            attributes["support_specializations"] = set(support_specializations)
+            attributes["cell_events"] = set(events)
+            cell.__dict__ = attributes
+            cells.append(cell)
+
+        # the snapshot may have been taken in another process
+        if len(cells):
+            reserve_cell_ids(int(columns["cell_id"].max()))
+
+        related_offsets = columns["related_offsets"].tolist()
+        related_indices = columns["related_indices"].tolist()
+        for i, cell in enumerate(cells):
+            cell.related_cells = [cells[j] for j in related_indices[related_offsets[i]:related_offsets[i + 1]]
+                                  if j >= 0]
+        return cells
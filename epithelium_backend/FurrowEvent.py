@@ -1,3 +1,5 @@
+import copy
+
 from eye_development_gui.FieldType import IntegerFieldType
 
 
@@ -58,6 +60,16 @@ class FurrowEvent(object):
         self.last_processed = set(candidates) - self.last_processed
         self.run(self.field_types, epithelium, self.last_processed)
 
+    def copy(self):
+        """
+        Returns a copy of this event with its own field values, which have not processed any cells.
+        Used to run the same event with different parameters in several epithelia.
+        """
+        event_copy = copy.copy(self)
+        event_copy.field_types = {name: copy.copy(field) for name, field in self.field_types.items()}
+        event_copy.last_processed = set()
+        return event_copy
+
     @property
     def distance_from_furrow(self):
         return self.field_types[self.__distance_from_furrow_key].value
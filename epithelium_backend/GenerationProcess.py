@@ -0,0 +1,121 @@
+import time
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.GenerationProgress import GenerationProgress
+from epithelium_backend.OperationCancelled import OperationCancelled
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.TiledSheetGenerator import generate_epithelium
+from epithelium_backend.TiledSheetGenerator import tiled_generation_threshold
+
+
+class GenerationProcess(object):
+    """
+    Generates an epithelium in its own process so that relaxation never competes with the gui for the GIL.
+    The generated epithelium is returned in the columnar format (see EpitheliumFile): it is written to a file
+    the gui reads back, rather than pickling its cells over the connection. Several generation processes may
+    run at once to generate candidate epithelia on different cores.
+
+    Messages received (tuples whose first element is the command):
+        ('cancel',) : stops generation after the current relaxation iteration. Ends the process.
+
+    Messages sent:
+        ('progress', candidate, phase, fraction, residual) : how far generation has got (see GenerationProgress).
+        Sent at most once per percent, or whenever the phase changes.
+        ('preview', candidate, snapshot) : a RenderSnapshot of the partially relaxed cells.
+        ('done', candidate, file_path, residual) : the epithelium was written to file_path. residual is the
+        largest distance a cell moved in the last relaxation iteration.
+        ('cancelled', candidate) : generation was cancelled.
+        ('error', candidate, message) : generation failed.
+    """
+
+    def __init__(self,
+                 connection,
+                 candidate: int,
+                 cell_quantity: int,
+                 cell_avg_radius: float,
+                 cell_factory: CellFactory,
+                 file_path: str,
+                 cache: EpitheliumCache = None,
+                 preview_interval: float = None,
+                 tiled_threshold: int = tiled_generation_threshold) -> None:
+        """
+        :param connection: One end of a multiprocessing Pipe, the gui holds the other end.
+        :param candidate: Identifies the epithelium in messages, when several are generated at once.
+        :param cell_quantity: The number of cells (see Epithelium).
+        :param cell_avg_radius: The average cell radius (see Epithelium).
+        :param cell_factory: Creates the cells (see Epithelium).
+        :param file_path: The file the generated epithelium is written to.
+        :param cache: Seeded epithelia are loaded from and saved to this cache. None to always generate.
+        :param preview_interval: The seconds between previews, None for no previews.
+        :param tiled_threshold: The cell count from which epithelia are generated from tiles (see generate_epithelium).
+        """
+        self.connection = connection
+        self.candidate = candidate  # type: int
+        self.cell_quantity = cell_quantity  # type: int
+        self.cell_avg_radius = cell_avg_radius  # type: float
+        self.cell_factory = cell_factory  # type: CellFactory
+        self.file_path = file_path  # type: str
+        self.cache = cache  # type: EpitheliumCache
+        self.preview_interval = preview_interval  # type: float
+        self.tiled_threshold = tiled_threshold  # type: int
+
+        self.phase = None  # type: str
+        self.fraction = 0  # type: float
+        self.residual = None  # type: float
+        self.last_preview = 0  # type: float
+
+    def report_progress(self, progress: GenerationProgress) -> None:
+        """
+        Progress callback handed to the epithelium being generated. Relays progress to the gui
+        and raises OperationCancelled once the gui has cancelled generation.
+        :param progress: How far generation has got.
+        """
+        if self.connection.poll():
+            command = self.connection.recv()[0]
+            if command == 'cancel':
+                raise OperationCancelled()
+            raise ValueError("Unknown generation process command: %s" % command)
+
+        if progress.residual is not None:
+            self.residual = progress.residual
+        if progress.phase != self.phase or progress.fraction >= self.fraction + .01:
+            self.phase = progress.phase
+            self.fraction = progress.fraction
+            self.connection.send(('progress', self.candidate, progress.phase, progress.fraction, progress.residual))
+
+        now = time.perf_counter()
+        if self.preview_interval is not None and progress.cells and now - self.last_preview >= self.preview_interval:
+            self.last_preview = now
+            self.connection.send(('preview', self.candidate, RenderSnapshot.from_cells(progress.cells)))
+
+    def run(self) -> None:
+        """Generates the epithelium and writes it to the file."""
+        try:
+            epithelium = generate_epithelium(self.cell_quantity, self.cell_avg_radius, self.cell_factory,
+                                             self.cache, self.report_progress, self.tiled_threshold)
+            write_epithelium(epithelium, self.file_path)
+        except OperationCancelled:
+            self.connection.send(('cancelled', self.candidate))
+        except Exception as error:
+            self.connection.send(('error', self.candidate, str(error)))
+        else:
+            self.connection.send(('done', self.candidate, self.file_path, self.residual))
+
+
+def run_generation_process(connection,
+                           candidate: int,
+                           cell_quantity: int,
+                           cell_avg_radius: float,
+                           cell_factory: CellFactory,
+                           file_path: str,
+                           cache: EpitheliumCache = None,
+                           preview_interval: float = None,
+                           tiled_threshold: int = tiled_generation_threshold) -> None:
+    """
+    Entry point of a generation process. Generates one epithelium then returns.
+    Takes the same parameters as GenerationProcess.
+    """
+    GenerationProcess(connection, candidate, cell_quantity, cell_avg_radius, cell_factory, file_path, cache,
+                      preview_interval, tiled_threshold).run()
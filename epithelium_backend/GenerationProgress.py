@@ -0,0 +1,34 @@
+class GenerationProgress(object):
+    """
+    How far the generation of an epithelium has got, handed to the progress callback of Epithelium.
+    Generation first creates the cells, then relaxes (decompacts) them over a number of iterations.
+    Tiled generation (see TiledSheetGenerator) relaxes patches and the seams between them instead.
+    """
+
+    creating_cells = "Creating Cells"
+    relaxing = "Relaxing"
+    relaxing_patches = "Relaxing Patches"
+    relaxing_seams = "Relaxing Seams"
+
+    def __init__(self,
+                 phase: str,
+                 fraction: float,
+                 cells: list,
+                 iteration: int = 0,
+                 iterations: int = 0,
+                 residual: float = None) -> None:
+        """
+        :param phase: The phase generation is in, such as creating_cells or relaxing.
+        :param fraction: The fraction of the generation done, from 0 to 1.
+        :param cells: The cells created so far, partially relaxed. Only valid during the callback.
+        :param iteration: The number of relaxation iterations done.
+        :param iterations: The number of relaxation iterations that will be run.
+        :param residual: The largest distance a cell moved in the last relaxation iteration,
+        None before the first iteration.
+        """
+        self.phase = phase  # type: str
+        self.fraction = fraction  # type: float
+        self.cells = cells  # type: list
+        self.iteration = iteration  # type: int
+        self.iterations = iterations  # type: int
+        self.residual = residual  # type: float
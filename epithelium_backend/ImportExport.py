@@ -1,19 +1,33 @@
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import is_columnar_file
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.EpitheliumFile import write_epithelium
+from epithelium_backend.EpitheliumFile import write_snapshot
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.OperationCancelled import OperationCancelled
 from quick_change import FurrowEventList
 import pickle
 import wx
 from wx.core import TextCtrl
 
 
-def import_epithelium(file_path: str) -> Epithelium:
+def import_epithelium(file_path: str, progress=None) -> Epithelium:
     """
     Loads an epithelium from a file. If an epithelium cannot be successfully loaded None is returned.
+    Files saved with pickle by earlier versions are still loaded, see EpitheliumFile to convert them.
     :param file_path: Path to epithelium save file.
+    :param progress: Called with the fraction of the epithelium loaded. May raise OperationCancelled to stop loading.
     """
 
     try:
+        if is_columnar_file(file_path):
+            return read_epithelium(file_path, progress)
         with open(file_path, "rb") as input_file:
             epithelium = pickle.load(input_file)
+        if progress is not None:
+            progress(1)
+    except OperationCancelled:
+        raise
     except Exception:
         return None
 
@@ -24,14 +38,25 @@ def import_epithelium(file_path: str) -> Epithelium:
 
 def export_epithelium(epithelium: Epithelium, file_path: str) -> None:
     """
-    Saves an epithelium to a file
+    Saves an epithelium to a file in the columnar format (see EpitheliumFile)
     :param epithelium: The epithelium to save.
     :param file_path: The path to the file where the epithelium will be saved.
     :return:
     """
 
-    with open(file_path, "wb") as out_file:
-        pickle.dump(epithelium, out_file, protocol=pickle.HIGHEST_PROTOCOL)
+    write_epithelium(epithelium, file_path)
+
+
+def export_snapshot(snapshot: EpitheliumSnapshot, file_path: str, progress=None) -> None:
+    """
+    Saves a snapshot of an epithelium to a file in the columnar format, so the epithelium can keep
+    being simulated while the file is written.
+    :param snapshot: The snapshot to save.
+    :param file_path: The path to the file where the epithelium will be saved.
+    :param progress: Called with the fraction of the file written. May raise OperationCancelled to stop saving,
+    leaving any previous file in place.
+    """
+    write_snapshot(snapshot, file_path, progress=progress)
 
 
 def import_simulation_settings(file_path: str) -> dict:
@@ -43,30 +68,47 @@ def import_simulation_settings(file_path: str) -> dict:
 
     No information about the furrow event list is returned. These values are set within the function.
     """
+    settings = read_simulation_settings(file_path)
+    if settings is None:
+        return None
+    simulation_options_dict, imported_furrow_event_list = settings
+    apply_furrow_event_settings(imported_furrow_event_list)
+    # return the simulation options for the caller to update
+    return simulation_options_dict
+
+
+def read_simulation_settings(file_path: str) -> tuple:
+    """
+    Reads simulation options and specialization options from a file without applying them,
+    so the file can be read away from the gui thread.
+    :param file_path: Path to simulation save file.
+    :return: The simulation options (see import_simulation_settings) and the saved furrow events,
+    or None if the file cannot be read.
+    """
     try:
         with open(file_path, "rb") as input_file:
             # get inputs
             input = pickle.load(input_file)
-            simulation_options_dict = input[0]
-            imported_furrow_event_list = input[1]
-
-            # update furrow event list
-            for furrow_event in FurrowEventList.furrow_event_list:
-                for imported_event in imported_furrow_event_list:
-                    furrow_keys = set(furrow_event.field_types.keys())
-                    imported_keys = set(imported_event.field_types.keys())
-                    if furrow_keys == imported_keys:
-                        for key, val in imported_event.field_types.items():
-                            furrow_event.field_types[key] = val
-                        break
-
-            # return the simulation options for the caller to update
-            return simulation_options_dict
-
+            return input[0], input[1]
     except Exception:
         return None
 
 
+def apply_furrow_event_settings(imported_furrow_event_list: list) -> None:
+    """
+    Updates the field values of the furrow event list with those of saved furrow events.
+    :param imported_furrow_event_list: The furrow events read from a simulation save file.
+    """
+    for furrow_event in FurrowEventList.furrow_event_list:
+        for imported_event in imported_furrow_event_list:
+            furrow_keys = set(furrow_event.field_types.keys())
+            imported_keys = set(imported_event.field_types.keys())
+            if furrow_keys == imported_keys:
+                for key, val in imported_event.field_types.items():
+                    furrow_event.field_types[key] = val
+                break
+
+
 def export_simulation_settings(simulation_scroll_children: list, furrow_event_list: list, file_path: str):
     """
     Saves all simulation options and specialization options to a file.
@@ -75,13 +117,33 @@ def export_simulation_settings(simulation_scroll_children: list, furrow_event_li
     :param furrow_event_list: The furrow events to have options saved.
     :param file_path: Path to the save file.
     """
+    write_simulation_settings(simulation_options_from_widgets(simulation_scroll_children), furrow_event_list,
+                              file_path)
+
+
+def simulation_options_from_widgets(simulation_scroll_children: list) -> dict:
+    """
+    Returns the simulation options entered in the simulation settings scroll window.
+    :param simulation_scroll_children: A list containing the the StaticText and TextCtrl widgets from the
+    simulation settings scroll window.
+    :return: The value of every TextCtrl by the label text of the StaticText before it.
+    """
     simulation_options = dict()
     for i in range(len(simulation_scroll_children)):
         if isinstance(simulation_scroll_children[i], wx.StaticText):
             child = simulation_scroll_children[i]  # type: wx.StaticText
             text_ctrl = simulation_scroll_children[i + 1]  # type: TextCtrl
             simulation_options[child.GetLabelText()] = text_ctrl.GetValue()
+    return simulation_options
 
+
+def write_simulation_settings(simulation_options: dict, furrow_event_list: list, file_path: str):
+    """
+    Saves simulation options (see simulation_options_from_widgets) and specialization options to a file.
+    :param simulation_options: The simulation options.
+    :param furrow_event_list: The furrow events to have options saved.
+    :param file_path: Path to the save file.
+    """
     output = (simulation_options, furrow_event_list)
 
     with open(file_path, "wb") as out_file:
@@ -0,0 +1,62 @@
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumFile import read_columns
+from epithelium_backend.EpitheliumFile import snapshot_from_columns
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+
+class MappedEpithelium(object):
+    """
+    An epithelium saved in the columnar format (see EpitheliumFile) that is memory mapped rather than loaded.
+    Opening a file only reads its header, columns are read from the page cache as they are used, so
+    very large epithelia can be drawn and inspected without creating a single Cell.
+    Call materialize to create an Epithelium that can be simulated.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Maps a columnar epithelium file.
+        :param file_path: The path of the file.
+        """
+        self.file_path = file_path  # type: str
+        self.header, self.columns = read_columns(file_path, memory_map=True)
+
+    def __len__(self) -> int:
+        return self.header["cell_count"]
+
+    @property
+    def furrow_position(self) -> float:
+        """Returns the position of the saved furrow."""
+        return self.header["furrow"]["position"]
+
+    def render_snapshot(self) -> RenderSnapshot:
+        """Returns a RenderSnapshot whose columns are views of the mapped file."""
+        return RenderSnapshot(self.columns["position_x"], self.columns["position_y"],
+                              self.columns["radius"], self.columns["fate"], source=self)
+
+    def radius_statistics(self) -> tuple:
+        """Returns the average radius of the cells, and the largest difference between a radius and the average."""
+        if not len(self):
+            return 0, 0
+        radius = self.columns["radius"]
+        average_radius = float(numpy.mean(radius))
+        return average_radius, float(numpy.max(numpy.abs(radius - average_radius)))
+
+    def snapshot(self) -> EpitheliumSnapshot:
+        """Returns an EpitheliumSnapshot of the saved epithelium whose columns are views of the mapped file."""
+        return snapshot_from_columns(self.header, self.columns)
+
+    def materialize(self, progress=None) -> Epithelium:
+        """
+        Creates the saved epithelium, reading every column.
+        :param progress: Called with 0 before and 1 after the cells are created.
+        :return: The new Epithelium
+        """
+        if progress is not None:
+            progress(0)
+        epithelium = Epithelium.from_snapshot(self.snapshot())
+        if progress is not None:
+            progress(1)
+        return epithelium
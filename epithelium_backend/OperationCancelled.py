@@ -0,0 +1,5 @@
+class OperationCancelled(Exception):
+    """
+    Raised by the progress callback of a long operation, such as loading or generating an epithelium,
+    to abandon the operation once the user has cancelled it.
+    """
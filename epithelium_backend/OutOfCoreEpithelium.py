@@ -0,0 +1,366 @@
+import os
+from math import floor
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.EpitheliumFile import read_columns
+from epithelium_backend.EpitheliumFile import snapshot_from_columns
+from epithelium_backend.EpitheliumFile import write_snapshot
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.MappedEpithelium import MappedEpithelium
+from epithelium_backend.ParallelDecompactor import ParallelDecompactor
+from epithelium_backend.ParallelDecompactor import shared_decompactor
+from quick_change.CellEvents import PassiveGrowth
+
+
+def passive_growth(radius: numpy.ndarray,
+                   max_radius: numpy.ndarray,
+                   target_radius: numpy.ndarray,
+                   growth_rate: numpy.ndarray,
+                   dividable: numpy.ndarray,
+                   ticks: int) -> numpy.ndarray:
+    """
+    Returns the radii cells reach after growing for a number of ticks with PassiveGrowth, computed at once.
+    Cells grow, or shrink, by their growth rate until they reach the smaller of their max and target radius,
+    then alternate between shrinking and growing around it. A dividable cell whose radius exceeds its max
+    radius would divide; it keeps that radius instead and divides on its next tick with PassiveGrowth.
+    :return: The new radii.
+    """
+    radius = numpy.asarray(radius, numpy.float64)
+    growth_rate = numpy.asarray(growth_rate, numpy.float64)
+    target = numpy.minimum(max_radius, target_radius)
+    growing = growth_rate > 0
+    rate = numpy.where(growing, growth_rate, 1)
+
+    # cells below their target grow until they reach it, cells at or above it shrink until they are below it
+    below = radius < target
+    steps = numpy.where(below, numpy.ceil((target - radius) / rate), numpy.floor((radius - target) / rate) + 1)
+    direction = numpy.where(below, 1, -1)
+    reached = radius + direction * steps * rate
+    alternated = numpy.where((ticks - steps) % 2 == 0, reached, reached - direction * rate)
+    grown = numpy.where(ticks <= steps, radius + direction * ticks * rate, alternated)
+
+    # the first tick a cell exceeds its max radius: growing cells when they reach their target, shrinking
+    # cells after their first tick or when they first grow back
+    shrunk = radius - rate
+    division_tick = numpy.where(below, steps, numpy.where(shrunk > max_radius, 1, steps + 1))
+    division_radius = numpy.where(below, reached, numpy.where(shrunk > max_radius, shrunk, reached + rate))
+    dividing = numpy.asarray(dividable, bool) & (division_radius > max_radius) & (ticks >= division_tick)
+    grown = numpy.where(dividing, division_radius, grown)
+    return numpy.where(growing, grown, radius)
+
+
+class Tile(object):
+    """A tile of an OutOfCoreEpithelium that is stored on disk."""
+
+    def __init__(self, file_path: str, cell_count: int, tick: int, growing: bool) -> None:
+        """
+        :param file_path: The columnar file the cells of the tile are stored in.
+        :param cell_count: The number of cells in the tile.
+        :param tick: The tick the tile was stored at.
+        :param growing: True if the cells of the tile grow while it is stored, False if they are frozen.
+        """
+        self.file_path = file_path  # type: str
+        self.cell_count = cell_count  # type: int
+        self.tick = tick  # type: int
+        self.growing = growing  # type: bool
+
+
+class OutOfCoreEpithelium(object):
+    """
+    Simulates epithelia larger than memory by storing them as tiles on disk, cut across the path of the
+    furrow, and keeping only the band of tiles around the windows of the furrow events in memory.
+
+    Furrow events only touch cells in their window, posterior to the last event the pattern is frozen,
+    and anterior to the furrow cells only grow. So every tick the tiles the band has moved onto are read
+    (memory mapped) and created as cells of the resident epithelium, and the tiles it has left are written
+    back to disk. The resident epithelium is simulated like Epithelium.update, and its cells are pushed and
+    pulled by the cells of the stored tiles next to the band. Tiles anterior to the band are not simulated
+    while stored; when read, their cells are grown for the ticks they missed at once (see passive_growth).
+    Posterior tiles are stored as they are.
+
+    Relationships between cells of different tiles are kept by cell id while one of the cells is stored.
+    """
+
+    def __init__(self,
+                 snapshot: EpitheliumSnapshot,
+                 tile_directory: str,
+                 tile_width: float = None,
+                 margin: float = None) -> None:
+        """
+        Stores a captured epithelium as tiles. Use from_epithelium or from_file.
+        :param snapshot: The epithelium. Its columns are only read a tile at a time.
+        :param tile_directory: The directory the tiles are stored in.
+        :param tile_width: The width of the tiles along the path of the furrow.
+        Defaults to 20 average cell radii.
+        :param margin: How far beyond the windows of the furrow events tiles are kept in memory, must be at least
+        as far as furrow events look for neighbors. Defaults to 10 average cell radii.
+        """
+        self.tile_directory = tile_directory  # type: str
+        self.tile_width = tile_width or 20 * snapshot.cell_avg_radius  # type: float
+        self.margin = margin if margin is not None else 10 * snapshot.cell_avg_radius  # type: float
+        self.tick = 0  # type: int
+        # the tiles stored on disk, by index, tile k holds the cells from k * tile_width to (k + 1) * tile_width
+        self.tiles = {}  # type: dict
+        # relationships of stored cells and the cells they are related to, as related ids by cell id
+        self.remote_relations = {}  # type: dict
+        self._halo_cache = {}  # type: dict
+
+        # the resident epithelium, which starts without cells
+        self.epithelium = Epithelium.from_snapshot(snapshot.select([]))  # type: Epithelium
+        self.handler_parameters = snapshot.collision_handler_parameters or {}  # type: dict
+        self.decompactor = shared_decompactor(self.handler_parameters.get("decompaction_processes")) \
+            or ParallelDecompactor(1)
+        os.makedirs(tile_directory, exist_ok=True)
+
+        columns = snapshot.load_columns()
+        tile_of = numpy.floor(numpy.asarray(columns["position_x"]) / self.tile_width).astype(numpy.int64)
+        self._store_remote_relations(columns, tile_of)
+        order = numpy.argsort(tile_of, kind="stable")
+        sorted_tiles = tile_of[order]
+        boundaries = numpy.flatnonzero(numpy.diff(sorted_tiles)) + 1
+        lower_bound = self.band()[0]
+        for indices in numpy.split(order, boundaries):
+            if len(indices):
+                index = int(tile_of[indices[0]])
+                self._write_tile(index, snapshot.select(indices), self._is_anterior(index, lower_bound))
+        self.page()
+
+    @staticmethod
+    def from_epithelium(epithelium: Epithelium, tile_directory: str, tile_width: float = None, margin: float = None):
+        """
+        Stores an epithelium as tiles (see __init__). The epithelium is not changed.
+        :return: The new OutOfCoreEpithelium
+        """
+        return OutOfCoreEpithelium(EpitheliumSnapshot.capture(epithelium), tile_directory, tile_width, margin)
+
+    @staticmethod
+    def from_file(file_path: str, tile_directory: str, tile_width: float = None, margin: float = None):
+        """
+        Stores an epithelium saved in the columnar format as tiles (see __init__), without ever reading
+        the whole epithelium into memory.
+        :return: The new OutOfCoreEpithelium
+        """
+        return OutOfCoreEpithelium(MappedEpithelium(file_path).snapshot(), tile_directory, tile_width, margin)
+
+    def _store_remote_relations(self, columns: dict, tile_of: numpy.ndarray) -> None:
+        """Keeps the relationships between cells of different tiles by id."""
+        related_offsets = columns["related_offsets"]
+        related_indices = numpy.asarray(columns["related_indices"])
+        rows = numpy.repeat(numpy.arange(len(tile_of)), numpy.diff(related_offsets))
+        remote = (related_indices >= 0) & (tile_of[rows] != tile_of[numpy.maximum(related_indices, 0)])
+        cell_ids = numpy.asarray(columns["cell_id"])
+        for cell_id, related_id in zip(cell_ids[rows[remote]].tolist(), cell_ids[related_indices[remote]].tolist()):
+            self.remote_relations.setdefault(cell_id, set()).add(related_id)
+
+    def band(self) -> tuple:
+        """Returns the lowest and highest x position of the cells that are kept in memory."""
+        furrow = self.epithelium.furrow
+        distances = [event.distance_from_furrow for event in furrow.events] or [0]
+        # furrow events look back as far as twice the distance the furrow moves in a tick
+        return (furrow.position + min(distances) - self.margin,
+                furrow.position + max(distances) + 2 * abs(furrow.velocity) + self.margin)
+
+    def tile_index(self, position_x: float) -> int:
+        """Returns the index of the tile a position belongs to."""
+        return int(floor(position_x / self.tile_width))
+
+    def resident_tiles(self) -> range:
+        """Returns the indices of the tiles that overlap the band and are kept in memory."""
+        lower_bound, upper_bound = self.band()
+        return range(self.tile_index(lower_bound), self.tile_index(upper_bound) + 1)
+
+    def _is_anterior(self, index: int, lower_bound: float) -> bool:
+        """Returns True if a tile lies anterior to the band, where cells grow while it is stored."""
+        return (index + 1) * self.tile_width <= lower_bound
+
+    def _tile_path(self, index: int) -> str:
+        return os.path.join(self.tile_directory, "tile_%d.epth" % index)
+
+    def _write_tile(self, index: int, snapshot: EpitheliumSnapshot, growing: bool) -> None:
+        write_snapshot(snapshot, self._tile_path(index), {"tile": index, "tick": self.tick, "growing": growing})
+        self.tiles[index] = Tile(self._tile_path(index), len(snapshot), self.tick, growing)
+        self._halo_cache.pop(index, None)
+
+    def _read_tile(self, index: int) -> EpitheliumSnapshot:
+        """Reads a stored tile, growing its cells for the ticks they missed, and removes it from disk."""
+        tile = self.tiles.pop(index)
+        self._halo_cache.pop(index, None)
+        # the cells are about to be created, read the whole tile rather than mapping it
+        snapshot = snapshot_from_columns(*read_columns(tile.file_path))
+        columns = dict(snapshot.columns)
+        os.remove(tile.file_path)
+        ticks = self.tick - tile.tick
+        if tile.growing and ticks > 0 and len(snapshot):
+            grows = numpy.fromiter((any(isinstance(event, PassiveGrowth) for event in events)
+                                    for events in snapshot.cell_events), bool, len(snapshot))
+            grown = passive_growth(columns["radius"], columns["max_radius"], columns["target_radius"],
+                                   columns["growth_rate"], columns["dividable"], ticks)
+            columns["radius"] = numpy.where(grows, grown, columns["radius"])
+            columns["radius"].setflags(write=False)
+        snapshot.columns = columns
+        return snapshot
+
+    def _relink(self, cells: list, cells_by_id: dict) -> None:
+        """Restores the relationships of cells with cells that are in memory."""
+        remote_relations = self.remote_relations
+        for cell in cells:
+            related_ids = remote_relations.get(cell.cell_id)
+            if not related_ids:
+                continue
+            for related_id in list(related_ids):
+                related = cells_by_id.get(related_id)
+                if related is not None:
+                    if related not in cell.related_cells:
+                        cell.related_cells.append(related)
+                    related_ids.discard(related_id)
+            if not related_ids:
+                del remote_relations[cell.cell_id]
+
+    def page(self) -> bool:
+        """
+        Reads the stored tiles that overlap the band, and stores the cells of the tiles outside of it.
+        :return: True if any cells were read or stored.
+        """
+        epithelium = self.epithelium
+        resident = self.resident_tiles()
+        lower_bound = self.band()[0]
+        cells = epithelium.cells
+
+        # store cells outside of the band, grouped by tile
+        leaving = {}
+        for cell in cells:
+            index = self.tile_index(cell.position_x)
+            if index not in resident:
+                leaving.setdefault(index, []).append(cell)
+        if leaving:
+            departed = set(id(cell) for group in leaving.values() for cell in group)
+            cells = [cell for cell in cells if id(cell) not in departed]
+            for event in epithelium.furrow.events:
+                event.last_processed = set(cell for cell in event.last_processed if id(cell) not in departed)
+            for cell in cells:
+                if any(id(related) in departed for related in cell.related_cells):
+                    self._unlink(cell, departed)
+            for index, group in leaving.items():
+                if index in self.tiles:
+                    # a cell has drifted into a stored tile
+                    stored = self._read_tile(index).create_cells()
+                    group = stored + group
+                    self._relink(group, {cell.cell_id: cell for cell in group})
+                members = set(id(cell) for cell in group)
+                for cell in group:
+                    self._unlink(cell, members, keep=True)
+                self._write_tile(index, EpitheliumSnapshot.capture_cells(group), self._is_anterior(index, lower_bound))
+
+        # read the stored tiles the band has reached
+        arrived = []
+        for index in [index for index in resident if index in self.tiles]:
+            snapshot = self._read_tile(index)
+            tile_cells = snapshot.create_cells(epithelium)
+            for event, (_, _, last_processed) in zip(epithelium.furrow.events, snapshot.furrow_events):
+                event.last_processed.update(tile_cells[i] for i in last_processed.tolist())
+            arrived.extend(tile_cells)
+        if arrived:
+            cells = cells + arrived
+            self._relink(cells, {cell.cell_id: cell for cell in cells})
+
+        if leaving or arrived:
+            epithelium.cells = cells
+            if cells:
+                epithelium.cell_collision_handler = CellCollisionHandler(cells, **self.handler_parameters)
+            else:
+                epithelium.cell_collision_handler = None
+        return bool(leaving or arrived)
+
+    def _unlink(self, cell, group: set, keep: bool = False) -> None:
+        """
+        Replaces the relationships of a cell with cells outside (keep=True) or inside of a group of cells,
+        given by their id(), with their cell ids.
+        """
+        linked = []
+        for related in cell.related_cells:
+            if (id(related) in group) == keep:
+                linked.append(related)
+            else:
+                self.remote_relations.setdefault(cell.cell_id, set()).add(related.cell_id)
+        cell.related_cells = linked
+
+    def edge_halo(self) -> tuple:
+        """
+        Returns the x positions, y positions, and radii of the stored cells next to the band, which push
+        and pull the cells in memory.
+        """
+        resident = self.resident_tiles()
+        halo = [[], [], []]
+        for index in (resident.start - 1, resident.stop):
+            if index not in self.tiles:
+                continue
+            if index not in self._halo_cache:
+                _, columns = read_columns(self.tiles[index].file_path, memory_map=True)
+                self._halo_cache[index] = tuple(numpy.array(columns[name])
+                                                for name in ("position_x", "position_y", "radius"))
+            for column, tile_column in zip(halo, self._halo_cache[index]):
+                column.append(tile_column)
+        return tuple(numpy.concatenate(column) if column else numpy.zeros(0) for column in halo)
+
+    def update(self) -> None:
+        """Simulates the epithelium for one tick."""
+        epithelium = self.epithelium
+        furrow = epithelium.furrow
+        furrow.advance(furrow.velocity)
+        self.tick += 1
+        self.page()
+        if epithelium.cell_collision_handler is not None:
+            for event in furrow.events:
+                event(furrow.last_position, furrow.position, epithelium)
+        epithelium.run_cell_updates()
+        self.decompactor.decompact(epithelium.cells, self.handler_parameters.get("force_escape", 1.05),
+                                   self.handler_parameters.get("allow_overlap", 0.95),
+                                   self.handler_parameters.get("spring_constant", 0.32), self.edge_halo())
+        if epithelium.cell_collision_handler is not None:
+            epithelium.cell_collision_handler.fill_grid()
+
+    def advance(self, ticks: int):
+        """
+        Simulates the epithelium for a number of ticks.
+        :param ticks: The number of ticks to simulate.
+        :return: This epithelium
+        """
+        for _ in range(ticks):
+            self.update()
+        return self
+
+    @property
+    def cell_count(self) -> int:
+        """Returns the number of cells, in memory and stored."""
+        return len(self.epithelium.cells) + sum(tile.cell_count for tile in self.tiles.values())
+
+    def gather(self) -> Epithelium:
+        """
+        Creates the whole epithelium in memory, with the stored anterior cells grown to the current tick.
+        The tiles stay stored; the simulation can continue.
+        :return: The new Epithelium
+        """
+        snapshots = [EpitheliumSnapshot.capture(self.epithelium)]
+        for index in sorted(self.tiles):
+            growing = self.tiles[index].growing
+            # reading grows the cells to the current tick, store them grown
+            snapshot = self._read_tile(index)
+            self._write_tile(index, snapshot, growing)
+            snapshots.append(snapshot)
+        epithelium = Epithelium.from_snapshot(snapshots[0])
+        for snapshot in snapshots[1:]:
+            epithelium.cells.extend(snapshot.create_cells(epithelium))
+        cells = epithelium.cells
+        cells_by_id = {cell.cell_id: cell for cell in cells}
+        for cell_id, related_ids in self.remote_relations.items():
+            cell = cells_by_id.get(cell_id)
+            for related_id in related_ids:
+                related = cells_by_id.get(related_id)
+                if cell is not None and related is not None and related not in cell.related_cells:
+                    cell.related_cells.append(related)
+        if cells:
+            epithelium.cell_collision_handler = CellCollisionHandler(cells, **self.handler_parameters)
+        return epithelium
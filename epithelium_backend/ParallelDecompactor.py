@@ -0,0 +1,280 @@
+import argparse
+import atexit
+import multiprocessing
+import time
+from math import sqrt
+
+import numpy
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+from epithelium_backend.SpringForces import neighbor_pairs
+from epithelium_backend.SpringForces import spring_deltas
+
+
+# columns shared with the strip workers, in the order they are laid out in shared memory
+_columns = ("position_x", "position_y", "radius", "delta_x", "delta_y")
+
+# the shared memory this worker process has attached to, by name
+_attached = {}
+
+# the decompactors shared by the collision handlers of this process by number of processes, see shared_decompactor
+_shared_decompactors = {}
+
+
+def shared_decompactor(processes: int = None):
+    """
+    Returns the ParallelDecompactor the collision handlers of this process decompact large sheets with on
+    a number of processes, started the first time it is asked for. Daemonic processes, such as generation
+    processes, may not start a pool of their own and decompact in a single process.
+    :param processes: The number of processes, None to leave decompaction to CellCollisionHandler alone.
+    :return: The decompactor, None if processes is None.
+    """
+    if processes is None:
+        return None
+    if multiprocessing.current_process().daemon or shared_memory is None:
+        processes = 1
+    processes = max(processes, 1)
+    if processes not in _shared_decompactors:
+        _shared_decompactors[processes] = ParallelDecompactor(processes)
+        atexit.register(_shared_decompactors[processes].close)
+    return _shared_decompactors[processes]
+
+
+def strip_deltas(position_x: numpy.ndarray,
+                 position_y: numpy.ndarray,
+                 radius: numpy.ndarray,
+                 start: int,
+                 end: int,
+                 box_size: float,
+                 force_escape: float,
+                 allow_overlap: float,
+                 spring_constant: float) -> tuple:
+    """
+    Computes the position deltas of the cells of one strip of a sheet.
+    :param position_x: The x positions of every cell of the sheet, sorted.
+    :param position_y: The y positions of every cell of the sheet.
+    :param radius: The radii of every cell of the sheet.
+    :param start: The index of the first cell of the strip.
+    :param end: The index after the last cell of the strip.
+    :param box_size: The furthest apart two cells can push or pull each other.
+    :return: The x and y position deltas of cells start to end.
+    """
+    # the halo, cells of neighboring strips close enough to push or pull cells of this strip
+    halo_start = int(numpy.searchsorted(position_x, position_x[start] - box_size, "left"))
+    halo_end = int(numpy.searchsorted(position_x, position_x[end - 1] + box_size, "right"))
+    local_x = position_x[halo_start:halo_end]
+    local_y = position_y[halo_start:halo_end]
+    local_radius = radius[halo_start:halo_end]
+    first, second = neighbor_pairs(local_x, local_y, box_size)
+    # push_pull pushes cells on top of each other apart in a direction that depends on which cell comes first,
+    # order every pair along the sheet so that cells move the same however the sheet is cut into strips
+    first, second = numpy.minimum(first, second), numpy.maximum(first, second)
+    delta_x, delta_y = spring_deltas(local_x, local_y, local_radius, first, second, force_escape, allow_overlap,
+                                     spring_constant)
+    return delta_x[start - halo_start:end - halo_start], delta_y[start - halo_start:end - halo_start]
+
+
+def _map_columns(memory, capacity: int) -> dict:
+    """Maps the shared columns of a block of shared memory."""
+    return {name: numpy.ndarray((capacity,), dtype=numpy.float64, buffer=memory.buf, offset=index * capacity * 8)
+            for index, name in enumerate(_columns)}
+
+
+def _relax_strip(task: tuple) -> None:
+    """Computes the position deltas of the cells of one strip, in a worker process (see ParallelDecompactor)."""
+    name, capacity, cell_count, start, end, box_size, force_escape, allow_overlap, spring_constant = task
+    memory = _attached.get(name)
+    if memory is None:
+        # the decompactor replaces its shared memory when the sheet outgrows it
+        for old_memory in _attached.values():
+            old_memory.close()
+        _attached.clear()
+        memory = _attached[name] = shared_memory.SharedMemory(name=name)
+    columns = _map_columns(memory, capacity)
+    delta_x, delta_y = strip_deltas(columns["position_x"][:cell_count], columns["position_y"][:cell_count],
+                                    columns["radius"][:cell_count], start, end, box_size, force_escape,
+                                    allow_overlap, spring_constant)
+    columns["delta_x"][start:end] = delta_x
+    columns["delta_y"][start:end] = delta_y
+
+
+class ParallelDecompactor(object):
+    """
+    Decompacts large sheets of cells on several cores, with the forces of CellCollisionHandler.push_pull.
+
+    The positions and radii of the cells are copied into shared memory once per call to decompact, and
+    stay there for every iteration of the call. Each iteration the columns are sorted along the x axis
+    (the axis the furrow moves along), which is cheap as the cells barely move between iterations, and the
+    sheet is split into vertical strips of equally many cells. A pool of worker processes computes the
+    forces on the cells of each strip. Each strip reads the halo of cells of its neighbors that are close
+    enough to push or pull its own cells, but only writes the position deltas of its own cells, so the
+    strips never need locks. The cells are then moved in shared memory, which is how the halos are
+    exchanged, and since the strips are cut anew each time, their boundaries follow the density of the
+    sheet. The cells themselves are only moved once the last iteration is done.
+
+    With a single process the strips are computed in the calling process, without shared memory.
+    """
+
+    # sheets with fewer cells are left to CellCollisionHandler, they are faster to decompact than to copy
+    minimum_cells = 10000
+
+    def __init__(self, processes: int, strips_per_process: int = 1) -> None:
+        """
+        :param processes: The number of worker processes.
+        :param strips_per_process: The number of strips each process computes per iteration.
+        More strips even out the load when some strips take longer, at the cost of larger halos.
+        """
+        self.processes = processes  # type: int
+        self.strips = processes * strips_per_process  # type: int
+        self.capacity = 0  # type: int
+        self._memory = None
+        self._columns = None  # type: dict
+        self._pool = None
+
+    def strip_bounds(self, cell_count: int) -> list:
+        """Returns the index of the first cell and the index after the last cell of every strip."""
+        bounds = numpy.linspace(0, cell_count, self.strips + 1).astype(numpy.int64).tolist()
+        return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def _reserve(self, cell_count: int) -> None:
+        """Creates the worker pool, and the shared memory if the sheet has outgrown it."""
+        if self._pool is None:
+            # spawn rather than fork, wx does not survive being forked
+            self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+        if cell_count > self.capacity:
+            self._release_memory()
+            # room to grow, so that dividing cells do not replace the memory every iteration
+            self.capacity = max(cell_count + cell_count // 4, 1024)
+            self._memory = shared_memory.SharedMemory(create=True, size=len(_columns) * self.capacity * 8)
+            self._columns = _map_columns(self._memory, self.capacity)
+
+    def _release_memory(self) -> None:
+        if self._memory is not None:
+            self._columns = None
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+            self.capacity = 0
+
+    def decompact(self,
+                  cells: list,
+                  force_escape: float = 1.05,
+                  allow_overlap: float = 0.95,
+                  spring_constant: float = 0.32,
+                  halo: tuple = None,
+                  iterations: int = 1) -> float:
+        """
+        Pushes overlapping cells apart, like CellCollisionHandler.decompact, and moves them.
+        Position deltas the cells already had are applied along with the forces of the first iteration.
+        :param cells: The cells of the sheet.
+        :param halo: The x positions, y positions, and radii of cells that push and pull the cells but
+        are not moved, such as the cells another process moves (see ShardedSimulation). None for no halo.
+        :param iterations: The number of times to push the cells apart.
+        :return: The largest distance a cell was moved in the last iteration.
+        """
+        cell_count = len(cells)
+        if cell_count == 0:
+            return 0
+        columns = [numpy.fromiter((cell.position_x for cell in cells), numpy.float64, cell_count),
+                   numpy.fromiter((cell.position_y for cell in cells), numpy.float64, cell_count),
+                   numpy.fromiter((cell.radius for cell in cells), numpy.float64, cell_count)]
+        if halo is not None:
+            columns = [numpy.concatenate((column, numpy.asarray(halo_column, numpy.float64)))
+                       for column, halo_column in zip(columns, halo)]
+        total_count = len(columns[2])
+        # every pair of cells that push or pull each other is closer than this
+        box_size = 2 * force_escape * float(columns[2].max())
+
+        if self.processes == 1:
+            position_x, position_y, radius = columns
+            delta_x = numpy.empty(total_count)
+            delta_y = numpy.empty(total_count)
+        else:
+            self._reserve(total_count)
+            position_x, position_y, radius, delta_x, delta_y = (self._columns[name][:total_count]
+                                                                for name in _columns)
+            position_x[:], position_y[:], radius[:] = columns
+        # the index of the cell in every row of the columns, halo cells come after the cells and are not moved
+        index = numpy.arange(total_count)
+        pending_x = numpy.zeros(total_count)
+        pending_y = numpy.zeros(total_count)
+        pending_x[:cell_count] = numpy.fromiter((cell.position_delta_x for cell in cells), numpy.float64, cell_count)
+        pending_y[:cell_count] = numpy.fromiter((cell.position_delta_y for cell in cells), numpy.float64, cell_count)
+
+        residual = 0
+        for _ in range(iterations):
+            if (position_x[1:] < position_x[:-1]).any():
+                order = numpy.argsort(position_x, kind="stable")
+                for column in (position_x, position_y, radius, index, pending_x, pending_y):
+                    column[:] = column[order]
+            bounds = self.strip_bounds(total_count)
+            if self.processes == 1:
+                for start, end in bounds:
+                    delta_x[start:end], delta_y[start:end] = strip_deltas(
+                        position_x, position_y, radius, start, end, box_size, force_escape, allow_overlap,
+                        spring_constant)
+            else:
+                self._pool.map(_relax_strip, [(self._memory.name, self.capacity, total_count, start, end, box_size,
+                                               force_escape, allow_overlap, spring_constant)
+                                              for start, end in bounds])
+
+            # move the cells, like UpdateCellPosition
+            moved_x = delta_x + pending_x
+            moved_y = delta_y + pending_y
+            halo_rows = index >= cell_count
+            moved_x[halo_rows] = 0
+            moved_y[halo_rows] = 0
+            position_x += moved_x
+            position_y += moved_y
+            pending_x[:] = 0
+            pending_y[:] = 0
+            residual = sqrt(float((moved_x * moved_x + moved_y * moved_y).max()))
+
+        cell_x = numpy.empty(total_count)
+        cell_y = numpy.empty(total_count)
+        cell_x[index] = position_x
+        cell_y[index] = position_y
+        for cell, cell_position_x, cell_position_y in zip(cells, cell_x.tolist(), cell_y.tolist()):
+            cell.position_x = cell_position_x
+            cell.position_y = cell_position_y
+            cell.position_delta_x = 0
+            cell.position_delta_y = 0
+        return residual
+
+    def close(self) -> None:
+        """Stops the worker processes and frees the shared memory."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release_memory()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures how decompaction scales with the number of processes.")
+    parser.add_argument("cells", type=int, help="the number of cells in the sheet")
+    parser.add_argument("processes", type=int, nargs="+", help="the process counts to measure")
+    parser.add_argument("--iterations", type=int, default=20, help="decompaction iterations per measurement")
+    arguments = parser.parse_args()
+
+    from epithelium_backend.CellFactory import CellFactory
+    factory = CellFactory()
+    factory.seed = 0
+    sheet = factory.create_columns(arguments.cells)
+    print("processes  seconds per iteration  speedup")
+    first_seconds = None
+    for process_count in arguments.processes:
+        # every measurement starts from the same sheet
+        cells = factory.create_columns_at(sheet.position_x, sheet.position_y, sheet.radius).create_cells()
+        decompactor = ParallelDecompactor(process_count)
+        decompactor.decompact(cells)  # start the workers
+        start_time = time.perf_counter()
+        decompactor.decompact(cells, iterations=arguments.iterations)
+        seconds = (time.perf_counter() - start_time) / arguments.iterations
+        decompactor.close()
+        first_seconds = first_seconds or seconds
+        print("%9d  %21.3f  %7.2f" % (process_count, seconds, first_seconds / seconds))
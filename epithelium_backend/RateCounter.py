@@ -0,0 +1,34 @@
+import time
+
+
+class RateCounter(object):
+    """Measures how many times per second something happens, averaged over a window of time."""
+
+    def __init__(self, window: float = 1.0):
+        """
+        Initialize the counter.
+        :param window: The number of seconds each measurement is averaged over.
+        """
+        self.window = window  # type: float
+        self.rate = 0.0  # type: float
+        self._count = 0  # type: int
+        self._window_start = time.perf_counter()  # type: float
+
+    def count(self, occurrences: int = 1) -> None:
+        """
+        Records occurrences. Updates the measured rate whenever a window has passed.
+        :param occurrences: The number of occurrences to record.
+        """
+        self._count += occurrences
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed >= self.window:
+            self.rate = self._count / elapsed
+            self._count = 0
+            self._window_start = now
+
+    def reset(self) -> None:
+        """Discards all recorded occurrences and the measured rate."""
+        self.rate = 0.0
+        self._count = 0
+        self._window_start = time.perf_counter()
@@ -0,0 +1,197 @@
+import collections
+
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+
+
+class RelaxationDecision(object):
+    """How a RelaxationScheduler relaxed the epithelium during one tick."""
+
+    def __init__(self, tick: int, disturbance: float, iterations: int, residual: float,
+                 region_fraction: float, reason: str) -> None:
+        """
+        :param tick: The number of ticks the scheduler had relaxed before this one.
+        :param disturbance: The largest distance a cell moved, grew or shrank outside of decompaction
+        since the epithelium was last decompacted. New cells count as disturbed by their radius.
+        :param iterations: The number of decompactions run.
+        :param residual: The largest distance a cell was moved by the last decompaction, run this tick or before.
+        :param region_fraction: The fraction of the grid's occupied boxes that the decompactions were restricted to,
+        averaged over the decompactions. 1 when every decompaction covered the whole sheet, 0 when none ran.
+        :param reason: Why the scheduler stopped decompacting: "quiet", "relaxed", "stalled" or "budget".
+        """
+        self.tick = tick  # type: int
+        self.disturbance = disturbance  # type: float
+        self.iterations = iterations  # type: int
+        self.residual = residual  # type: float
+        self.region_fraction = region_fraction  # type: float
+        self.reason = reason  # type: str
+
+    def __repr__(self) -> str:
+        return "RelaxationDecision(tick=%d, disturbance=%g, iterations=%d, residual=%g, region_fraction=%g, " \
+               "reason=%r)" % (self.tick, self.disturbance, self.iterations, self.residual, self.region_fraction,
+                               self.reason)
+
+
+class RelaxationScheduler(object):
+    """
+    Decides how many times the cells of an epithelium are decompacted each tick, in place of the single
+    decompaction Epithelium.update otherwise runs.
+
+    Before decompacting, the scheduler measures how far cells moved, grew or shrank since they were last
+    decompacted, and how far the last decompaction moved them. When both are below tolerance, the sheet is
+    left alone for the tick, and the changes add up until they are worth relaxing. Otherwise the sheet is
+    decompacted until it moves less than tolerance, stops relaxing (the residual shrinks by less than
+    stall_ratio), or max_iterations decompactions have run. A first decompaction that moves the cells about
+    as far as the one before it did is not repeated, since the cells are oscillating rather than relaxing.
+
+    If regional, only the first decompaction of a tick after a disturbance covers the whole sheet, or only the
+    disturbed boxes of the grid if the sheet was already relaxed, and the others are restricted to the boxes
+    where cells still moved more than tolerance (see CellCollisionHandler.decompact_region).
+
+    Every tick's decision is kept in decisions, and summarized by metrics.
+    """
+
+    def __init__(self,
+                 max_iterations: int = 4,
+                 tolerance: float = 0.5,
+                 regional: bool = False,
+                 stall_ratio: float = 0.9,
+                 history: int = 1000) -> None:
+        """
+        :param max_iterations: The most decompactions run in a tick.
+        :param tolerance: The distance below which moving, growing and shrinking cells are considered relaxed.
+        :param regional: If true, decompactions after the first of a tick only cover the boxes that still move.
+        :param stall_ratio: Decompacting stops once the residual shrinks by less than this ratio.
+        :param history: The number of recent decisions kept.
+        """
+        self.max_iterations = max_iterations  # type: int
+        self.tolerance = tolerance  # type: float
+        self.regional = regional  # type: bool
+        self.stall_ratio = stall_ratio  # type: float
+        self.decisions = collections.deque(maxlen=history)
+        self.ticks = 0  # type: int
+        self.iterations = 0  # type: int
+        self.quiet_ticks = 0  # type: int
+        self.reset()
+
+    def __getstate__(self) -> dict:
+        """The state of the cells is not saved, so restored schedulers decompact on their first tick."""
+        state = dict(self.__dict__)
+        state["residual"] = None
+        state["last_states"] = {}
+        return state
+
+    def reset(self) -> None:
+        """Forgets the state of the cells, so the sheet is decompacted on the next tick."""
+        # the largest distance a cell was moved by the last decompaction, None before the first
+        self.residual = None  # type: float
+        # the position and radius of every cell after the last decompaction, by cell
+        self.last_states = {}
+
+    def disturbance(self, collision_handler: CellCollisionHandler) -> tuple:
+        """
+        Measures how far the cells moved, grew or shrank since they were last decompacted.
+        :param collision_handler: The collision handler of the cells.
+        :return: The largest change, and the set of grid boxes where cells changed by more than tolerance.
+        """
+        tolerance = self.tolerance
+        last_states = dict(self.last_states)
+        largest = 0
+        disturbed = []
+        for cell in collision_handler.cells:
+            state = last_states.pop(cell, None)
+            if state is None:
+                change = cell.radius
+            else:
+                change = max(abs(cell.position_x - state[0]), abs(cell.position_y - state[1]),
+                             abs(cell.radius - state[2]))
+            if change > largest:
+                largest = change
+            if change > tolerance:
+                disturbed.append(cell)
+        boxes = set(collision_handler.bin(cell) for cell in disturbed)
+        # dead cells leave a gap for the cells around them
+        dimension = collision_handler.dimension
+        for position_x, position_y, radius in last_states.values():
+            largest = max(largest, radius)
+            row = collision_handler.compute_row(position_y)
+            col = collision_handler.compute_col(position_x)
+            if 0 <= row < dimension and 0 <= col < dimension:
+                boxes.add(dimension * row + col)
+        return largest, boxes
+
+    def relax(self, collision_handler: CellCollisionHandler) -> RelaxationDecision:
+        """
+        Decompacts the cells of a collision handler as many times as this tick calls for.
+        :param collision_handler: The collision handler of the epithelium.
+        :return: The decision, which is also added to decisions.
+        """
+        disturbance, disturbed_boxes = self.disturbance(collision_handler)
+        tolerance = self.tolerance
+        relaxed = self.residual is not None and self.residual < tolerance
+        iterations = 0
+        covered = 0.0
+        reason = "budget"
+        if relaxed and disturbance < tolerance:
+            reason = "quiet"
+        else:
+            region = disturbed_boxes if self.regional and relaxed else None
+            while iterations < self.max_iterations:
+                occupied = len(collision_handler.non_empty) or 1
+                if region is None:
+                    states = self.states(collision_handler) if self.regional else None
+                    residual = collision_handler.decompact()
+                    covered += 1
+                    if states is not None:
+                        region = self.moved_boxes(collision_handler, states)
+                else:
+                    covered += min(len(region) / occupied, 1.0)
+                    residual, region = collision_handler.decompact_region(region, tolerance)
+                iterations += 1
+                previous = self.residual
+                self.residual = residual
+                if residual < tolerance:
+                    reason = "relaxed"
+                    break
+                # the first decompaction is compared to the last one of the tick before, which it may well exceed
+                if previous is not None and residual > previous * self.stall_ratio and \
+                        (iterations > 1 or residual * self.stall_ratio < previous):
+                    reason = "stalled"
+                    break
+            self.last_states = self.states(collision_handler)
+
+        decision = RelaxationDecision(self.ticks, disturbance, iterations,
+                                      self.residual if self.residual is not None else 0.0,
+                                      covered / iterations if iterations else 0.0, reason)
+        self.decisions.append(decision)
+        self.ticks += 1
+        self.iterations += iterations
+        if not iterations:
+            self.quiet_ticks += 1
+        return decision
+
+    @staticmethod
+    def states(collision_handler: CellCollisionHandler) -> dict:
+        """Returns the position and radius of every cell of a collision handler, by cell."""
+        return {cell: (cell.position_x, cell.position_y, cell.radius) for cell in collision_handler.cells}
+
+    def moved_boxes(self, collision_handler: CellCollisionHandler, states: dict) -> set:
+        """Returns the grid boxes of the cells that moved more than tolerance since states were taken."""
+        tolerance = self.tolerance
+        return set(collision_handler.bin(cell) for cell in collision_handler.cells
+                   if cell in states and (abs(cell.position_x - states[cell][0]) > tolerance or
+                                          abs(cell.position_y - states[cell][1]) > tolerance))
+
+    def metrics(self) -> dict:
+        """
+        Summarizes the decisions made so far.
+        :return: The number of ticks relaxed, of decompactions run, of ticks without a decompaction,
+        the average number of decompactions per tick, how often each reason stopped the decompactions
+        among the kept decisions, and the last decision.
+        """
+        reasons = collections.Counter(decision.reason for decision in self.decisions)
+        return {"ticks": self.ticks,
+                "iterations": self.iterations,
+                "quiet_ticks": self.quiet_ticks,
+                "iterations_per_tick": self.iterations / self.ticks if self.ticks else 0.0,
+                "reasons": dict(reasons),
+                "last_decision": self.decisions[-1] if self.decisions else None}
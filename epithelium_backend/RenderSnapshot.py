@@ -0,0 +1,109 @@
+import threading
+
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+
+
+class RenderSnapshot(object):
+    """
+    An immutable copy of everything needed to draw an epithelium.
+    Snapshots are safe to read from one thread while another thread keeps simulating
+    the epithelium they were taken from. The columns may also be read only views, such as
+    memory mapped files (see MappedEpithelium), of any numeric type.
+    """
+
+    def __init__(self,
+                 position_x: numpy.ndarray,
+                 position_y: numpy.ndarray,
+                 radius: numpy.ndarray,
+                 fate: numpy.ndarray,
+                 tick: int = 0,
+                 source=None) -> None:
+        """
+        Initializes the snapshot. The passed arrays are made read only.
+        :param position_x: x position of every cell.
+        :param position_y: y position of every cell.
+        :param radius: radius of every cell.
+        :param fate: fate code (see CellFate) of every cell.
+        :param tick: The number of simulation ticks run before this snapshot was taken.
+        :param source: An object kept alive for as long as this snapshot, such as the
+        shared memory that the columns are views into.
+        """
+        for column in (position_x, position_y, radius, fate):
+            column.setflags(write=False)
+        self.position_x = position_x  # type: numpy.ndarray
+        self.position_y = position_y  # type: numpy.ndarray
+        self.radius = radius  # type: numpy.ndarray
+        self.fate = fate  # type: numpy.ndarray
+        self.tick = tick  # type: int
+        self.source = source
+
+    def __len__(self) -> int:
+        return len(self.radius)
+
+    @staticmethod
+    def from_cells(cells: list, tick: int = 0):
+        """
+        Copies the render columns out of a list of cells.
+        :param cells: The cells to copy.
+        :param tick: The tick the cells are being simulated at.
+        :return: A new RenderSnapshot
+        """
+        cell_count = len(cells)
+        position_x = numpy.fromiter((cell.position_x for cell in cells), numpy.float32, cell_count)
+        position_y = numpy.fromiter((cell.position_y for cell in cells), numpy.float32, cell_count)
+        radius = numpy.fromiter((cell.radius for cell in cells), numpy.float32, cell_count)
+        fate = numpy.fromiter((cell_fate(cell) for cell in cells), numpy.uint8, cell_count)
+        return RenderSnapshot(position_x, position_y, radius, fate, tick)
+
+    @staticmethod
+    def from_epithelium(epithelium, tick: int = 0):
+        """
+        Copies the render columns out of an epithelium.
+        :param epithelium: The epithelium to copy.
+        :param tick: The tick the epithelium is being simulated at.
+        :return: A new RenderSnapshot
+        """
+        # cells that have not been created yet are drawn straight from their columns
+        uncreated_cells = getattr(epithelium, "cell_columns", None)
+        if uncreated_cells is not None:
+            return uncreated_cells.render_snapshot(tick)
+        # copy the list first so that cells added while reading do not change the column lengths
+        return RenderSnapshot.from_cells(list(epithelium.cells), tick)
+
+
+class SnapshotDoubleBuffer(object):
+    """
+    Hands render snapshots from a simulating thread to drawing threads.
+    The producer publishes into the back slot and the slots are swapped, so readers
+    always see the most recently completed snapshot and never wait on a simulation tick.
+    """
+
+    def __init__(self) -> None:
+        self._slots = [None, None]  # type: list
+        self._front_index = 0  # type: int
+        self._lock = threading.Lock()
+        self.version = 0  # type: int
+
+    @property
+    def front(self) -> RenderSnapshot:
+        """Returns the most recently published snapshot (None if nothing was published)."""
+        return self._slots[self._front_index]
+
+    def publish(self, snapshot: RenderSnapshot) -> None:
+        """
+        Makes snapshot the front of the buffer.
+        :param snapshot: A completed snapshot. It must not be modified after publishing.
+        """
+        with self._lock:
+            back_index = 1 - self._front_index
+            self._slots[back_index] = snapshot
+            self._front_index = back_index
+            self.version += 1
+
+    def clear(self) -> None:
+        """Removes all published snapshots."""
+        with self._lock:
+            self._slots = [None, None]
+            self.version += 1
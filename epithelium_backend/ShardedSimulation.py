@@ -0,0 +1,539 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import traceback
+
+import numpy
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.Cell import partition_cell_ids
+from epithelium_backend.CellCollisionHandler import CellCollisionHandler
+from epithelium_backend.EpitheliumFile import snapshot_from_columns
+from epithelium_backend.EpitheliumFile import snapshot_to_columns
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.ParallelDecompactor import ParallelDecompactor
+from epithelium_backend.ParallelDecompactor import shared_decompactor
+
+
+def _fate_state(cell) -> tuple:
+    """Returns the attributes of a cell furrow events specialize it by."""
+    return cell.photoreceptor_type, frozenset(cell.support_specializations), cell.target_radius, cell.dividable
+
+
+def _exchange(connection, message):
+    """
+    Sends a message to a neighboring shard while receiving the neighbor's message, so that two shards
+    sending large messages to each other at once cannot both block on a full socket.
+    :return: The neighbor's message.
+    """
+    if connection is None:
+        return None
+    sender = threading.Thread(target=connection.send, args=(message,))
+    sender.start()
+    try:
+        return connection.recv()
+    finally:
+        sender.join()
+
+
+class ShardCollisionHandler(CellCollisionHandler):
+    """
+    The collision handler of a shard (see ShardedSimulation). It holds the ghost cells mirrored from
+    the neighboring shards along with the shard's own cells, so that furrow events find them among the
+    neighbors of a cell, but furrow events never process ghost cells themselves: that is up to their owner.
+    """
+
+    def __init__(self, cells: list, ghosts: list, **parameters):
+        """
+        :param cells: The cells of the shard.
+        :param ghosts: The ghost cells.
+        :param parameters: The parameters of CellCollisionHandler.
+        """
+        CellCollisionHandler.__init__(self, list(cells) + list(ghosts), **parameters)
+        self.ghosts = set(id(ghost) for ghost in ghosts)  # type: set
+
+    def cells_between(self, min_x, max_x):
+        return [cell for cell in CellCollisionHandler.cells_between(self, min_x, max_x) if id(cell) not in self.ghosts]
+
+
+class ShardProcess(object):
+    """
+    Simulates one slab of a sharded epithelium (see ShardedSimulation), in its own process.
+    Every tick mirrors the steps of Epithelium.update:
+
+    1. The cells within the halo width of each edge of the slab are sent to the neighbor across that edge,
+       which adds them as ghost cells for its furrow events to see.
+    2. The furrow events run between the furrow positions sent by the coordinator. Changes they make to
+       ghost cells are sent back to the owners of the ghosts.
+    3. The cells of the slab run their cell events, growing, dividing, and dying.
+    4. The positions and radii of the cells near each edge are exchanged again, and the cells of the slab
+       are decompacted, pushed and pulled by the neighbors' cells but only moving their own.
+    5. Cells that have left the slab migrate to the neighbor whose slab they are in.
+
+    Messages received from the coordinator (tuples whose first element is the command):
+        ('setup', lower_bound, upper_bound, upper_address, header, columns, relations, halo_width) : the cells
+        of the slab (see snapshot_to_columns), their relationships to cells of other slabs as (cell id,
+        related cell id) pairs, and the address of the shard above, or None for the top shard.
+        ('tick', last_position, position) : simulates one tick with the furrow moving between the positions.
+        ('gather',) : sends the cells of the slab back.
+        ('stop',) : ends the process.
+
+    Messages sent to the coordinator:
+        ('hello', index, address) : the address neighbors connect to.
+        ('ready', index) : the shard is connected to its neighbors.
+        ('ticked', index, cell_count, migrated) : the tick is done, migrated cells left the slab.
+        ('gathered', index, header, columns, relations, last_processed) : the cells of the slab, their
+        relationships to cells of other slabs, and the ids of the cells each furrow event last processed.
+        ('error', index, message) : the shard failed and has stopped.
+    """
+
+    def __init__(self, coordinator_address, authkey: bytes, index: int, shard_count: int, family: str) -> None:
+        """
+        :param coordinator_address: The address of the coordinator's listener.
+        :param authkey: Authenticates every connection of the simulation.
+        :param index: The index of the slab, counting up from the lowest y.
+        :param shard_count: The number of shards.
+        :param family: The socket family of the connections, "AF_INET" or "AF_UNIX".
+        """
+        self.coordinator_address = coordinator_address
+        self.authkey = authkey  # type: bytes
+        self.index = index  # type: int
+        self.shard_count = shard_count  # type: int
+        self.family = family  # type: str
+        self.upper_address = None
+
+        self.coordinator = None
+        self.lower = None
+        self.upper = None
+        self.lower_bound = -numpy.inf  # type: float
+        self.upper_bound = numpy.inf  # type: float
+        self.halo_width = 0  # type: float
+        self.epithelium = None  # type: Epithelium
+        self.handler_parameters = {}  # type: dict
+        # relationships between cells of this slab and cells of other slabs, as related ids by cell id
+        self.remote_relations = {}  # type: dict
+        self.decompactor = None  # type: ParallelDecompactor
+
+    def run(self) -> None:
+        """Connects to the coordinator and the neighboring shards, then simulates until stopped."""
+        # cells created by every shard get ids no other shard gives out
+        partition_cell_ids(self.index, self.shard_count)
+        self.coordinator = multiprocessing.connection.Client(self.coordinator_address, authkey=self.authkey)
+        try:
+            with multiprocessing.connection.Listener(family=self.family, authkey=self.authkey) as listener:
+                self.coordinator.send(('hello', self.index, listener.address))
+                self.setup(*self.coordinator.recv()[1:])
+                # the top shard accepts first, then each shard below it in turn
+                if self.upper_address is not None:
+                    self.upper = multiprocessing.connection.Client(self.upper_address, authkey=self.authkey)
+                if self.index > 0:
+                    self.lower = listener.accept()
+            self.coordinator.send(('ready', self.index))
+
+            while True:
+                message = self.coordinator.recv()
+                command = message[0]
+                if command == 'tick':
+                    migrated = self.tick(message[1], message[2])
+                    self.coordinator.send(('ticked', self.index, len(self.epithelium.cells), migrated))
+                elif command == 'gather':
+                    self.coordinator.send(('gathered', self.index) + self.gather())
+                elif command == 'stop':
+                    break
+                else:
+                    raise ValueError("Unknown shard command: %s" % command)
+        except Exception:
+            self.coordinator.send(('error', self.index, traceback.format_exc()))
+        finally:
+            for connection in (self.lower, self.upper, self.coordinator):
+                if connection is not None:
+                    connection.close()
+
+    def setup(self, lower_bound: float, upper_bound: float, upper_address, header: dict, columns: dict,
+              relations: list, halo_width: float) -> None:
+        """Creates the epithelium of the slab (see the 'setup' message)."""
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        self.upper_address = upper_address
+        self.halo_width = halo_width
+        self.epithelium = Epithelium.from_snapshot(snapshot_from_columns(header, columns))
+        self.handler_parameters = header["collision_handler"] or {}
+        self.decompactor = shared_decompactor(self.handler_parameters.get("decompaction_processes")) \
+            or ParallelDecompactor(1)
+        for cell_id, related_id in relations:
+            self.remote_relations.setdefault(cell_id, set()).add(related_id)
+
+    def edge_cells(self, width: float) -> tuple:
+        """Returns the cells of the slab within width of its lower edge, and those within width of its upper edge."""
+        lower = [cell for cell in self.epithelium.cells if cell.position_y < self.lower_bound + width]
+        upper = [cell for cell in self.epithelium.cells if cell.position_y >= self.upper_bound - width]
+        return lower, upper
+
+    def exchange_ghosts(self) -> tuple:
+        """Exchanges the cells near the edges of the slab, returns the ghosts received from below and above."""
+        lower, upper = self.edge_cells(self.halo_width)
+        ghosts = []
+        for connection, cells in ((self.lower, lower), (self.upper, upper)):
+            received = _exchange(connection, snapshot_to_columns(EpitheliumSnapshot.capture_cells(cells)))
+            ghosts.append([] if received is None else snapshot_from_columns(*received).create_cells())
+        return ghosts[0], ghosts[1]
+
+    def write_back_ghosts(self, lower_ghosts: list, upper_ghosts: list, states: dict) -> None:
+        """Sends the changes furrow events made to ghost cells to their owners, and applies theirs."""
+        received = []
+        for connection, ghosts in ((self.lower, lower_ghosts), (self.upper, upper_ghosts)):
+            changed = [(ghost.cell_id,) + _fate_state(ghost) for ghost in ghosts
+                       if _fate_state(ghost) != states[id(ghost)]]
+            received.extend(_exchange(connection, changed) or [])
+        if received:
+            cells_by_id = {cell.cell_id: cell for cell in self.epithelium.cells}
+            for cell_id, photoreceptor_type, support_specializations, target_radius, dividable in received:
+                cell = cells_by_id.get(cell_id)
+                if cell is not None:
+                    cell.photoreceptor_type = photoreceptor_type
+                    cell.support_specializations = set(support_specializations)
+                    cell.target_radius = target_radius
+                    cell.dividable = dividable
+
+    def exchange_halo(self) -> tuple:
+        """Exchanges the positions and radii of the cells near the edges, for decompaction."""
+        halo = [[], [], []]
+        for connection, cells in zip((self.lower, self.upper), self.edge_cells(self.halo_width)):
+            columns = tuple(numpy.array([getattr(cell, name) for cell in cells], numpy.float64)
+                            for name in ("position_x", "position_y", "radius"))
+            received = _exchange(connection, columns)
+            if received is not None:
+                for column, received_column in zip(halo, received):
+                    column.append(received_column)
+        return tuple(numpy.concatenate(column) if column else numpy.zeros(0) for column in halo)
+
+    def migrate(self) -> int:
+        """Hands the cells that have left the slab to the neighbors, and adopts the cells they hand over."""
+        epithelium = self.epithelium
+        leaving = ([cell for cell in epithelium.cells if cell.position_y < self.lower_bound],
+                   [cell for cell in epithelium.cells if cell.position_y >= self.upper_bound])
+        departed = set(id(cell) for cells in leaving for cell in cells)
+        if departed:
+            epithelium.cells = [cell for cell in epithelium.cells if id(cell) not in departed]
+
+        arrived = []
+        for connection, cells in zip((self.lower, self.upper), leaving):
+            migrants = set(id(cell) for cell in cells)
+            # relationships with cells that stay behind are kept by id
+            relations = [(cell.cell_id, related.cell_id) for cell in cells for related in cell.related_cells
+                         if id(related) not in migrants]
+            relations.extend((cell.cell_id, related_id) for cell in cells
+                             for related_id in self.remote_relations.pop(cell.cell_id, ()))
+            received = _exchange(connection, (snapshot_to_columns(EpitheliumSnapshot.capture_cells(cells)),
+                                              relations))
+            if received is not None:
+                (header, columns), received_relations = received
+                arrived.extend(snapshot_from_columns(header, columns).create_cells(epithelium))
+                for cell_id, related_id in received_relations:
+                    self.remote_relations.setdefault(cell_id, set()).add(related_id)
+        epithelium.cells.extend(arrived)
+        return len(departed)
+
+    def tick(self, last_position: float, position: float) -> int:
+        """
+        Simulates the slab for one tick (see the steps above).
+        :return: The number of cells that left the slab.
+        """
+        epithelium = self.epithelium
+        lower_ghosts, upper_ghosts = self.exchange_ghosts()
+        ghosts = lower_ghosts + upper_ghosts
+        if epithelium.cells or ghosts:
+            epithelium.cell_collision_handler = ShardCollisionHandler(epithelium.cells, ghosts,
+                                                                      **self.handler_parameters)
+        else:
+            epithelium.cell_collision_handler = None
+
+        # the coordinator moves the furrow, every shard runs its events between the same positions
+        furrow = epithelium.furrow
+        furrow.last_position, furrow.position = last_position, position
+        states = {id(ghost): _fate_state(ghost) for ghost in ghosts}
+        if epithelium.cell_collision_handler is not None:
+            # events that look at the extent of the sheet see past the edges of the slab
+            owned = epithelium.cells
+            epithelium.cells = owned + ghosts
+            try:
+                for event in furrow.events:
+                    event(furrow.last_position, furrow.position, epithelium)
+            finally:
+                epithelium.cells = owned
+        self.write_back_ghosts(lower_ghosts, upper_ghosts, states)
+
+        epithelium.run_cell_updates()
+
+        halo = self.exchange_halo()
+        radius = max([cell.radius for cell in epithelium.cells] + halo[2].tolist() + [0])
+        force_escape = self.handler_parameters.get("force_escape", 1.05)
+        if 2 * force_escape * radius > self.halo_width:
+            raise ValueError("Cells of radius %s push and pull further than the halo width %s"
+                             % (radius, self.halo_width))
+        self.decompactor.decompact(epithelium.cells, force_escape, self.handler_parameters.get("allow_overlap", 0.95),
+                                   self.handler_parameters.get("spring_constant", 0.32), halo)
+        return self.migrate()
+
+    def gather(self) -> tuple:
+        """Describes the cells of the slab for the 'gathered' message."""
+        cells = self.epithelium.cells
+        owned = set(id(cell) for cell in cells)
+        relations = [(cell.cell_id, related.cell_id) for cell in cells for related in cell.related_cells
+                     if id(related) not in owned]
+        relations.extend((cell_id, related_id) for cell_id, related_ids in self.remote_relations.items()
+                         for related_id in related_ids)
+        last_processed = [[cell.cell_id for cell in event.last_processed if id(cell) in owned]
+                          for event in self.epithelium.furrow.events]
+        header, columns = snapshot_to_columns(EpitheliumSnapshot.capture_cells(cells))
+        return header, columns, relations, last_processed
+
+
+def run_shard_process(coordinator_address, authkey: bytes, index: int, shard_count: int, family: str) -> None:
+    """
+    Entry point of a shard process. Simulates its slab until the coordinator stops it.
+    Takes the same parameters as ShardProcess.
+    """
+    ShardProcess(coordinator_address, authkey, index, shard_count, family).run()
+
+
+class ShardedSimulation(object):
+    """
+    Simulates an epithelium too large for one process by splitting it into horizontal slabs, each
+    simulated by its own shard process (see ShardProcess). Slabs are cut across the furrow, so every shard
+    runs furrow events on its share of the furrow. Shards talk to their neighbors directly over TCP or
+    Unix sockets, exchanging ghost cells, halos, and migrating cells every tick. This process is the
+    coordinator: it advances the furrow and sends its position to every shard, and gathers the slabs back
+    into one epithelium when asked to. Shards on localhost stand in for the nodes of a cluster.
+
+    With a single shard a tick is the same as Epithelium.update, decompacted with the forces of
+    ParallelDecompactor. With more shards the cells of the slabs move the same way, while the following
+    only hold approximately near the edges of the slabs:
+    - Furrow events that look at the extent of the whole epithelium, such as R8 selection keeping away
+      from the edges of the sheet, see the extent of their slab and its ghost cells.
+    - A cell specialized by a furrow event does not stop cells in other slabs from being specialized by
+      the same event in the same tick, since ghost cells are mirrored before the events run.
+    - Relationships between cells of different slabs are kept by cell id and restored when gathered,
+      but during the simulation a cell only sees a copy of a related cell in another slab.
+    Cell and furrow events must be those of quick_change, since they are sent between processes by name.
+    """
+
+    def __init__(self,
+                 epithelium: Epithelium,
+                 shards: int = 2,
+                 family: str = "AF_INET",
+                 halo_width: float = None) -> None:
+        """
+        :param epithelium: The epithelium to simulate. It is not changed, see gather.
+        :param shards: The number of shard processes.
+        :param family: "AF_INET" to connect shards over TCP, "AF_UNIX" for Unix sockets.
+        :param halo_width: How close to the edge of a slab a cell is mirrored into the neighboring slab.
+        Must be at least as far as cells push and pull each other, and as far as furrow events look for
+        neighbors. Defaults to 10 average cell radii.
+        """
+        self.epithelium = epithelium  # type: Epithelium
+        self.shard_count = shards  # type: int
+        self.family = family  # type: str
+        self.halo_width = halo_width if halo_width is not None else 10 * epithelium.cell_avg_radius  # type: float
+        self.furrow_position = epithelium.furrow.position  # type: float
+        self.furrow_last_position = epithelium.furrow.last_position  # type: float
+        self.tick = 0  # type: int
+        # the number of cells that moved from one slab to another, over every tick
+        self.migrated = 0  # type: int
+        self._processes = []  # type: list
+        self._connections = []  # type: list
+        self._listener = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def slab_bounds(self, position_y: numpy.ndarray) -> list:
+        """Returns the lower and upper bound of every slab, cut so that every slab starts with as many cells."""
+        cuts = numpy.quantile(position_y, numpy.arange(1, self.shard_count) / self.shard_count).tolist()
+        bounds = [-numpy.inf] + cuts + [numpy.inf]
+        for lower_bound, upper_bound in zip(cuts[:-1], cuts[1:]):
+            if upper_bound - lower_bound < self.halo_width:
+                raise ValueError("Slabs are narrower than the halo width, use fewer shards")
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def start(self) -> None:
+        """Starts the shard processes and hands each one its slab. If any shard fails, every shard is stopped."""
+        try:
+            self._start()
+        except BaseException:
+            self.close()
+            raise
+
+    def _start(self) -> None:
+        epithelium = self.epithelium
+        cells = list(epithelium.cells)
+        position_y = numpy.array([cell.position_y for cell in cells])
+        bounds = self.slab_bounds(position_y)
+
+        # spawn rather than fork, wx does not survive being forked
+        context = multiprocessing.get_context("spawn")
+        authkey = os.urandom(16)
+        self._listener = multiprocessing.connection.Listener(family=self.family, authkey=authkey)
+        for index in range(self.shard_count):
+            process = context.Process(target=run_shard_process,
+                                      args=(self._listener.address, authkey, index, self.shard_count, self.family),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+
+        # a shard that fails to start never connects, stop waiting for it once its process has ended
+        connected = threading.Event()
+        watchdog = threading.Thread(target=self._watch_processes, args=(connected, authkey), daemon=True)
+        watchdog.start()
+        connections = [None] * self.shard_count
+        addresses = [None] * self.shard_count
+        try:
+            for _ in range(self.shard_count):
+                connection = self._listener.accept()
+                _, index, address = self._receive(connection)
+                connections[index] = connection
+                addresses[index] = address
+        finally:
+            connected.set()
+            watchdog.join()
+        self._connections = connections
+
+        slab_of = numpy.searchsorted([upper_bound for _, upper_bound in bounds[:-1]], position_y, "right")
+        slab_by_id = {id(cell): slab for cell, slab in zip(cells, slab_of.tolist())}
+        handler = epithelium.cell_collision_handler
+        handler_parameters = None
+        if handler is not None:
+            handler_parameters = {"force_escape": handler.force_escape, "allow_overlap": handler.allow_overlap,
+                                  "spring_constant": handler.spring_constant, "by_max_radius": handler.by_max_radius,
+                                  "decompaction_processes": handler.decompaction_processes}
+        for index, (lower_bound, upper_bound) in enumerate(bounds):
+            slab_cells = [cell for cell, slab in zip(cells, slab_of.tolist()) if slab == index]
+            snapshot = EpitheliumSnapshot.capture_cells(slab_cells)
+            snapshot.cell_quantity = epithelium.cell_quantity
+            snapshot.cell_avg_radius = epithelium.cell_avg_radius
+            snapshot.collision_handler_parameters = handler_parameters
+            snapshot.furrow_position = self.furrow_position
+            snapshot.furrow_velocity = epithelium.furrow.velocity
+            snapshot.furrow_last_position = self.furrow_last_position
+            index_of = {id(cell): i for i, cell in enumerate(slab_cells)}
+            for event in epithelium.furrow.events:
+                field_values = {name: field.value for name, field in event.field_types.items()}
+                last_processed = numpy.array(sorted(index_of[id(cell)] for cell in event.last_processed
+                                                    if id(cell) in index_of), dtype=numpy.int64)
+                snapshot.furrow_events.append((event, field_values, last_processed))
+            relations = [(cell.cell_id, related.cell_id) for cell in slab_cells for related in cell.related_cells
+                         if slab_by_id.get(id(related)) != index]
+            header, columns = snapshot_to_columns(snapshot)
+            upper_address = addresses[index + 1] if index + 1 < self.shard_count else None
+            connections[index].send(('setup', lower_bound, upper_bound, upper_address, header, columns, relations,
+                                     self.halo_width))
+        for connection in connections:
+            self._receive(connection)
+
+    def _watch_processes(self, connected: threading.Event, authkey: bytes) -> None:
+        """
+        Connects to the listener and hangs up if a shard process ends before every shard has connected,
+        so that start stops waiting for it.
+        """
+        sentinels = [process.sentinel for process in self._processes]
+        while not connected.is_set():
+            if multiprocessing.connection.wait(sentinels, timeout=0.1):
+                multiprocessing.connection.Client(self._listener.address, authkey=authkey).close()
+                return
+
+    def _receive(self, connection) -> tuple:
+        """Receives a message from a shard, raising RuntimeError if the shard failed."""
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            raise RuntimeError("A shard process ended unexpectedly")
+        if message[0] == 'error':
+            raise RuntimeError("Shard %d failed:\n%s" % (message[1], message[2]))
+        return message
+
+    def advance(self, ticks: int):
+        """
+        Simulates the epithelium for a number of ticks.
+        :param ticks: The number of ticks to simulate.
+        :return: This simulation
+        """
+        velocity = self.epithelium.furrow.velocity
+        for _ in range(ticks):
+            # move the furrow forward, like Furrow.advance
+            self.furrow_last_position = self.furrow_position
+            self.furrow_position -= velocity
+            for connection in self._connections:
+                connection.send(('tick', self.furrow_last_position, self.furrow_position))
+            for connection in self._connections:
+                self.migrated += self._receive(connection)[3]
+            self.tick += 1
+        return self
+
+    def gather(self) -> Epithelium:
+        """
+        Collects the cells of every slab into a new epithelium, in the state the simulation has reached.
+        The shards keep simulating their slabs if advance is called again.
+        :return: The new Epithelium
+        """
+        for connection in self._connections:
+            connection.send(('gather',))
+        messages = [self._receive(connection) for connection in self._connections]
+
+        source = self.epithelium
+        epithelium = Epithelium(0, source.cell_avg_radius)
+        epithelium.cell_quantity = source.cell_quantity
+        epithelium.furrow.events = [event.copy() for event in source.furrow.events]
+        epithelium.furrow.position = self.furrow_position
+        epithelium.furrow.velocity = source.furrow.velocity
+        epithelium.furrow.last_position = self.furrow_last_position
+
+        cells = []
+        relations = []
+        last_processed = [set() for _ in epithelium.furrow.events]
+        for _, _, header, columns, shard_relations, shard_last_processed in messages:
+            cells.extend(snapshot_from_columns(header, columns).create_cells(epithelium))
+            relations.extend(shard_relations)
+            for processed, cell_ids in zip(last_processed, shard_last_processed):
+                processed.update(cell_ids)
+
+        cells_by_id = {cell.cell_id: cell for cell in cells}
+        for cell_id, related_id in relations:
+            cell, related = cells_by_id.get(cell_id), cells_by_id.get(related_id)
+            if cell is not None and related is not None and related not in cell.related_cells:
+                cell.related_cells.append(related)
+        for event, cell_ids in zip(epithelium.furrow.events, last_processed):
+            event.last_processed = set(cells_by_id[cell_id] for cell_id in cell_ids if cell_id in cells_by_id)
+
+        epithelium.cells = cells
+        handler = source.cell_collision_handler
+        if cells:
+            parameters = {}
+            if handler is not None:
+                parameters = {"force_escape": handler.force_escape, "allow_overlap": handler.allow_overlap,
+                              "spring_constant": handler.spring_constant, "by_max_radius": handler.by_max_radius}
+            epithelium.cell_collision_handler = CellCollisionHandler(cells, **parameters)
+        return epithelium
+
+    def close(self) -> None:
+        """Stops the shard processes."""
+        for connection in self._connections:
+            try:
+                connection.send(('stop',))
+            except (OSError, ValueError):
+                pass  # the shard has already stopped
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        self._connections = []
+        self._processes = []
@@ -0,0 +1,163 @@
+import weakref
+
+import numpy
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+
+# header layout (int64s): capacity, slot count, latest slot, then the tick and cell count of every slot
+_capacity_index = 0
+_slot_count_index = 1
+_latest_slot_index = 2
+_fixed_header_length = 3
+
+# render columns stored for every cell in a slot, and their types
+_columns = (("position_x", numpy.float32),
+            ("position_y", numpy.float32),
+            ("radius", numpy.float32),
+            ("fate", numpy.uint8))
+
+
+class SharedFrameRing(object):
+    """
+    A ring of render frames in a block of shared memory.
+    One process writes the render columns of an epithelium into the slots, any other process
+    can attach to the ring by name and read frames as numpy views into the block,
+    so frames are never pickled or copied on their way between processes.
+
+    The writer is responsible for not overwriting a slot that a reader is still using
+    (see SimulationProcess for the protocol used by the gui).
+    Snapshots read from a ring keep it mapped, their columns must not outlive the snapshot.
+    """
+
+    def __init__(self, memory, owner: bool) -> None:
+        """
+        Wraps a block of shared memory. Use SharedFrameRing.create or SharedFrameRing.attach instead.
+        :param memory: The shared_memory.SharedMemory holding the ring.
+        :param owner: True if this instance created the block and should unlink it when closed.
+        """
+        self.memory = memory
+        self.owner = owner  # type: bool
+        # numpy does not pin the shared memory, so track the snapshots that view it
+        self._readers = weakref.WeakSet()  # type: weakref.WeakSet
+        header_probe = numpy.ndarray((_fixed_header_length,), dtype=numpy.int64, buffer=memory.buf)
+        self.capacity = int(header_probe[_capacity_index])  # type: int
+        self.slot_count = int(header_probe[_slot_count_index])  # type: int
+
+        header_length = _fixed_header_length + 2 * self.slot_count
+        self._header = numpy.ndarray((header_length,), dtype=numpy.int64, buffer=memory.buf)
+        self._slot_ticks = self._header[_fixed_header_length:_fixed_header_length + self.slot_count]
+        self._slot_cell_counts = self._header[_fixed_header_length + self.slot_count:]
+
+        # map the columns of every slot
+        offset = self._header.nbytes
+        self._slots = []
+        for _ in range(self.slot_count):
+            slot = {}
+            for name, dtype in _columns:
+                slot[name] = numpy.ndarray((self.capacity,), dtype=dtype, buffer=memory.buf, offset=offset)
+                offset += slot[name].nbytes
+            self._slots.append(slot)
+
+    @staticmethod
+    def required_bytes(capacity: int, slot_count: int) -> int:
+        """Returns the size of the shared memory block needed to store a ring."""
+        header_bytes = (_fixed_header_length + 2 * slot_count) * numpy.dtype(numpy.int64).itemsize
+        cell_bytes = sum(numpy.dtype(dtype).itemsize for _, dtype in _columns)
+        return header_bytes + slot_count * capacity * cell_bytes
+
+    @staticmethod
+    def create(capacity: int, slot_count: int = 3):
+        """
+        Creates a new ring in a new block of shared memory.
+        :param capacity: The maximum number of cells in a frame.
+        :param slot_count: The number of frames in the ring.
+        :return: The new SharedFrameRing
+        """
+        if shared_memory is None:
+            raise RuntimeError("SharedFrameRing requires python 3.8 or greater")
+        memory = shared_memory.SharedMemory(create=True,
+                                            size=SharedFrameRing.required_bytes(max(capacity, 1), slot_count))
+        header = numpy.ndarray((_fixed_header_length,), dtype=numpy.int64, buffer=memory.buf)
+        header[_capacity_index] = max(capacity, 1)
+        header[_slot_count_index] = slot_count
+        header[_latest_slot_index] = -1
+        del header
+        return SharedFrameRing(memory, owner=True)
+
+    @staticmethod
+    def attach(name: str):
+        """
+        Attaches to a ring created by another process.
+        :param name: The name of the ring.
+        :return: The attached SharedFrameRing
+        """
+        if shared_memory is None:
+            raise RuntimeError("SharedFrameRing requires python 3.8 or greater")
+        return SharedFrameRing(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        """Returns the name other processes use to attach to this ring."""
+        return self.memory.name
+
+    @property
+    def latest_slot(self) -> int:
+        """Returns the slot of the last completed frame, or -1 if no frame has been written."""
+        return int(self._header[_latest_slot_index])
+
+    def write(self, slot: int, snapshot: RenderSnapshot) -> None:
+        """
+        Copies a snapshot into a slot and marks it as the latest completed frame.
+        :param slot: The slot to overwrite.
+        :param snapshot: The frame to write. Must not have more cells than the capacity of the ring.
+        """
+        cell_count = len(snapshot)
+        if cell_count > self.capacity:
+            raise ValueError("A frame of %d cells does not fit in a ring with capacity %d"
+                             % (cell_count, self.capacity))
+        columns = self._slots[slot]
+        for name, _ in _columns:
+            columns[name][:cell_count] = getattr(snapshot, name)
+        self._slot_ticks[slot] = snapshot.tick
+        self._slot_cell_counts[slot] = cell_count
+        self._header[_latest_slot_index] = slot
+
+    def read(self, slot: int) -> RenderSnapshot:
+        """
+        Returns the frame in a slot. The snapshot's columns are views into the shared memory.
+        :param slot: The slot to read.
+        """
+        columns = self._slots[slot]
+        cell_count = int(self._slot_cell_counts[slot])
+        snapshot = RenderSnapshot(*(columns[name][:cell_count] for name, _ in _columns),
+                                  tick=int(self._slot_ticks[slot]),
+                                  source=self)
+        self._readers.add(snapshot)
+        return snapshot
+
+    def close(self) -> bool:
+        """
+        Detaches from the ring, destroying it if this instance created it.
+        The ring should no longer be written after calling close.
+        :return: False if snapshots read from this ring are still in use, the ring stays mapped and
+        close should be retried once they are released. True otherwise.
+        """
+        if self.owner and self.memory is not None:
+            self.memory.unlink()
+            self.owner = False
+
+        if len(self._readers):
+            return False
+
+        if self.memory is not None:
+            self._header = self._slot_ticks = self._slot_cell_counts = None
+            self._slots = []
+            self.memory.close()
+            self.memory = None
+        return True
@@ -0,0 +1,157 @@
+import time
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RateCounter import RateCounter
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.SharedFrameRing import SharedFrameRing
+
+
+class SimulationProcess(object):
+    """
+    Simulates an epithelium in its own process so that the simulation never competes with
+    the gui for the GIL. Frames are written into a SharedFrameRing, only small control
+    messages travel over the connection to the gui.
+
+    Messages received (tuples whose first element is the command):
+        ('resume',) / ('pause',) / ('stop',) : begin, pause, or end simulation. 'stop' ends the process.
+        ('set_epithelium', epithelium) : replaces the simulated epithelium.
+        ('set_parameters', dict) : sets frame pacing attributes (frame_delay, ticks_per_frame, max_throughput).
+        ('set_field', event_index, name, value) : sets the value of a field of one of the furrow events.
+        ('hold', slot) : the gui is now drawing the frame in slot. Acknowledges the last frame.
+        ('fetch',) : requests a copy of the simulated epithelium.
+
+    Messages sent:
+        ('ring', name) : frames are now written to the ring with this name.
+        ('frame', slot, tick, tick_rate) : a frame was written. No further frames are written until
+        it is acknowledged with 'hold'. The held slot, and the slot held before it (which the gui
+        may still be drawing), are never overwritten.
+        ('epithelium', epithelium) : the reply to 'fetch'.
+    """
+
+    def __init__(self, connection, epithelium: Epithelium = None, slot_count: int = 3) -> None:
+        """
+        Initializes the simulation. The simulation starts out paused.
+        :param connection: One end of a multiprocessing Pipe, the gui holds the other end.
+        :param epithelium: The epithelium to simulate.
+        :param slot_count: The number of frames in the ring. At least 3 are needed to write a
+        new frame while the two most recently held frames are protected.
+        """
+        self.connection = connection
+        self.epithelium = epithelium  # type: Epithelium
+        self.slot_count = slot_count  # type: int
+        self.ring = None  # type: SharedFrameRing
+        self.tick = 0  # type: int
+        self.frame_delay = 0.1  # type: float
+        self.ticks_per_frame = 1  # type: int
+        self.max_throughput = False  # type: bool
+        self.tick_counter = RateCounter()  # type: RateCounter
+
+        self.resumed = False  # type: bool
+        self.stopped = False  # type: bool
+        self._held_slot = -1  # type: int
+        self._previous_held_slot = -1  # type: int
+        self._unacknowledged_slot = -1  # type: int
+
+    def handle_message(self, message: tuple) -> None:
+        """
+        Carries out one control message from the gui.
+        :param message: The message (see the class documentation).
+        """
+        command = message[0]
+        if command == 'resume':
+            self.tick_counter.reset()
+            self.resumed = True
+        elif command == 'pause':
+            self.resumed = False
+        elif command == 'stop':
+            self.resumed = False
+            self.stopped = True
+        elif command == 'set_epithelium':
+            self.epithelium = message[1]
+            self.tick = 0
+        elif command == 'set_parameters':
+            for name, value in message[1].items():
+                setattr(self, name, value)
+        elif command == 'set_field':
+            _, event_index, name, value = message
+            if self.epithelium is not None and event_index < len(self.epithelium.furrow.events):
+                field_types = self.epithelium.furrow.events[event_index].field_types
+                if name in field_types:
+                    field_types[name].value = value
+        elif command == 'hold':
+            self._previous_held_slot = self._held_slot
+            self._held_slot = message[1]
+            self._unacknowledged_slot = -1
+        elif command == 'fetch':
+            self.connection.send(('epithelium', self.epithelium))
+        else:
+            raise ValueError("Unknown simulation process command: %s" % command)
+
+    def publish(self, snapshot: RenderSnapshot) -> None:
+        """
+        Writes a frame into a slot the gui is not using and notifies the gui.
+        Grows the ring when the frame does not fit.
+        :param snapshot: The frame to write.
+        """
+        if self.ring is None or len(snapshot) > self.ring.capacity:
+            if self.ring is not None:
+                self.ring.close()
+            self.ring = SharedFrameRing.create(max(2 * len(snapshot), 1024), self.slot_count)
+            self._held_slot = self._previous_held_slot = -1
+            self.connection.send(('ring', self.ring.name))
+
+        protected_slots = (self._held_slot, self._previous_held_slot, self.ring.latest_slot)
+        slot = next(s for s in range(self.slot_count) if s not in protected_slots)
+        self.ring.write(slot, snapshot)
+        self._unacknowledged_slot = slot
+        self.connection.send(('frame', slot, snapshot.tick, self.tick_counter.rate))
+
+    def run(self) -> None:
+        """Simulates the epithelium while resumed, until stopped."""
+        ticks_since_frame = 0
+        last_frame_time = time.perf_counter()
+        try:
+            while not self.stopped:
+                # handle all waiting messages, waiting for one while paused
+                timeout = 0 if self.resumed else 0.1
+                while self.connection.poll(timeout):
+                    self.handle_message(self.connection.recv())
+                    timeout = 0
+                if not self.resumed or self.stopped:
+                    continue
+
+                tick_start = time.perf_counter()
+                self.epithelium.update()
+                self.tick += 1
+                ticks_since_frame += 1
+                self.tick_counter.count()
+
+                if self.max_throughput:
+                    frame_due = tick_start - last_frame_time >= self.frame_delay
+                else:
+                    frame_due = ticks_since_frame >= self.ticks_per_frame
+                # frames are dropped while the gui is still catching up with the previous one
+                if frame_due and self._unacknowledged_slot == -1:
+                    ticks_since_frame = 0
+                    last_frame_time = tick_start
+                    self.publish(RenderSnapshot.from_epithelium(self.epithelium, self.tick))
+
+                # wait out the rest of the tick, staying responsive to messages
+                if not self.max_throughput:
+                    tick_delay = self.frame_delay / self.ticks_per_frame
+                    remaining_delay = tick_delay - (time.perf_counter() - tick_start)
+                    if remaining_delay > 0:
+                        self.connection.poll(remaining_delay)
+        finally:
+            if self.ring is not None:
+                self.ring.close()
+
+
+def run_simulation_process(connection, epithelium: Epithelium = None, slot_count: int = 3) -> None:
+    """
+    Entry point of a simulation process. Simulates until told to stop.
+    :param connection: One end of a multiprocessing Pipe, the gui holds the other end.
+    :param epithelium: The epithelium to simulate.
+    :param slot_count: The number of frames in the shared frame ring.
+    """
+    SimulationProcess(connection, epithelium, slot_count).run()
@@ -0,0 +1,93 @@
+import numpy
+
+
+def neighbor_pairs(position_x: numpy.ndarray,
+                   position_y: numpy.ndarray,
+                   box_size: float,
+                   period: float = None) -> tuple:
+    """
+    Finds every pair of cells in the same or adjacent boxes of a grid, like CellCollisionHandler does,
+    without looping over the cells in python.
+    :param position_x: The x positions of the cells.
+    :param position_y: The y positions of the cells.
+    :param box_size: The smallest width of a box. Cells further apart than this are never paired.
+    :param period: The width of a square, periodic space that wraps around at its edges. None for open space.
+    :return: The indices (first, second) of the paired cells, each pair listed once.
+    """
+    if period is not None:
+        columns = rows = max(int(period // box_size), 1)
+        if columns < 3:
+            raise ValueError("A periodic patch must be at least three boxes wide")
+        box_x = (numpy.floor(numpy.mod(position_x, period) * columns / period)).astype(numpy.int64) % columns
+        box_y = (numpy.floor(numpy.mod(position_y, period) * rows / period)).astype(numpy.int64) % rows
+    else:
+        box_x = numpy.floor((position_x - position_x.min()) / box_size).astype(numpy.int64)
+        box_y = numpy.floor((position_y - position_y.min()) / box_size).astype(numpy.int64)
+        columns, rows = int(box_x.max()) + 1, int(box_y.max()) + 1
+
+    box = box_x * rows + box_y
+    order = numpy.argsort(box, kind="stable")
+    counts = numpy.bincount(box, minlength=columns * rows)
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    # the rank of every cell among the cells sorted by box, so pairs within a box are only listed once
+    rank = numpy.empty(len(order), numpy.int64)
+    rank[order] = numpy.arange(len(order))
+
+    first_pairs, second_pairs = [], []
+    # half of the surrounding boxes, so that pairs of boxes are only visited once
+    for offset_x, offset_y in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        neighbor_x, neighbor_y = box_x + offset_x, box_y + offset_y
+        if period is not None:
+            neighbor_x, neighbor_y = neighbor_x % columns, neighbor_y % rows
+            cells = numpy.arange(len(box))
+        else:
+            inside = (neighbor_x >= 0) & (neighbor_x < columns) & (neighbor_y < rows)
+            cells = numpy.nonzero(inside)[0]
+            neighbor_x, neighbor_y = neighbor_x[inside], neighbor_y[inside]
+        neighbor_box = neighbor_x * rows + neighbor_y
+        neighbor_counts = counts[neighbor_box]
+        first = numpy.repeat(cells, neighbor_counts)
+        # the position of each pair among the pairs of its first cell
+        pair_starts = numpy.cumsum(neighbor_counts) - neighbor_counts
+        within = numpy.arange(len(first)) - numpy.repeat(pair_starts, neighbor_counts)
+        second_rank = numpy.repeat(starts[neighbor_box], neighbor_counts) + within
+        if offset_x == 0 and offset_y == 0:
+            keep = second_rank > rank[first]
+            first, second_rank = first[keep], second_rank[keep]
+        first_pairs.append(first)
+        second_pairs.append(order[second_rank])
+    return numpy.concatenate(first_pairs), numpy.concatenate(second_pairs)
+
+
+def spring_deltas(position_x: numpy.ndarray,
+                  position_y: numpy.ndarray,
+                  radius: numpy.ndarray,
+                  first: numpy.ndarray,
+                  second: numpy.ndarray,
+                  force_escape: float = 1.05,
+                  allow_overlap: float = 0.95,
+                  spring_constant: float = 0.32,
+                  period: float = None) -> tuple:
+    """
+    Computes how far pairs of cells push and pull each other, with the forces of CellCollisionHandler.push_pull.
+    :param first: The indices of the first cell of every pair (see neighbor_pairs).
+    :param second: The indices of the second cell of every pair.
+    :param period: The width of a periodic space, whose cells are pushed by the nearest image of each other.
+    :return: The x and y position deltas of every cell.
+    """
+    cxnx = position_x[first] - position_x[second]
+    cyny = position_y[first] - position_y[second]
+    if period is not None:
+        cxnx -= period * numpy.round(cxnx / period)
+        cyny -= period * numpy.round(cyny / period)
+    min_dist = numpy.minimum(radius[first], radius[second]) / 100
+    cxnx = numpy.where(numpy.abs(cxnx) >= min_dist, cxnx, min_dist)
+    cyny = numpy.where(numpy.abs(cyny) >= min_dist, cyny, min_dist)
+    dist = numpy.maximum(numpy.sqrt(cxnx * cxnx + cyny * cyny), min_dist)
+    rest_length = radius[first] + radius[second]
+    s = numpy.where(dist <= force_escape * rest_length,
+                    spring_constant * (dist - allow_overlap * rest_length) / dist, 0)
+    cell_count = len(position_x)
+    delta_x = (numpy.bincount(second, s * cxnx, cell_count) - numpy.bincount(first, s * cxnx, cell_count))
+    delta_y = (numpy.bincount(second, s * cyny, cell_count) - numpy.bincount(first, s * cyny, cell_count))
+    return delta_x, delta_y
@@ -0,0 +1,298 @@
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+
+def _locate(ids: numpy.ndarray, targets: numpy.ndarray) -> numpy.ndarray:
+    """Returns the index in ids of every id in targets. Every target must be in ids."""
+    order = numpy.argsort(ids, kind="stable")
+    return order[numpy.searchsorted(ids[order], targets)]
+
+
+class TickRecord(object):
+    """
+    The render state of an epithelium after one tick. Keyframes hold the complete state, every
+    other record only holds what changed since the tick before it.
+    """
+
+    def __init__(self, tick: int, keyframe: EpitheliumSnapshot = None) -> None:
+        """
+        Initializes an empty record.
+        :param tick: The tick that was recorded.
+        :param keyframe: A snapshot of the whole epithelium if this record is a keyframe.
+        """
+        self.tick = tick  # type: int
+        self.keyframe = keyframe  # type: EpitheliumSnapshot
+
+        # keyframes: ids, quantized position_x / position_y / radius rows, and fates of every cell
+        self.state = None  # type: tuple
+
+        # deltas: cells that died, cells that were born, and cells whose values changed
+        self.died_ids = None  # type: numpy.ndarray
+        self.born_state = None  # type: tuple
+        self.moved_ids = None  # type: numpy.ndarray
+        self.moved_rows = None  # type: numpy.ndarray
+        self.fate_changed_ids = None  # type: numpy.ndarray
+        self.changed_fates = None  # type: numpy.ndarray
+
+    def arrays(self) -> list:
+        """
+        Returns the arrays held by this record, including the columns of its keyframe. Keyframes share
+        unchanged columns with the keyframe before them, and their state shares columns with the keyframe.
+        """
+        arrays = [self.died_ids, self.moved_ids, self.moved_rows, self.fate_changed_ids, self.changed_fates]
+        arrays.extend(self.state or ())
+        arrays.extend(self.born_state or ())
+        if self.keyframe is not None:
+            arrays.extend(self.keyframe.columns.values())
+        return [array for array in arrays if array is not None]
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the number of bytes held by this record, counting arrays it shares with other records."""
+        return sum(array.nbytes for array in {id(array): array for array in self.arrays()}.values())
+
+    def apply(self, state: tuple) -> tuple:
+        """
+        Applies the changes recorded by this delta to the state of the tick before it.
+        :param state: (ids, quantized rows, fates) of the previous tick.
+        :return: (ids, quantized rows, fates) of this tick.
+        """
+        ids, rows, fates = state
+        if len(self.died_ids):
+            alive = numpy.isin(ids, self.died_ids, invert=True)
+            ids, rows, fates = ids[alive], rows[alive], fates[alive]
+        if len(self.moved_ids):
+            rows = rows.copy()
+            rows[_locate(ids, self.moved_ids)] = self.moved_rows
+        if len(self.fate_changed_ids):
+            fates = fates.copy()
+            fates[_locate(ids, self.fate_changed_ids)] = self.changed_fates
+        if len(self.born_state[0]):
+            born_ids, born_rows, born_fates = self.born_state
+            ids = numpy.concatenate((ids, born_ids))
+            rows = numpy.concatenate((rows, born_rows))
+            fates = numpy.concatenate((fates, born_fates))
+        return ids, rows, fates
+
+
+class TickHistory(object):
+    """
+    A bounded record of the most recent ticks of an epithelium, used to step backwards and forwards
+    through a simulation without running it again.
+
+    Every keyframe_interval ticks the whole epithelium is captured in an EpitheliumSnapshot (a keyframe),
+    which the epithelium can be restored to. The ticks between keyframes are stored as deltas of
+    the render state: positions and radii quantized to position_resolution, fate codes, and the ids
+    of the cells that were born or died. Only the values that changed are stored.
+
+    When the history grows past its memory cap, the oldest keyframe is dropped along with its deltas.
+    Arrays shared by several records, such as the columns keyframes share, are only counted once.
+    """
+
+    def __init__(self,
+                 memory_cap: int = 64 * 1024 * 1024,
+                 keyframe_interval: int = 50,
+                 position_resolution: float = 1 / 256) -> None:
+        """
+        Initializes an empty history.
+        :param memory_cap: The number of bytes the history may occupy. At least one keyframe is always kept.
+        :param keyframe_interval: The number of ticks between keyframes.
+        :param position_resolution: The precision positions and radii are stored with.
+        """
+        self.memory_cap = memory_cap  # type: int
+        self.keyframe_interval = max(int(keyframe_interval), 1)  # type: int
+        self.position_resolution = position_resolution  # type: float
+        # the number of bytes of every array held by the records, counted once
+        self.nbytes = 0  # type: int
+        self.next_tick = 0  # type: int
+        self._records = []  # type: list
+        # the arrays held by the records and how many records hold them, by id
+        self._arrays = {}  # type: dict
+        self._last_keyframe = None  # type: TickRecord
+        self._previous_state = None  # type: tuple
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, tick: int) -> bool:
+        return len(self._records) > 0 and self.first_tick <= tick <= self.last_tick
+
+    @property
+    def first_tick(self) -> int:
+        """Returns the oldest recorded tick."""
+        return self._records[0].tick
+
+    @property
+    def last_tick(self) -> int:
+        """Returns the most recently recorded tick."""
+        return self._records[-1].tick
+
+    @property
+    def keyframe_ticks(self) -> list:
+        """Returns the ticks that an epithelium can be restored to."""
+        return [record.tick for record in self._records if record.keyframe is not None]
+
+    def clear(self) -> None:
+        """Removes every recorded tick. The next recorded tick is tick 0."""
+        self.__init__(self.memory_cap, self.keyframe_interval, self.position_resolution)
+
+    def quantize(self, values: numpy.ndarray) -> numpy.ndarray:
+        """Converts positions or radii to the fixed point values stored by the history."""
+        return numpy.rint(values / self.position_resolution).astype(numpy.int32)
+
+    def _render_state(self, cells: list) -> tuple:
+        """Returns the ids, quantized rows, and fates of a list of cells."""
+        cell_count = len(cells)
+        ids = numpy.fromiter((cell.cell_id for cell in cells), numpy.int64, cell_count)
+        values = numpy.fromiter((value for cell in cells
+                                 for value in (cell.position_x, cell.position_y, cell.radius)),
+                                numpy.float64, 3 * cell_count)
+        fates = numpy.fromiter((cell_fate(cell) for cell in cells), numpy.uint8, cell_count)
+        return ids, self.quantize(values).reshape(cell_count, 3), fates
+
+    def _snapshot_render_state(self, snapshot: EpitheliumSnapshot) -> tuple:
+        """Returns the ids, quantized rows, and fates of the cells in a snapshot."""
+        columns = snapshot.columns
+        values = numpy.stack([columns["position_x"], columns["position_y"], columns["radius"]], axis=1)
+        return columns["cell_id"], self.quantize(values), columns["fate"]
+
+    def _delta(self, tick: int, state: tuple) -> TickRecord:
+        """Creates the record of the changes between the previous state and state."""
+        ids, rows, fates = state
+        previous_ids, previous_rows, previous_fates = self._previous_state
+        record = TickRecord(tick)
+
+        if numpy.array_equal(ids, previous_ids):
+            # no births or deaths, the cells are in the same order
+            survived = numpy.ones(len(ids), dtype=bool)
+            previous_index = numpy.arange(len(ids))
+            record.died_ids = numpy.empty(0, dtype=numpy.int64)
+        else:
+            if len(previous_ids):
+                order = numpy.argsort(previous_ids, kind="stable")
+                sorted_ids = previous_ids[order]
+                matches = numpy.minimum(numpy.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+                survived = sorted_ids[matches] == ids
+                previous_index = order[matches[survived]]
+            else:
+                survived = numpy.zeros(len(ids), dtype=bool)
+                previous_index = numpy.empty(0, dtype=numpy.int64)
+            record.died_ids = previous_ids[numpy.isin(previous_ids, ids, invert=True)]
+
+        current_index = numpy.flatnonzero(survived)
+        moved = (rows[current_index] != previous_rows[previous_index]).any(axis=1)
+        record.moved_ids = ids[current_index[moved]]
+        record.moved_rows = rows[current_index[moved]]
+        fate_changed = fates[current_index] != previous_fates[previous_index]
+        record.fate_changed_ids = ids[current_index[fate_changed]]
+        record.changed_fates = fates[current_index[fate_changed]]
+        born = ~survived
+        record.born_state = (ids[born], rows[born], fates[born])
+        return record
+
+    def _hold(self, record: TickRecord) -> None:
+        """Counts the arrays of a record that no other record holds."""
+        for array in record.arrays():
+            held = self._arrays.get(id(array))
+            if held is None:
+                self._arrays[id(array)] = [array, 1]
+                self.nbytes += array.nbytes
+            else:
+                held[1] += 1
+
+    def _release(self, records: list) -> None:
+        """Stops counting the arrays of dropped records that no remaining record holds."""
+        for record in records:
+            for array in record.arrays():
+                held = self._arrays[id(array)]
+                held[1] -= 1
+                if not held[1]:
+                    del self._arrays[id(array)]
+                    self.nbytes -= array.nbytes
+
+    def record(self, epithelium) -> int:
+        """
+        Records the current state of an epithelium as the next tick.
+        :param epithelium: The epithelium, which must be the one recorded by every previous call.
+        :return: The recorded tick.
+        """
+        tick = self.next_tick
+        if self._last_keyframe is None or tick - self._last_keyframe.tick >= self.keyframe_interval:
+            keyframe = EpitheliumSnapshot.capture(epithelium, previous=None if self._last_keyframe is None
+                                                  else self._last_keyframe.keyframe)
+            record = TickRecord(tick, keyframe)
+            state = record.state = self._snapshot_render_state(keyframe)
+            self._last_keyframe = record
+        else:
+            state = self._render_state(list(epithelium.cells))
+            record = self._delta(tick, state)
+
+        self._previous_state = state
+        self._records.append(record)
+        self._hold(record)
+        self.next_tick = tick + 1
+        self._evict()
+        return tick
+
+    def _evict(self) -> None:
+        """Drops the oldest keyframes and their deltas until the history fits in its memory cap."""
+        while self.nbytes > self.memory_cap:
+            next_keyframe = next((i for i in range(1, len(self._records)) if self._records[i].keyframe is not None),
+                                 None)
+            if next_keyframe is None:
+                return
+            self._release(self._records[:next_keyframe])
+            del self._records[:next_keyframe]
+
+    def _index(self, tick: int) -> int:
+        """Returns the index of the record of a tick."""
+        if tick not in self:
+            raise KeyError("Tick %d is not in the history" % tick)
+        return tick - self.first_tick
+
+    def render_snapshot(self, tick: int) -> RenderSnapshot:
+        """
+        Rebuilds the render state of a recorded tick.
+        :param tick: A tick between first_tick and last_tick.
+        :return: A RenderSnapshot of the tick, with cells ordered by id.
+        """
+        index = self._index(tick)
+        start = index
+        while self._records[start].keyframe is None:
+            start -= 1
+        state = self._records[start].state
+        for record in self._records[start + 1:index + 1]:
+            state = record.apply(state)
+
+        ids, rows, fates = state
+        order = numpy.argsort(ids, kind="stable")
+        values = rows[order].astype(numpy.float32) * numpy.float32(self.position_resolution)
+        return RenderSnapshot(numpy.ascontiguousarray(values[:, 0]),
+                              numpy.ascontiguousarray(values[:, 1]),
+                              numpy.ascontiguousarray(values[:, 2]),
+                              fates[order], tick)
+
+    def restore(self, epithelium, tick: int, event_fields: bool = True) -> int:
+        """
+        Restores an epithelium to the last keyframe at or before a tick, and forgets every later tick
+        so that recording continues from there.
+        :param epithelium: The recorded epithelium.
+        :param tick: A tick between first_tick and last_tick.
+        :param event_fields: If false, the furrow events keep their current field values.
+        :return: The tick that the epithelium was restored to.
+        """
+        index = self._index(tick)
+        while self._records[index].keyframe is None:
+            index -= 1
+        record = self._records[index]
+        epithelium.restore(record.keyframe, event_fields)
+
+        self._release(self._records[index + 1:])
+        del self._records[index + 1:]
+        self._last_keyframe = record
+        self._previous_state = record.state
+        self.next_tick = record.tick + 1
+        return record.tick
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import math
+
+import numpy
+
+from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.EpitheliumCache import generation_code_version
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.GenerationProgress import GenerationProgress
+from epithelium_backend.SpringForces import neighbor_pairs
+from epithelium_backend.SpringForces import spring_deltas
+
+
+# the cell count from which epithelia are generated from tiles rather than relaxed as a whole by default
+tiled_generation_threshold = 5000
+
+
+def generate_epithelium(cell_quantity: int,
+                        cell_avg_radius: float,
+                        cell_factory: CellFactory,
+                        cache: EpitheliumCache = None,
+                        progress=None,
+                        tiled_threshold: int = tiled_generation_threshold) -> Epithelium:
+    """
+    Generates an epithelium, from tiles (see TiledSheetGenerator) if it has at least tiled_threshold
+    cells, or by relaxing the whole sheet (see Epithelium) otherwise.
+    Takes the same parameters as Epithelium.
+    :param cache: Relaxed patches and seeded epithelia are loaded from and saved to this cache.
+    None to always generate.
+    :param tiled_threshold: The cell count from which the epithelium is generated from tiles.
+    """
+    if cell_quantity >= tiled_threshold:
+        return TiledSheetGenerator(cache=cache).generate(cell_quantity, cell_avg_radius, cell_factory, progress)
+    if cache is not None:
+        return cache.generate(cell_quantity, cell_avg_radius, cell_factory, progress)
+    return Epithelium(cell_quantity, cell_avg_radius, cell_factory, progress)
+
+
+class TiledSheetGenerator(object):
+    """
+    Generates large epithelia from tiles instead of relaxing the whole sheet.
+
+    A handful of periodic patches, square sheets of cells whose edges wrap around, are relaxed once for
+    a radius distribution and then loaded from the cache. The sheet is covered by copies of these patches,
+    each randomly chosen, rotated and shifted, which is possible because periodic patches have no edges.
+    Only the cells along the seams between tiles are then relaxed, for a few iterations. Generation
+    therefore costs time in proportion to the area of the sheet.
+
+    Patches are relaxed without the python objects of CellCollisionHandler, by spring_deltas, which applies
+    the same forces.
+    """
+
+    cache_prefix = "patches-"
+
+    def __init__(self,
+                 patch_cells: int = 1024,
+                 patch_count: int = 4,
+                 seam_width: float = 3,
+                 seam_iterations: int = 40,
+                 cache: EpitheliumCache = None) -> None:
+        """
+        :param patch_cells: The number of cells in a patch.
+        :param patch_count: The number of different patches tiles are chosen from.
+        :param seam_width: The width of the relaxed band along every seam, in cell diameters.
+        :param seam_iterations: The number of times the seams are relaxed.
+        :param cache: Relaxed patches are loaded from and saved to this cache. None to always relax them.
+        """
+        self.patch_cells = patch_cells  # type: int
+        self.patch_count = patch_count  # type: int
+        self.seam_width = seam_width  # type: float
+        self.seam_iterations = seam_iterations  # type: int
+        self.cache = cache  # type: EpitheliumCache
+
+    def patch_key(self, cell_factory: CellFactory) -> str:
+        """Returns the key the patches for a cell factory's radius distribution are cached under."""
+        parameters = {"patch_cells": self.patch_cells,
+                      "patch_count": self.patch_count,
+                      "average_radius": cell_factory.average_radius,
+                      "radius_divergence": cell_factory.radius_divergence,
+                      "code_version": generation_code_version()}
+        return self.cache_prefix + hashlib.sha256(json.dumps(parameters, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def patch_side(self, radius: numpy.ndarray) -> float:
+        """
+        Returns the width of a patch of cells with these radii, chosen so the relaxed cells are packed as
+        tightly as the rest length of their springs allows.
+        """
+        # each relaxed cell takes a hexagon whose width is the overlapping diameter of the cell
+        spacing_squared = (2 * 0.95) ** 2 * numpy.mean(radius * radius)
+        return math.sqrt(len(radius) * math.sqrt(3) / 2 * spacing_squared)
+
+    def relax_patch(self, random: numpy.random.RandomState, cell_factory: CellFactory, progress=None) -> tuple:
+        """
+        Creates and relaxes one periodic patch.
+        :param random: The source of the patch's radii and initial positions.
+        :param cell_factory: Gives the radius distribution.
+        :param progress: Called with the fraction of the patch relaxed.
+        :return: The position_x, position_y, and radius of the patch's cells, and its width.
+        """
+        radius = random.uniform(cell_factory.average_radius * (1 - cell_factory.radius_divergence),
+                                cell_factory.average_radius * (1 + cell_factory.radius_divergence),
+                                self.patch_cells)
+        side = self.patch_side(radius)
+        position_x = random.uniform(0, side, self.patch_cells)
+        position_y = random.uniform(0, side, self.patch_cells)
+        box_size = 2 * 1.05 * radius.max()
+        # as many iterations as Epithelium relaxes a sheet of this many cells with
+        iterations = self.patch_cells // 2
+        for iteration in range(iterations):
+            first, second = neighbor_pairs(position_x, position_y, box_size, side)
+            delta_x, delta_y = spring_deltas(position_x, position_y, radius, first, second, period=side)
+            position_x = numpy.mod(position_x + delta_x, side)
+            position_y = numpy.mod(position_y + delta_y, side)
+            if progress is not None:
+                progress((iteration + 1) / iterations)
+        return position_x, position_y, radius, side
+
+    def patches(self, cell_factory: CellFactory, progress=None) -> list:
+        """
+        Returns the relaxed patches for a cell factory's radius distribution, from the cache when possible.
+        Patches are always relaxed from the same random state, so they do not depend on the factory's seed.
+        :param progress: Called with the fraction of the patches relaxed.
+        :return: A list of (position_x, position_y, radius, width) of every patch.
+        """
+        key = self.patch_key(cell_factory)
+        arrays = self.cache.get_arrays(key) if self.cache is not None else None
+        if arrays is not None:
+            return [(arrays["position_x"][index], arrays["position_y"][index], arrays["radius"][index],
+                     float(arrays["side"][index])) for index in range(self.patch_count)]
+
+        random = numpy.random.RandomState(0)
+        patches = []
+        for index in range(self.patch_count):
+            patch_progress = None if progress is None else \
+                lambda fraction, index=index: progress((index + fraction) / self.patch_count)
+            patches.append(self.relax_patch(random, cell_factory, patch_progress))
+        if self.cache is not None:
+            self.cache.put_arrays(key, {"position_x": numpy.array([patch[0] for patch in patches]),
+                                        "position_y": numpy.array([patch[1] for patch in patches]),
+                                        "radius": numpy.array([patch[2] for patch in patches]),
+                                        "side": numpy.array([patch[3] for patch in patches])})
+        return patches
+
+    def tile(self, cell_quantity: int, patches: list, random: numpy.random.RandomState) -> tuple:
+        """
+        Covers a sheet with randomly chosen, rotated, and shifted patches.
+        :param cell_quantity: The number of cells in the sheet. Cells beyond it are cut off the top of the sheet.
+        :param patches: The patches (see patches), all of the same width.
+        :param random: The source of the tile choices.
+        :return: The position_x, position_y, and radius of the sheet's cells, and the width of a tile.
+        """
+        side = patches[0][3]
+        tiles_x = max(int(math.ceil(math.sqrt(cell_quantity / self.patch_cells))), 1)
+        tiles_y = max(int(math.ceil(cell_quantity / (self.patch_cells * tiles_x))), 1)
+        columns = {"position_x": [], "position_y": [], "radius": []}
+        for tile_x in range(tiles_x):
+            for tile_y in range(tiles_y):
+                position_x, position_y, radius, _ = patches[random.randint(len(patches))]
+                # shifting and rotating a periodic patch by quarter turns leaves it periodic
+                position_x = numpy.mod(position_x + random.uniform(0, side), side)
+                position_y = numpy.mod(position_y + random.uniform(0, side), side)
+                for _ in range(random.randint(4)):
+                    position_x, position_y = side - position_y, position_x
+                    position_x = numpy.mod(position_x, side)
+                columns["position_x"].append(position_x + tile_x * side)
+                columns["position_y"].append(position_y + tile_y * side)
+                columns["radius"].append(radius)
+        position_x = numpy.concatenate(columns["position_x"])
+        position_y = numpy.concatenate(columns["position_y"])
+        radius = numpy.concatenate(columns["radius"])
+
+        # keep the bottom cell_quantity cells, so the sheet has exactly that many
+        kept = numpy.sort(numpy.argsort(position_y, kind="stable")[:cell_quantity])
+        return position_x[kept], position_y[kept], radius[kept], side
+
+    def relax_seams(self,
+                    position_x: numpy.ndarray,
+                    position_y: numpy.ndarray,
+                    radius: numpy.ndarray,
+                    side: float,
+                    progress=None) -> float:
+        """
+        Relaxes the cells along the seams between tiles, in place. Cells further from a seam stay where
+        their patch put them, but still push the relaxed cells.
+        :param side: The width of a tile.
+        :param progress: Called with the fraction of the iterations done and the residual of the last one.
+        :return: The largest distance a cell moved in the last iteration.
+        """
+        band = self.seam_width * 2 * radius.max()
+        reach = 2 * 1.05 * radius.max()
+        distance_x = numpy.abs(position_x - side * numpy.round(position_x / side))
+        distance_y = numpy.abs(position_y - side * numpy.round(position_y / side))
+        distance = numpy.minimum(distance_x, distance_y)
+        # the cells that move, and every cell close enough to push them
+        involved = numpy.nonzero(distance < band + reach)[0]
+        moving = distance[involved] < band
+
+        x, y, r = position_x[involved], position_y[involved], radius[involved]
+        residual = 0.0
+        # pairs are found within a margin of the reach, and only found again once cells may have crossed it
+        skin = radius.max() / 2
+        moved = numpy.inf
+        for iteration in range(self.seam_iterations):
+            if moved > skin / 2:
+                first, second = neighbor_pairs(x, y, reach + skin)
+                # only pairs that are close, and that move a cell, can push
+                close = numpy.hypot(x[first] - x[second], y[first] - y[second]) < reach + skin
+                close &= moving[first] | moving[second]
+                first, second = first[close], second[close]
+                moved = 0.0
+            delta_x, delta_y = spring_deltas(x, y, r, first, second)
+            delta_x[~moving] = 0
+            delta_y[~moving] = 0
+            x += delta_x
+            y += delta_y
+            residual = float(numpy.sqrt(numpy.max(delta_x * delta_x + delta_y * delta_y))) if len(x) else 0.0
+            moved += residual
+            if progress is not None:
+                progress((iteration + 1) / self.seam_iterations, residual)
+        position_x[involved] = x
+        position_y[involved] = y
+        return residual
+
+    def generate(self,
+                 cell_quantity: int,
+                 cell_avg_radius: float = 10,
+                 cell_factory: CellFactory = None,
+                 progress=None) -> Epithelium:
+        """
+        Generates an epithelium from tiles. Takes the same parameters as Epithelium.
+        The factory's seed decides the tile choices, so seeded sheets are the same every time.
+        """
+        if cell_factory is None:
+            cell_factory = CellFactory()
+
+        def report(phase: str, start: float, end: float, fraction: float, iteration: int = 0,
+                   iterations: int = 0, residual: float = None) -> None:
+            if progress is not None:
+                progress(GenerationProgress(phase, start + (end - start) * fraction, [], iteration, iterations,
+                                            residual))
+
+        report(GenerationProgress.relaxing_patches, 0, .6, 0)
+        patches = self.patches(cell_factory, lambda fraction: report(GenerationProgress.relaxing_patches,
+                                                                     0, .6, fraction))
+        random = numpy.random.RandomState(cell_factory.seed)
+        position_x, position_y, radius, side = self.tile(cell_quantity, patches, random)
+
+        report(GenerationProgress.relaxing_seams, .6, .8, 0, 0, self.seam_iterations)
+        self.relax_seams(position_x, position_y, radius, side,
+                         lambda fraction, residual: report(GenerationProgress.relaxing_seams, .6, .8, fraction,
+                                                           int(round(fraction * self.seam_iterations)),
+                                                           self.seam_iterations, residual))
+
+        report(GenerationProgress.creating_cells, .8, 1, 0)
+        epithelium = Epithelium(0, cell_avg_radius)
+        epithelium.cell_quantity = len(radius)
+        cell_factory.cell_events = epithelium.default_cell_events()
+        # the cells are only created once the epithelium is simulated
+        epithelium.set_cell_columns(cell_factory.create_columns_at(position_x, position_y, radius))
+        if len(position_x):
+            epithelium.furrow.position = float(position_x.max())
+        report(GenerationProgress.creating_cells, .8, 1, 1)
+        return epithelium
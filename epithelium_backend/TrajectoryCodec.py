@@ -0,0 +1,302 @@
+"""
+The compressed file format of long recorded trajectories, written by CompressedTrajectoryWriter
+and read by CompressedTrajectoryReader.
+
+Layout of a file:
+    8 bytes       magic number (compressed_trajectory_magic)
+    8 bytes       length of the header, little endian unsigned integer
+    header        utf-8 JSON: format version, compressor, position and radius resolution
+    chunks        one after the other
+
+Layout of a chunk:
+    chunk header  chunk_header_struct
+    ticks         the tick of every frame in the chunk (int64)
+    payload       the frames of the chunk, compressed as a whole by the compressor of the file
+
+Positions and radii are stored as fixed point integers, with a precision of the position and radius
+resolution. The first frame of a chunk is a keyframe that is decoded on its own, the other frames
+only store how they differ from the frame before them:
+    - the ids of the cells born and of the cells that died since the previous frame, and the ids of
+      every cell only when the cells were reordered in some other way
+    - the change of every fixed point value (int32), with the bytes of the values grouped by their
+      significance so that the many small changes compress well
+    - runs of consecutive cells whose fate changed to the same fate
+So any frame is decoded by decompressing its chunk and applying the frames from the keyframe on.
+"""
+
+import json
+import lzma
+import struct
+import zlib
+
+import numpy
+
+compressed_trajectory_magic = b"EPTHTRZ\x00"
+compressed_trajectory_format_version = 1
+chunk_magic = b"CHNK"
+
+# magic, frame count, compressed payload length, uncompressed payload length, payload crc32
+chunk_header_struct = struct.Struct("<4sIqqI")
+# tick, cell count, born count, died count, ids stored, fate run count
+frame_header_struct = struct.Struct("<qqqqqq")
+
+compressors = {"zlib": (zlib.compress, zlib.decompress),
+               "lzma": (lambda data, level: lzma.compress(data, preset=level), lzma.decompress)}
+
+# fate of a cell that did not exist in the previous frame, so the fate of every born cell is stored
+_no_fate = 255
+
+# length of the magic number and the header length
+_preamble_length = 16
+
+
+def write_header(out_file, header: dict) -> None:
+    """
+    Writes the header of a compressed trajectory file.
+    :param out_file: A file opened for binary writing, at its start.
+    :param header: The header values.
+    """
+    if header["compressor"] not in compressors:
+        raise ValueError("Unknown compressor %s, expected one of %s" % (header["compressor"], sorted(compressors)))
+    header_bytes = json.dumps(dict(header, version=compressed_trajectory_format_version)).encode("utf-8")
+    out_file.write(compressed_trajectory_magic)
+    out_file.write(len(header_bytes).to_bytes(8, "little"))
+    out_file.write(header_bytes)
+
+
+def read_header(in_file) -> tuple:
+    """
+    Reads the header of a compressed trajectory file.
+    :param in_file: A file opened for binary reading, at its start.
+    :return: The header as a dictionary, and the offset of the first chunk.
+    """
+    if in_file.read(len(compressed_trajectory_magic)) != compressed_trajectory_magic:
+        raise ValueError("Not a compressed trajectory file")
+    header_length = int.from_bytes(in_file.read(8), "little")
+    header = json.loads(in_file.read(header_length).decode("utf-8"))
+    if header["version"] > compressed_trajectory_format_version:
+        raise ValueError("The trajectory was written by a newer version (format %d, this version reads up to %d)"
+                         % (header["version"], compressed_trajectory_format_version))
+    return header, _preamble_length + header_length
+
+
+def is_compressed_trajectory_file(file_path: str) -> bool:
+    """Returns True if the file at file_path is a compressed trajectory file, False otherwise."""
+    try:
+        with open(file_path, "rb") as in_file:
+            return in_file.read(len(compressed_trajectory_magic)) == compressed_trajectory_magic
+    except OSError:
+        return False
+
+
+def encode_chunk(header: dict, ticks: list, payload: bytes) -> bytes:
+    """
+    Compresses the frames of a chunk.
+    :param header: The header of the trajectory.
+    :param ticks: The tick of every frame in the chunk.
+    :param payload: The encoded frames (see FrameEncoder).
+    :return: The chunk.
+    """
+    compress = compressors[header["compressor"]][0]
+    compressed = compress(payload, header["level"])
+    return chunk_header_struct.pack(chunk_magic, len(ticks), len(compressed), len(payload), zlib.crc32(compressed)) \
+        + numpy.asarray(ticks, numpy.dtype("<i8")).tobytes() + compressed
+
+
+def decode_chunk(header: dict, compressed: bytes) -> bytes:
+    """Returns the encoded frames of a chunk from its compressed payload."""
+    return compressors[header["compressor"]][1](compressed)
+
+
+def scan_chunks(in_file, chunks_start: int) -> tuple:
+    """
+    Finds every completely written chunk of a compressed trajectory file.
+    :param in_file: A file opened for binary reading.
+    :param chunks_start: The offset of the first chunk (see read_header).
+    :return: A list of (ticks, offset of the compressed payload, compressed length) for every chunk,
+    and the offset where the complete chunks end.
+    """
+    chunks = []
+    offset = chunks_start
+    file_length = in_file.seek(0, 2)
+    while offset + chunk_header_struct.size <= file_length:
+        in_file.seek(offset)
+        magic, frame_count, compressed_length, _, crc = chunk_header_struct.unpack(
+            in_file.read(chunk_header_struct.size))
+        payload_offset = offset + chunk_header_struct.size + 8 * frame_count
+        if magic != chunk_magic or payload_offset + compressed_length > file_length:
+            break
+        ticks = numpy.frombuffer(in_file.read(8 * frame_count), numpy.dtype("<i8"))
+        if zlib.crc32(in_file.read(compressed_length)) != crc:
+            break
+        chunks.append((ticks, payload_offset, compressed_length))
+        offset = payload_offset + compressed_length
+    return chunks, offset
+
+
+def _shuffle(values: numpy.ndarray) -> bytes:
+    """Groups the bytes of int32 values by their significance."""
+    return values.astype(numpy.dtype("<i4")).view(numpy.uint8).reshape(-1, 4).T.tobytes()
+
+
+def _unshuffle(data, offset: int, length: int) -> numpy.ndarray:
+    """Reverses _shuffle."""
+    planes = numpy.frombuffer(data, numpy.uint8, 4 * length, offset).reshape(4, length)
+    return numpy.ascontiguousarray(planes.T).view(numpy.dtype("<i4")).reshape(length)
+
+
+def _previous_indices(previous_ids: numpy.ndarray, ids: numpy.ndarray) -> numpy.ndarray:
+    """Returns the index of every id in previous_ids, -1 for ids that are not in previous_ids."""
+    if not len(previous_ids):
+        return numpy.full(len(ids), -1, numpy.int64)
+    order = numpy.argsort(previous_ids, kind="stable")
+    positions = numpy.minimum(numpy.searchsorted(previous_ids, ids, sorter=order), len(order) - 1)
+    indices = order[positions]
+    indices[previous_ids[indices] != ids] = -1
+    return indices
+
+
+class FrameState(object):
+    """The fixed point values of the cells of the most recently encoded or decoded frame."""
+
+    def __init__(self) -> None:
+        self.ids = numpy.empty(0, numpy.int64)  # type: numpy.ndarray
+        self.values = numpy.empty((3, 0), numpy.int64)  # type: numpy.ndarray
+        self.fate = numpy.empty(0, numpy.uint8)  # type: numpy.ndarray
+
+    def previous_columns(self, indices: numpy.ndarray) -> tuple:
+        """
+        Returns the values and fates of the previous frame for the cells of the next frame.
+        Born cells have the value 0 and no fate.
+        :param indices: The index of every cell in the previous frame, -1 for born cells.
+        None if the cells did not change since the previous frame.
+        """
+        if indices is None:
+            return self.values.copy(), self.fate.copy()
+        if not len(self.ids):
+            return numpy.zeros((3, len(indices)), numpy.int64), numpy.full(len(indices), _no_fate, numpy.uint8)
+        born = indices < 0
+        values = self.values.take(indices, axis=1, mode="clip")
+        values[:, born] = 0
+        fate = self.fate.take(indices, mode="clip")
+        fate[born] = _no_fate
+        return values, fate
+
+
+class FrameEncoder(FrameState):
+    """Encodes frames as changes against the frame encoded before them."""
+
+    def __init__(self, position_resolution: float, radius_resolution: float) -> None:
+        """
+        :param position_resolution: The precision positions are stored with.
+        :param radius_resolution: The precision radii are stored with.
+        """
+        super().__init__()
+        self.scales = numpy.array([[1 / position_resolution], [1 / position_resolution], [1 / radius_resolution]])
+
+    def keyframe(self) -> None:
+        """Encodes the next frame on its own."""
+        FrameState.__init__(self)
+
+    def encode(self, tick: int, ids: numpy.ndarray, position_x: numpy.ndarray, position_y: numpy.ndarray,
+               radius: numpy.ndarray, fate: numpy.ndarray) -> bytes:
+        """
+        Encodes a frame.
+        :return: The encoded frame.
+        """
+        ids = numpy.asarray(ids, numpy.int64)
+        values = numpy.rint(numpy.array([position_x, position_y, radius], numpy.float64).reshape(3, -1)
+                            * self.scales).astype(numpy.int64)
+        fate = numpy.asarray(fate, numpy.uint8)
+
+        if numpy.array_equal(ids, self.ids):
+            born_ids = died_ids = numpy.empty(0, numpy.int64)
+            ids_stored = False
+            indices = None
+        else:
+            alive = numpy.isin(self.ids, ids)
+            born_ids = ids[numpy.isin(ids, self.ids, invert=True)]
+            died_ids = self.ids[~alive]
+            # usually cells are only removed and appended, so the order of the cells follows from the births and deaths
+            ids_stored = not numpy.array_equal(numpy.concatenate((self.ids[alive], born_ids)), ids)
+            if ids_stored:
+                indices = _previous_indices(self.ids, ids)
+            else:
+                indices = numpy.concatenate((numpy.flatnonzero(alive), numpy.full(len(born_ids), -1, numpy.int64)))
+        previous_values, previous_fate = self.previous_columns(indices)
+
+        changes = values - previous_values
+        if changes.size and numpy.abs(changes).max() >= 2 ** 31:
+            raise ValueError("Values too large to encode at tick %d, use a coarser resolution" % tick)
+
+        # runs of consecutive cells that changed to the same fate
+        changed = numpy.flatnonzero(fate != previous_fate)
+        run_starts = numpy.flatnonzero((numpy.diff(changed, prepend=-2) != 1)
+                                       | (numpy.diff(fate[changed].astype(numpy.int16), prepend=-1) != 0))
+        run_lengths = numpy.diff(numpy.append(run_starts, len(changed)))
+
+        self.ids, self.values, self.fate = ids, values, fate
+        return b"".join((frame_header_struct.pack(tick, len(ids), len(born_ids), len(died_ids), ids_stored,
+                                                  len(run_starts)),
+                         born_ids.astype(numpy.dtype("<i8")).tobytes(),
+                         died_ids.astype(numpy.dtype("<i8")).tobytes(),
+                         ids.astype(numpy.dtype("<i8")).tobytes() if ids_stored else b"",
+                         _shuffle(changes[0]), _shuffle(changes[1]), _shuffle(changes[2]),
+                         changed[run_starts].astype(numpy.dtype("<u4")).tobytes(),
+                         run_lengths.astype(numpy.dtype("<u4")).tobytes(),
+                         fate[changed[run_starts]].tobytes()))
+
+
+class FrameDecoder(FrameState):
+    """Decodes the frames of a chunk in order, starting at its keyframe."""
+
+    def __init__(self, payload: bytes) -> None:
+        """
+        :param payload: The decompressed payload of a chunk.
+        """
+        super().__init__()
+        self.payload = payload  # type: bytes
+        self.offset = 0  # type: int
+        self.tick = None  # type: int
+
+    def decode(self) -> None:
+        """Applies the next frame of the chunk."""
+        payload = self.payload
+        tick, cell_count, born_count, died_count, ids_stored, run_count = \
+            frame_header_struct.unpack_from(payload, self.offset)
+        offset = self.offset + frame_header_struct.size
+
+        born_ids = numpy.frombuffer(payload, numpy.dtype("<i8"), born_count, offset)
+        offset += 8 * born_count
+        died_ids = numpy.frombuffer(payload, numpy.dtype("<i8"), died_count, offset)
+        offset += 8 * died_count
+        if ids_stored:
+            ids = numpy.frombuffer(payload, numpy.dtype("<i8"), cell_count, offset).astype(numpy.int64)
+            offset += 8 * cell_count
+            indices = _previous_indices(self.ids, ids)
+        elif not born_count and not died_count:
+            ids = self.ids
+            indices = None
+        else:
+            alive = numpy.isin(self.ids, died_ids, invert=True)
+            ids = numpy.concatenate((self.ids[alive], born_ids))
+            indices = numpy.concatenate((numpy.flatnonzero(alive), numpy.full(born_count, -1, numpy.int64)))
+        values, fate = self.previous_columns(indices)
+
+        for row in range(3):
+            values[row] += _unshuffle(payload, offset, cell_count)
+            offset += 4 * cell_count
+
+        run_starts = numpy.frombuffer(payload, numpy.dtype("<u4"), run_count, offset).astype(numpy.int64)
+        offset += 4 * run_count
+        run_lengths = numpy.frombuffer(payload, numpy.dtype("<u4"), run_count, offset).astype(numpy.int64)
+        offset += 4 * run_count
+        run_fates = numpy.frombuffer(payload, numpy.uint8, run_count, offset)
+        offset += run_count
+        run_offsets = numpy.repeat(numpy.cumsum(run_lengths) - run_lengths, run_lengths)
+        fate[numpy.repeat(run_starts, run_lengths) + numpy.arange(run_lengths.sum()) - run_offsets] = \
+            numpy.repeat(run_fates, run_lengths)
+
+        self.ids, self.values, self.fate = ids, values, fate
+        self.tick = tick
+        self.offset = offset
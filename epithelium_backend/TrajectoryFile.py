@@ -0,0 +1,170 @@
+"""
+The append only file format of recorded trajectories (see TrajectoryRecorder).
+
+Layout of a file:
+    8 bytes       magic number (trajectory_magic)
+    8 bytes       length of the header, little endian unsigned integer
+    header        utf-8 JSON: format version, tick interval, position format and resolution
+    padding       up to a multiple of frame_alignment bytes
+    frames        one after the other, each starting at a multiple of frame_alignment bytes
+
+Layout of a frame:
+    frame header  frame_header_struct, padded to frame_alignment bytes
+    payload       ids (int64), position_x, position_y, radius (float32, or int32 when quantized),
+                  fates (uint8), ids of the cells born and of the cells that died since the
+                  previous frame (int64). Every array starts at a multiple of 8 bytes.
+
+Every frame holds the complete render state of its tick, so frames can be read in any order.
+The crc32 of the payload detects frames that were not completely written.
+"""
+
+import json
+import struct
+import zlib
+
+import numpy
+
+trajectory_magic = b"EPTHTRJ\x00"
+trajectory_format_version = 1
+frame_alignment = 64
+frame_magic = b"FRAM"
+
+# magic, flags, tick, cell count, born count, died count, payload length, payload crc32
+frame_header_struct = struct.Struct("<4sIqqqqqI")
+
+# length of the magic number and the header length
+_preamble_length = 16
+
+
+def aligned(offset: int, alignment: int = frame_alignment) -> int:
+    """Returns the first multiple of alignment at or after offset."""
+    return -(-offset // alignment) * alignment
+
+
+def is_trajectory_file(file_path: str) -> bool:
+    """Returns True if the file at file_path is a trajectory file, False otherwise."""
+    try:
+        with open(file_path, "rb") as in_file:
+            return in_file.read(len(trajectory_magic)) == trajectory_magic
+    except OSError:
+        return False
+
+
+def value_dtype(header: dict) -> numpy.dtype:
+    """Returns the type positions and radii are stored as in a trajectory with this header."""
+    return numpy.dtype("<i4") if header["quantized"] else numpy.dtype("<f4")
+
+
+def write_header(out_file, header: dict) -> int:
+    """
+    Writes the header of a trajectory file.
+    :param out_file: A file opened for binary writing, at its start.
+    :param header: The header values.
+    :return: The offset of the first frame.
+    """
+    header_bytes = json.dumps(dict(header, version=trajectory_format_version)).encode("utf-8")
+    out_file.write(trajectory_magic)
+    out_file.write(len(header_bytes).to_bytes(8, "little"))
+    out_file.write(header_bytes)
+    frames_start = aligned(_preamble_length + len(header_bytes))
+    out_file.write(bytes(frames_start - out_file.tell()))
+    return frames_start
+
+
+def read_header(in_file) -> tuple:
+    """
+    Reads the header of a trajectory file.
+    :param in_file: A file opened for binary reading, at its start.
+    :return: The header as a dictionary, and the offset of the first frame.
+    """
+    if in_file.read(len(trajectory_magic)) != trajectory_magic:
+        raise ValueError("Not a trajectory file")
+    header_length = int.from_bytes(in_file.read(8), "little")
+    header = json.loads(in_file.read(header_length).decode("utf-8"))
+    if header["version"] > trajectory_format_version:
+        raise ValueError("The trajectory was recorded by a newer version (format %d, this version reads up to %d)"
+                         % (header["version"], trajectory_format_version))
+    return header, aligned(_preamble_length + header_length)
+
+
+def payload_layout(header: dict, cell_count: int, born_count: int, died_count: int) -> list:
+    """
+    Returns the arrays in the payload of a frame.
+    :return: A list of (name, dtype, length, offset in the payload)
+    """
+    values = value_dtype(header)
+    arrays = [("ids", numpy.dtype("<i8"), cell_count),
+              ("position_x", values, cell_count),
+              ("position_y", values, cell_count),
+              ("radius", values, cell_count),
+              ("fate", numpy.dtype("u1"), cell_count),
+              ("born_ids", numpy.dtype("<i8"), born_count),
+              ("died_ids", numpy.dtype("<i8"), died_count)]
+    layout = []
+    offset = 0
+    for name, dtype, length in arrays:
+        layout.append((name, dtype, length, offset))
+        offset = aligned(offset + length * dtype.itemsize, 8)
+    return layout
+
+
+def encode_frame(header: dict, tick: int, arrays: dict) -> bytes:
+    """
+    Encodes a frame.
+    :param header: The header of the trajectory.
+    :param tick: The tick of the frame.
+    :param arrays: The payload arrays by name (see payload_layout).
+    :return: The frame, padded to frame_alignment bytes
+    """
+    layout = payload_layout(header, len(arrays["ids"]), len(arrays["born_ids"]), len(arrays["died_ids"]))
+    payload = bytearray(aligned(layout[-1][3] + layout[-1][2] * layout[-1][1].itemsize, frame_alignment))
+    for name, dtype, length, offset in layout:
+        payload[offset:offset + length * dtype.itemsize] = numpy.ascontiguousarray(arrays[name], dtype).tobytes()
+    frame_header = frame_header_struct.pack(frame_magic, 0, tick, len(arrays["ids"]), len(arrays["born_ids"]),
+                                            len(arrays["died_ids"]), len(payload), zlib.crc32(payload))
+    return frame_header + bytes(frame_alignment - len(frame_header)) + bytes(payload)
+
+
+def scan_frames(in_file, frames_start: int, check_crc: bool = True) -> tuple:
+    """
+    Finds every completely written frame of a trajectory file.
+    :param in_file: A file opened for binary reading.
+    :param frames_start: The offset of the first frame (see read_header).
+    :param check_crc: If true, the payload of every frame is read and checked.
+    :return: A list of (tick, cell count, born count, died count, offset of the payload) for every frame,
+    and the offset where the complete frames end.
+    """
+    frames = []
+    offset = frames_start
+    while True:
+        in_file.seek(offset)
+        frame_header = in_file.read(frame_alignment)
+        if len(frame_header) < frame_alignment:
+            break
+        magic, _, tick, cell_count, born_count, died_count, payload_length, crc = \
+            frame_header_struct.unpack_from(frame_header)
+        # ticks only increase, anything else is left over from an incomplete write
+        if magic != frame_magic or (frames and tick <= frames[-1][0]):
+            break
+        if check_crc:
+            payload = in_file.read(payload_length)
+            if len(payload) < payload_length or zlib.crc32(payload) != crc:
+                break
+        elif in_file.seek(0, 2) < offset + frame_alignment + payload_length:
+            break
+        frames.append((tick, cell_count, born_count, died_count, offset + frame_alignment))
+        offset += frame_alignment + payload_length
+    return frames, offset
+
+
+def frame_arrays(header: dict, buffer, frame: tuple) -> dict:
+    """
+    Returns the payload arrays of a frame as views of a buffer holding the file.
+    :param header: The header of the trajectory.
+    :param buffer: The contents of the file, such as a numpy.memmap of it.
+    :param frame: An entry returned by scan_frames.
+    :return: The payload arrays by name
+    """
+    _, cell_count, born_count, died_count, payload_offset = frame
+    return {name: numpy.frombuffer(buffer, dtype, length, payload_offset + offset)
+            for name, dtype, length, offset in payload_layout(header, cell_count, born_count, died_count)}
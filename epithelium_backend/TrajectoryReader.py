@@ -0,0 +1,81 @@
+import numpy
+
+from epithelium_backend import TrajectoryFile
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+
+
+class TrajectoryReader(object):
+    """
+    Reads the frames of a recorded trajectory (see TrajectoryRecorder) from a memory mapping of the file.
+    Opening a trajectory only reads the frame headers, so any tick can be drawn without reading the
+    frames before it, and frames are only read from the page cache as they are drawn.
+    """
+
+    def __init__(self, file_path: str, check_crc: bool = False) -> None:
+        """
+        Maps a trajectory file.
+        :param file_path: The path of the trajectory file.
+        :param check_crc: If true, every frame is read and checked when the file is opened.
+        Otherwise only the frame headers are read.
+        """
+        self.file_path = file_path  # type: str
+        self.check_crc = check_crc  # type: bool
+        self.header = None  # type: dict
+        self.frames = []  # type: list
+        self.ticks = numpy.empty(0, numpy.int64)  # type: numpy.ndarray
+        self._frames_end = 0  # type: int
+        self._mapped_file = None  # type: numpy.memmap
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def refresh(self) -> int:
+        """
+        Finds frames appended to the file since it was mapped, such as by a recording that is still running.
+        :return: The number of new frames.
+        """
+        with open(self.file_path, "rb") as in_file:
+            if self.header is None:
+                self.header, self._frames_end = TrajectoryFile.read_header(in_file)
+            new_frames, frames_end = TrajectoryFile.scan_frames(in_file, self._frames_end, self.check_crc)
+        # the first new frame continues the ticks of the known frames
+        if self.frames and new_frames and new_frames[0][0] <= self.frames[-1][0]:
+            new_frames = []
+        if new_frames or self._mapped_file is None:
+            self.frames.extend(new_frames)
+            self._frames_end = frames_end
+            self.ticks = numpy.fromiter((frame[0] for frame in self.frames), numpy.int64, len(self.frames))
+            self._mapped_file = numpy.memmap(self.file_path, dtype=numpy.uint8, mode="r")
+        return len(new_frames)
+
+    def frame_index(self, tick: int) -> int:
+        """
+        Returns the index of the frame to draw for a tick: the last frame recorded at or before the tick,
+        or the first frame if the tick is before every frame.
+        """
+        return max(int(numpy.searchsorted(self.ticks, tick, side="right")) - 1, 0)
+
+    def frame_arrays(self, index: int) -> dict:
+        """
+        Returns the payload arrays of a frame (see TrajectoryFile.payload_layout) as views of the mapped file.
+        :param index: The index of the frame.
+        """
+        return TrajectoryFile.frame_arrays(self.header, self._mapped_file, self.frames[index])
+
+    def snapshot(self, index: int) -> RenderSnapshot:
+        """
+        Returns a RenderSnapshot of a frame. Unless the trajectory is quantized, its columns are views
+        of the mapped file.
+        :param index: The index of the frame.
+        """
+        arrays = self.frame_arrays(index)
+        columns = [arrays["position_x"], arrays["position_y"], arrays["radius"]]
+        if self.header["quantized"]:
+            resolution = numpy.float32(self.header["position_resolution"])
+            columns = [column.astype(numpy.float32) * resolution for column in columns]
+        return RenderSnapshot(*columns, arrays["fate"], self.frames[index][0], source=self._mapped_file)
+
+    def snapshot_at(self, tick: int) -> RenderSnapshot:
+        """Returns a RenderSnapshot of the frame drawn for a tick (see frame_index)."""
+        return self.snapshot(self.frame_index(tick))
@@ -0,0 +1,195 @@
+import os
+import queue
+import threading
+
+import numpy
+
+from epithelium_backend.CellFate import cell_fate
+from epithelium_backend.EpitheliumFile import read_header as read_epithelium_header
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.EpitheliumFile import write_snapshot
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
+from epithelium_backend import TrajectoryFile
+
+
+class TrajectoryRecorder(object):
+    """
+    Records the ticks of an epithelium to an append only trajectory file (see TrajectoryFile).
+
+    Once attached, every tick_interval-th tick run by Epithelium.update is recorded. The simulating
+    thread only copies the render columns of the cells, a background thread works out births and deaths,
+    encodes the frames and writes them. At most queue_size frames wait to be written, when the writer
+    falls further behind the simulation waits for it.
+
+    Every checkpoint_interval ticks the whole epithelium is also saved next to the trajectory
+    (see checkpoint_path), so a recording interrupted by a crash can be continued with resume.
+    """
+
+    def __init__(self,
+                 file_path: str,
+                 tick_interval: int = 1,
+                 quantized: bool = False,
+                 position_resolution: float = 1 / 256,
+                 checkpoint_interval: int = 0,
+                 queue_size: int = 8) -> None:
+        """
+        Creates a new trajectory file, replacing any file at file_path.
+        :param file_path: The path of the trajectory file.
+        :param tick_interval: Every tick_interval-th tick is recorded.
+        :param quantized: If true, positions and radii are stored as fixed point integers with a precision of
+        position_resolution. Otherwise they are stored as float32.
+        :param position_resolution: The precision of quantized positions and radii.
+        :param checkpoint_interval: The number of ticks between checkpoints. 0 for no checkpoints.
+        :param queue_size: The maximum number of frames waiting to be written.
+        """
+        self.file_path = file_path  # type: str
+        self.header = {"tick_interval": max(int(tick_interval), 1),
+                       "quantized": quantized,
+                       "position_resolution": position_resolution}  # type: dict
+        self.checkpoint_interval = checkpoint_interval  # type: int
+        self.tick = 0  # type: int
+        self.epithelium = None
+
+        self._out_file = open(file_path, "wb")
+        TrajectoryFile.write_header(self._out_file, self.header)
+        self._previous_ids = None  # type: numpy.ndarray
+        self._start_writer(queue_size)
+
+    def _start_writer(self, queue_size: int) -> None:
+        """Starts the background thread that writes frames."""
+        self._queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._error = None  # type: Exception
+        self._writer = threading.Thread(target=self._write_frames, daemon=True)
+        self._writer.start()
+
+    @property
+    def tick_interval(self) -> int:
+        """Returns the number of ticks between recorded ticks."""
+        return self.header["tick_interval"]
+
+    @property
+    def checkpoint_path(self) -> str:
+        """Returns the path of the file the latest checkpoint is saved to."""
+        return self.file_path + ".checkpoint"
+
+    @staticmethod
+    def resume(file_path: str, checkpoint_interval: int = 0, queue_size: int = 8):
+        """
+        Continues an interrupted recording from its latest checkpoint. Frames recorded after the checkpoint
+        are removed, and the epithelium is loaded from the checkpoint and attached to the returned recorder.
+        :param file_path: The path of the trajectory file.
+        :param checkpoint_interval: The number of ticks between checkpoints. 0 for no checkpoints.
+        :param queue_size: The maximum number of frames waiting to be written.
+        :return: The recorder, whose epithelium attribute holds the restored epithelium.
+        """
+        recorder = TrajectoryRecorder.__new__(TrajectoryRecorder)
+        recorder.file_path = file_path
+        recorder.checkpoint_interval = checkpoint_interval
+        checkpoint_tick = read_epithelium_header(recorder.checkpoint_path)[0]["metadata"]["tick"]
+        epithelium = read_epithelium(recorder.checkpoint_path)
+
+        with open(file_path, "rb") as in_file:
+            recorder.header, frames_start = TrajectoryFile.read_header(in_file)
+            frames, frames_end = TrajectoryFile.scan_frames(in_file, frames_start)
+            kept_frames = [frame for frame in frames if frame[0] <= checkpoint_tick]  # ticks are ascending
+            recorder._previous_ids = None
+            if kept_frames:
+                last_frame = kept_frames[-1]
+                in_file.seek(last_frame[4])
+                recorder._previous_ids = numpy.fromfile(in_file, numpy.dtype("<i8"), last_frame[1])
+        end = frames[len(kept_frames)][4] - TrajectoryFile.frame_alignment \
+            if len(kept_frames) < len(frames) else frames_end
+
+        recorder._out_file = open(file_path, "r+b")
+        recorder._out_file.truncate(end)
+        recorder._out_file.seek(end)
+        recorder.tick = checkpoint_tick + 1
+        recorder.epithelium = None
+        recorder._start_writer(queue_size)
+        recorder.attach(epithelium, record=False)
+        return recorder
+
+    def attach(self, epithelium, record: bool = True) -> None:
+        """
+        Begins recording the ticks of an epithelium.
+        :param epithelium: The epithelium to record.
+        :param record: If true, the current state of the epithelium is recorded as the next tick.
+        """
+        self.epithelium = epithelium
+        epithelium.trajectory_recorder = self
+        if record:
+            self.record(epithelium)
+
+    def detach(self) -> None:
+        """Stops recording the attached epithelium."""
+        if self.epithelium is not None and self.epithelium.trajectory_recorder is self:
+            self.epithelium.trajectory_recorder = None
+        self.epithelium = None
+
+    def record(self, epithelium) -> None:
+        """
+        Counts a tick of an epithelium, recording it when it is due. Called by Epithelium.update.
+        :param epithelium: The recorded epithelium.
+        """
+        if self._error is not None:
+            raise self._error
+        tick = self.tick
+        self.tick += 1
+
+        if tick % self.tick_interval == 0:
+            cells = list(epithelium.cells)
+            cell_count = len(cells)
+            ids = numpy.fromiter((cell.cell_id for cell in cells), numpy.int64, cell_count)
+            values = numpy.fromiter((value for cell in cells
+                                     for value in (cell.position_x, cell.position_y, cell.radius)),
+                                    numpy.float64, 3 * cell_count).reshape(cell_count, 3)
+            fates = numpy.fromiter((cell_fate(cell) for cell in cells), numpy.uint8, cell_count)
+            self._queue.put(("frame", tick, ids, values, fates))
+
+        if self.checkpoint_interval and tick % self.checkpoint_interval == 0:
+            self._queue.put(("checkpoint", tick, EpitheliumSnapshot.capture(epithelium)))
+
+    def _write_frames(self) -> None:
+        """Writes queued frames and checkpoints until the recorder is closed."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                if item[0] == "frame":
+                    self._write_frame(*item[1:])
+                else:
+                    _, tick, snapshot = item
+                    write_snapshot(snapshot, self.checkpoint_path, {"tick": tick})
+            except Exception as error:
+                self._error = error
+
+    def _write_frame(self, tick: int, ids: numpy.ndarray, values: numpy.ndarray, fates: numpy.ndarray) -> None:
+        """Encodes and appends one frame."""
+        if self.header["quantized"]:
+            values = numpy.rint(values / self.header["position_resolution"])
+        previous_ids = self._previous_ids if self._previous_ids is not None else numpy.empty(0, numpy.int64)
+        arrays = {"ids": ids,
+                  "position_x": values[:, 0],
+                  "position_y": values[:, 1],
+                  "radius": values[:, 2],
+                  "fate": fates,
+                  "born_ids": ids[numpy.isin(ids, previous_ids, invert=True)],
+                  "died_ids": previous_ids[numpy.isin(previous_ids, ids, invert=True)]}
+        self._out_file.write(TrajectoryFile.encode_frame(self.header, tick, arrays))
+        self._out_file.flush()
+        self._previous_ids = ids
+
+    def close(self) -> None:
+        """Writes every queued frame, closes the file, and detaches from the epithelium."""
+        self.detach()
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._out_file.flush()
+        os.fsync(self._out_file.fileno())
+        self._out_file.close()
+        if self._error is not None:
+            raise self._error
@@ -1,19 +1,53 @@
 """Subclass of MainFrameBase, which is generated by wxFormBuilder."""
 
 from epithelium_backend.CellFactory import CellFactory
+from epithelium_backend.CellOrdering import CellOrdering
+from epithelium_backend.CellPool import CellPool
+from epithelium_backend.CompressedTrajectoryReader import CompressedTrajectoryReader
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.EpitheliumFile import is_columnar_file
+from epithelium_backend.EpitheliumSnapshot import EpitheliumSnapshot
 from epithelium_backend.ImportExport import import_epithelium
-from epithelium_backend.ImportExport import export_epithelium
-from epithelium_backend.ImportExport import import_simulation_settings
-from epithelium_backend.ImportExport import export_simulation_settings
+from epithelium_backend.ImportExport import export_snapshot
+from epithelium_backend.ImportExport import read_simulation_settings
+from epithelium_backend.ImportExport import apply_furrow_event_settings
+from epithelium_backend.ImportExport import simulation_options_from_widgets
+from epithelium_backend.ImportExport import write_simulation_settings
+from epithelium_backend.MappedEpithelium import MappedEpithelium
+from epithelium_backend.RateCounter import RateCounter
+from epithelium_backend.RelaxationScheduler import RelaxationScheduler
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+from epithelium_backend.TiledSheetGenerator import tiled_generation_threshold
+from epithelium_backend.TrajectoryCodec import is_compressed_trajectory_file
+from epithelium_backend.TrajectoryFile import is_trajectory_file
+from epithelium_backend.TrajectoryReader import TrajectoryReader
 from quick_change.FurrowEventList import furrow_event_list
 from eye_development_gui.FieldType import FieldType
 from eye_development_gui.eye_development_gui import MainFrameBase
 
+from eye_development_gui.background_workers.EpitheliumGenerationProcessWorker import EpitheliumGenerationProcessWorker
 from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationEvent
 from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationWorker
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationProgressEvent
 from eye_development_gui.background_workers.EpitheliumGenerationWorker import EVT_GENERATE_EPITHELIUM
-
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import EVT_GENERATION_PROGRESS
+from eye_development_gui.background_workers.FileWorker import FileDoneEvent
+from eye_development_gui.background_workers.FileWorker import FileProgressEvent
+from eye_development_gui.background_workers.FileWorker import FileWorker
+from eye_development_gui.background_workers.FileWorker import EVT_FILE_DONE
+from eye_development_gui.background_workers.FileWorker import EVT_FILE_PROGRESS
+from eye_development_gui.background_workers.SimulationWorker import SimulationFrameEvent
+from eye_development_gui.background_workers.SimulationWorker import SimulationWorker
+from eye_development_gui.background_workers.SimulationWorker import EVT_SIMULATION_FRAME
+from eye_development_gui.background_workers.SimulationProcessWorker import SimulationProcessError
+from eye_development_gui.background_workers.SimulationProcessWorker import SimulationProcessWorker
+from eye_development_gui.background_workers.TrajectoryReplayWorker import ReplayFrameEvent
+from eye_development_gui.background_workers.TrajectoryReplayWorker import TrajectoryReplayWorker
+from eye_development_gui.background_workers.TrajectoryReplayWorker import EVT_REPLAY_FRAME
+
+import functools
 import wx
 import wx.xrc
 from wx.core import TextCtrl
@@ -31,22 +65,45 @@ class MainFrame(MainFrameBase):
         """Initializes the GUI and all the data of the model."""
         MainFrameBase.__init__(self, parent)
 
-        self.status_bar = self.CreateStatusBar()  # type: wx.StatusBar
+        # first field: application state, second field: measured simulation rates
+        self.status_bar = self.CreateStatusBar(2)  # type: wx.StatusBar
         self.init_icon()
 
         self.Bind(wx.EVT_CLOSE, self.on_close)
 
-        MainFrame.add_fields(self.m_sim_overview_spec_options_scrolled_window, furrow_event_list)
+        MainFrame.add_fields(self.m_sim_overview_spec_options_scrolled_window, furrow_event_list,
+                             self.on_furrow_event_field_changed)
+        self.add_frame_pacing_fields()
+        self.add_simulation_process_field()
+        self.add_decompaction_processes_field()
+        self.add_sleep_threshold_field()
+        self.add_relaxation_fields()
+        self.add_reorder_interval_field()
+        self.add_recycle_cells_field()
+        self.add_generation_seed_field()
+        self.add_generation_candidates_field()
+        self.add_generation_process_field()
+        self.add_generation_cache_field()
+        self.add_tiling_threshold_field()
+        self.add_cancel_button()
 
         self.__active_epithelium = Epithelium(0)  # type: Epithelium
         self._simulating = False
         self._has_simulated = False
 
+        # The active epithelium is simulated in the background. Panels draw the
+        # snapshots it publishes instead of reading the epithelium directly.
+        self.render_buffer = SnapshotDoubleBuffer()  # type: SnapshotDoubleBuffer
+        # replaced by a SimulationProcessWorker when 'Simulation Process' is checked, see use_simulation_process
+        self.simulation_worker = SimulationWorker(self, self.render_buffer, self.__active_epithelium)
+
         # Track all the panels that need to be notified when the
         # active epithelium is changed
         self.epithelium_listeners = [self.m_epithelium_gen_display_panel,
                                      self.m_sim_overview_display_panel,
                                      self.m_simulation_display_panel]  # type: list
+        for listener in self.epithelium_listeners:
+            listener.render_buffer = self.render_buffer
 
         # Track panels that can control the simulation of the active epithelium
         # (this is an observer of these objects)
@@ -63,53 +120,80 @@ class MainFrame(MainFrameBase):
         overview_canvas.camera_listeners.extend((sim_canvas, generation_canvas))
         generation_canvas.camera_listeners.extend((sim_canvas, overview_canvas))
 
-        # Timer for updating the epithelium
-        self.simulation_timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self.update_epithelium, self.simulation_timer)
+        # Redraw whenever the simulation publishes a frame
+        self.Bind(EVT_SIMULATION_FRAME, self.on_simulation_frame)
+        self.frame_counter = RateCounter()  # type: RateCounter
+
+        # plays back a loaded trajectory file instead of simulating, see load_trajectory
+        self.replay_worker = None  # type: TrajectoryReplayWorker
+        self.Bind(EVT_REPLAY_FRAME, self.on_replay_frame)
+
+        # saves and loads files in the background, see start_file_operation
+        self.file_worker = None  # type: FileWorker
+        self.Bind(EVT_FILE_PROGRESS, self.on_file_progress)
+        self.Bind(EVT_FILE_DONE, self.on_file_done)
 
         # save files
         self.active_epithelium_file = ""
         self.active_simulation_settings_file = ""
-        self.temporary_epithelium_location = r"temp/temp_epithelium.epth"
+        # a loaded file that is only drawn until its epithelium is needed, see materialize_mapped_epithelium
+        self.mapped_epithelium = None  # type: MappedEpithelium
+
+        # the state of the active epithelium before it was first simulated, restored when simulation is stopped.
+        # Snapshots above the budget (in bytes) are kept on disk instead of in memory.
+        self.initial_snapshot = None  # type: EpitheliumSnapshot
+        self.snapshot_memory_budget = 512 * 1024 * 1024  # type: int
+        # the recorded tick shown while paused, simulation continues from there when resumed. See seek_history
+        self.history_tick = None  # type: int
+
+        # seeded epithelia are generated once and then loaded from disk, unless 'Cache Epithelia' is unchecked
+        self.epithelium_cache = EpitheliumCache()  # type: EpitheliumCache
 
         # enable disable elements: state tracking
         self.generating_epithelium = False  # type: bool
+        self.generation_worker = None  # type: EpitheliumGenerationWorker
         self.simulation_controllers_inputs_valid = True  # type: bool
         self.update_enabled_widgets()
 
         # worker thread
 
         self.Bind(EVT_GENERATE_EPITHELIUM, self.on_epithelium_generated)
+        self.Bind(EVT_GENERATION_PROGRESS, self.on_epithelium_generation_progress)
+        self.simulation_worker.start()
 
         self.init_settings_with_default_values()
 
     # region dynamic input creation
 
     @staticmethod
-    def create_callback(field_type: FieldType, text_control: wx.TextCtrl):
+    def create_callback(field_type: FieldType, text_control: wx.TextCtrl, on_change=None):
         """
         Create a callback that validates/sets the field type's value
         when the text_control's input changes.
+        :param on_change: Called with the new value whenever a valid value is set.
         """
         def callback(event):
             # If valid, sets the value to it and returns True. Otherwise returns False.
-            field_type.validate(text_control.GetLineText(0))
+            if field_type.validate(text_control.GetLineText(0)) and on_change is not None:
+                on_change(field_type.value)
             event.Skip()
         return callback
 
     @staticmethod
-    def add_fields(window: wx.Window, events: list):
+    def add_fields(window: wx.Window, events: list, on_change=None):
         """
         Dynamically generate input fields from the furrow events.
 
         :param window: the wxform window to add the inputs to.
         :param events: a list of furrow events to generate gui inputs from.
+        :param on_change: Called with the index of the event, the name of the field and its new value
+        whenever a field is set to a valid value.
         """
         # This was copied from the dynamically generated code that wxFormBuilder spits out.
         # I don't totally understand it.
         g_sizer = wx.GridSizer(0, 2, 0, 0)
         event_label_font = wx.Font(wx.FontInfo().Bold())
-        for event in events:
+        for event_index, event in enumerate(events):
             event_label = wx.StaticText(window, wx.ID_ANY, event.name, wx.DefaultPosition, wx.DefaultSize, 0)
             event_label.SetFont(event_label_font)
             g_sizer.Add(event_label)
@@ -122,12 +206,329 @@ class MainFrame(MainFrameBase):
                 # The right hand side -- the input box
                 text_control =  wx.TextCtrl(window , wx.ID_ANY, str(field_type.value), wx.DefaultPosition, wx.DefaultSize, 0 )
                 # Bind the input box to the field_type value
-                text_control.Bind(wx.EVT_TEXT, MainFrame.create_callback(field_type, text_control))
+                field_changed = functools.partial(on_change, event_index, param_name) if on_change else None
+                text_control.Bind(wx.EVT_TEXT, MainFrame.create_callback(field_type, text_control, field_changed))
                 g_sizer.Add(text_control, 0, wx.ALL, 5)
         window.SetSizer(g_sizer)
         window.Layout()
         g_sizer.Fit(window)
 
+    def add_frame_pacing_fields(self):
+        """
+        Adds the inputs that pace simulation ticks against drawn frames to the simulation options.
+        'Simulation Speed' sets the target frames drawn per second.
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        self.sim_speed_static_text.SetToolTip(u"Target frames drawn per second")
+        self.simulation_speed_text_ctrl.SetToolTip(u"Target frames drawn per second")
+
+        ticks_per_frame_tooltip = u"Simulation cycles run for every frame that is drawn"
+        self.ticks_per_frame_static_text = wx.StaticText(window, wx.ID_ANY, u"Ticks Per Frame",
+                                                         wx.DefaultPosition, wx.DefaultSize, 0)
+        self.ticks_per_frame_static_text.Wrap(-1)
+        self.ticks_per_frame_static_text.SetToolTip(ticks_per_frame_tooltip)
+        g_sizer.Add(self.ticks_per_frame_static_text, 0, wx.ALL, 5)
+        self.ticks_per_frame_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"1", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.ticks_per_frame_text_ctrl.SetToolTip(ticks_per_frame_tooltip)
+        self.ticks_per_frame_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.ticks_per_frame_text_ctrl, 0, wx.ALL, 5)
+
+        max_throughput_tooltip = u"Run simulation cycles as fast as possible, only drawing when a frame is due"
+        self.max_throughput_static_text = wx.StaticText(window, wx.ID_ANY, u"Max Throughput",
+                                                        wx.DefaultPosition, wx.DefaultSize, 0)
+        self.max_throughput_static_text.Wrap(-1)
+        self.max_throughput_static_text.SetToolTip(max_throughput_tooltip)
+        g_sizer.Add(self.max_throughput_static_text, 0, wx.ALL, 5)
+        self.max_throughput_check_box = wx.CheckBox(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.max_throughput_check_box.SetToolTip(max_throughput_tooltip)
+        self.max_throughput_check_box.Bind(wx.EVT_CHECKBOX, self.on_sim_overview_user_input)
+        g_sizer.Add(self.max_throughput_check_box, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_simulation_process_field(self):
+        """
+        Adds the 'Simulation Process' input to the simulation options. Heavy simulations can be moved into
+        their own process so they don't compete with the gui for the GIL.
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        simulation_process_tooltip = u"Simulate in a separate process, keeping the gui responsive for large " \
+                                     u"epithelia. Paused simulations cannot be scrubbed back."
+        self.simulation_process_static_text = wx.StaticText(window, wx.ID_ANY, u"Simulation Process",
+                                                            wx.DefaultPosition, wx.DefaultSize, 0)
+        self.simulation_process_static_text.Wrap(-1)
+        self.simulation_process_static_text.SetToolTip(simulation_process_tooltip)
+        g_sizer.Add(self.simulation_process_static_text, 0, wx.ALL, 5)
+        self.simulation_process_check_box = wx.CheckBox(window, wx.ID_ANY, u"", wx.DefaultPosition,
+                                                        wx.DefaultSize, 0)
+        self.simulation_process_check_box.SetToolTip(simulation_process_tooltip)
+        g_sizer.Add(self.simulation_process_check_box, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_decompaction_processes_field(self):
+        """
+        Adds the 'Decompaction Processes' input to the simulation options. Large sheets are decompacted on
+        this many processes (see ParallelDecompactor), or by the collision handler alone if it is left empty.
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        decompaction_processes_tooltip = u"Decompact sheets of 10000 cells or more on this many processor cores. " \
+                                         u"Leave empty to decompact in the simulation."
+        self.decompaction_processes_static_text = wx.StaticText(window, wx.ID_ANY, u"Decompaction Processes",
+                                                                wx.DefaultPosition, wx.DefaultSize, 0)
+        self.decompaction_processes_static_text.Wrap(-1)
+        self.decompaction_processes_static_text.SetToolTip(decompaction_processes_tooltip)
+        g_sizer.Add(self.decompaction_processes_static_text, 0, wx.ALL, 5)
+        self.decompaction_processes_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"", wx.DefaultPosition,
+                                                            wx.DefaultSize, 0)
+        self.decompaction_processes_text_ctrl.SetToolTip(decompaction_processes_tooltip)
+        self.decompaction_processes_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.decompaction_processes_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_sleep_threshold_field(self):
+        """
+        Adds the 'Sleep Threshold' input to the simulation options. Cells that move less than this distance for
+        a few decompactions in a row are put to sleep and skipped when decompacting (see CellCollisionHandler).
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        sleep_threshold_tooltip = u"Skip decompacting cells that settled, moving less than this distance. " \
+                                  u"Leave empty to keep every cell awake."
+        self.sleep_threshold_static_text = wx.StaticText(window, wx.ID_ANY, u"Sleep Threshold",
+                                                         wx.DefaultPosition, wx.DefaultSize, 0)
+        self.sleep_threshold_static_text.Wrap(-1)
+        self.sleep_threshold_static_text.SetToolTip(sleep_threshold_tooltip)
+        g_sizer.Add(self.sleep_threshold_static_text, 0, wx.ALL, 5)
+        self.sleep_threshold_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.sleep_threshold_text_ctrl.SetToolTip(sleep_threshold_tooltip)
+        self.sleep_threshold_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.sleep_threshold_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_relaxation_fields(self):
+        """
+        Adds the inputs of the relaxation scheduler to the simulation options (see RelaxationScheduler).
+        'Relaxation Iterations' sets the most decompactions run in a tick, the cells are decompacted once
+        every tick if it is left empty.
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        relaxation_iterations_tooltip = u"Decompact up to this many times a tick, depending on how much the cells " \
+                                        u"moved. Leave empty to decompact once every tick."
+        self.relaxation_iterations_static_text = wx.StaticText(window, wx.ID_ANY, u"Relaxation Iterations",
+                                                               wx.DefaultPosition, wx.DefaultSize, 0)
+        self.relaxation_iterations_static_text.Wrap(-1)
+        self.relaxation_iterations_static_text.SetToolTip(relaxation_iterations_tooltip)
+        g_sizer.Add(self.relaxation_iterations_static_text, 0, wx.ALL, 5)
+        self.relaxation_iterations_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"", wx.DefaultPosition,
+                                                           wx.DefaultSize, 0)
+        self.relaxation_iterations_text_ctrl.SetToolTip(relaxation_iterations_tooltip)
+        self.relaxation_iterations_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.relaxation_iterations_text_ctrl, 0, wx.ALL, 5)
+
+        relaxation_tolerance_tooltip = u"The distance below which moving, growing and shrinking cells are " \
+                                       u"considered relaxed, when decompacting up to several times a tick"
+        self.relaxation_tolerance_static_text = wx.StaticText(window, wx.ID_ANY, u"Relaxation Tolerance",
+                                                              wx.DefaultPosition, wx.DefaultSize, 0)
+        self.relaxation_tolerance_static_text.Wrap(-1)
+        self.relaxation_tolerance_static_text.SetToolTip(relaxation_tolerance_tooltip)
+        g_sizer.Add(self.relaxation_tolerance_static_text, 0, wx.ALL, 5)
+        self.relaxation_tolerance_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"0.5", wx.DefaultPosition,
+                                                          wx.DefaultSize, 0)
+        self.relaxation_tolerance_text_ctrl.SetToolTip(relaxation_tolerance_tooltip)
+        self.relaxation_tolerance_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.relaxation_tolerance_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_reorder_interval_field(self):
+        """
+        Adds the 'Reorder Interval' input to the simulation options. Every this many ticks the cells are stored
+        along a space filling curve again if they have become scattered in memory (see CellOrdering).
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        reorder_interval_tooltip = u"Every this many ticks, store cells near each other in memory again " \
+                                   u"if they have scattered. Leave empty to keep the order cells were created in."
+        self.reorder_interval_static_text = wx.StaticText(window, wx.ID_ANY, u"Reorder Interval",
+                                                          wx.DefaultPosition, wx.DefaultSize, 0)
+        self.reorder_interval_static_text.Wrap(-1)
+        self.reorder_interval_static_text.SetToolTip(reorder_interval_tooltip)
+        g_sizer.Add(self.reorder_interval_static_text, 0, wx.ALL, 5)
+        self.reorder_interval_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.reorder_interval_text_ctrl.SetToolTip(reorder_interval_tooltip)
+        self.reorder_interval_text_ctrl.Bind(wx.EVT_TEXT, self.on_sim_overview_user_input)
+        g_sizer.Add(self.reorder_interval_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_recycle_cells_field(self):
+        """
+        Adds the 'Recycle Cells' input to the simulation options. Dead cells are reused for the cells of
+        divisions instead of allocating new ones (see CellPool).
+        """
+        window = self.m_sim_overview_sim_options_scrolled_window
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        recycle_cells_tooltip = u"Reuse dead cells for the cells of divisions, so that long simulations " \
+                                u"allocate fewer cells"
+        self.recycle_cells_static_text = wx.StaticText(window, wx.ID_ANY, u"Recycle Cells",
+                                                       wx.DefaultPosition, wx.DefaultSize, 0)
+        self.recycle_cells_static_text.Wrap(-1)
+        self.recycle_cells_static_text.SetToolTip(recycle_cells_tooltip)
+        g_sizer.Add(self.recycle_cells_static_text, 0, wx.ALL, 5)
+        self.recycle_cells_check_box = wx.CheckBox(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.recycle_cells_check_box.SetToolTip(recycle_cells_tooltip)
+        g_sizer.Add(self.recycle_cells_check_box, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_generation_seed_field(self):
+        """
+        Adds the 'Seed' input to the epithelium generation options. Epithelia created with a seed are
+        the same every time, and are loaded from the epithelium cache once they have been generated.
+        """
+        window = self.epithelium_options_scrolled_window3
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        seed_tooltip = u"Creates the same epithelium every time a seed is reused. Leave empty for a new epithelium."
+        self.seed_static_text = wx.StaticText(window, wx.ID_ANY, u"Seed", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.seed_static_text.Wrap(-1)
+        self.seed_static_text.SetToolTip(seed_tooltip)
+        g_sizer.Add(self.seed_static_text, 0, wx.ALL, 5)
+        self.seed_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.seed_text_ctrl.SetToolTip(seed_tooltip)
+        self.seed_text_ctrl.Bind(wx.EVT_TEXT, self.on_ep_gen_user_input)
+        g_sizer.Add(self.seed_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_generation_candidates_field(self):
+        """
+        Adds the 'Candidates' input to the epithelium generation options. Several candidate epithelia are
+        generated at once in separate processes, and the user chooses one of them.
+        """
+        window = self.epithelium_options_scrolled_window3
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        candidates_tooltip = u"The number of epithelia to generate at once, one per processor core. " \
+                             u"You choose which one to keep."
+        self.candidates_static_text = wx.StaticText(window, wx.ID_ANY, u"Candidates",
+                                                    wx.DefaultPosition, wx.DefaultSize, 0)
+        self.candidates_static_text.Wrap(-1)
+        self.candidates_static_text.SetToolTip(candidates_tooltip)
+        g_sizer.Add(self.candidates_static_text, 0, wx.ALL, 5)
+        self.candidates_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, u"1", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.candidates_text_ctrl.SetToolTip(candidates_tooltip)
+        self.candidates_text_ctrl.Bind(wx.EVT_TEXT, self.on_ep_gen_user_input)
+        g_sizer.Add(self.candidates_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_generation_process_field(self):
+        """
+        Adds the 'Generation Process' input to the epithelium generation options. Epithelia are generated in a
+        separate process when it is checked, as they always are when several candidates are generated.
+        """
+        window = self.epithelium_options_scrolled_window3
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        generation_process_tooltip = u"Generate in a separate process, keeping the gui responsive. " \
+                                     u"Always done for several candidates."
+        self.generation_process_static_text = wx.StaticText(window, wx.ID_ANY, u"Generation Process",
+                                                            wx.DefaultPosition, wx.DefaultSize, 0)
+        self.generation_process_static_text.Wrap(-1)
+        self.generation_process_static_text.SetToolTip(generation_process_tooltip)
+        g_sizer.Add(self.generation_process_static_text, 0, wx.ALL, 5)
+        self.generation_process_check_box = wx.CheckBox(window, wx.ID_ANY, u"", wx.DefaultPosition,
+                                                        wx.DefaultSize, 0)
+        self.generation_process_check_box.SetToolTip(generation_process_tooltip)
+        g_sizer.Add(self.generation_process_check_box, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_generation_cache_field(self):
+        """
+        Adds the 'Cache Epithelia' input to the epithelium generation options. Seeded epithelia, and the
+        patches large epithelia are tiled from, are saved to the epithelium cache and loaded from it again.
+        """
+        window = self.epithelium_options_scrolled_window3
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        cache_tooltip = u"Loads seeded epithelia from disk once they have been generated. " \
+                        u"Cached in %s" % EpitheliumCache.default_directory
+        self.cache_static_text = wx.StaticText(window, wx.ID_ANY, u"Cache Epithelia",
+                                               wx.DefaultPosition, wx.DefaultSize, 0)
+        self.cache_static_text.Wrap(-1)
+        self.cache_static_text.SetToolTip(cache_tooltip)
+        g_sizer.Add(self.cache_static_text, 0, wx.ALL, 5)
+        self.cache_check_box = wx.CheckBox(window, wx.ID_ANY, u"", wx.DefaultPosition, wx.DefaultSize, 0)
+        self.cache_check_box.SetToolTip(cache_tooltip)
+        g_sizer.Add(self.cache_check_box, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_tiling_threshold_field(self):
+        """
+        Adds the 'Tiling Threshold' input to the epithelium generation options. Epithelia of at least this many
+        cells are covered by tiles of relaxed patches, and only the seams between them are relaxed
+        (see TiledSheetGenerator).
+        """
+        window = self.epithelium_options_scrolled_window3
+        g_sizer = window.GetSizer()  # type: wx.GridSizer
+
+        tiling_threshold_tooltip = u"Epithelia of at least this many cells are tiled from relaxed patches " \
+                                   u"instead of relaxing the whole sheet"
+        self.tiling_threshold_static_text = wx.StaticText(window, wx.ID_ANY, u"Tiling Threshold",
+                                                          wx.DefaultPosition, wx.DefaultSize, 0)
+        self.tiling_threshold_static_text.Wrap(-1)
+        self.tiling_threshold_static_text.SetToolTip(tiling_threshold_tooltip)
+        g_sizer.Add(self.tiling_threshold_static_text, 0, wx.ALL, 5)
+        self.tiling_threshold_text_ctrl = wx.TextCtrl(window, wx.ID_ANY, str(tiled_generation_threshold),
+                                                      wx.DefaultPosition, wx.DefaultSize, 0)
+        self.tiling_threshold_text_ctrl.SetToolTip(tiling_threshold_tooltip)
+        self.tiling_threshold_text_ctrl.Bind(wx.EVT_TEXT, self.on_ep_gen_user_input)
+        g_sizer.Add(self.tiling_threshold_text_ctrl, 0, wx.ALL, 5)
+
+        window.Layout()
+        g_sizer.Fit(window)
+
+    def add_cancel_button(self):
+        """
+        Adds a 'Cancel' button beside the epithelium file buttons that stops the generation or file operation
+        in progress.
+        """
+        self.cancel_button = wx.Button(self.ep_gen_load_button.GetParent(), wx.ID_ANY, u"Cancel",
+                                       wx.DefaultPosition, wx.DefaultSize, 0)
+        self.cancel_button.SetToolTip(u"Stops generating, saving or loading")
+        self.cancel_button.Bind(wx.EVT_BUTTON, self.on_cancel)
+        sizer = self.ep_gen_load_button.GetContainingSizer()  # type: wx.Sizer
+        sizer.Add(self.cancel_button, 0, wx.ALL, 5)
+        sizer.Layout()
+
     # endregion dynamic input creation
 
     # region general event handling
@@ -162,12 +563,42 @@ class MainFrame(MainFrameBase):
             cell_size_variance_str = self.str_from_text_input(self.cell_size_variance_text_ctrl)  # type: str
             cell_size_variance = float(cell_size_variance_str)
 
-            # create active epithelium in the background
-            worker = EpitheliumGenerationWorker(self,
-                                                min_cell_count,
-                                                avg_cell_size,
-                                                radius_divergence=cell_size_variance / avg_cell_size)
+            # seed
+            seed_str = self.str_from_text_input(self.seed_text_ctrl)  # type: str
+            seed = int(seed_str) if seed_str else None
+
+            # candidates
+            candidates = int(self.str_from_text_input(self.candidates_text_ctrl))  # type: int
+
+            # cache
+            cache = self.epithelium_cache if self.cache_check_box.GetValue() else None  # type: EpitheliumCache
+
+            # tiling threshold
+            tiled_threshold = int(self.str_from_text_input(self.tiling_threshold_text_ctrl))  # type: int
+
+            # create active epithelium in the background, in separate processes to generate several candidates
+            # or when 'Generation Process' is checked
+            if candidates > 1 or self.generation_process_check_box.GetValue():
+                worker = EpitheliumGenerationProcessWorker(self,
+                                                           min_cell_count,
+                                                           avg_cell_size,
+                                                           radius_divergence=cell_size_variance / avg_cell_size,
+                                                           seed=seed,
+                                                           cache=cache,
+                                                           render_buffer=self.render_buffer,
+                                                           candidates=candidates,
+                                                           tiled_threshold=tiled_threshold)
+            else:
+                worker = EpitheliumGenerationWorker(self,
+                                                    min_cell_count,
+                                                    avg_cell_size,
+                                                    radius_divergence=cell_size_variance / avg_cell_size,
+                                                    seed=seed,
+                                                    cache=cache,
+                                                    render_buffer=self.render_buffer,
+                                                    tiled_threshold=tiled_threshold)
             worker.setDaemon(True)
+            self.generation_worker = worker
             self.generating_epithelium = True
             self.update_enabled_widgets()
             worker.start()
@@ -176,8 +607,34 @@ class MainFrame(MainFrameBase):
         """Callback invoked when closing the application.
         Halts simulation then allows the default close handler to exit the application."""
         self.simulating = False
+        self.simulation_worker.shut_down()
+        self.end_replay()
+        if self.generation_worker is not None:
+            self.generation_worker.cancel()
+        # a save is finished rather than left half written
+        if self.file_worker is not None and self.file_worker.description.startswith("Saving"):
+            self.file_worker.join()
         event.Skip()
 
+    def on_furrow_event_field_changed(self, event_index: int, name: str, value) -> None:
+        """
+        Callback invoked whenever a user sets a field of a furrow event to a valid value.
+        Sends the value to the simulation, which may be running in its own process.
+        """
+        try:
+            self.simulation_worker.set_field(event_index, name, value)
+        except SimulationProcessError as error:
+            self.show_simulation_process_error(error)
+
+    def show_simulation_process_error(self, error: Exception) -> None:
+        """Tells the user that the simulation process has failed, and stops simulating."""
+        self._simulating = False
+        self.update_enabled_widgets()
+        dlg = wx.MessageDialog(self, "The simulation has stopped unexpectedly: %s" % error,
+                               "Simulation Failed", wx.OK | wx.ICON_ERROR)
+        dlg.ShowModal()
+        dlg.Destroy()
+
     def on_ep_gen_user_input(self, event: wx.Event):
         """
         Callback invoked whenever a user alters an epithelium generation input.
@@ -199,8 +656,19 @@ class MainFrame(MainFrameBase):
             self.on_epithelium_save_as(event)
             return
 
-        # attempt to save to active file
-        export_epithelium(self.active_epithelium, self.active_epithelium_file)
+        # capture the epithelium between simulation ticks, then write it in the background
+        if self.mapped_epithelium is not None:
+            snapshot = self.mapped_epithelium.snapshot()
+        else:
+            try:
+                with self.simulation_worker.tick_lock:
+                    snapshot = self.simulation_worker.epithelium.snapshot()
+            except SimulationProcessError as error:
+                self.show_simulation_process_error(error)
+                return
+        file_path = self.active_epithelium_file
+        self.start_file_operation("Saving Epithelium",
+                                  lambda progress: export_snapshot(snapshot, file_path, progress))
 
         # do not consume event
         event.Skip(False)
@@ -239,7 +707,23 @@ class MainFrame(MainFrameBase):
 
         # load the file
         active_epithelium_file = load_dialog.GetPath()
-        imported_epithelium = import_epithelium(active_epithelium_file)
+        if self.load_trajectory(active_epithelium_file) or self.load_mapped_epithelium(active_epithelium_file):
+            event.Skip(False)
+            return
+        self.start_file_operation("Loading Epithelium",
+                                  lambda progress: import_epithelium(active_epithelium_file, progress),
+                                  lambda epithelium: self.on_epithelium_loaded(active_epithelium_file, epithelium))
+
+        # do not consume event
+        event.Skip(False)
+
+    def on_epithelium_loaded(self, file_path: str, imported_epithelium: Epithelium):
+        """
+        Invoked once an epithelium file has been loaded in the background.
+        Makes the loaded epithelium the active epithelium and its file the active file.
+        :param file_path: The loaded file.
+        :param imported_epithelium: The loaded epithelium. None if the file could not be loaded.
+        """
         if imported_epithelium:
 
             # check if the furrow events of the imported epithelium match the local furrow events
@@ -263,7 +747,7 @@ class MainFrame(MainFrameBase):
                 dlg.Destroy()
 
             # update epithelium
-            self.active_epithelium_file = active_epithelium_file
+            self.active_epithelium_file = file_path
             self.active_epithelium = imported_epithelium
             # update gui
             self.update_gui_to_active_epithelium()
@@ -273,8 +757,127 @@ class MainFrame(MainFrameBase):
             dlg.ShowModal()
             dlg.Destroy()
 
-        # do not consume event
+    def load_mapped_epithelium(self, file_path: str) -> bool:
+        """
+        Maps a columnar epithelium file and draws it without creating its cells.
+        The mapped epithelium becomes the active epithelium once it is simulated or saved.
+        :param file_path: The file to load.
+        :return: True if the file was mapped. False if it is not a columnar file or could not be mapped.
+        """
+        if not is_columnar_file(file_path):
+            return False
+        try:
+            mapped_epithelium = MappedEpithelium(file_path)
+        except Exception:
+            return False
+
+        self.active_epithelium_file = file_path
+        self.active_epithelium = Epithelium(0)
+        self.mapped_epithelium = mapped_epithelium
+        self.render_buffer.publish(mapped_epithelium.render_snapshot())
+        for listener in self.epithelium_listeners:
+            listener.draw()
+        self.update_gui_to_active_epithelium()
+        return True
+
+    def load_trajectory(self, file_path: str) -> bool:
+        """
+        Replays a recorded trajectory file (see TrajectoryRecorder), or a compressed one (see TrajectoryCodec),
+        in place of the active epithelium.
+        The simulation controls play, pause, and seek through the recording until replay is stopped.
+        :param file_path: The file to load.
+        :return: True if the file is being replayed. False if it is not a trajectory file or has no frames.
+        """
+        if is_trajectory_file(file_path):
+            reader_type = TrajectoryReader
+        elif is_compressed_trajectory_file(file_path):
+            reader_type = CompressedTrajectoryReader
+        else:
+            return False
+        try:
+            reader = reader_type(file_path)
+        except Exception:
+            return False
+        if not len(reader):
+            return False
+
+        self.active_epithelium = Epithelium(0)
+        self.replay_worker = TrajectoryReplayWorker(self, self.render_buffer, reader)
+        self.replay_worker.start()
+        self.replay_worker.seek(0)
+        for controller in self.simulation_controllers:
+            controller.show_replay_controls(len(reader))
+        self.update_enabled_widgets()
+        return True
+
+    def end_replay(self) -> None:
+        """Stops replaying a trajectory and draws the active epithelium again."""
+        if self.replay_worker is None:
+            return
+        self.replay_worker.shut_down()
+        self.replay_worker = None
+        self._simulating = False
+        for controller in self.simulation_controllers:
+            controller.show_replay_controls(0)
+        self.simulation_worker.epithelium = self.active_epithelium
+        for listener in self.epithelium_listeners:
+            listener.draw()
+        self.update_enabled_widgets()
+
+    def seek_replay(self, index: int) -> None:
+        """
+        Shows a frame of the replayed trajectory.
+        :param index: The index of the frame.
+        """
+        if self.replay_worker is not None:
+            self.replay_worker.seek(index)
+
+    @property
+    def replay_reversed(self) -> bool:
+        """Returns true if the replayed trajectory plays backwards."""
+        return self.replay_worker is not None and self.replay_worker.reversed
+
+    @replay_reversed.setter
+    def replay_reversed(self, value: bool) -> None:
+        """
+        Sets the direction the replayed trajectory plays in.
+        :param value: Plays backwards if true, forwards otherwise.
+        """
+        if self.replay_worker is not None:
+            with self.replay_worker.frame_lock:
+                self.replay_worker.reversed = value
+
+    def on_replay_frame(self, event: ReplayFrameEvent):
+        """Callback invoked after the replay worker has published a frame, or stopped at an end of the recording.
+        Draws the frame and moves the replay slider to it."""
         event.Skip(False)
+        if self.replay_worker is None:
+            return
+        self.replay_worker.frame_consumed()
+
+        for listener in self.epithelium_listeners:
+            listener.draw()
+        for controller in self.simulation_controllers:
+            controller.replay_slider.SetValue(event.index)
+        self.status_bar.SetStatusText("Replaying tick %d" % self.replay_worker.reader.ticks[event.index], 1)
+
+        if self.simulating and not self.replay_worker.resumed:
+            self._simulating = False
+            self.update_enabled_widgets()
+
+    def materialize_mapped_epithelium(self, on_done=None) -> None:
+        """
+        Creates the cells of a mapped epithelium file in the background and makes it the active epithelium.
+        :param on_done: Called once the mapped epithelium is the active epithelium.
+        """
+        if self.mapped_epithelium is None:
+            return
+
+        def on_materialized(epithelium: Epithelium):
+            self.active_epithelium = epithelium
+            if on_done is not None:
+                on_done()
+        self.start_file_operation("Loading Epithelium", self.mapped_epithelium.materialize, on_materialized)
 
     def on_sim_overview_save(self, event: wx.Event):
         """
@@ -288,10 +891,14 @@ class MainFrame(MainFrameBase):
             self.on_sim_overview_save_as(event)
             return
 
-        # attempt to save to active file
-        export_simulation_settings(list(self.m_sim_overview_sim_options_scrolled_window.GetChildren()),
-                                   furrow_event_list,
-                                   self.active_simulation_settings_file)
+        # gather the settings from the gui, then write them in the background
+        simulation_options = simulation_options_from_widgets(
+            list(self.m_sim_overview_sim_options_scrolled_window.GetChildren()))
+        furrow_events = [furrow_event.copy() for furrow_event in furrow_event_list]
+        file_path = self.active_simulation_settings_file
+        self.start_file_operation("Saving Simulation Settings",
+                                  lambda progress: write_simulation_settings(simulation_options, furrow_events,
+                                                                             file_path))
 
         # do not consume event
         event.Skip(False)
@@ -329,17 +936,34 @@ class MainFrame(MainFrameBase):
 
         # load the file
         active_simulation_settings_file = load_dialog.GetPath()
-        imported_settings = import_simulation_settings(active_simulation_settings_file)
+        self.start_file_operation("Loading Simulation Settings",
+                                  lambda progress: read_simulation_settings(active_simulation_settings_file),
+                                  lambda settings: self.on_sim_overview_loaded(active_simulation_settings_file,
+                                                                               settings))
 
-        # update with values from loaded file
-        if imported_settings:
-            self.active_simulation_settings_file = active_simulation_settings_file
+        # do not consume event
+        event.Skip(False)
+
+    def on_sim_overview_loaded(self, file_path: str, settings: tuple):
+        """
+        Invoked once a simulation settings file has been read in the background.
+        Updates the gui to match the values of the file, which becomes the active file.
+        :param file_path: The read file.
+        :param settings: The simulation options and furrow events of the file (see read_simulation_settings).
+        None if the file could not be read.
+        """
+        if settings:
+            imported_settings, imported_furrow_event_list = settings
+            apply_furrow_event_settings(imported_furrow_event_list)
+            self.active_simulation_settings_file = file_path
             simulation_scroll_children = self.m_sim_overview_sim_options_scrolled_window.GetChildren()
             for i in range(len(simulation_scroll_children)):
                 if isinstance(simulation_scroll_children[i], wx.StaticText):
                     static_text = simulation_scroll_children[i]  # type: wx.StaticText
                     text_ctrl = simulation_scroll_children[i + 1]  # type: TextCtrl
-                    text_ctrl.SetValue(imported_settings[static_text.GetLabelText()])
+                    # settings saved before an option existed keep its current value
+                    if static_text.GetLabelText() in imported_settings:
+                        text_ctrl.SetValue(imported_settings[static_text.GetLabelText()])
 
             self.m_sim_overview_spec_options_scrolled_window.DestroyChildren()
             self.add_fields(self.m_sim_overview_spec_options_scrolled_window, furrow_event_list)
@@ -352,9 +976,6 @@ class MainFrame(MainFrameBase):
             dlg.ShowModal()
             dlg.Destroy()
 
-        # do not consume event
-        event.Skip(False)
-
     def on_sim_overview_user_input(self, event: wx.Event):
         """
         Callback invoked whenever a user alters a simulation input in the simulation overview tab.
@@ -383,9 +1004,17 @@ class MainFrame(MainFrameBase):
         Function called when the simulation of an epithelium should fully stop (not just pause).
         Resets the epithelium to its pre-simulation state.
         """
-        imported_epithelium = import_epithelium(self.temporary_epithelium_location)
-        if imported_epithelium:
-            self.active_epithelium = imported_epithelium
+        self.simulation_worker.pause()
+        if self.replay_worker is not None:
+            self.end_replay()
+            return
+        if self.initial_snapshot is not None:
+            with self.simulation_worker.tick_lock:
+                # keep the simulation options the user has entered since the snapshot was taken
+                self.active_epithelium.restore(self.initial_snapshot, event_fields=False)
+                self.active_epithelium.history = None
+            # reassigning resets the simulation state and hands the restored epithelium to every listener
+            self.active_epithelium = self.active_epithelium
 
     # endregion event handling
 
@@ -393,14 +1022,168 @@ class MainFrame(MainFrameBase):
 
     def on_epithelium_generated(self, event: EpitheliumGenerationEvent):
         """
-        Callback invoked after a background worker has finished creating an epithelium.
+        Callback invoked after a background worker has finished creating an epithelium, or has been cancelled.
         :param event: Event containing the produced epithelium.
         :return:
         """
-        self.active_epithelium = event.get_epithelium()
+        if event.worker is not self.generation_worker:
+            return
+        self.generation_worker = None
         self.generating_epithelium = False
+        epithelium = event.get_epithelium()
+        if len(event.candidates) > 1:
+            epithelium = self.choose_generated_candidate(event.candidates)
+        if epithelium is None:
+            # replace the preview of the abandoned epithelium
+            self.redraw_active_epithelium()
+        else:
+            self.active_epithelium = epithelium
         self.update_enabled_widgets()
 
+        if event.error:
+            dlg = wx.MessageDialog(self, "Could not generate epithelium: %s" % event.error,
+                                   "Unable To Generate", wx.OK | wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+        elif epithelium is None:
+            self.status_bar.SetStatusText("Generation cancelled")
+
+    def choose_generated_candidate(self, candidates: list) -> Epithelium:
+        """
+        Asks the user which of several generated epithelia to keep. The chosen candidate's seed is entered
+        in the seed input, so it can be generated again.
+        :param candidates: The (epithelium, seed, residual) of every candidate, best relaxed first.
+        :return: The chosen epithelium, None if the user chose none of them.
+        """
+        choices = ["Seed %d, largest movement %.3g" % (seed, residual if residual is not None else 0)
+                   for _, seed, residual in candidates]
+        dlg = wx.SingleChoiceDialog(self, "Choose the epithelium to keep. The best relaxed one is listed first.",
+                                    "Generated Candidates", choices)
+        chosen = None
+        if dlg.ShowModal() == wx.ID_OK:
+            epithelium, seed, _ = candidates[dlg.GetSelection()]
+            self.seed_text_ctrl.SetValue(str(seed))
+            chosen = epithelium
+        dlg.Destroy()
+        return chosen
+
+    def on_epithelium_generation_progress(self, event: EpitheliumGenerationProgressEvent):
+        """
+        Callback invoked as a background worker generates an epithelium.
+        Displays the phase of generation and draws the preview of the partially relaxed cells.
+        :param event: Event describing how far generation has got.
+        """
+        if event.worker is not self.generation_worker:
+            return
+        status = "Generating Epithelium... %s %d%%" % (event.phase, event.fraction * 100)
+        if event.residual is not None:
+            status += ", largest movement %.3g" % event.residual
+        self.status_bar.SetStatusText(status)
+        if event.preview:
+            self.m_epithelium_gen_display_panel.draw()
+
+    def seek_history(self, tick: int) -> None:
+        """
+        Shows a recorded tick of the paused simulation. Resuming continues from the keyframe at or before it.
+        :param tick: A tick in the history of the active epithelium.
+        """
+        history = self.active_epithelium.history
+        if history is None or self.simulating:
+            return
+        with self.simulation_worker.tick_lock:
+            if tick not in history:
+                return
+            snapshot = history.render_snapshot(tick)
+        self.history_tick = tick
+        self.render_buffer.publish(snapshot)
+        for listener in self.epithelium_listeners:
+            listener.draw()
+        self.status_bar.SetStatusText("Tick %d of %d" % (tick, history.last_tick), 1)
+
+    def resume_from_history(self) -> None:
+        """Restores the active epithelium to the tick picked with seek_history, forgetting every later tick."""
+        history = self.active_epithelium.history
+        tick, self.history_tick = self.history_tick, None
+        if history is None or tick is None:
+            return
+        with self.simulation_worker.tick_lock:
+            if tick not in history or tick == history.last_tick:
+                return
+            self.simulation_worker.tick = history.restore(self.active_epithelium, tick, event_fields=False)
+
+    def show_history_controls(self) -> None:
+        """Shows the history slider while a simulation with a history is paused, and hides it otherwise."""
+        history = self.active_epithelium.history
+        first_tick = last_tick = None
+        if history is not None and not self.simulating and self.replay_worker is None:
+            with self.simulation_worker.tick_lock:
+                if len(history):
+                    first_tick, last_tick = history.first_tick, history.last_tick
+        for controller in self.simulation_controllers:
+            controller.show_history_controls(first_tick, last_tick)
+
+    def redraw_active_epithelium(self) -> None:
+        """Publishes and draws the active epithelium, replacing whatever was drawn in its place."""
+        if self.replay_worker is not None:
+            self.seek_replay(self.replay_worker.index)
+            return
+        if self.mapped_epithelium is not None:
+            snapshot = self.mapped_epithelium.render_snapshot()
+        else:
+            with self.simulation_worker.tick_lock:
+                snapshot = RenderSnapshot.from_epithelium(self.active_epithelium)
+        self.render_buffer.publish(snapshot)
+        for listener in self.epithelium_listeners:
+            listener.draw()
+
+    def start_file_operation(self, description: str, operation, on_done=None) -> None:
+        """
+        Saves or loads a file in the background, showing its progress in the status bar.
+        Controls that would change the epithelium or its files are disabled until it is done or cancelled.
+        :param description: Describes the operation to the user, such as "Saving Epithelium".
+        :param operation: Called with a progress callback in the background (see FileWorker).
+        :param on_done: Called with the result of the operation once it has succeeded.
+        """
+        self.file_worker = FileWorker(self, description, operation, on_done)
+        self.file_worker.start()
+        self.update_enabled_widgets()
+
+    def on_cancel(self, event: wx.Event):
+        """
+        Callback invoked when the user clicks the cancel button. Stops the generation or file operation in progress.
+        :param event: event generated by user input
+        """
+        if self.generation_worker is not None:
+            self.generation_worker.cancel()
+        if self.file_worker is not None:
+            self.file_worker.cancel()
+        event.Skip(False)
+
+    def on_file_progress(self, event: FileProgressEvent):
+        """Callback invoked as a background file operation progresses. Displays its progress."""
+        if event.worker is self.file_worker:
+            self.status_bar.SetStatusText("%s... %d%%" % (event.worker.description, event.fraction * 100))
+
+    def on_file_done(self, event: FileDoneEvent):
+        """
+        Callback invoked after a background file operation has finished, failed or been cancelled.
+        :param event: Event containing the result of the operation.
+        """
+        if event.worker is not self.file_worker:
+            return
+        self.file_worker = None
+        self.update_enabled_widgets()
+
+        if event.cancelled:
+            self.status_bar.SetStatusText("%s cancelled" % event.worker.description)
+        elif event.error is not None:
+            dlg = wx.MessageDialog(self, "%s failed: %s" % (event.worker.description, event.error),
+                                   "File Error", wx.OK | wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+        elif event.worker.on_done is not None:
+            event.worker.on_done(event.result)
+
     # endregion background workers
 
     # region input validation
@@ -414,7 +1197,10 @@ class MainFrame(MainFrameBase):
         avg_cell_size = self.validate_ep_gen_avg_cell_size()
         variance = self.validate_ep_gen_cell_size_variance()
         cell_count = self.validate_ep_gen_min_cell_count()
-        return avg_cell_size and variance and cell_count
+        seed = self.validate_ep_gen_seed()
+        candidates = self.validate_ep_gen_candidates()
+        tiling_threshold = self.validate_ep_gen_tiling_threshold()
+        return avg_cell_size and variance and cell_count and seed and candidates and tiling_threshold
 
     def sim_overview_input_validation(self) -> bool:
         """Validates all simulation overview simulation inputs.
@@ -424,8 +1210,16 @@ class MainFrame(MainFrameBase):
         cell_max_size = self.validate_ep_gen_cell_max_size()
         cell_growth_rate = self.validate_ep_gen_cell_growth_rate()
         sim_speed = self.validate_simulation_speed()
-
-        inputs_valid = furrow_velocity and cell_max_size and cell_growth_rate and sim_speed
+        ticks_per_frame = self.validate_ticks_per_frame()
+        decompaction_processes = self.validate_decompaction_processes()
+        sleep_threshold = self.validate_sleep_threshold()
+        relaxation_iterations = self.validate_relaxation_iterations()
+        relaxation_tolerance = self.validate_relaxation_tolerance()
+        reorder_interval = self.validate_reorder_interval()
+
+        inputs_valid = furrow_velocity and cell_max_size and cell_growth_rate and sim_speed and ticks_per_frame \
+            and decompaction_processes and sleep_threshold and relaxation_iterations and relaxation_tolerance \
+            and reorder_interval
         self.simulation_controllers_inputs_valid = inputs_valid
 
         self.update_enabled_widgets()
@@ -450,6 +1244,57 @@ class MainFrame(MainFrameBase):
         self.display_text_control_validation(self.min_cell_count_text_ctrl, validated)
         return validated
 
+    def validate_ep_gen_seed(self) -> bool:
+        """Validates user input to seed_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+        seed_str = self.str_from_text_input(self.seed_text_ctrl)  # type: str
+
+        validated = True
+        try:
+            # the seed must be empty or a non-negative integer value
+            if seed_str and int(seed_str) < 0:
+                validated = False
+        except ValueError:
+            validated = False
+
+        self.display_text_control_validation(self.seed_text_ctrl, validated)
+        return validated
+
+    def validate_ep_gen_candidates(self) -> bool:
+        """Validates user input to candidates_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+        candidates_str = self.str_from_text_input(self.candidates_text_ctrl)  # type: str
+
+        validated = True
+        try:
+            # the candidate count must be a positive integer value
+            if int(candidates_str) < 1:
+                validated = False
+        except ValueError:
+            validated = False
+
+        self.display_text_control_validation(self.candidates_text_ctrl, validated)
+        return validated
+
+    def validate_ep_gen_tiling_threshold(self) -> bool:
+        """Validates user input to tiling_threshold_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+        tiling_threshold_str = self.str_from_text_input(self.tiling_threshold_text_ctrl)  # type: str
+
+        validated = True
+        try:
+            # the tiling threshold must be a positive integer value
+            if int(tiling_threshold_str) < 1:
+                validated = False
+        except ValueError:
+            validated = False
+
+        self.display_text_control_validation(self.tiling_threshold_text_ctrl, validated)
+        return validated
+
     def validate_ep_gen_avg_cell_size(self) -> bool:
         """
         Validates the user input to avg_cell_size_text_ctrl
@@ -557,6 +1402,103 @@ class MainFrame(MainFrameBase):
         self.display_text_control_validation(self.simulation_speed_text_ctrl, validated)
         return validated
 
+    def validate_ticks_per_frame(self) -> bool:
+        """
+        Validates the user input to ticks_per_frame_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        ticks_per_frame_str = self.str_from_text_input(self.ticks_per_frame_text_ctrl)
+        try:
+            # value must be a positive integer
+            ticks_per_frame = int(ticks_per_frame_str)
+            validated = ticks_per_frame > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.ticks_per_frame_text_ctrl, validated)
+        return validated
+
+
+    def validate_decompaction_processes(self) -> bool:
+        """
+        Validates the user input to decompaction_processes_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        decompaction_processes_str = self.str_from_text_input(self.decompaction_processes_text_ctrl)
+        try:
+            # value must be empty or a positive integer
+            validated = not decompaction_processes_str or int(decompaction_processes_str) > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.decompaction_processes_text_ctrl, validated)
+        return validated
+
+    def validate_sleep_threshold(self) -> bool:
+        """
+        Validates the user input to sleep_threshold_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        sleep_threshold_str = self.str_from_text_input(self.sleep_threshold_text_ctrl)
+        try:
+            # value must be empty or a positive number
+            validated = not sleep_threshold_str or float(sleep_threshold_str) > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.sleep_threshold_text_ctrl, validated)
+        return validated
+
+    def validate_relaxation_iterations(self) -> bool:
+        """
+        Validates the user input to relaxation_iterations_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        relaxation_iterations_str = self.str_from_text_input(self.relaxation_iterations_text_ctrl)
+        try:
+            # value must be empty or a positive integer
+            validated = not relaxation_iterations_str or int(relaxation_iterations_str) > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.relaxation_iterations_text_ctrl, validated)
+        return validated
+
+    def validate_relaxation_tolerance(self) -> bool:
+        """
+        Validates the user input to relaxation_tolerance_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        relaxation_tolerance_str = self.str_from_text_input(self.relaxation_tolerance_text_ctrl)
+        try:
+            # value must be a positive number
+            validated = float(relaxation_tolerance_str) > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.relaxation_tolerance_text_ctrl, validated)
+        return validated
+
+    def validate_reorder_interval(self) -> bool:
+        """
+        Validates the user input to reorder_interval_text_ctrl
+        :return: Return True if the validation was successful. Return False otherwise.
+        """
+
+        reorder_interval_str = self.str_from_text_input(self.reorder_interval_text_ctrl)
+        try:
+            # value must be empty or a positive integer
+            validated = not reorder_interval_str or int(reorder_interval_str) > 0
+        except Exception:
+            validated = False
+
+        self.display_text_control_validation(self.reorder_interval_text_ctrl, validated)
+        return validated
 
     @staticmethod
     def display_text_control_validation(txt_control: TextCtrl, validated: bool = True) -> None:
@@ -592,24 +1534,34 @@ class MainFrame(MainFrameBase):
         :param value: The new active epithelium
         :return: None
         """
+        self.simulation_worker.pause()
+        self.end_replay()
+        self.mapped_epithelium = None
         self.__active_epithelium = value
+        self.history_tick = None
         self.has_simulated = False
         self.simulating = False
         self.active_epithelium.furrow.events = furrow_event_list
+        self.simulation_worker.epithelium = value
 
         # notify listeners of change
         for listener in self.epithelium_listeners:
             listener.epithelium = self.__active_epithelium
 
-    def update_epithelium(self, event: wx.EVT_TIMER):
-        """Simulates the active epithelium for one tick.
-        Draws the updated epithelium."""
-        self.active_epithelium.update()
+    def on_simulation_frame(self, event: SimulationFrameEvent):
+        """Callback invoked after the simulation worker has published a new frame.
+        Draws the updated epithelium and displays the measured tick and frame rates."""
+        self.simulation_worker.frame_consumed()
         event.Skip(False)
 
         for listener in self.epithelium_listeners:
             listener.draw()
 
+        self.frame_counter.count()
+        if self.simulating:
+            self.status_bar.SetStatusText("%.1f ticks/s, %.1f frames/s" % (self.simulation_worker.tick_rate,
+                                                                           self.frame_counter.rate), 1)
+
     @ property
     def simulating(self) -> bool:
         """Returns true if the active epithelium is being simulated. Returns false otherwise."""
@@ -623,22 +1575,69 @@ class MainFrame(MainFrameBase):
         :return: None
         """
 
-        # save the epithelium to a temporary location before it is simulated for the first time
-        # this is used to reload the origonal state of the epithelium when simulation is stopped
+        # while a trajectory is replayed the simulation controls play and pause the recording
+        if self.replay_worker is not None:
+            self._simulating = simulate
+            if simulate:
+                self.replay_worker.frame_delay = 1 / float(self.str_from_text_input(self.simulation_speed_text_ctrl))
+                self.replay_worker.frames_per_step = int(self.str_from_text_input(self.ticks_per_frame_text_ctrl))
+                self.replay_worker.resume()
+            else:
+                self.replay_worker.pause()
+            self.update_enabled_widgets()
+            return
+
+        # the cells of a mapped file are created before it is simulated
+        if simulate and self.mapped_epithelium is not None:
+            self.materialize_mapped_epithelium(self.start_materialized_simulation)
+            return
+
+        # snapshot the epithelium before it is simulated for the first time
+        # this is used to restore the original state of the epithelium when simulation is stopped
         if simulate and not self.has_simulated:
-            export_epithelium(self.active_epithelium, self.temporary_epithelium_location)
+            self.initial_snapshot = self.active_epithelium.snapshot(memory_budget=self.snapshot_memory_budget)
+            self.use_simulation_process(self.simulation_process_check_box.GetValue())
+            # record every tick so that a paused simulation can be scrubbed back and continued from earlier.
+            # A simulation process keeps its own copy of the epithelium, which is not recorded
+            if isinstance(self.simulation_worker, SimulationWorker):
+                self.active_epithelium.keep_history()
+            # hand the worker the epithelium again so it picks up the latest simulation options
+            self.simulation_worker.epithelium = self.active_epithelium
 
         self._simulating = simulate
         if simulate and len(self.active_epithelium.cells):
+            self.resume_from_history()
             frames_per_second = float(self.str_from_text_input(self.simulation_speed_text_ctrl))
-            simulation_delay = 1000 / frames_per_second  # (MS per S) / fps = ms per update
-            self.simulation_timer.Start(simulation_delay)
+            self.simulation_worker.frame_delay = 1 / frames_per_second  # seconds per frame
+            self.simulation_worker.ticks_per_frame = int(self.str_from_text_input(self.ticks_per_frame_text_ctrl))
+            self.simulation_worker.max_throughput = self.max_throughput_check_box.GetValue()
+            self.frame_counter.reset()
+            self.simulation_worker.resume()
             self.has_simulated = True
         else:
-            self.simulation_timer.Stop()
+            self.simulation_worker.pause()
+            self.status_bar.SetStatusText("", 1)
 
+        self.show_history_controls()
         self.update_enabled_widgets()
 
+    def use_simulation_process(self, enabled: bool) -> None:
+        """
+        Replaces the simulation worker if it does not simulate where asked to.
+        :param enabled: Simulates the active epithelium in a separate process if true, in a thread otherwise.
+        """
+        simulation_worker_type = SimulationProcessWorker if enabled else SimulationWorker
+        if type(self.simulation_worker) is simulation_worker_type:
+            return
+        self.simulation_worker.shut_down()
+        self.simulation_worker = simulation_worker_type(self, self.render_buffer, self.active_epithelium)
+        self.simulation_worker.start()
+
+    def start_materialized_simulation(self) -> None:
+        """Simulates a mapped epithelium once its cells have been created."""
+        self.update_epithelium_with_sim_options()
+        self.simulating = True
+
     @property
     def has_simulated(self):
         return self._has_simulated
@@ -659,40 +1658,49 @@ class MainFrame(MainFrameBase):
         """
 
         # status bar updates:
+        file_operation = self.file_worker is not None
         if self.generating_epithelium:
             self.status_bar.SetStatusText("Generating Epithelium...")
+        elif file_operation:
+            self.status_bar.SetStatusText("%s..." % self.file_worker.description)
         else:
             self.status_bar.SetStatusText("")
 
         # Epithelium Creation
-        self.ep_gen_create_button.Enable(not self.generating_epithelium)
+        self.ep_gen_create_button.Enable(not self.generating_epithelium and not file_operation)
+        self.cancel_button.Enable(file_operation or self.generating_epithelium)
 
         # epithelium file options
-        enable_epithelium_file_options = not self.generating_epithelium
+        enable_epithelium_file_options = not self.generating_epithelium and not file_operation
         self.ep_gen_save_button.Enable(enable_epithelium_file_options)
         self.ep_gen_save_as_button.Enable(enable_epithelium_file_options)
         self.ep_gen_load_button.Enable(enable_epithelium_file_options)
 
         # simulation settings file options
-        enable_simulation_file_options = not self.generating_epithelium and not self.simulating
+        enable_simulation_file_options = not self.generating_epithelium and not self.simulating and not file_operation
         self.m_sim_overview_save_button.Enable(enable_simulation_file_options)
         self.m_sim_overview_save_as_button.Enable(enable_simulation_file_options)
         self.m_sim_overview_load_button.Enable(enable_simulation_file_options)
 
         # simulation options
+        replaying = self.replay_worker is not None
         self.enable_edit_simulation_options(not self.has_simulated and not self.generating_epithelium)
-        self.enable_edit_specialization_options(not self.has_simulated and not self.generating_epithelium)
+        self.enable_edit_specialization_options(not self.has_simulated and not self.generating_epithelium
+                                                and not replaying)
 
         # update status of simulation start stop and pause buttons
         for controller in self.simulation_controllers:
             start_button = controller.m_button4  # type: Button
             start_button.Enable(self.simulation_controllers_inputs_valid
                                 and not self.generating_epithelium
+                                and not file_operation
                                 and not self.simulating)
             pause_button = controller.m_button5
-            pause_button.Enable(not self.generating_epithelium and self.has_simulated and self.simulating)
+            pause_button.Enable(not self.generating_epithelium
+                                and (self.has_simulated or replaying)
+                                and self.simulating)
             stop_button = controller.m_button6
-            stop_button.Enable(not self.generating_epithelium and self.has_simulated)
+            stop_button.Enable(not self.generating_epithelium and (self.has_simulated or replaying))
 
     def enable_edit_simulation_options(self, enable: bool):
         """Enables or disables user ability to edit all simulation options"""
@@ -729,6 +1737,13 @@ class MainFrame(MainFrameBase):
         Updates all gui values to match the values stored by the active epithelium
         """
 
+        if self.mapped_epithelium is not None:
+            average_cell_size, cell_size_variance = self.mapped_epithelium.radius_statistics()
+            self.min_cell_count_text_ctrl.SetValue(str(len(self.mapped_epithelium)))
+            self.avg_cell_size_text_ctrl.SetValue(str(average_cell_size))
+            self.cell_size_variance_text_ctrl.SetValue(str(cell_size_variance))
+            return
+
         epithelium = self.active_epithelium
         min_cell_count = len(epithelium.cells)
         if min_cell_count:
@@ -746,7 +1761,9 @@ class MainFrame(MainFrameBase):
         Updates the active epithelium with the simulation options from the GUI
         """
 
-        if self.sim_overview_input_validation() and not self.has_simulated:
+        # a mapped epithelium is updated once its cells have been created, see start_materialized_simulation
+        if self.sim_overview_input_validation() and not self.has_simulated and self.mapped_epithelium is None:
+
             # cell max size
             cell_max_size_str = self.str_from_text_input(self.cell_max_size_text_ctrl)  # type: str
             cell_max_size = float(cell_max_size_str)
@@ -765,6 +1782,40 @@ class MainFrame(MainFrameBase):
             furrow_velocity = float(furrow_velocity_str)
             self.active_epithelium.furrow.velocity = furrow_velocity
 
+            # decompaction processes
+            decompaction_processes_str = self.str_from_text_input(self.decompaction_processes_text_ctrl)
+            handler = self.active_epithelium.cell_collision_handler
+            if handler is not None:
+                handler.decompaction_processes = int(decompaction_processes_str) if decompaction_processes_str \
+                    else None
+
+            # sleep threshold
+            sleep_threshold_str = self.str_from_text_input(self.sleep_threshold_text_ctrl)
+            if handler is not None:
+                handler.sleep_threshold = float(sleep_threshold_str) if sleep_threshold_str else None
+
+            # relaxation scheduler
+            relaxation_iterations_str = self.str_from_text_input(self.relaxation_iterations_text_ctrl)
+            if relaxation_iterations_str:
+                relaxation_tolerance = float(self.str_from_text_input(self.relaxation_tolerance_text_ctrl))
+                self.active_epithelium.relaxation_scheduler = RelaxationScheduler(int(relaxation_iterations_str),
+                                                                                  relaxation_tolerance)
+            else:
+                self.active_epithelium.relaxation_scheduler = None
+
+            # cell ordering
+            reorder_interval_str = self.str_from_text_input(self.reorder_interval_text_ctrl)
+            if reorder_interval_str:
+                self.active_epithelium.cell_ordering = CellOrdering(interval=int(reorder_interval_str))
+            else:
+                self.active_epithelium.cell_ordering = None
+
+            # cell pool, an existing pool is kept so that the handles to its cells stay valid
+            if not self.recycle_cells_check_box.GetValue():
+                self.active_epithelium.cell_pool = None
+            elif self.active_epithelium.cell_pool is None:
+                self.active_epithelium.cell_pool = CellPool()
+
     def init_icon(self):
         """initializes and displays the application icon."""
         image = wx.Image(r"./resources/EDM-1.png")  # type: wx.Image
@@ -784,5 +1835,17 @@ class MainFrame(MainFrameBase):
         self.cell_growth_rate_text_ctrl.SetValue("0.005")
         self.furrow_velocity_text_ctrl.SetValue("20")
         self.simulation_speed_text_ctrl.SetValue("100")
+        self.ticks_per_frame_text_ctrl.SetValue("1")
+        self.max_throughput_check_box.SetValue(False)
+        self.simulation_process_check_box.SetValue(False)
+        self.decompaction_processes_text_ctrl.SetValue("")
+        self.sleep_threshold_text_ctrl.SetValue("")
+        self.relaxation_iterations_text_ctrl.SetValue("")
+        self.relaxation_tolerance_text_ctrl.SetValue("0.5")
+        self.reorder_interval_text_ctrl.SetValue("")
+        self.recycle_cells_check_box.SetValue(False)
+        self.generation_process_check_box.SetValue(False)
+        self.cache_check_box.SetValue(True)
+        self.tiling_threshold_text_ctrl.SetValue(str(tiled_generation_threshold))
 
     # endregion misc
@@ -1,5 +1,6 @@
 from eye_development_gui.SimulationPanelBase import SimulationPanelBase
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
 import wx
 
 
@@ -17,6 +18,88 @@ class SimulationPanel(SimulationPanelBase):
         """
         SimulationPanelBase.__init__(self, parent)
         self.simulation_listeners = []
+        self.add_replay_controls()
+        self.add_history_controls()
+
+    def add_replay_controls(self):
+        """
+        Adds the controls for replaying a recorded trajectory next to the simulation buttons.
+        They are hidden until a trajectory is replayed (see show_replay_controls).
+        """
+        control_b_sizer = self.m_button4.GetContainingSizer()  # type: wx.BoxSizer
+
+        self.replay_slider = wx.Slider(self, wx.ID_ANY, 0, 0, 1, wx.DefaultPosition, wx.DefaultSize,
+                                       wx.SL_HORIZONTAL)  # type: wx.Slider
+        self.replay_slider.SetToolTip(u"Recorded frame")
+        self.replay_slider.Bind(wx.EVT_SLIDER, self.replay_seek_callback)
+        control_b_sizer.Add(self.replay_slider, 1, wx.ALL | wx.EXPAND, 5)
+
+        self.replay_reverse_check_box = wx.CheckBox(self, wx.ID_ANY, u"Reverse", wx.DefaultPosition,
+                                                    wx.DefaultSize, 0)  # type: wx.CheckBox
+        self.replay_reverse_check_box.SetToolTip(u"Play the recording backwards")
+        self.replay_reverse_check_box.Bind(wx.EVT_CHECKBOX, self.replay_reverse_callback)
+        control_b_sizer.Add(self.replay_reverse_check_box, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        self.show_replay_controls(0)
+
+    def show_replay_controls(self, frame_count: int):
+        """
+        Shows or hides the replay controls.
+        :param frame_count: The number of frames of the replayed trajectory, 0 hides the controls.
+        """
+        if frame_count:
+            self.replay_slider.SetRange(0, max(frame_count - 1, 1))
+            self.replay_slider.SetValue(0)
+        self.replay_slider.Show(bool(frame_count))
+        self.replay_reverse_check_box.Show(bool(frame_count))
+        self.Layout()
+
+    def add_history_controls(self):
+        """
+        Adds the slider for scrubbing back through the recorded ticks of a paused simulation
+        next to the simulation buttons. It is hidden until a simulation with a history is paused
+        (see show_history_controls).
+        """
+        control_b_sizer = self.m_button4.GetContainingSizer()  # type: wx.BoxSizer
+
+        self.history_slider = wx.Slider(self, wx.ID_ANY, 0, 0, 1, wx.DefaultPosition, wx.DefaultSize,
+                                        wx.SL_HORIZONTAL | wx.SL_LABELS)  # type: wx.Slider
+        self.history_slider.SetToolTip(u"Recorded tick. Simulation continues from the keyframe at or before it")
+        self.history_slider.Bind(wx.EVT_SLIDER, self.history_seek_callback)
+        control_b_sizer.Add(self.history_slider, 1, wx.ALL | wx.EXPAND, 5)
+
+        self.show_history_controls(None, None)
+
+    def show_history_controls(self, first_tick, last_tick):
+        """
+        Shows or hides the history slider.
+        :param first_tick: The oldest recorded tick, None hides the slider.
+        :param last_tick: The newest recorded tick, the slider starts there.
+        """
+        shown = first_tick is not None and last_tick > first_tick
+        if shown:
+            self.history_slider.SetRange(first_tick, last_tick)
+            self.history_slider.SetValue(last_tick)
+        self.history_slider.Show(shown)
+        self.Layout()
+
+    def history_seek_callback(self, event: wx.Event):
+        """Callback invoked when the history slider is moved. Signals all listeners to show the selected tick."""
+        for listener in self.simulation_listeners:
+            listener.seek_history(self.history_slider.GetValue())
+        event.Skip(False)
+
+    def replay_seek_callback(self, event: wx.Event):
+        """Callback invoked when the replay slider is moved. Signals all listeners to show the selected frame."""
+        for listener in self.simulation_listeners:
+            listener.seek_replay(self.replay_slider.GetValue())
+        event.Skip(False)
+
+    def replay_reverse_callback(self, event: wx.Event):
+        """Callback invoked when the replay 'Reverse' box is toggled. Signals all listeners to change direction."""
+        for listener in self.simulation_listeners:
+            listener.replay_reversed = self.replay_reverse_check_box.GetValue()
+        event.Skip(False)
 
     @property
     def epithelium(self) -> Epithelium:
@@ -30,6 +113,18 @@ class SimulationPanel(SimulationPanelBase):
         """
         self.m_epithelium_display.epithelium = value
 
+    @property
+    def render_buffer(self) -> SnapshotDoubleBuffer:
+        """returns the buffer of render snapshots that is being displayed"""
+        return self.m_epithelium_display.render_buffer
+
+    @render_buffer.setter
+    def render_buffer(self, value: SnapshotDoubleBuffer):
+        """Sets the buffer of render snapshots that is to be displayed
+        :param value: Buffer that a background simulation publishes snapshots to
+        """
+        self.m_epithelium_display.render_buffer = value
+
     def start_simulation_callback(self, event: wx.Event):
         """ Callback invoked when the SimulationPanel's 'start' button is pressed.
         Signals all listeners to begin simulating."""
@@ -0,0 +1,162 @@
+import copy
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import shutil
+import tempfile
+import threading
+
+import wx
+
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.EpitheliumFile import read_epithelium
+from epithelium_backend.GenerationProcess import run_generation_process
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+from epithelium_backend.TiledSheetGenerator import tiled_generation_threshold
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationEvent
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationProgressEvent
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import EpitheliumGenerationWorker
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import _EVT_GENERATE_EPITHELIUM
+from eye_development_gui.background_workers.EpitheliumGenerationWorker import _EVT_GENERATION_PROGRESS
+
+
+class EpitheliumGenerationProcessWorker(EpitheliumGenerationWorker):
+    """
+    Drop in replacement for EpitheliumGenerationWorker that generates epithelia in separate processes
+    (see GenerationProcess), so relaxation does not compete with the gui for the GIL. This thread only
+    relays progress, previews, and results.
+
+    Several candidate epithelia can be generated at once, one process each. Every candidate gets its own seed:
+    the entered seed plus the index of the candidate, or a random seed if none was entered, so a chosen
+    candidate can be generated again. The generated event lists every candidate, best relaxed first.
+    """
+
+    def __init__(self,
+                 parent,
+                 min_cell_count,
+                 avg_cell_size,
+                 radius_divergence,
+                 seed: int = None,
+                 cache: EpitheliumCache = None,
+                 render_buffer: SnapshotDoubleBuffer = None,
+                 preview_interval: float = 0.5,
+                 candidates: int = 1,
+                 tiled_threshold: int = tiled_generation_threshold):
+        """
+        Initialize this background worker. Takes the same parameters as EpitheliumGenerationWorker.
+        :param candidates: The number of epithelia to generate at once. Previews are drawn of the first one.
+        """
+        EpitheliumGenerationWorker.__init__(self, parent, min_cell_count, avg_cell_size, radius_divergence,
+                                            seed, cache, render_buffer, preview_interval, tiled_threshold)
+        self.daemon = True
+        self.candidates = candidates  # type: int
+        self._connections = []  # type: list
+        self._send_lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Stops every generation process. The parent is notified once they have stopped."""
+        EpitheliumGenerationWorker.cancel(self)
+        with self._send_lock:
+            for connection in self._connections:
+                try:
+                    connection.send(('cancel',))
+                except (OSError, ValueError):
+                    pass  # the process has already finished
+
+    def candidate_seeds(self) -> list:
+        """Returns the seed of every candidate."""
+        if self.cell_factory.seed is not None:
+            return [self.cell_factory.seed + candidate for candidate in range(self.candidates)]
+        return [random.randrange(2 ** 31) for _ in range(self.candidates)]
+
+    def run(self):
+        """
+        Starts a generation process per candidate and relays their messages until they have all ended.
+        Overrides Thread.run. Called internally when thread.start() is invoked
+        :return:
+        """
+
+        # spawn rather than fork, wx does not survive being forked
+        context = multiprocessing.get_context("spawn")
+        directory = tempfile.mkdtemp(prefix="epithelium_generation_")
+        seeds = self.candidate_seeds()
+        # only entered seeds are cached, random ones are unlikely to be generated again
+        cache = self.cache if self.cell_factory.seed is not None else None
+        processes = []
+        with self._send_lock:
+            for candidate, seed in enumerate(seeds):
+                cell_factory = copy.copy(self.cell_factory)
+                cell_factory.seed = seed
+                preview_interval = self.preview_interval if candidate == 0 and self.render_buffer else None
+                connection, process_connection = context.Pipe()
+                process = context.Process(target=run_generation_process,
+                                          args=(process_connection, candidate, self.min_cell_count,
+                                                self.avg_cell_size, cell_factory,
+                                                os.path.join(directory, "%d.epth" % candidate), cache,
+                                                preview_interval, self.tiled_threshold),
+                                          daemon=True)
+                process.start()
+                process_connection.close()
+                processes.append(process)
+                self._connections.append(connection)
+            # cancelled before the processes existed
+            if self.cancelled:
+                for connection in self._connections:
+                    connection.send(('cancel',))
+
+        fractions = [0.0] * len(seeds)
+        phases = [None] * len(seeds)
+        results = []
+        errors = []
+        open_connections = list(self._connections)
+        try:
+            while open_connections:
+                for connection in multiprocessing.connection.wait(open_connections):
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        open_connections.remove(connection)
+                        continue
+
+                    command, candidate = message[0], message[1]
+                    if command == 'progress':
+                        phases[candidate], fractions[candidate] = message[2], message[3]
+                        slowest = min(range(len(seeds)), key=lambda index: fractions[index])
+                        self.post_progress(phases[slowest], sum(fractions) / len(fractions),
+                                           message[4] if candidate == 0 else None, False)
+                    elif command == 'preview':
+                        self.render_buffer.publish(message[2])
+                        self.post_progress(self.phase, self.fraction, None, True)
+                    elif command == 'done':
+                        _, _, file_path, residual = message
+                        results.append((read_epithelium(file_path), seeds[candidate], residual))
+                        os.remove(file_path)
+                    elif command == 'error':
+                        errors.append(message[2])
+                    if command in ('done', 'cancelled', 'error'):
+                        open_connections.remove(connection)
+        finally:
+            for connection in self._connections:
+                connection.close()
+            for process in processes:
+                process.join(timeout=5)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        # best relaxed first
+        results.sort(key=lambda result: float("inf") if result[2] is None else result[2])
+        if self.cancelled or not results:
+            event = EpitheliumGenerationEvent(_EVT_GENERATE_EPITHELIUM, -1, worker=self, cancelled=True,
+                                              error=None if self.cancelled else "; ".join(errors))
+        else:
+            event = EpitheliumGenerationEvent(_EVT_GENERATE_EPITHELIUM, -1, results[0][0], self,
+                                              candidates=results)
+        wx.PostEvent(self.parent, event)
+
+    def post_progress(self, phase: str, fraction: float, residual: float, preview: bool) -> None:
+        """Posts a progress event if the phase changed, progress advanced a percent, or a preview was published."""
+        if preview or phase != self.phase or fraction >= self.fraction + .01:
+            self.phase = phase
+            self.fraction = fraction
+            wx.PostEvent(self.parent, EpitheliumGenerationProgressEvent(_EVT_GENERATION_PROGRESS, -1, self,
+                                                                        phase, fraction, residual, preview))
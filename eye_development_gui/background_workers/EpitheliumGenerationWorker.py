@@ -3,41 +3,89 @@ Based on code from https://wiki.wxpython.org/Non-Blocking%20Gui
 """
 
 import threading
+import time
 
 import wx
 
 from epithelium_backend.CellFactory import CellFactory
 from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.EpitheliumCache import EpitheliumCache
+from epithelium_backend.GenerationProgress import GenerationProgress
+from epithelium_backend.OperationCancelled import OperationCancelled
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+from epithelium_backend.TiledSheetGenerator import generate_epithelium
+from epithelium_backend.TiledSheetGenerator import tiled_generation_threshold
 
 
 _EVT_GENERATE_EPITHELIUM = wx.NewEventType()
 EVT_GENERATE_EPITHELIUM = wx.PyEventBinder(_EVT_GENERATE_EPITHELIUM, 1)
+_EVT_GENERATION_PROGRESS = wx.NewEventType()
+EVT_GENERATION_PROGRESS = wx.PyEventBinder(_EVT_GENERATION_PROGRESS, 1)
 
 
 class EpitheliumGenerationEvent(wx.PyCommandEvent):
-    """Event to signal that an epithelium has been created."""
+    """Event to signal that an epithelium has been created, or that its generation was cancelled or failed."""
 
-    def __init__(self, etype, eid, epithelium=None):
+    def __init__(self, etype, eid, epithelium=None, worker=None, cancelled: bool = False, error: str = None,
+                 candidates: list = None):
         """initialize the event"""
         wx.PyCommandEvent.__init__(self, etype, eid)
         self.epithelium = epithelium
+        self.worker = worker
+        self.cancelled = cancelled
+        # describes why generation failed, None if it was cancelled by the user
+        self.error = error
+        # (epithelium, seed, residual) of every generated candidate, best relaxed first
+        self.candidates = candidates or []
 
     def get_epithelium(self) -> Epithelium:
-        """Returns the epithelium tied to the event."""
+        """Returns the epithelium tied to the event. None if generation was cancelled."""
         return self.epithelium
 
 
+class EpitheliumGenerationProgressEvent(wx.PyCommandEvent):
+    """Event to signal how far the generation of an epithelium has got."""
+
+    def __init__(self, etype, eid, worker=None, phase: str = "", fraction: float = 0, residual: float = None,
+                 preview: bool = False):
+        """initialize the event"""
+        wx.PyCommandEvent.__init__(self, etype, eid)
+        self.worker = worker
+        self.phase = phase
+        self.fraction = fraction
+        self.residual = residual
+        # True if a preview of the partially relaxed cells was published to the render buffer
+        self.preview = preview
+
+
 class EpitheliumGenerationWorker(threading.Thread):
     """
     Background worker that generates an epithelium in a background thread then returns.
+
+    Progress is posted to the parent at most once per percent, or whenever the phase of generation changes.
+    Once cancel has been called generation stops after the current relaxation iteration.
     """
 
     def __init__(self,
                  parent,
                  min_cell_count,
                  avg_cell_size,
-                 radius_divergence):
-        """Initialize this background worker."""
+                 radius_divergence,
+                 seed: int = None,
+                 cache: EpitheliumCache = None,
+                 render_buffer: SnapshotDoubleBuffer = None,
+                 preview_interval: float = 0.5,
+                 tiled_threshold: int = tiled_generation_threshold):
+        """
+        Initialize this background worker.
+        :param seed: Seeds the generated cells, None for a different epithelium every time.
+        :param cache: Seeded epithelia are loaded from and saved to this cache. None to always generate.
+        :param render_buffer: The partially relaxed cells are published to this buffer as a preview.
+        None for no preview.
+        :param preview_interval: The seconds between previews.
+        :param tiled_threshold: The cell count from which epithelia are generated from tiles (see generate_epithelium).
+        """
 
         threading.Thread.__init__(self)
 
@@ -48,6 +96,47 @@ class EpitheliumGenerationWorker(threading.Thread):
         self.cell_factory = CellFactory()
         self.cell_factory.radius_divergence = radius_divergence
         self.cell_factory.average_radius = avg_cell_size
+        self.cell_factory.seed = seed
+        self.cache = cache  # type: EpitheliumCache
+        self.render_buffer = render_buffer  # type: SnapshotDoubleBuffer
+        self.preview_interval = preview_interval  # type: float
+        self.tiled_threshold = tiled_threshold  # type: int
+
+        self.phase = None  # type: str
+        self.fraction = 0  # type: float
+        self.last_preview = 0  # type: float
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns True once generation was cancelled."""
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Stops generation at its next progress report. The parent is notified once it has stopped."""
+        self._cancelled.set()
+
+    def report_progress(self, progress: GenerationProgress) -> None:
+        """
+        Progress callback handed to the epithelium being generated.
+        :param progress: How far generation has got.
+        """
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+
+        preview = False
+        now = time.perf_counter()
+        if self.render_buffer is not None and progress.cells and now - self.last_preview >= self.preview_interval:
+            self.render_buffer.publish(RenderSnapshot.from_cells(progress.cells))
+            self.last_preview = now
+            preview = True
+
+        if preview or progress.phase != self.phase or progress.fraction >= self.fraction + .01:
+            self.phase = progress.phase
+            self.fraction = progress.fraction
+            wx.PostEvent(self.parent, EpitheliumGenerationProgressEvent(_EVT_GENERATION_PROGRESS, -1, self,
+                                                                        progress.phase, progress.fraction,
+                                                                        progress.residual, preview))
 
     def run(self):
         """
@@ -56,10 +145,16 @@ class EpitheliumGenerationWorker(threading.Thread):
         :return:
         """
 
-        epithelium = Epithelium(cell_quantity=self.min_cell_count,
-                                cell_avg_radius=self.avg_cell_size,
-                                cell_factory=self.cell_factory)
-
-        event = EpitheliumGenerationEvent(_EVT_GENERATE_EPITHELIUM, -1, epithelium)
+        try:
+            # large epithelia are generated from tiles
+            epithelium = generate_epithelium(cell_quantity=self.min_cell_count,
+                                             cell_avg_radius=self.avg_cell_size,
+                                             cell_factory=self.cell_factory,
+                                             cache=self.cache,
+                                             progress=self.report_progress,
+                                             tiled_threshold=self.tiled_threshold)
+        except OperationCancelled:
+            event = EpitheliumGenerationEvent(_EVT_GENERATE_EPITHELIUM, -1, worker=self, cancelled=True)
+        else:
+            event = EpitheliumGenerationEvent(_EVT_GENERATE_EPITHELIUM, -1, epithelium, self)
         wx.PostEvent(self.parent, event)
-
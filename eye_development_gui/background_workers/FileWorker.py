@@ -0,0 +1,100 @@
+"""
+Based on code from https://wiki.wxpython.org/Non-Blocking%20Gui
+"""
+
+import threading
+
+import wx
+
+from epithelium_backend.OperationCancelled import OperationCancelled
+
+
+_EVT_FILE_PROGRESS = wx.NewEventType()
+EVT_FILE_PROGRESS = wx.PyEventBinder(_EVT_FILE_PROGRESS, 1)
+_EVT_FILE_DONE = wx.NewEventType()
+EVT_FILE_DONE = wx.PyEventBinder(_EVT_FILE_DONE, 1)
+
+
+class FileProgressEvent(wx.PyCommandEvent):
+    """Event to signal how far a file operation has got."""
+
+    def __init__(self, etype, eid, worker=None, fraction: float = 0):
+        """initialize the event"""
+        wx.PyCommandEvent.__init__(self, etype, eid)
+        self.worker = worker
+        self.fraction = fraction
+
+
+class FileDoneEvent(wx.PyCommandEvent):
+    """Event to signal that a file operation has finished, failed, or been cancelled."""
+
+    def __init__(self, etype, eid, worker=None, result=None, error: Exception = None, cancelled: bool = False):
+        """initialize the event"""
+        wx.PyCommandEvent.__init__(self, etype, eid)
+        self.worker = worker
+        self.result = result
+        self.error = error
+        self.cancelled = cancelled
+
+
+class FileWorker(threading.Thread):
+    """
+    Background worker that runs one file operation, such as saving or loading an epithelium, then returns.
+
+    The operation is called with a progress callback, which it calls with the fraction of the work done.
+    Progress is posted to the parent at most once per percent, and once cancel has been called the callback
+    raises OperationCancelled so the operation stops at its next report.
+    """
+
+    def __init__(self, parent, description: str, operation, on_done=None):
+        """
+        Initialize this background worker.
+        :param parent: The wx window that is notified of progress and completion.
+        :param description: Describes the operation to the user, such as "Saving Epithelium".
+        :param operation: Called with the progress callback in the background. Returns the result of the operation.
+        :param on_done: Called with the result on the gui thread once the operation has succeeded.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.parent = parent
+        self.description = description  # type: str
+        self.operation = operation
+        self.on_done = on_done
+        self.fraction = 0  # type: float
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Returns True once the operation was cancelled."""
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Stops the operation at its next progress report. The parent is notified once it has stopped."""
+        self._cancelled.set()
+
+    def report_progress(self, fraction: float) -> None:
+        """
+        Progress callback handed to the operation.
+        :param fraction: The fraction of the operation done, from 0 to 1.
+        """
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+        if fraction >= self.fraction + .01 or (fraction >= 1 > self.fraction):
+            self.fraction = fraction
+            wx.PostEvent(self.parent, FileProgressEvent(_EVT_FILE_PROGRESS, -1, self, fraction))
+
+    def run(self):
+        """
+        Runs the operation and posts its result.
+        Overrides Thread.run. Called internally when thread.start() is invoked
+        :return:
+        """
+        try:
+            result = self.operation(self.report_progress)
+        except OperationCancelled:
+            wx.PostEvent(self.parent, FileDoneEvent(_EVT_FILE_DONE, -1, self, cancelled=True))
+        except Exception as error:
+            wx.PostEvent(self.parent, FileDoneEvent(_EVT_FILE_DONE, -1, self, error=error))
+        else:
+            wx.PostEvent(self.parent, FileDoneEvent(_EVT_FILE_DONE, -1, self, result))
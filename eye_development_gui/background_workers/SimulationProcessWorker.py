@@ -0,0 +1,215 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+import wx
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+from epithelium_backend.SharedFrameRing import SharedFrameRing
+from epithelium_backend.SimulationProcess import run_simulation_process
+from eye_development_gui.background_workers.SimulationWorker import SimulationFrameEvent
+from eye_development_gui.background_workers.SimulationWorker import _EVT_SIMULATION_FRAME
+
+
+class SimulationProcessError(RuntimeError):
+    """Raised when the simulation process has ended or does not answer."""
+    pass
+
+
+class SimulationProcessWorker(threading.Thread):
+    """
+    Drop in replacement for SimulationWorker that simulates the epithelium in a separate process
+    (see SimulationProcess). This thread only relays frames: it maps the latest frame written to
+    shared memory into the render buffer and posts frame events, so gui latency does not
+    depend on the size of the epithelium.
+
+    The epithelium held by the gui is never modified by the simulation. Reading the epithelium
+    property after simulating fetches the simulated state from the process, raising SimulationProcessError
+    if the process has ended or does not answer within fetch_timeout seconds. Changes to the fields of the
+    furrow events are sent to the process with set_field.
+    """
+
+    # seconds to wait for the simulation process to send the epithelium
+    fetch_timeout = 60
+
+    def __init__(self,
+                 parent,
+                 render_buffer: SnapshotDoubleBuffer,
+                 epithelium: Epithelium = None):
+        """
+        Initialize this background worker and start the simulation process. The worker starts out paused.
+        :param parent: The wx window that is notified of new frames.
+        :param render_buffer: The buffer render snapshots are published to.
+        :param epithelium: The epithelium to simulate.
+        """
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.parent = parent
+        self.render_buffer = render_buffer
+        self._epithelium = epithelium  # type: Epithelium
+        self._epithelium_stale = False  # type: bool
+        self.tick = 0  # type: int
+        self.frame_delay = 0.1  # type: float
+        self.ticks_per_frame = 1  # type: int
+        self.max_throughput = False  # type: bool
+        self._tick_rate = 0.0  # type: float
+
+        # kept for compatibility with SimulationWorker, the gui's epithelium is never simulated
+        self.tick_lock = threading.Lock()
+        self._resumed = False  # type: bool
+        self._frame_pending = threading.Event()
+        self._fetched_epithelia = queue.Queue()
+        self._send_lock = threading.Lock()
+
+        # rings are kept until the snapshots read from them are no longer displayed
+        self._ring = None  # type: SharedFrameRing
+        self._retired_rings = []  # type: list
+
+        # spawn rather than fork, wx does not survive being forked
+        context = multiprocessing.get_context("spawn")
+        self._connection, process_connection = context.Pipe()
+        self._process = context.Process(target=run_simulation_process,
+                                        args=(process_connection, epithelium),
+                                        daemon=True)
+        self._process.start()
+        process_connection.close()
+
+    def _send(self, *message) -> None:
+        """Sends a control message to the simulation process."""
+        with self._send_lock:
+            try:
+                self._connection.send(message)
+            except (BrokenPipeError, EOFError, OSError):
+                raise SimulationProcessError("The simulation process has ended")
+
+    def _fetch(self) -> Epithelium:
+        """Fetches the simulated epithelium from the simulation process."""
+        self._send('fetch')
+        deadline = time.perf_counter() + self.fetch_timeout
+        while True:
+            try:
+                return self._fetched_epithelia.get(timeout=0.5)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    raise SimulationProcessError("The simulation process has ended (exit code %s)"
+                                                 % self._process.exitcode)
+                if time.perf_counter() > deadline:
+                    raise SimulationProcessError("The simulation process did not answer within %g seconds"
+                                                 % self.fetch_timeout)
+
+    @property
+    def epithelium(self) -> Epithelium:
+        """
+        Returns the epithelium being simulated, fetching it from the simulation process if needed.
+        Raises SimulationProcessError if it cannot be fetched.
+        """
+        if self._epithelium_stale:
+            self._epithelium = self._fetch()
+            self._epithelium_stale = self._resumed
+        return self._epithelium
+
+    @epithelium.setter
+    def epithelium(self, value: Epithelium) -> None:
+        """
+        Sets the epithelium to simulate, and publishes a snapshot of it.
+        :param value: The new epithelium. It is copied into the simulation process.
+        """
+        self._epithelium = value
+        self._epithelium_stale = False
+        self.tick = 0
+        self._send('set_epithelium', value)
+        self.render_buffer.publish(RenderSnapshot.from_epithelium(value, self.tick))
+
+    @property
+    def resumed(self) -> bool:
+        """Returns True if the worker is simulating."""
+        return self._resumed
+
+    @property
+    def tick_rate(self) -> float:
+        """Returns the measured number of ticks simulated per second."""
+        return self._tick_rate if self.resumed else 0.0
+
+    def resume(self) -> None:
+        """Begins simulating the epithelium."""
+        self._send('set_parameters', {'frame_delay': self.frame_delay,
+                                      'ticks_per_frame': self.ticks_per_frame,
+                                      'max_throughput': self.max_throughput})
+        self._send('resume')
+        self._resumed = True
+        self._epithelium_stale = True
+
+    def pause(self) -> None:
+        """Stops simulating the epithelium."""
+        resumed, self._resumed = self._resumed, False
+        if resumed:
+            self._send('pause')
+
+    def set_field(self, event_index: int, name: str, value) -> None:
+        """
+        Sets the value of a field of one of the furrow events of the simulated epithelium.
+        :param event_index: The index of the furrow event.
+        :param name: The name of the field.
+        :param value: The new value.
+        """
+        self._send('set_field', event_index, name, value)
+
+    def shut_down(self) -> None:
+        """Ends the simulation process and this thread."""
+        try:
+            self.pause()
+            self._send('stop')
+        except SimulationProcessError:
+            pass
+        self._process.join(timeout=5)
+
+    def frame_consumed(self) -> None:
+        """Signals that the last posted frame event was handled, so another one may be posted."""
+        self._frame_pending.clear()
+
+    def _retire_rings(self) -> None:
+        """Closes every retired ring that is no longer displayed."""
+        self._retired_rings = [ring for ring in self._retired_rings if not ring.close()]
+
+    def run(self):
+        """
+        Relays messages from the simulation process until it ends.
+        Overrides Thread.run. Called internally when thread.start() is invoked
+        :return:
+        """
+
+        while True:
+            try:
+                message = self._connection.recv()
+            except (EOFError, OSError):
+                break
+
+            command = message[0]
+            if command == 'ring':
+                if self._ring is not None:
+                    self._retired_rings.append(self._ring)
+                self._ring = SharedFrameRing.attach(message[1])
+
+            elif command == 'frame':
+                _, slot, self.tick, self._tick_rate = message
+                self.render_buffer.publish(self._ring.read(slot))
+                self._send('hold', slot)
+                self._retire_rings()
+
+                # only keep one frame event in the gui's queue at a time
+                if not self._frame_pending.is_set():
+                    self._frame_pending.set()
+                    wx.PostEvent(self.parent, SimulationFrameEvent(_EVT_SIMULATION_FRAME, -1,
+                                                                   self.render_buffer.front))
+
+            elif command == 'epithelium':
+                self._fetched_epithelia.put(message[1])
+
+        if self._ring is not None:
+            self._retired_rings.append(self._ring)
+        self._retire_rings()
@@ -0,0 +1,174 @@
+"""
+Based on code from https://wiki.wxpython.org/Non-Blocking%20Gui
+"""
+
+import threading
+import time
+
+import wx
+
+from epithelium_backend.Epithelium import Epithelium
+from epithelium_backend.RateCounter import RateCounter
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+
+
+_EVT_SIMULATION_FRAME = wx.NewEventType()
+EVT_SIMULATION_FRAME = wx.PyEventBinder(_EVT_SIMULATION_FRAME, 1)
+
+
+class SimulationFrameEvent(wx.PyCommandEvent):
+    """Event to signal that a new render snapshot has been published."""
+
+    def __init__(self, etype, eid, snapshot=None):
+        """initialize the event"""
+        wx.PyCommandEvent.__init__(self, etype, eid)
+        self.snapshot = snapshot
+
+    def get_snapshot(self) -> RenderSnapshot:
+        """Returns the snapshot tied to the event."""
+        return self.snapshot
+
+
+class SimulationWorker(threading.Thread):
+    """
+    Long-lived background worker that simulates an epithelium while it is resumed.
+    Whenever a frame is due a render snapshot is published to the render buffer, so the gui
+    can draw without touching the epithelium that is being simulated.
+
+    Frames are paced in one of two ways:
+    Normally ticks_per_frame ticks are run for every frame and frames are spaced frame_delay
+    seconds apart. With max_throughput set, ticks run back to back and a frame is only
+    published once frame_delay seconds have passed since the last one.
+    """
+
+    def __init__(self,
+                 parent,
+                 render_buffer: SnapshotDoubleBuffer,
+                 epithelium: Epithelium = None):
+        """
+        Initialize this background worker. The worker starts out paused.
+        :param parent: The wx window that is notified of new frames.
+        :param render_buffer: The buffer render snapshots are published to.
+        :param epithelium: The epithelium to simulate.
+        """
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.parent = parent
+        self.render_buffer = render_buffer
+        self._epithelium = epithelium  # type: Epithelium
+        self.tick = 0  # type: int
+        self.frame_delay = 0.1  # type: float
+        self.ticks_per_frame = 1  # type: int
+        self.max_throughput = False  # type: bool
+        self.tick_counter = RateCounter()  # type: RateCounter
+
+        # held for the duration of every tick
+        self.tick_lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._shut_down = threading.Event()
+        self._frame_pending = threading.Event()
+
+    @property
+    def epithelium(self) -> Epithelium:
+        """Returns the epithelium being simulated."""
+        return self._epithelium
+
+    @epithelium.setter
+    def epithelium(self, value: Epithelium) -> None:
+        """
+        Sets the epithelium to simulate, and publishes a snapshot of it.
+        :param value: The new epithelium. Waits for any in-progress tick to finish.
+        """
+        with self.tick_lock:
+            self._epithelium = value
+            self.tick = 0
+            self.render_buffer.publish(RenderSnapshot.from_epithelium(value, self.tick))
+
+    @property
+    def resumed(self) -> bool:
+        """Returns True if the worker is simulating."""
+        return self._resumed.is_set()
+
+    @property
+    def tick_rate(self) -> float:
+        """Returns the measured number of ticks simulated per second."""
+        return self.tick_counter.rate if self.resumed else 0.0
+
+    def resume(self) -> None:
+        """Begins simulating the epithelium."""
+        self.tick_counter.reset()
+        self._resumed.set()
+
+    def pause(self) -> None:
+        """Stops simulating the epithelium. Returns once any in-progress tick has finished."""
+        self._resumed.clear()
+        with self.tick_lock:
+            pass
+
+    def set_field(self, event_index: int, name: str, value) -> None:
+        """
+        Does nothing, the simulated epithelium shares the fields of the furrow events with the gui.
+        See SimulationProcessWorker.set_field.
+        """
+        pass
+
+    def shut_down(self) -> None:
+        """Pauses the worker and ends its thread."""
+        self._shut_down.set()
+        self.pause()
+
+    def frame_consumed(self) -> None:
+        """Signals that the last posted frame event was handled, so another one may be posted."""
+        self._frame_pending.clear()
+
+    def run(self):
+        """
+        Simulates the epithelium while resumed, until shut down.
+        Overrides Thread.run. Called internally when thread.start() is invoked
+        :return:
+        """
+
+        ticks_since_frame = 0
+        last_frame_time = time.perf_counter()
+        while not self._shut_down.is_set():
+            if not self._resumed.wait(timeout=0.1):
+                continue
+
+            tick_start = time.perf_counter()
+            snapshot = None
+            with self.tick_lock:
+                # the worker may have been paused while waiting on the lock
+                if not self._resumed.is_set():
+                    continue
+                self._epithelium.update()
+                self.tick += 1
+                ticks_since_frame += 1
+
+                # only pay for a snapshot when a frame is due
+                if self.max_throughput:
+                    frame_due = tick_start - last_frame_time >= self.frame_delay
+                else:
+                    frame_due = ticks_since_frame >= self.ticks_per_frame
+                if frame_due:
+                    snapshot = RenderSnapshot.from_epithelium(self._epithelium, self.tick)
+            self.tick_counter.count()
+
+            if snapshot is not None:
+                ticks_since_frame = 0
+                last_frame_time = tick_start
+                self.render_buffer.publish(snapshot)
+
+                # only keep one frame event in the gui's queue at a time
+                if not self._frame_pending.is_set():
+                    self._frame_pending.set()
+                    wx.PostEvent(self.parent, SimulationFrameEvent(_EVT_SIMULATION_FRAME, -1, snapshot))
+
+            # wait out the rest of the tick
+            if not self.max_throughput:
+                tick_delay = self.frame_delay / self.ticks_per_frame
+                remaining_delay = tick_delay - (time.perf_counter() - tick_start)
+                if remaining_delay > 0:
+                    self._shut_down.wait(remaining_delay)
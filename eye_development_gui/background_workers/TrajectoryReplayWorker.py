@@ -0,0 +1,153 @@
+import threading
+import time
+
+import wx
+
+from epithelium_backend.RenderSnapshot import RenderSnapshot
+from epithelium_backend.RenderSnapshot import SnapshotDoubleBuffer
+
+
+_EVT_REPLAY_FRAME = wx.NewEventType()
+EVT_REPLAY_FRAME = wx.PyEventBinder(_EVT_REPLAY_FRAME, 1)
+
+
+class ReplayFrameEvent(wx.PyCommandEvent):
+    """Event to signal that a frame of a replayed trajectory has been published."""
+
+    def __init__(self, etype, eid, index: int = 0, snapshot: RenderSnapshot = None):
+        """initialize the event"""
+        wx.PyCommandEvent.__init__(self, etype, eid)
+        self.index = index
+        self.snapshot = snapshot
+
+    def get_snapshot(self) -> RenderSnapshot:
+        """Returns the snapshot tied to the event."""
+        return self.snapshot
+
+
+class TrajectoryReplayWorker(threading.Thread):
+    """
+    Long-lived background worker that plays back a recorded trajectory while it is resumed.
+    Frames are read from the mapped trajectory file (see TrajectoryReader) and published to the
+    render buffer, so recorded runs are drawn without simulating them again.
+
+    Every frame_delay seconds the worker moves frames_per_step frames through the trajectory,
+    backwards when reversed. The next frame is read while the current one is being drawn.
+    """
+
+    def __init__(self,
+                 parent,
+                 render_buffer: SnapshotDoubleBuffer,
+                 reader):
+        """
+        Initialize this background worker. The worker starts out paused, showing the first frame.
+        :param parent: The wx window that is notified of new frames.
+        :param render_buffer: The buffer render snapshots are published to.
+        :param reader: The trajectory to play back, a TrajectoryReader or CompressedTrajectoryReader.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.parent = parent
+        self.render_buffer = render_buffer
+        self.reader = reader
+        self.frame_delay = 0.1  # type: float
+        self.frames_per_step = 1  # type: int
+        self.reversed = False  # type: bool
+        self.index = 0  # type: int
+
+        # held while a frame is read and published
+        self.frame_lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._shut_down = threading.Event()
+        self._frame_pending = threading.Event()
+        self._next_frame = None  # type: tuple
+
+    @property
+    def resumed(self) -> bool:
+        """Returns True if the worker is playing the trajectory."""
+        return self._resumed.is_set()
+
+    def resume(self) -> None:
+        """Begins playing the trajectory from the current frame."""
+        self._resumed.set()
+
+    def pause(self) -> None:
+        """Stops playing the trajectory. Returns once any in-progress frame has been published."""
+        self._resumed.clear()
+        with self.frame_lock:
+            pass
+
+    def shut_down(self) -> None:
+        """Pauses the worker and ends its thread."""
+        self._shut_down.set()
+        self.pause()
+
+    def frame_consumed(self) -> None:
+        """Signals that the last posted frame event was handled, so another one may be posted."""
+        self._frame_pending.clear()
+
+    def seek(self, index: int) -> None:
+        """
+        Shows a frame of the trajectory.
+        :param index: The index of the frame, clamped to the recorded frames.
+        """
+        with self.frame_lock:
+            self._publish(min(max(index, 0), len(self.reader) - 1))
+
+    def seek_tick(self, tick: int) -> None:
+        """Shows the frame drawn for a tick (see TrajectoryReader.frame_index)."""
+        self.seek(self.reader.frame_index(tick))
+
+    def step(self, frames: int) -> None:
+        """Moves a number of frames through the trajectory, negative numbers move backwards."""
+        self.seek(self.index + frames)
+
+    def _publish(self, index: int) -> None:
+        """Publishes a frame and reads the frame that follows it in the direction of play."""
+        if self._next_frame is not None and self._next_frame[0] == index:
+            snapshot = self._next_frame[1]
+        else:
+            snapshot = self.reader.snapshot(index)
+        self.index = index
+        self.render_buffer.publish(snapshot)
+
+        # only keep one frame event in the gui's queue at a time
+        if not self._frame_pending.is_set():
+            self._frame_pending.set()
+            wx.PostEvent(self.parent, ReplayFrameEvent(_EVT_REPLAY_FRAME, -1, index, snapshot))
+
+        next_index = index + (-self.frames_per_step if self.reversed else self.frames_per_step)
+        self._next_frame = (next_index, self.reader.snapshot(next_index)) \
+            if 0 <= next_index < len(self.reader) else None
+
+    def run(self):
+        """
+        Plays the trajectory while resumed, until shut down. Playback pauses at either end of the trajectory.
+        Overrides Thread.run. Called internally when thread.start() is invoked
+        :return:
+        """
+        while not self._shut_down.is_set():
+            if not self._resumed.wait(timeout=0.1):
+                continue
+
+            frame_start = time.perf_counter()
+            with self.frame_lock:
+                # the worker may have been paused while waiting on the lock
+                if not self._resumed.is_set():
+                    continue
+                # pick up frames written by a recording that is still running
+                if not self.reversed and self.index + self.frames_per_step >= len(self.reader):
+                    self.reader.refresh()
+                step = -self.frames_per_step if self.reversed else self.frames_per_step
+                next_index = min(max(self.index + step, 0), len(self.reader) - 1)
+                if next_index == self.index:
+                    self._resumed.clear()
+                    # let the gui know that playback stopped
+                    wx.PostEvent(self.parent, ReplayFrameEvent(_EVT_REPLAY_FRAME, -1, self.index))
+                    continue
+                self._publish(next_index)
+
+            remaining_delay = self.frame_delay - (time.perf_counter() - frame_start)
+            if remaining_delay > 0:
+                self._shut_down.wait(remaining_delay)
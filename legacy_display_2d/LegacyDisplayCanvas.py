@@ -5,8 +5,7 @@ from OpenGL.GL import *
 from OpenGL.GLU import *
 
 from legacy_display_2d.LegacyGlDrawingPrimitives import draw_circle
-from quick_change.CellDisplayRules import determine_cell_fill
-from quick_change.CellDisplayRules import determine_cell_color
+from display_2d.EpitheliumGlTranslator import fate_display_tables
 
 from pyrr import matrix44, vector4
 
@@ -144,10 +143,14 @@ class LegacyDisplayCanvas(glcanvas.GLCanvas):
 
         glMatrixMode(GL_MODELVIEW)
         glLineWidth(2)
-        for cell in self.GetParent().epithelium.cells:
+        snapshot = self.GetParent().render_snapshot
+        colors, fills = fate_display_tables()
+        for i in range(len(snapshot)):
             # determine the color of the circle
-            color = determine_cell_color(cell)
-            fill = determine_cell_fill(cell)
-            draw_circle((cell.position_x, cell.position_y), cell.radius, fill, (*color, 1))
+            fate = snapshot.fate[i]
+            draw_circle((snapshot.position_x[i], snapshot.position_y[i]),
+                        snapshot.radius[i],
+                        fills[fate],
+                        (*colors[fate], 1))
 
         self.SwapBuffers()
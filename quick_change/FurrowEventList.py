@@ -18,7 +18,9 @@ def run_r8_selector(field_types, epithelium, cells):
     r8_min_from_edge = field_types['min distance from edge'].value
     r8_target_radius = field_types['r8 target radius'].value
 
-    collision_handler = CellCollisionHandler(epithelium.cells, by_max_radius=False)
+    handler = epithelium.cell_collision_handler
+    collision_handler = CellCollisionHandler(epithelium.cells, by_max_radius=False,
+                                             period_x=handler.period_x, period_y=handler.period_y)
     min_row = min(map(lambda x: collision_handler.compute_row(x.position_x), collision_handler.cells))
     min_col = min(map(lambda x: collision_handler.compute_col(x.position_y), collision_handler.cells))
     max_row = max(map(lambda x: collision_handler.compute_row(x.position_x), collision_handler.cells))
@@ -35,8 +37,13 @@ def run_r8_selector(field_types, epithelium, cells):
         row = collision_handler.compute_row(cell.position_y)
         col = collision_handler.compute_col(cell.position_x)
 
-        # Don't specialize cells if they are too close to the edge of the simulation
-        if col < min_col + r8_min_from_edge or row < min_row + r8_min_from_edge or col > max_col - r8_min_from_edge or row > max_row - r8_min_from_edge:
+        # Don't specialize cells if they are too close to the edge of the simulation.
+        # Periodic sheets have no edge in the directions they wrap around in.
+        if collision_handler.period_x is None and \
+                (col < min_col + r8_min_from_edge or col > max_col - r8_min_from_edge):
+            assign = False
+        if collision_handler.period_y is None and \
+                (row < min_row + r8_min_from_edge or row > max_row - r8_min_from_edge):
             assign = False
 
         if assign:
@@ -68,7 +75,8 @@ def run_r2_r5_selector(field_types, epithelium, cells):
         # r2 and r5 cells are recruited by R8 cells
         if cell.photoreceptor_type == PhotoreceptorType.R8:
             neighbors = epithelium.neighboring_cells(cell, max_distance_from_r8)
-            neighbors.sort(key=cell.distance_to_other)
+            collision_handler = epithelium.cell_collision_handler
+            neighbors.sort(key=lambda neighbor: collision_handler.distance_between(cell, neighbor))
 
             # Get the number of r2 or r5 cells already selected by the R8
             selected_r2_r5_cells = \
@@ -123,7 +131,8 @@ def run_r3_r4_selector(field_types, epithelium, cells):
         # r3 and r4 cells are recruited an the R8
         if cell.photoreceptor_type == PhotoreceptorType.R8:
             neighbors = epithelium.neighboring_cells(cell, max_distance_from_r8)
-            neighbors.sort(key=cell.distance_to_other)
+            collision_handler = epithelium.cell_collision_handler
+            neighbors.sort(key=lambda neighbor: collision_handler.distance_between(cell, neighbor))
 
             # Get the number of r2 or r5 cells already selected by the R8
             selected_r3_r4_cells = \
@@ -175,7 +184,8 @@ def run_r1_r6_selector(field_types, epithelium, cells):
         # r1 and r6 cells are recruited an the R8
         if cell.photoreceptor_type == PhotoreceptorType.R8:
             neighbors = epithelium.neighboring_cells(cell, max_distance_from_r8)
-            neighbors.sort(key=cell.distance_to_other)
+            collision_handler = epithelium.cell_collision_handler
+            neighbors.sort(key=lambda neighbor: collision_handler.distance_between(cell, neighbor))
 
             # Get the number of r2 or r5 cells already selected by the R8
             selected_r1_r6_cells = \
@@ -235,7 +245,9 @@ def run_border_cell_selection(field_types, epithelium, cells):
             neighbors = epithelium.neighboring_cells(cell, distance)
             if distance == 1:
                 for neighbor in neighbors:
-                    if cell.touches(neighbor):
+                    # across the edges of periodic sheets as well
+                    if epithelium.cell_collision_handler.distance_between(cell, neighbor) <= \
+                            cell.radius + neighbor.radius:
                         if neighbor.photoreceptor_type != PhotoreceptorType.NOT_RECEPTOR:
                             # make support
                             cell.support_specializations.add(SupportCellType.BORDER_CELL)